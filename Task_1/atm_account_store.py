@@ -0,0 +1,220 @@
+"""
+Account Store
+=============
+
+Dirty-tracking, crash-safe persistence for ATM account data.
+
+Only accounts that changed are re-serialized; every other account keeps
+its cached encoded line. Changes are flushed together in a group commit
+that writes a temporary file and atomically renames it over
+``accounts.json``, so a crash mid-write can never leave a truncated file.
+"""
+
+import json
+import os
+import threading
+import time
+
+from atm_metrics import METRICS, acquire, fsync
+
+DURABILITY_LEVELS = ("fsync", "batched", "async")
+
+
+class AccountStore:
+    """
+    Persist an accounts dict with dirty tracking and group commits
+
+    Durability levels:
+    - fsync: commit and fsync on every save (safest, slowest)
+    - batched: group commit once ``batch_size`` saves are pending or
+      ``batch_interval`` seconds have passed since the first pending save;
+      a flusher thread commits on the interval if no further save arrives
+    - async: a background thread writes dirty accounts behind the caller
+      every ``batch_interval`` seconds
+
+    The file stays a plain JSON object keyed by account number with one
+    account per line, so ``json.load`` reads it exactly as before.
+    """
+
+    def __init__(self, path, accounts, durability="fsync",
+                 batch_size=32, batch_interval=1.0):
+        """
+        Create a store for an already loaded accounts dict
+
+        Args:
+            path (str): accounts.json location
+            accounts (Mapping): account_number -> account record, e.g. a
+                Ledger (shared, not copied)
+            durability (str): One of DURABILITY_LEVELS
+            batch_size (int): Pending saves that trigger a batched commit
+            batch_interval (float): Seconds between batched/async commits
+        """
+        if durability not in DURABILITY_LEVELS:
+            raise ValueError(f"Unknown durability level: {durability}")
+
+        self.path = path
+        self.accounts = accounts
+        self.durability = durability
+        self.batch_size = batch_size
+        self.batch_interval = batch_interval
+        self.commits = 0
+
+        # Pre-seeded in account order so the file keeps its layout
+        self._encoded = dict.fromkeys(accounts)
+        self._dirty = set(accounts)
+        self._pending = 0
+        self._first_pending = None
+        self._lock = threading.Lock()
+        self._commit_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._closed = False
+        self._writer = None
+
+        if self.durability == "async":
+            self._writer = threading.Thread(target=self._write_behind,
+                                            name="account-writer", daemon=True)
+            self._writer.start()
+        elif self.durability == "batched":
+            self._writer = threading.Thread(target=self._flush_batches,
+                                            name="account-flusher", daemon=True)
+            self._writer.start()
+
+    def mark_dirty(self, *account_numbers):
+        """
+        Record that accounts changed without scheduling a commit
+
+        Args:
+            *account_numbers (str): Changed accounts; all accounts if empty
+        """
+        with self._lock:
+            self._dirty.update(account_numbers or self.accounts)
+
+    def save(self, *account_numbers):
+        """
+        Record changed accounts and commit according to the durability level
+
+        Args:
+            *account_numbers (str): Changed accounts; all accounts if empty
+        """
+        with self._lock:
+            self._dirty.update(account_numbers or self.accounts)
+            self._pending += 1
+            now = time.monotonic()
+            first = self._first_pending is None
+            if first:
+                self._first_pending = now
+            # Decided under the lock: a concurrent commit resets both counters
+            due = (self._pending >= self.batch_size or
+                   now - self._first_pending >= self.batch_interval)
+
+        if self.durability == "fsync":
+            self.commit()
+        elif self.durability == "batched":
+            if due:
+                self.commit()
+            elif first:
+                # Start the flusher's clock for this batch
+                self._wakeup.set()
+        else:
+            self._wakeup.set()
+
+    def commit(self):
+        """
+        Group-commit all dirty accounts with write-to-temp plus atomic rename
+
+        Returns:
+            bool: True if a file was written, False if nothing was dirty
+        """
+        # Commits are serialized so an older snapshot never overwrites a newer one
+        acquire(self._commit_lock, "account_store")
+        try:
+            with self._lock:
+                if not self._dirty and os.path.exists(self.path):
+                    return False
+
+                for account_number in self._dirty:
+                    record = self.accounts.get(account_number)
+                    if record is None:
+                        self._encoded.pop(account_number, None)
+                    else:
+                        self._encoded[account_number] = (
+                            f"{json.dumps(account_number)}: "
+                            f"{json.dumps(dict(record), separators=(',', ':'))}"
+                        )
+                self._dirty.clear()
+                self._pending = 0
+                self._first_pending = None
+                body = ",\n".join(self._encoded.values())
+
+            self._write_atomic("{\n" + body + "\n}\n")
+            self.commits += 1
+        finally:
+            self._commit_lock.release()
+        return True
+
+    def close(self):
+        """Commit outstanding changes and stop the background thread"""
+        self._closed = True
+        if self._writer:
+            self._wakeup.set()
+            self._writer.join()
+            self._writer = None
+        self.commit()
+
+    def _write_atomic(self, content):
+        """Write content to a temp file, fsync it and rename it into place"""
+        temp_path = f"{self.path}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            f.write(content)
+            f.flush()
+            fsync(f.fileno(), "accounts")
+            METRICS.inc("atm_bytes_written_total", f.tell(), file="accounts")
+        os.replace(temp_path, self.path)
+        _fsync_directory(self.path)
+
+    def _flush_batches(self):
+        """Background loop for batched durability: commit a batch that saves stopped filling"""
+        while not self._closed:
+            first = self._first_pending
+            timeout = None if first is None else first + self.batch_interval - time.monotonic()
+            if timeout is None or timeout > 0:
+                self._wakeup.wait(timeout)
+            self._wakeup.clear()
+            if self._closed:
+                break
+            first = self._first_pending
+            if first is not None and time.monotonic() - first >= self.batch_interval:
+                try:
+                    self.commit()
+                except OSError as e:
+                    print(f"✗ Error saving accounts: {e}")
+
+    def _write_behind(self):
+        """Background loop for async durability"""
+        while not self._closed:
+            self._wakeup.wait(self.batch_interval)
+            self._wakeup.clear()
+            if self._closed:
+                break
+            if self._dirty:
+                # Give concurrent saves a moment to join this commit
+                time.sleep(min(self.batch_interval, 0.05))
+                try:
+                    self.commit()
+                except OSError as e:
+                    print(f"✗ Error saving accounts: {e}")
+
+
+def _fsync_directory(path):
+    """fsync the directory holding path so the rename itself is durable"""
+    directory = os.path.dirname(os.path.abspath(path))
+    try:
+        fd = os.open(directory, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
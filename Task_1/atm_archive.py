@@ -0,0 +1,528 @@
+"""
+Transaction Archive
+===================
+
+Cold tier for old transaction history.
+
+Transactions older than a configurable age are moved out of the hot
+storage backend into immutable, compressed monthly segment files:
+
+    archive/
+        MANIFEST.json           committed segments (the commit point)
+        2025-06.0001.seg        one segment per month per archiving run
+        2025-07.0001.seg
+
+A segment is columnar: transaction IDs, dates, type codes, amounts and
+balances in cents, and descriptions are stored (and zlib-compressed)
+column by column. Its header carries the min/max date and an account
+index (first row and row count per account), so range scans skip
+segments by date or account without decompressing anything.
+
+``TieredStorage`` wraps any storage backend and merges the two tiers:
+history positions run through the archived rows first and the hot rows
+after them, so history queries work unchanged while the hot working set
+only holds recent activity.
+
+Usage:
+    python atm_archive.py --older-than 90             # JSON storage
+    python atm_archive.py --storage sqlite --db atm.db --older-than 30
+"""
+
+import argparse
+import json
+import os
+import struct
+import threading
+import zlib
+from array import array
+from bisect import bisect_left
+from collections import OrderedDict
+from datetime import datetime, timedelta
+
+from atm_journal import write_snapshot
+
+
+SEGMENT_MAGIC = b"ATMSEG01"
+HEADER_LENGTH = struct.Struct("<I")
+MANIFEST = "MANIFEST.json"
+
+
+class Segment:
+    """One immutable monthly segment; columns are decompressed on demand"""
+
+    def __init__(self, path):
+        """
+        Read a segment header
+
+        Args:
+            path (str): Segment file
+        """
+        self.path = path
+        with open(path, 'rb') as f:
+            if f.read(len(SEGMENT_MAGIC)) != SEGMENT_MAGIC:
+                raise ValueError(f"{path} is not an archive segment")
+            (length,) = HEADER_LENGTH.unpack(f.read(HEADER_LENGTH.size))
+            header = json.loads(f.read(length))
+        self.data_offset = len(SEGMENT_MAGIC) + HEADER_LENGTH.size + length
+        self.month = header["month"]
+        self.min_date = header["min_date"]
+        self.max_date = header["max_date"]
+        self.rows = header["rows"]
+        self.accounts = header["accounts"]
+        self.types = header["types"]
+        self.column_spans = header["columns"]
+        self._columns = {}
+        self._lock = threading.Lock()
+
+    def overlaps(self, start=None, end=None):
+        """True if the segment may hold rows dated within [start, end]"""
+        if start and self.max_date[:len(start)] < start:
+            return False
+        if end and self.min_date[:len(end)] > end:
+            return False
+        return True
+
+    def column(self, name):
+        """Decompress (once) and return one column"""
+        with self._lock:
+            values = self._columns.get(name)
+            if values is None:
+                offset, length = self.column_spans[name]
+                with open(self.path, 'rb') as f:
+                    f.seek(self.data_offset + offset)
+                    raw = zlib.decompress(f.read(length))
+                if name == "type":
+                    values = array('B', raw)
+                elif name in ("amount", "balance_after"):
+                    values = array('q')
+                    values.frombytes(raw)
+                else:
+                    values = json.loads(raw)
+                self._columns[name] = values
+            return values
+
+    def record(self, row):
+        """Rebuild the transaction dict stored at a row"""
+        return {
+            "transaction_id": self.column("transaction_id")[row],
+            "date": self.column("date")[row],
+            "type": self.types[self.column("type")[row]],
+            "amount": self.column("amount")[row] / 100,
+            "description": self.column("description")[row],
+            "balance_after": self.column("balance_after")[row] / 100,
+        }
+
+    def release(self):
+        """Drop decompressed columns"""
+        with self._lock:
+            self._columns = {}
+
+
+def write_segment(path, month, groups):
+    """
+    Write one immutable segment atomically
+
+    Args:
+        path (str): Segment file to create
+        month (str): YYYY-MM the rows belong to
+        groups (list): (account_number, [transactions]) in account order
+    """
+    ids, dates, descriptions = [], [], []
+    types, amounts, balances = array('B'), array('q'), array('q')
+    type_names, type_codes = [], {}
+    accounts = {}
+
+    for account_number, transactions in groups:
+        accounts[account_number] = [len(ids), len(transactions)]
+        for tx in transactions:
+            code = type_codes.get(tx["type"])
+            if code is None:
+                code = type_codes[tx["type"]] = len(type_names)
+                type_names.append(tx["type"])
+            ids.append(tx.get("transaction_id"))
+            dates.append(tx["date"])
+            descriptions.append(tx.get("description", ""))
+            types.append(code)
+            amounts.append(round(tx["amount"] * 100))
+            balances.append(round(tx["balance_after"] * 100))
+
+    blobs = {
+        "transaction_id": json.dumps(ids).encode(),
+        "date": json.dumps(dates).encode(),
+        "type": types.tobytes(),
+        "amount": amounts.tobytes(),
+        "description": json.dumps(descriptions).encode(),
+        "balance_after": balances.tobytes(),
+    }
+    columns, body, offset = {}, [], 0
+    for name, raw in blobs.items():
+        compressed = zlib.compress(raw, 6)
+        columns[name] = [offset, len(compressed)]
+        body.append(compressed)
+        offset += len(compressed)
+
+    header = json.dumps({
+        "month": month,
+        "min_date": min(dates),
+        "max_date": max(dates),
+        "rows": len(ids),
+        "accounts": accounts,
+        "types": type_names,
+        "columns": columns,
+    }, separators=(',', ':')).encode()
+
+    temp_path = f"{path}.tmp"
+    with open(temp_path, 'wb') as f:
+        f.write(SEGMENT_MAGIC + HEADER_LENGTH.pack(len(header)) + header)
+        for blob in body:
+            f.write(blob)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temp_path, path)
+
+
+class TransactionArchive:
+    """
+    Read side of the archive: per-account positions across all segments
+
+    Segment headers are read once when the archive is first used;
+    decompressed segments are kept in a small LRU cache.
+    """
+
+    def __init__(self, directory="archive", cache_size=4):
+        """
+        Args:
+            directory (str): Archive directory
+            cache_size (int): Segments kept decompressed in memory
+        """
+        self.directory = directory
+        self.cache_size = cache_size
+        self.segments = None
+        self._spans = {}
+        self._counts = {}
+        self._recent = OrderedDict()
+        self._lock = threading.RLock()
+
+    @property
+    def manifest_path(self):
+        return os.path.join(self.directory, MANIFEST)
+
+    def manifest(self):
+        """The committed manifest (empty if nothing was archived yet)"""
+        try:
+            with open(self.manifest_path, 'r') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {"segments": [], "pending": {}}
+
+    def load(self):
+        """(Re)read the segment headers listed in the manifest"""
+        with self._lock:
+            self.segments = [Segment(os.path.join(self.directory, name))
+                             for name in self.manifest()["segments"]]
+            self._spans, self._counts = {}, {}
+            self._recent.clear()
+            for segment in self.segments:
+                for account_number, (start, count) in segment.accounts.items():
+                    spans = self._spans.setdefault(account_number, [])
+                    total = self._counts.get(account_number, 0)
+                    # (first global position, segment, first row, rows)
+                    spans.append((total, segment, start, count))
+                    self._counts[account_number] = total + count
+
+    def _ensure_loaded(self):
+        if self.segments is None:
+            self.load()
+
+    def accounts(self):
+        """Account numbers with archived history"""
+        self._ensure_loaded()
+        return self._counts.keys()
+
+    def count(self, account_number):
+        """Number of archived transactions for an account"""
+        self._ensure_loaded()
+        return self._counts.get(account_number, 0)
+
+    def keys(self, account_number, start=0):
+        """(type, date) pairs of archived transactions from position ``start``"""
+        keys = []
+        for first, segment, row, count in self._spans_from(account_number, start):
+            skip = max(0, start - first)
+            types, dates = self._use(segment).column("type"), segment.column("date")
+            for i in range(row + skip, row + count):
+                keys.append((segment.types[types[i]], dates[i]))
+        return keys
+
+    def records(self, account_number, positions):
+        """Archived transactions at the given positions, in that order"""
+        self._ensure_loaded()
+        spans = self._spans.get(account_number, [])
+        starts = [first for first, _, _, _ in spans]
+        records = []
+        for position in positions:
+            i = bisect_left(starts, position + 1) - 1
+            first, segment, row, _ = spans[i]
+            records.append(self._use(segment).record(row + position - first))
+        return records
+
+    def transactions(self, account_number):
+        """All archived transactions of an account, oldest first"""
+        return self.records(account_number, range(self.count(account_number)))
+
+    def scan(self, start=None, end=None, account_number=None):
+        """
+        Range scan over the archive
+
+        Segments whose date range or account index rules them out are
+        skipped without being decompressed.
+
+        Args:
+            start (str): First date to include (YYYY-MM-DD)
+            end (str): Last date to include (YYYY-MM-DD)
+            account_number (str): Only this account
+
+        Yields:
+            tuple: (account_number, transaction)
+        """
+        self._ensure_loaded()
+        for segment in self.segments:
+            if not segment.overlaps(start, end):
+                continue
+            if account_number is not None:
+                if account_number not in segment.accounts:
+                    continue
+                items = [(account_number, segment.accounts[account_number])]
+            else:
+                items = segment.accounts.items()
+            self._use(segment)
+            for acct, (row, count) in items:
+                for i in range(row, row + count):
+                    tx = segment.record(i)
+                    day = tx["date"][:10]
+                    if (start is None or day >= start) and (end is None or day <= end):
+                        yield acct, tx
+
+    def _spans_from(self, account_number, start):
+        self._ensure_loaded()
+        return [span for span in self._spans.get(account_number, ())
+                if span[0] + span[3] > start]
+
+    def _use(self, segment):
+        """Mark a segment as recently used, releasing the least recent ones"""
+        with self._lock:
+            self._recent[segment.path] = segment
+            self._recent.move_to_end(segment.path)
+            while len(self._recent) > self.cache_size:
+                _, old = self._recent.popitem(last=False)
+                old.release()
+        return segment
+
+
+class TieredStorage:
+    """
+    Storage backend facade merging archived and hot history
+
+    Every method not related to history is passed straight through to the
+    wrapped backend. History positions 0..A-1 of an account are archived,
+    A.. are the hot backend's positions 0..
+    """
+
+    def __init__(self, storage, archive):
+        """
+        Args:
+            storage: Hot storage backend
+            archive (TransactionArchive): Archive to merge in
+        """
+        self.storage = storage
+        self.archive = archive
+
+    def __getattr__(self, name):
+        return getattr(self.storage, name)
+
+    def load_transactions(self):
+        transactions = self.storage.load_transactions()
+        recover(self.storage, self.archive)
+        return transactions
+
+    def transaction_count(self, account_number):
+        return self.archive.count(account_number) + self.storage.transaction_count(account_number)
+
+    def get_transactions(self, account_number):
+        return self.archive.transactions(account_number) + self.storage.get_transactions(account_number)
+
+    def recent_transactions(self, account_number, limit):
+        hot = self.storage.recent_transactions(account_number, limit)
+        missing = limit - len(hot)
+        if missing <= 0:
+            return hot
+        archived = self.archive.count(account_number)
+        positions = range(max(0, archived - missing), archived)
+        return self.archive.records(account_number, positions) + hot
+
+    def transaction_keys(self, account_number, start=0):
+        archived = self.archive.count(account_number)
+        if start >= archived:
+            return self.storage.transaction_keys(account_number, start - archived)
+        return (self.archive.keys(account_number, start) +
+                self.storage.transaction_keys(account_number, 0))
+
+    def transactions_at(self, account_number, positions):
+        archived = self.archive.count(account_number)
+        cold = [p for p in positions if p < archived]
+        hot = [p - archived for p in positions if p >= archived]
+        found = dict(zip(cold, self.archive.records(account_number, cold)))
+        found.update(zip((p + archived for p in hot),
+                         self.storage.transactions_at(account_number, hot) if hot else ()))
+        return [found[p] for p in positions]
+
+    def transaction_types(self, account_number):
+        types = {key for key, _ in self.archive.keys(account_number)}
+        return sorted(types.union(self.storage.transaction_types(account_number)))
+
+    def transactions_by_type(self, account_number, transaction_type):
+        archived = [tx for tx in self.archive.transactions(account_number)
+                    if tx["type"] == transaction_type]
+        return archived + self.storage.transactions_by_type(account_number, transaction_type)
+
+    def scan_transactions(self):
+        """Stream archived then hot rows, still grouped by account"""
+        seen = set()
+        current = None
+        for row in self.storage.scan_transactions():
+            if row[0] != current:
+                current = row[0]
+                seen.add(current)
+                yield from self._archived_rows(current)
+            yield row
+        for account_number in sorted(set(self.archive.accounts()) - seen):
+            yield from self._archived_rows(account_number)
+
+    def _archived_rows(self, account_number):
+        for tx in self.archive.transactions(account_number):
+            yield account_number, tx["type"], tx["amount"], tx["balance_after"], tx["date"]
+
+    def export_transactions(self, path=None):
+        """Export both tiers in the transactions.json layout"""
+        accounts = set(self.archive.accounts()).union(self.storage.transactions)
+        write_snapshot(path or self.storage.transactions_file,
+                       {acct: self.get_transactions(acct) for acct in sorted(accounts)})
+
+
+def archive_transactions(storage, directory="archive", older_than_days=90, now=None):
+    """
+    Move transactions older than a cutoff into new monthly segments
+
+    Steps: write segments, commit them in the manifest together with the
+    trim to apply, trim the hot backend, then clear the pending trim. A
+    crash after the manifest commit is finished by ``recover``.
+
+    Args:
+        storage: Hot storage backend with transactions loaded
+        directory (str): Archive directory
+        older_than_days (int): Age after which transactions are archived
+        now (datetime): Reference time, defaults to datetime.now()
+
+    Returns:
+        int: Number of transactions archived
+    """
+    archive = TransactionArchive(directory)
+    os.makedirs(directory, exist_ok=True)
+    recover(storage, archive)
+
+    cutoff = ((now or datetime.now()) - timedelta(days=older_than_days)).strftime("%Y-%m-%d")
+    months = {}
+    drops = {}
+    for account_number in sorted(storage.transactions):
+        history = storage.get_transactions(account_number)
+        # History is appended in time order, so old rows form a prefix
+        count = bisect_left([tx["date"][:10] for tx in history], cutoff)
+        if not count:
+            continue
+        drops[account_number] = (count, history[count - 1].get("transaction_id"))
+        for tx in history[:count]:
+            months.setdefault(tx["date"][:7], {}).setdefault(account_number, []).append(tx)
+
+    if not drops:
+        return 0
+
+    manifest = archive.manifest()
+    existing = set(manifest["segments"])
+    for month in sorted(months):
+        sequence = 1
+        while f"{month}.{sequence:04d}.seg" in existing:
+            sequence += 1
+        name = f"{month}.{sequence:04d}.seg"
+        write_segment(os.path.join(directory, name), month, sorted(months[month].items()))
+        manifest["segments"].append(name)
+
+    manifest["pending"] = {acct: last_id for acct, (_, last_id) in drops.items()}
+    write_snapshot(archive.manifest_path, manifest)
+
+    storage.drop_transactions({acct: count for acct, (count, _) in drops.items()})
+    manifest["pending"] = {}
+    write_snapshot(archive.manifest_path, manifest)
+    return sum(count for count, _ in drops.values())
+
+
+def recover(storage, archive):
+    """
+    Finish a trim interrupted after its segments were committed
+
+    Hot rows up to each account's last archived transaction ID are
+    dropped; accounts already trimmed are left alone.
+    """
+    manifest = archive.manifest()
+    pending = manifest.get("pending")
+    if not pending:
+        return
+    drops = {}
+    for account_number, last_id in pending.items():
+        history = storage.get_transactions(account_number)
+        for position, tx in enumerate(history):
+            if tx.get("transaction_id") == last_id:
+                drops[account_number] = position + 1
+                break
+    if drops:
+        storage.drop_transactions(drops)
+    manifest["pending"] = {}
+    write_snapshot(archive.manifest_path, manifest)
+    archive.load()
+
+
+def main(argv=None):
+    """Archive old transactions from the command line"""
+    from atm_storage import open_storage
+
+    parser = argparse.ArgumentParser(description="Move old ATM transactions to the archive")
+    parser.add_argument("--storage", choices=["json", "lazy", "sqlite"], default="json")
+    parser.add_argument("--db", default="atm.db", help="SQLite database file")
+    parser.add_argument("--journal", action="store_true",
+                        help="replay transactions.jsonl on top of transactions.json")
+    parser.add_argument("--archive-dir", default="archive", help="archive directory")
+    parser.add_argument("--older-than", type=int, default=90, metavar="DAYS",
+                        help="archive transactions older than this many days (default: 90)")
+    args = parser.parse_args(argv)
+
+    if args.storage == "sqlite":
+        storage = open_storage("sqlite", path=args.db)
+    elif args.storage == "lazy":
+        storage = open_storage("lazy")
+    else:
+        storage = open_storage("json", journal_mode=args.journal)
+
+    try:
+        if storage.load_accounts() is None:
+            print("❌ No accounts found")
+            return 1
+        storage.load_transactions()
+        moved = archive_transactions(storage, args.archive_dir, args.older_than)
+    finally:
+        storage.close()
+    print(f"✓ Archived {moved:,} transactions older than {args.older_than} days "
+          f"to {args.archive_dir}/")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
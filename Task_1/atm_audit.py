@@ -0,0 +1,357 @@
+"""
+ATM Audit Log
+=============
+
+Event stream for non-financial activity: logins, failed logins, balance
+inquiries, logouts, PIN changes and refused withdrawals.
+
+These events used to be written to the ledger as zero-amount
+transactions. There they outnumbered real transactions, used up
+transaction IDs, made every history rewrite bigger and cluttered history
+queries. The ledger now holds only balance-changing records. Events are
+recorded here instead, which is cheap:
+
+- ``record`` appends to a bounded in-memory ring buffer and returns
+- a background writer flushes the buffer in batches, when ``batch_size``
+  events are pending or every ``flush_interval`` seconds
+- if the buffer fills faster than the writer drains it, the producer
+  flushes inline, so events are delayed but never dropped
+
+Events are JSON Lines in one file per day (``audit-YYYY-MM-DD.jsonl``).
+Files older than ``retention_days`` are deleted when the log opens and at
+every day rollover.
+
+Usage:
+    python atm_audit.py show --account 1234567890 --limit 20
+    python atm_audit.py split --transactions transactions.json
+    python atm_audit.py prune --retention-days 30
+"""
+
+import argparse
+import json
+import os
+import threading
+from collections import deque
+from datetime import date, datetime, timedelta
+
+from atm_journal import TransactionJournal, read_journal, write_snapshot
+from atm_metrics import METRICS, fsync
+
+
+# Transaction types that do not change a balance and belong in the audit log
+AUDIT_EVENTS = frozenset(("Login", "Failed Login", "Balance Inquiry", "Logout",
+                          "PIN Change", "Failed Withdrawal"))
+FILE_PREFIX = "audit-"
+FILE_SUFFIX = ".jsonl"
+
+
+class AuditLog:
+    """
+    Buffered, batch-flushed audit event writer with day files and retention
+
+    Features:
+    - O(1) ``record`` into a bounded ring buffer
+    - Batched writes (one write call per batch) from a background thread
+    - Per-day files pruned after ``retention_days``
+    """
+
+    def __init__(self, directory="audit", capacity=4096, batch_size=256, flush_interval=1.0,
+                 retention_days=90, fsync=False):
+        """
+        Open (or create) an audit log directory
+
+        Args:
+            directory (str): Directory holding the day files
+            capacity (int): Events the ring buffer holds before producers
+                flush inline
+            batch_size (int): Pending events that wake the writer
+            flush_interval (float): Seconds between background flushes
+            retention_days (int): Days of files to keep (None keeps all)
+            fsync (bool): fsync each batch
+        """
+        if capacity < 1 or batch_size < 1:
+            raise ValueError("capacity and batch_size must be at least 1")
+        self.directory = directory
+        self.capacity = capacity
+        self.batch_size = min(batch_size, capacity)
+        self.flush_interval = flush_interval
+        self.retention_days = retention_days
+        self.fsync = fsync
+        self.written = 0
+        self.batches = 0
+
+        self._buffer = deque()
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._closed = False
+        self._day = None
+        self._file = None
+
+        os.makedirs(directory, exist_ok=True)
+        self.prune()
+        self._writer = threading.Thread(target=self._write_behind, name="audit-writer",
+                                        daemon=True)
+        self._writer.start()
+
+    def record(self, account_number, event, detail="", amount=None):
+        """
+        Queue one event
+
+        Args:
+            account_number (str): Account the event belongs to
+            event (str): Event type, e.g. "Login"
+            detail (str): Free-text description
+            amount (float): Amount involved, if any (e.g. a refused withdrawal)
+
+        Returns:
+            dict: The queued event
+        """
+        entry = {
+            "time": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            "account": account_number,
+            "event": event,
+            "detail": detail,
+        }
+        if amount is not None:
+            entry["amount"] = amount
+        with self._lock:
+            self._buffer.append(entry)
+            pending = len(self._buffer)
+        if pending >= self.capacity:
+            self.flush()
+        elif pending >= self.batch_size:
+            self._wakeup.set()
+        return entry
+
+    def extend(self, entries):
+        """
+        Queue already-built events (e.g. imported from an old history)
+
+        Args:
+            entries (iterable): Event dicts in time order
+        """
+        for entry in entries:
+            with self._lock:
+                self._buffer.append(entry)
+                pending = len(self._buffer)
+            if pending >= self.capacity:
+                self.flush()
+
+    def flush(self):
+        """
+        Write every buffered event
+
+        Returns:
+            int: Number of events written
+        """
+        with self._write_lock:
+            with self._lock:
+                batch = list(self._buffer)
+                self._buffer.clear()
+            if not batch:
+                return 0
+
+            # Group consecutive events by day so each file gets one write
+            start = 0
+            while start < len(batch):
+                day = batch[start]["time"][:10]
+                end = start
+                while end < len(batch) and batch[end]["time"][:10] == day:
+                    end += 1
+                self._write(day, batch[start:end])
+                start = end
+            self.written += len(batch)
+            self.batches += 1
+            return len(batch)
+
+    def events(self, account_number=None, start=None, end=None, limit=None):
+        """
+        Read events back, newest first
+
+        Includes events still in the buffer.
+
+        Args:
+            account_number (str): Only events of this account
+            start (str): First day to include (YYYY-MM-DD)
+            end (str): Last day to include (YYYY-MM-DD)
+            limit (int): Maximum number of events
+
+        Returns:
+            list: Event dicts
+        """
+        with self._lock:
+            pending = list(self._buffer)
+        found = []
+
+        def matches(entry):
+            day = entry["time"][:10]
+            return ((account_number is None or entry["account"] == account_number) and
+                    (start is None or day >= start) and (end is None or day <= end))
+
+        for entry in reversed(pending):
+            if matches(entry):
+                found.append(entry)
+        for day in reversed(self.days()):
+            if limit is not None and len(found) >= limit:
+                break
+            if (start and day < start) or (end and day > end):
+                continue
+            entries = [entry for entry in read_journal(self._path(day)) if matches(entry)]
+            found.extend(reversed(entries))
+        return found[:limit] if limit is not None else found
+
+    def days(self):
+        """Days with an audit file, oldest first"""
+        return sorted(name[len(FILE_PREFIX):-len(FILE_SUFFIX)]
+                      for name in os.listdir(self.directory)
+                      if name.startswith(FILE_PREFIX) and name.endswith(FILE_SUFFIX))
+
+    def prune(self, today=None):
+        """
+        Delete day files older than the retention period
+
+        Returns:
+            list: Days removed
+        """
+        if self.retention_days is None:
+            return []
+        today = today or date.today()
+        cutoff = (today - timedelta(days=self.retention_days)).isoformat()
+        removed = []
+        for day in self.days():
+            if day < cutoff and day != self._day:
+                os.remove(self._path(day))
+                removed.append(day)
+        return removed
+
+    def close(self):
+        """Flush remaining events and stop the writer thread"""
+        if self._closed:
+            return
+        self._closed = True
+        self._wakeup.set()
+        self._writer.join()
+        self.flush()
+        with self._write_lock:
+            if self._file:
+                self._file.close()
+                self._file = None
+
+    def _path(self, day):
+        return os.path.join(self.directory, f"{FILE_PREFIX}{day}{FILE_SUFFIX}")
+
+    def _write(self, day, entries):
+        """Append entries to a day file (caller holds the write lock)"""
+        if day != self._day:
+            if self._file:
+                self._file.close()
+            self._file = open(self._path(day), 'a', encoding='utf-8')
+            rollover = self._day is not None
+            self._day = day
+            if rollover:
+                self.prune(date.fromisoformat(day))
+        data = "".join(json.dumps(entry, separators=(',', ':')) + "\n" for entry in entries)
+        self._file.write(data)
+        self._file.flush()
+        if self.fsync:
+            fsync(self._file.fileno(), "audit")
+        if METRICS.enabled:
+            METRICS.inc("atm_bytes_written_total", len(data.encode("utf-8")), file="audit")
+
+    def _write_behind(self):
+        """Background loop flushing batches"""
+        while not self._closed:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            try:
+                self.flush()
+            except OSError as e:
+                print(f"✗ Error writing audit log: {e}")
+
+
+def split_history(transactions):
+    """
+    Separate audit events from a transaction history
+
+    Args:
+        transactions (dict): account_number -> list of transactions
+
+    Returns:
+        tuple: (financial history in the same layout, list of audit events
+            sorted by time)
+    """
+    ledger, events = {}, []
+    for account_number, history in transactions.items():
+        kept = []
+        for tx in history:
+            if tx.get("type") in AUDIT_EVENTS:
+                entry = {"time": tx.get("date", ""), "account": account_number,
+                         "event": tx["type"], "detail": tx.get("description", "")}
+                if tx.get("amount"):
+                    entry["amount"] = tx["amount"]
+                events.append(entry)
+            else:
+                kept.append(tx)
+        ledger[account_number] = kept
+    events.sort(key=lambda entry: entry["time"])
+    return ledger, events
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="ATM audit log tool")
+    parser.add_argument("--dir", default="audit", help="audit directory (default: audit)")
+    parser.add_argument("--retention-days", type=int, default=90)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    show = commands.add_parser("show", help="print recent events")
+    show.add_argument("--account")
+    show.add_argument("--start", help="first day (YYYY-MM-DD)")
+    show.add_argument("--end", help="last day (YYYY-MM-DD)")
+    show.add_argument("--limit", type=int, default=50)
+
+    split = commands.add_parser("split", help="move audit events out of JSON history files")
+    split.add_argument("--transactions", default="transactions.json")
+    split.add_argument("--journal-file", default=None,
+                       help="journal to fold in first (it is truncated afterwards)")
+
+    commands.add_parser("prune", help="delete files past the retention period")
+    args = parser.parse_args(argv)
+
+    log = AuditLog(args.dir, retention_days=args.retention_days)
+    try:
+        if args.command == "show":
+            for entry in log.events(args.account, args.start, args.end, args.limit):
+                amount = f" ${entry['amount']:,.2f}" if "amount" in entry else ""
+                print(f"{entry['time']}  {entry['account']}  {entry['event']:<18}"
+                      f"{amount}  {entry['detail']}")
+        elif args.command == "split":
+            try:
+                with open(args.transactions, 'r') as f:
+                    transactions = json.load(f)
+            except FileNotFoundError:
+                transactions = {}
+            if args.journal_file:
+                journal = TransactionJournal(args.journal_file)
+                journal.replay(transactions)
+            ledger, events = split_history(transactions)
+            log.extend(events)
+            log.flush()
+            # Audit files are written before the ledger shrinks, so a crash
+            # in between only duplicates events, never loses them
+            write_snapshot(args.transactions, ledger)
+            if args.journal_file:
+                journal.truncate()
+                journal.close()
+            kept = sum(len(history) for history in ledger.values())
+            print(f"✓ Moved {len(events):,} events to {args.dir}; {kept:,} transactions remain")
+        else:
+            removed = log.prune()
+            print(f"✓ Removed {len(removed)} day files")
+    finally:
+        log.close()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
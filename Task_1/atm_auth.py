@@ -0,0 +1,249 @@
+"""
+ATM PIN Authentication
+======================
+
+Salted, deliberately slow PIN hashing, with lockout after repeated
+failures.
+
+PINs are stored in the account's "pin" field as a self-describing hash
+string::
+
+    pbkdf2_sha256$<iterations>$<salt>$<hash>
+    scrypt$<n>$<r>$<p>$<salt>$<hash>
+
+Salt and hash are URL-safe base64. A field without ``$`` is a legacy
+plaintext PIN. It is still accepted, and it is replaced by a hash on the
+first successful login. So is any hash made with a lower cost than the
+current settings.
+
+The key derivation is CPU-bound by design. ``PinAuthenticator`` runs it on
+a thread or process pool, so a burst of logins does not stall the asyncio
+server or sessions doing other work. hashlib releases the GIL while
+deriving, so threads are enough to use several cores.
+
+Failed attempts are counted on the account record ("failed_logins",
+"locked_until") and saved with it. The lockout therefore survives
+restarts and applies across sessions.
+"""
+
+import base64
+import hashlib
+import hmac
+import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+
+SCHEMES = ("pbkdf2_sha256", "scrypt")
+DEFAULT_ITERATIONS = 100_000
+DEFAULT_SCRYPT = (2 ** 14, 8, 1)
+SALT_BYTES = 16
+HASH_BYTES = 32
+
+
+class PinHasher:
+    """
+    Hash and verify PINs with a configurable key derivation cost
+
+    Args:
+        scheme (str): "pbkdf2_sha256" or "scrypt"
+        iterations (int): PBKDF2 iteration count
+        n (int): scrypt CPU/memory cost (power of two)
+        r (int): scrypt block size
+        p (int): scrypt parallelism
+    """
+
+    def __init__(self, scheme="pbkdf2_sha256", iterations=DEFAULT_ITERATIONS,
+                 n=DEFAULT_SCRYPT[0], r=DEFAULT_SCRYPT[1], p=DEFAULT_SCRYPT[2]):
+        if scheme not in SCHEMES:
+            raise ValueError(f"Unknown PIN hash scheme: {scheme}")
+        if scheme == "scrypt" and not hasattr(hashlib, "scrypt"):
+            raise ValueError("This Python build has no hashlib.scrypt")
+        self.scheme = scheme
+        self.iterations = iterations
+        self.n, self.r, self.p = n, r, p
+
+    def hash(self, pin, salt=None):
+        """
+        Derive the stored form of a PIN
+
+        Returns:
+            str: Hash string including scheme, cost and salt
+        """
+        salt = salt or os.urandom(SALT_BYTES)
+        if self.scheme == "scrypt":
+            params = (self.n, self.r, self.p)
+        else:
+            params = (self.iterations,)
+        digest = _derive(self.scheme, params, pin, salt)
+        fields = [self.scheme, *map(str, params), _b64(salt), _b64(digest)]
+        return "$".join(fields)
+
+    def needs_rehash(self, stored):
+        """True if ``stored`` is plaintext or uses other settings than this hasher"""
+        scheme, params, _, _ = parse(stored)
+        if scheme != self.scheme:
+            return True
+        if scheme == "scrypt":
+            return params != (self.n, self.r, self.p)
+        return params != (self.iterations,)
+
+    def describe(self):
+        if self.scheme == "scrypt":
+            return f"scrypt n={self.n} r={self.r} p={self.p}"
+        return f"pbkdf2_sha256 iterations={self.iterations:,}"
+
+
+def parse(stored):
+    """
+    Split a stored PIN into its parts
+
+    Returns:
+        tuple: (scheme, params, salt, digest); scheme is None for a
+            legacy plaintext PIN
+    """
+    if "$" not in stored:
+        return None, (), b"", b""
+    scheme, *fields = stored.split("$")
+    if scheme not in SCHEMES or len(fields) < 3:
+        raise ValueError("Unrecognized PIN hash format")
+    *params, salt, digest = fields
+    return scheme, tuple(int(value) for value in params), _unb64(salt), _unb64(digest)
+
+
+def verify(pin, stored):
+    """
+    Check a PIN against its stored form in constant time
+
+    A module-level function so it can run in a process pool.
+
+    Returns:
+        bool: True if the PIN matches
+    """
+    scheme, params, salt, digest = parse(stored)
+    if scheme is None:
+        return hmac.compare_digest(pin.encode("utf-8"), stored.encode("utf-8"))
+    return hmac.compare_digest(_derive(scheme, params, pin, salt), digest)
+
+
+def _derive(scheme, params, pin, salt):
+    if scheme == "scrypt":
+        n, r, p = params
+        return hashlib.scrypt(pin.encode("utf-8"), salt=salt, n=n, r=r, p=p,
+                              maxmem=256 * n * r + 1024 * 1024, dklen=HASH_BYTES)
+    (iterations,) = params
+    return hashlib.pbkdf2_hmac("sha256", pin.encode("utf-8"), salt, iterations, HASH_BYTES)
+
+
+def _b64(raw):
+    return base64.urlsafe_b64encode(raw).rstrip(b"=").decode("ascii")
+
+
+def _unb64(text):
+    return base64.urlsafe_b64decode(text + "=" * (-len(text) % 4))
+
+
+class PinAuthenticator:
+    """
+    PIN checks offloaded to a worker pool, plus persistent lockout state
+
+    Features:
+    - KDF work on a thread or process pool
+    - Rehash on login when the stored form is plaintext or outdated
+    - Per-account failure counter and timed lockout kept on the record
+    """
+
+    def __init__(self, hasher=None, pool="thread", workers=None, max_attempts=3,
+                 lockout_minutes=15):
+        """
+        Configure PIN verification
+
+        Args:
+            hasher (PinHasher): Hash settings for new and migrated PINs
+            pool (str): "thread", "process" or "inline" (no pool)
+            workers (int): Pool size (defaults to the CPU count)
+            max_attempts (int): Consecutive failures that lock an account
+            lockout_minutes (float): Lock duration; 0 locks until an
+                operator clears it
+        """
+        self.hasher = hasher or PinHasher()
+        self.max_attempts = max_attempts
+        self.lockout = timedelta(minutes=lockout_minutes)
+        workers = workers or os.cpu_count() or 1
+        if pool == "process":
+            self._executor = ProcessPoolExecutor(workers)
+        elif pool == "thread":
+            self._executor = ThreadPoolExecutor(workers, thread_name_prefix="pin-kdf")
+        elif pool == "inline":
+            self._executor = None
+        else:
+            raise ValueError(f"Unknown pool type: {pool}")
+
+    def verify(self, pin, stored):
+        """Check a PIN on the pool and wait for the answer"""
+        if self._executor is None:
+            return verify(pin, stored)
+        return self._executor.submit(verify, pin, stored).result()
+
+    def hash(self, pin):
+        """Hash a PIN on the pool and wait for the result"""
+        if self._executor is None:
+            return self.hasher.hash(pin)
+        return self._executor.submit(self.hasher.hash, pin).result()
+
+    def needs_rehash(self, stored):
+        return self.hasher.needs_rehash(stored)
+
+    def locked_until(self, account, now=None):
+        """
+        End of an account's lockout
+
+        Returns:
+            datetime: When the lock expires (datetime.max for an indefinite
+                lock), or None if the account is not locked
+        """
+        until = account.get("locked_until")
+        if until is None:
+            return None
+        until = datetime.max if until == "indefinite" else datetime.fromisoformat(until)
+        return until if until > (now or datetime.now()) else None
+
+    def register_failure(self, account, now=None):
+        """
+        Count a failed attempt on the record, locking it at the limit
+
+        Returns:
+            bool: True if this failure locked the account
+        """
+        now = now or datetime.now()
+        failures = account.get("failed_logins", 0) + 1
+        if "locked_until" in account and self.locked_until(account, now) is None:
+            # The previous lock has expired; start a fresh count
+            failures = 1
+            del account["locked_until"]
+        account["failed_logins"] = failures
+        if failures < self.max_attempts:
+            return False
+        if self.lockout:
+            account["locked_until"] = (now + self.lockout).isoformat(timespec="seconds")
+        else:
+            account["locked_until"] = "indefinite"
+        return True
+
+    def clear_failures(self, account):
+        """
+        Reset the failure counter and lock after a successful login
+
+        Returns:
+            bool: True if the record changed
+        """
+        changed = False
+        for key in ("failed_logins", "locked_until"):
+            if key in account:
+                del account[key]
+                changed = True
+        return changed
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown()
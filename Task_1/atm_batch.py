@@ -0,0 +1,426 @@
+"""
+ATM Batch Posting
+=================
+
+Bulk balance postings: payroll and other credit files, fees, and interest
+computed from per-account-type rate tables.
+
+Posting a file one ``deposit`` at a time would save the account file and
+append a transaction for every line. A batch goes through three passes
+instead:
+
+1. parse and validate every line (posting type, amount, account),
+   collecting per-line rejects rather than stopping at the first error
+2. under the locks of the touched accounts, check debits against the
+   available balances, including earlier lines of the same batch
+3. apply all balance changes in one pass, reserve one block of transaction
+   IDs, and persist the accounts and every transaction record in a single
+   storage commit (one file rewrite, journal write or SQL transaction)
+
+If the commit fails, every balance is restored and nothing is posted.
+Batch postings are bank-initiated, so the withdrawal limits and velocity
+rules for customer operations do not apply to them.
+
+Posting files are CSV with a header row, or JSON Lines. Fields: account,
+amount, and optionally type and description. The type defaults to the
+command's ``--type``. Amounts are positive. Credit and debit types are
+listed in POSTING_TYPES.
+
+Usage:
+    python atm_batch.py post payroll.csv --type Payroll --rejects rejects.csv
+    python atm_batch.py post fees.jsonl --type Fee --dry-run
+    python atm_batch.py interest --rate Savings=0.02 --rate Premium=0.035 --periods 12
+"""
+
+import argparse
+import csv
+import json
+import re
+import time
+from datetime import datetime
+from decimal import Decimal, ROUND_HALF_EVEN
+
+from atm_engine import MAX_AMOUNT_CENTS, ATMEngine, InvalidAmountError
+from atm_ids import format_id
+from atm_ledger import MAX_CENTS, Ledger, add_cents, from_cents, to_cents
+from atm_metrics import METRICS
+
+
+# Balance effect of each posting type
+POSTING_TYPES = {
+    "Deposit": 1,
+    "Payroll": 1,
+    "Interest": 1,
+    "Fee": -1,
+}
+
+# Plain "123" / "123.4" / "123.45" amounts, parsed without Decimal
+PLAIN_AMOUNT = re.compile(r"(\d{1,15})(?:\.(\d{1,2}))?")
+
+# Accounts changed and saved together on backends without a Ledger
+SAVE_CHUNK = 256
+
+# Annual interest rate per account type; types without an entry earn none
+INTEREST_RATES = {
+    "Savings": 0.02,
+    "Premium": 0.035,
+}
+
+
+def read_postings(path, default_type="Deposit"):
+    """
+    Stream postings from a CSV or JSON Lines file
+
+    Files ending in .jsonl or .json are read as JSON Lines, anything else
+    as CSV with a header row.
+
+    Args:
+        path (str): Posting file
+        default_type (str): Type of lines without one
+
+    Yields:
+        tuple: (line number, account_number, amount, type, description);
+            amount is the raw text or number from the file, and a line that
+            cannot be parsed yields account_number None and the error as
+            description
+    """
+    if path.endswith((".jsonl", ".json")):
+        with open(path, 'r', encoding='utf-8') as f:
+            for line_number, line in enumerate(f, 1):
+                if not line.strip():
+                    continue
+                try:
+                    row = json.loads(line)
+                    yield (line_number, str(row["account"]), row["amount"],
+                           row.get("type") or default_type, row.get("description", ""))
+                except (ValueError, KeyError, TypeError) as e:
+                    yield line_number, None, None, None, f"Unreadable line: {e}"
+        return
+
+    with open(path, 'r', encoding='utf-8', newline='') as f:
+        reader = csv.reader(f)
+        header = [name.strip().lower() for name in next(reader, [])]
+        try:
+            account_col, amount_col = header.index("account"), header.index("amount")
+        except ValueError:
+            raise ValueError(f"{path}: header needs 'account' and 'amount' columns") from None
+        type_col = header.index("type") if "type" in header else None
+        description_col = header.index("description") if "description" in header else None
+        for line_number, row in enumerate(reader, 2):
+            if not row:
+                continue
+            if max(account_col, amount_col) >= len(row):
+                yield line_number, None, None, None, "Unreadable line: missing fields"
+                continue
+            yield (line_number, row[account_col].strip(), row[amount_col].strip(),
+                   _optional(row, type_col).strip() or default_type,
+                   _optional(row, description_col))
+
+
+def _optional(row, column):
+    """Value of an optional CSV column, empty if absent or left off the row"""
+    if column is None or column >= len(row):
+        return ""
+    return row[column]
+
+
+def interest_postings(accounts, rates=None, periods=12):
+    """
+    Interest for one period on every account with a rate
+
+    Interest is the balance times the annual rate over ``periods``,
+    rounded half-even to the cent. Accounts that would earn nothing are
+    skipped.
+
+    Args:
+        accounts (mapping): account_number -> record
+        rates (dict): account_type -> annual rate (defaults to INTEREST_RATES)
+        periods (int): Interest periods per year
+
+    Yields:
+        tuple: Postings in the ``read_postings`` layout, numbered from 1
+    """
+    rates = {account_type: Decimal(str(rate)) / periods
+             for account_type, rate in (INTEREST_RATES if rates is None else rates).items()}
+    description = f"Interest {datetime.now():%Y-%m}"
+    number = 0
+    for account_number, record in accounts.items():
+        rate = rates.get(record.get("account_type"))
+        if not rate:
+            continue
+        cents = int((Decimal(_balance_cents(record)) * rate)
+                    .quantize(Decimal(1), rounding=ROUND_HALF_EVEN))
+        if cents > 0:
+            number += 1
+            yield number, account_number, from_cents(cents), "Interest", description
+
+
+def parse_cents(amount):
+    """
+    Positive posting amount in cents
+
+    Plain decimal strings take a fast path; anything else (including JSON
+    booleans, non-finite numbers and amounts above MAX_AMOUNT_CENTS) goes
+    through ``ATMEngine.validate_amount`` for the full checks and error
+    messages.
+
+    Raises:
+        InvalidAmountError: If the amount is not acceptable
+    """
+    if isinstance(amount, str):
+        match = PLAIN_AMOUNT.fullmatch(amount)
+        if match:
+            whole, fraction = match.groups()
+            cents = int(whole) * 100 + (int(fraction.ljust(2, "0")) if fraction else 0)
+            if 0 < cents <= MAX_AMOUNT_CENTS:
+                return cents
+    return to_cents(ATMEngine.validate_amount(amount))
+
+
+def _balance_cents(record):
+    if hasattr(record, "balance_cents"):
+        return record.balance_cents
+    return to_cents(record["balance"])
+
+
+class BatchPoster:
+    """
+    Validate and apply a batch of postings with one storage commit
+
+    Features:
+    - Per-line rejects instead of all-or-nothing validation
+    - Running balance checks for debits within the batch
+    - One ID block, one balance pass and one bulk transaction write
+    """
+
+    def __init__(self, engine):
+        """
+        Args:
+            engine (ATMEngine): Engine whose storage, locks and IDs are used
+        """
+        self.engine = engine
+
+    def post(self, postings, dry_run=False):
+        """
+        Validate and apply postings
+
+        Args:
+            postings (iterable): (line, account_number, amount, type,
+                description) tuples, e.g. from ``read_postings``
+            dry_run (bool): Validate only; nothing is changed
+
+        Returns:
+            dict: "posted", "credited", "debited" (amounts), "rejected"
+                (list of (line, account_number, reason)), "first_id",
+                "last_id" and "elapsed" (seconds)
+        """
+        start = time.perf_counter()
+        engine = self.engine
+        accounts = engine.accounts
+        accepted, rejected = [], []
+        known = {}
+
+        # Pass 1: everything that does not depend on balances
+        for line, account_number, amount, posting_type, description in postings:
+            if account_number is None:
+                rejected.append((line, "", description))
+                continue
+            sign = POSTING_TYPES.get(posting_type)
+            if sign is None:
+                rejected.append((line, account_number, f"Unknown posting type: {posting_type}"))
+                continue
+            try:
+                cents = parse_cents(amount)
+            except InvalidAmountError as e:
+                rejected.append((line, account_number, str(e)))
+                continue
+            exists = known.get(account_number)
+            if exists is None:
+                exists = known[account_number] = account_number in accounts
+            if not exists:
+                rejected.append((line, account_number, "Unknown account"))
+                continue
+            accepted.append((line, account_number, sign * cents, posting_type,
+                             description or f"Batch {posting_type.lower()}"))
+
+        touched = sorted({entry[1] for entry in accepted})
+        with engine.locks.hold(*touched):
+            # Pass 2: debits against running available balances, credits
+            # against the largest balance the ledger holds
+            available, balances = {}, {}
+            for account_number in touched:
+                record = accounts[account_number]
+                balances[account_number] = _balance_cents(record)
+                available[account_number] = ATMEngine.available_cents(record)
+            running = dict(balances)
+            valid = []
+            for entry in accepted:
+                line, account_number, cents = entry[:3]
+                if available[account_number] + cents < 0:
+                    rejected.append((line, account_number, "Insufficient funds"))
+                    continue
+                if running[account_number] + cents > MAX_CENTS:
+                    rejected.append((line, account_number, "Balance would exceed the largest allowed"))
+                    continue
+                available[account_number] += cents
+                running[account_number] += cents
+                valid.append(entry)
+
+            report = {
+                "posted": len(valid),
+                "credited": from_cents(sum(e[2] for e in valid if e[2] > 0)),
+                "debited": from_cents(-sum(e[2] for e in valid if e[2] < 0)),
+                "rejected": sorted(rejected),
+                "first_id": None,
+                "last_id": None,
+            }
+            if valid and not dry_run:
+                report["first_id"], report["last_id"] = self._apply(valid, balances)
+        report["elapsed"] = time.perf_counter() - start
+        return report
+
+    def _apply(self, entries, balances):
+        """
+        Apply validated postings and persist them as one commit
+
+        Args:
+            entries (list): (line, account_number, signed cents, type, description)
+            balances (dict): account_number -> balance in cents before the batch
+
+        Returns:
+            tuple: (first, last) transaction IDs used
+        """
+        engine = self.engine
+        storage = engine.storage
+        accounts = engine.accounts
+        first, end = engine.ids.reserve(len(entries))
+        date = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+        running = dict(balances)
+        records = []
+        for number, (_, account_number, cents, posting_type, description) in \
+                enumerate(entries, first):
+            running[account_number] += cents
+            records.append((account_number, {
+                "transaction_id": format_id(number),
+                "date": date,
+                "type": posting_type,
+                "amount": from_cents(abs(cents)),
+                "description": description,
+                "balance_after": from_cents(running[account_number]),
+            }))
+        deltas = {account_number: running[account_number] - cents
+                  for account_number, cents in balances.items()}
+
+        applied = {}
+        with storage.atomic():
+            try:
+                with METRICS.timer("atm_storage_seconds", call="save_accounts"):
+                    if isinstance(accounts, Ledger):
+                        accounts.apply_deltas(deltas)
+                        applied = deltas
+                        storage.save_accounts(*deltas)
+                    else:
+                        # Backends with a bounded record cache could evict a
+                        # changed record before it is saved, so save in chunks
+                        chunk = []
+                        for account_number, cents in deltas.items():
+                            add_cents(accounts[account_number], cents)
+                            applied[account_number] = cents
+                            chunk.append(account_number)
+                            if len(chunk) == SAVE_CHUNK:
+                                storage.save_accounts(*chunk)
+                                chunk = []
+                        if chunk:
+                            storage.save_accounts(*chunk)
+                with METRICS.timer("atm_storage_seconds", call="append_transactions"):
+                    storage.append_transactions(records)
+            except Exception:
+                if isinstance(accounts, Ledger):
+                    accounts.apply_deltas({acct: -cents for acct, cents in applied.items()})
+                else:
+                    for account_number, cents in applied.items():
+                        add_cents(accounts[account_number], -cents)
+                raise
+        return format_id(first), format_id(end - 1)
+
+
+def write_rejects(path, rejected):
+    """Write (line, account, reason) rejects as CSV"""
+    with open(path, 'w', encoding='utf-8', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(("line", "account", "reason"))
+        writer.writerows(rejected)
+
+
+def main(argv=None):
+    from atm_storage import open_storage
+
+    parser = argparse.ArgumentParser(description="ATM batch posting")
+    parser.add_argument("--storage", choices=["json", "lazy", "sqlite"], default="json")
+    parser.add_argument("--db", default="atm.db", help="SQLite database file")
+    parser.add_argument("--journal", action="store_true",
+                        help="append to transactions.jsonl instead of rewriting transactions.json")
+    parser.add_argument("--dry-run", action="store_true", help="validate only")
+    parser.add_argument("--rejects", help="write rejected lines to this CSV file")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    post = commands.add_parser("post", help="post a CSV or JSON Lines file")
+    post.add_argument("file")
+    post.add_argument("--type", default="Deposit", choices=sorted(POSTING_TYPES),
+                      help="type of lines without one (default: Deposit)")
+
+    interest = commands.add_parser("interest", help="post interest from rate tables")
+    interest.add_argument("--rate", action="append", metavar="TYPE=RATE",
+                          help="annual rate per account type (default: " +
+                               " ".join(f"{t}={r}" for t, r in INTEREST_RATES.items()) + ")")
+    interest.add_argument("--periods", type=int, default=12, help="periods per year (default: 12)")
+    args = parser.parse_args(argv)
+
+    if args.storage == "sqlite":
+        storage = open_storage("sqlite", path=args.db)
+    elif args.storage == "lazy":
+        storage = open_storage("lazy")
+    else:
+        storage = open_storage("json", journal_mode=args.journal)
+
+    engine = None
+    try:
+        if storage.load_accounts() is None:
+            print("❌ No accounts found")
+            return 1
+        storage.load_transactions()
+        engine = ATMEngine(storage)
+        if args.command == "post":
+            postings = read_postings(args.file, args.type)
+        else:
+            rates = None
+            if args.rate:
+                rates = {}
+                for value in args.rate:
+                    account_type, _, rate = value.partition("=")
+                    rates[account_type] = float(rate)
+            postings = interest_postings(engine.accounts, rates, args.periods)
+        report = BatchPoster(engine).post(postings, dry_run=args.dry_run)
+    finally:
+        if engine:
+            engine.close()
+        storage.close()
+
+    verb = "Validated" if args.dry_run else "Posted"
+    print(f"✓ {verb} {report['posted']:,} postings in {report['elapsed']:.2f}s: "
+          f"${report['credited']:,.2f} credited, ${report['debited']:,.2f} debited")
+    if report["first_id"]:
+        print(f"   Transactions {report['first_id']} - {report['last_id']}")
+    if report["rejected"]:
+        print(f"❌ {len(report['rejected']):,} lines rejected")
+        for line, account_number, reason in report["rejected"][:10]:
+            print(f"   line {line}: {account_number} {reason}")
+        if args.rejects:
+            write_rejects(args.rejects, report["rejected"])
+            print(f"   All rejects written to {args.rejects}")
+    return 0 if not report["rejected"] else 2
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
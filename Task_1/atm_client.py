@@ -0,0 +1,118 @@
+"""
+ATM Session Client
+==================
+
+Local client for the ATM session server, for manual and scripted testing.
+
+Usage:
+    python atm_client.py                      # interactive prompt
+    python atm_client.py -c "LOGIN 1234567890 1234" -c BALANCE -c LOGOUT
+"""
+
+import argparse
+import asyncio
+import json
+
+
+class ATMClient:
+    """Async client speaking the ATM server line protocol"""
+
+    def __init__(self, host="127.0.0.1", port=8765):
+        self.host = host
+        self.port = port
+        self.reader = None
+        self.writer = None
+
+    async def connect(self):
+        """Open the connection to the server"""
+        self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+        return self
+
+    async def request(self, line):
+        """
+        Send one command and wait for its response
+
+        Args:
+            line (str): Command line, e.g. "WITHDRAW 50"
+
+        Returns:
+            dict: Decoded server response
+        """
+        self.writer.write(line.strip().encode("utf-8") + b"\n")
+        await self.writer.drain()
+        response = await self.reader.readline()
+        if not response:
+            raise ConnectionError("Server closed the connection")
+        return json.loads(response)
+
+    async def close(self):
+        """Close the connection"""
+        if self.writer is not None:
+            self.writer.close()
+            try:
+                await self.writer.wait_closed()
+            except ConnectionError:
+                pass
+            self.writer = None
+
+    async def __aenter__(self):
+        return await self.connect()
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+
+async def run_commands(host, port, commands):
+    """Send a list of commands in one session and print each response"""
+    async with ATMClient(host, port) as client:
+        for command in commands:
+            print(f"> {command}")
+            print(json.dumps(await client.request(command)))
+
+
+async def interactive(host, port):
+    """Read commands from the terminal until LOGOUT or end of input"""
+    loop = asyncio.get_running_loop()
+    async with ATMClient(host, port) as client:
+        print(f"🔌 Connected to {host}:{port} (LOGOUT or Ctrl-D to exit)")
+        while True:
+            try:
+                line = await loop.run_in_executor(None, input, "atm> ")
+            except EOFError:
+                break
+            if not line.strip():
+                continue
+            try:
+                response = await client.request(line)
+            except ConnectionError as e:
+                print(f"❌ {e}")
+                break
+            print(json.dumps(response, indent=2))
+            if line.strip().upper() in ("LOGOUT", "8") and response.get("ok"):
+                break
+
+
+def main(argv=None):
+    """Command line entry point for the client"""
+    parser = argparse.ArgumentParser(description="Brainwave ATM session client")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("-c", "--command", action="append", dest="commands",
+                        help="command to send (repeatable); omit for an interactive prompt")
+    args = parser.parse_args(argv)
+
+    try:
+        if args.commands:
+            asyncio.run(run_commands(args.host, args.port, args.commands))
+        else:
+            asyncio.run(interactive(args.host, args.port))
+    except (ConnectionError, OSError) as e:
+        print(f"❌ Connection failed: {e}")
+        return 1
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,338 @@
+"""
+Account Directory
+=================
+
+Recipient search by account-number prefix or customer name.
+
+The directory keeps two sorted string arrays and answers every query with
+bisection, never with a scan of the accounts:
+
+- ``numbers``: account numbers, with ``names`` in the same order; a
+  number prefix is one contiguous slice found with ``bisect_left``
+- ``tokens``: ``"<name token>\\0<account number>"`` for every normalized
+  word of every name (lower case, accents removed); a word prefix is
+  again one contiguous slice
+
+A name query of several words takes candidates from the slice of its
+longest word and keeps those whose name has a word starting with each of
+the others. At most ``max_scan`` candidates are examined, so a query costs
+O(log n + max_scan) however many accounts match.
+
+The directory is saved to ``<storage location>.dir`` and reused as long
+as the account numbers are unchanged (their count and the sum of their
+CRC-32s, which needs no sort); otherwise it is rebuilt from the account
+records. ATMSystem opens it on the first recipient search, not at
+startup. Updates (``add``, ``rename``, ``remove``) are applied in place
+with ``insort``/``del`` and written back by ``save``.
+
+Usage:
+    python atm_directory.py john
+    python atm_directory.py 12345 --limit 5
+    python atm_directory.py --storage sqlite --db atm.db --rebuild
+"""
+
+import argparse
+import json
+import os
+import time
+import unicodedata
+import zlib
+from bisect import bisect_left, insort
+
+FORMAT_VERSION = 2
+
+SEPARATOR = "\0"
+
+
+def normalize(text):
+    """
+    Split a name or query into lower-case words without accents
+
+    Returns:
+        list: Words, in order
+    """
+    decomposed = unicodedata.normalize("NFKD", text.casefold())
+    stripped = "".join(ch if ch.isalnum() else " " for ch in decomposed
+                       if not unicodedata.combining(ch))
+    return stripped.split()
+
+
+class AccountDirectory:
+    """
+    Sorted-array index of account numbers and name words
+
+    Features:
+    - Account-number prefix and name-word prefix search with bisect
+    - Top-k results with bounded work per query
+    - Incremental add/rename/remove
+    - Persisted next to the account data
+    """
+
+    def __init__(self, path=None, max_scan=2000):
+        """
+        Create an empty directory
+
+        Args:
+            path (str): Save file, or None to keep it in memory only
+            max_scan (int): Most candidates examined per name query
+        """
+        self.path = path
+        self.max_scan = max_scan
+        self.numbers = []
+        self.names = []
+        self.tokens = []
+        self.dirty = False
+
+    # ------------------------------------------------------------------
+    # Building and persistence
+
+    @classmethod
+    def open(cls, storage, path=None, max_scan=2000):
+        """
+        Load the saved directory for a storage backend, rebuilding it if stale
+
+        Args:
+            storage: Storage backend with accounts loaded
+            path (str): Save file (default: ``<storage.location>.dir``)
+            max_scan (int): Most candidates examined per name query
+
+        Returns:
+            AccountDirectory: Up-to-date directory
+        """
+        path = path or f"{storage.location}.dir"
+        directory = cls(path, max_scan)
+        numbers = list(storage.accounts)
+        if not directory.load(numbers):
+            directory.build((number, storage.accounts[number]["name"]) for number in numbers)
+            directory.save()
+        return directory
+
+    def build(self, entries):
+        """
+        Replace the contents with (account_number, name) pairs
+
+        Args:
+            entries (iterable): (account_number, name) pairs
+        """
+        pairs = sorted(entries)
+        self.numbers = [number for number, _ in pairs]
+        self.names = [name for _, name in pairs]
+        self.tokens = sorted(f"{token}{SEPARATOR}{number}"
+                             for number, name in pairs for token in set(normalize(name)))
+        self.dirty = True
+
+    def load(self, numbers=None):
+        """
+        Read the saved directory
+
+        Args:
+            numbers (list): Current account numbers, in any order; the saved
+                copy is rejected if it was built for different ones
+
+        Returns:
+            bool: True if the saved directory was loaded
+        """
+        if not self.path:
+            return False
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (FileNotFoundError, ValueError):
+            return False
+        if data.get("version") != FORMAT_VERSION:
+            return False
+        if numbers is not None and (data["count"] != len(numbers) or
+                                    data["checksum"] != _checksum(numbers)):
+            return False
+        self.numbers = data["numbers"]
+        self.names = data["names"]
+        self.tokens = data["tokens"]
+        self.dirty = False
+        return True
+
+    def save(self):
+        """Write the directory if it changed since it was loaded or saved"""
+        if not self.path or not self.dirty:
+            return
+        data = {
+            "version": FORMAT_VERSION,
+            "count": len(self.numbers),
+            "checksum": _checksum(self.numbers),
+            "numbers": self.numbers,
+            "names": self.names,
+            "tokens": self.tokens,
+        }
+        temp_path = f"{self.path}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, separators=(",", ":"))
+        os.replace(temp_path, self.path)
+        self.dirty = False
+
+    # ------------------------------------------------------------------
+    # Incremental updates
+
+    def add(self, account_number, name):
+        """Add an account (or rename it if it is already present)"""
+        if self._position(account_number) is not None:
+            self.rename(account_number, name)
+            return
+        i = bisect_left(self.numbers, account_number)
+        self.numbers.insert(i, account_number)
+        self.names.insert(i, name)
+        for token in set(normalize(name)):
+            insort(self.tokens, f"{token}{SEPARATOR}{account_number}")
+        self.dirty = True
+
+    def rename(self, account_number, name):
+        """Change the name of an account in the directory"""
+        i = self._position(account_number)
+        if i is None:
+            raise KeyError(account_number)
+        self._drop_tokens(account_number, self.names[i])
+        self.names[i] = name
+        for token in set(normalize(name)):
+            insort(self.tokens, f"{token}{SEPARATOR}{account_number}")
+        self.dirty = True
+
+    def remove(self, account_number):
+        """Remove an account from the directory"""
+        i = self._position(account_number)
+        if i is None:
+            raise KeyError(account_number)
+        self._drop_tokens(account_number, self.names[i])
+        del self.numbers[i]
+        del self.names[i]
+        self.dirty = True
+
+    def _drop_tokens(self, account_number, name):
+        for token in set(normalize(name)):
+            entry = f"{token}{SEPARATOR}{account_number}"
+            j = bisect_left(self.tokens, entry)
+            if j < len(self.tokens) and self.tokens[j] == entry:
+                del self.tokens[j]
+
+    def _position(self, account_number):
+        i = bisect_left(self.numbers, account_number)
+        if i < len(self.numbers) and self.numbers[i] == account_number:
+            return i
+        return None
+
+    # ------------------------------------------------------------------
+    # Queries
+
+    def __len__(self):
+        return len(self.numbers)
+
+    def __contains__(self, account_number):
+        return self._position(account_number) is not None
+
+    def name_of(self, account_number):
+        """Name recorded for an account, or None"""
+        i = self._position(account_number)
+        return None if i is None else self.names[i]
+
+    def search(self, query, limit=10):
+        """
+        Find accounts by number prefix or name words
+
+        A query made only of digits matches account numbers; anything
+        else matches names whose words start with every query word.
+        Whole-word matches come before longer words with the same prefix.
+
+        Args:
+            query (str): Search text
+            limit (int): Most results returned
+
+        Returns:
+            list: (account_number, name) pairs
+        """
+        query = query.strip()
+        if not query or limit <= 0:
+            return []
+        if query.isdigit():
+            return self._search_numbers(query, limit)
+        return self._search_names(normalize(query), limit)
+
+    def _search_numbers(self, prefix, limit):
+        numbers = self.numbers
+        i = bisect_left(numbers, prefix)
+        results = []
+        while i < len(numbers) and len(results) < limit and numbers[i].startswith(prefix):
+            results.append((numbers[i], self.names[i]))
+            i += 1
+        return results
+
+    def _search_names(self, words, limit):
+        if not words:
+            return []
+        # The longest word usually has the narrowest slice
+        lead = max(words, key=len)
+        others = list(words)
+        others.remove(lead)
+        tokens = self.tokens
+        results = []
+        seen = set()
+        # "word\0..." sorts before "wordy\0...", so whole-word matches come first
+        i = bisect_left(tokens, lead)
+        end = min(len(tokens), i + self.max_scan)
+        while i < end and len(results) < limit and tokens[i].startswith(lead):
+            account_number = tokens[i].split(SEPARATOR, 1)[1]
+            i += 1
+            if account_number in seen:
+                continue
+            seen.add(account_number)
+            name = self.name_of(account_number)
+            if others:
+                name_words = normalize(name)
+                if not all(any(w.startswith(other) for w in name_words) for other in others):
+                    continue
+            results.append((account_number, name))
+        return results
+
+
+def _checksum(numbers):
+    """Sum of the account numbers' CRC-32s (independent of their order)"""
+    return sum(map(zlib.crc32, map(str.encode, numbers)))
+
+
+def main(argv=None):
+    """Search the account directory from the command line"""
+    from atm_storage import open_storage
+
+    parser = argparse.ArgumentParser(description="ATM account directory search")
+    parser.add_argument("query", nargs="?", help="account-number prefix or name words")
+    parser.add_argument("--limit", type=int, default=10, help="most results (default: 10)")
+    parser.add_argument("--rebuild", action="store_true", help="rebuild the saved directory")
+    parser.add_argument("--storage", choices=["json", "lazy", "sqlite"], default="json")
+    parser.add_argument("--db", default="atm.db", help="SQLite database file")
+    args = parser.parse_args(argv)
+
+    storage = open_storage("sqlite", path=args.db) if args.storage == "sqlite" \
+        else open_storage(args.storage)
+    try:
+        if storage.load_accounts() is None:
+            print("❌ No accounts found")
+            return 1
+        if args.rebuild:
+            path = f"{storage.location}.dir"
+            if os.path.exists(path):
+                os.remove(path)
+        start = time.perf_counter()
+        directory = AccountDirectory.open(storage)
+        print(f"✓ Directory of {len(directory):,} accounts ready in "
+              f"{time.perf_counter() - start:.2f}s")
+    finally:
+        storage.close()
+
+    if args.query:
+        start = time.perf_counter()
+        results = directory.search(args.query, args.limit)
+        elapsed = time.perf_counter() - start
+        for account_number, name in results:
+            print(f"   {account_number}  {name}")
+        print(f"📊 {len(results)} matches in {elapsed * 1000:.3f} ms")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,845 @@
+"""
+ATM Transaction Engine
+======================
+
+Headless core of the ATM Interface System.
+
+All validation, balance mutation and transaction recording lives here,
+free of ``input()``, ``getpass`` and ``print``. The interactive
+``ATMSystem`` is a thin client on top, and batch jobs, services and
+benchmarks can drive the engine directly.
+
+Every operation either returns a ``Result`` or raises an ``ATMError``
+subclass describing why it was refused.
+"""
+
+import copy
+import os
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+
+from atm_audit import AuditLog
+from atm_auth import PinAuthenticator
+from atm_fraud import OPERATIONS, FraudMonitor
+from atm_history import TransactionHistory
+from atm_ids import IDAllocator
+from atm_ledger import MAX_CENTS, add_cents, from_cents, to_cents
+from atm_limits import WithdrawalLimiter
+from atm_metrics import METRICS, acquire, timed
+
+
+# Credit IDs remembered per account so retried credits are not applied twice
+SETTLED_MEMORY = 64
+
+# Largest single amount accepted ($10 trillion), well inside the int64 cent
+# range of a ledger balance
+MAX_AMOUNT_CENTS = 10**15
+
+
+class ATMError(Exception):
+    """Base class for operations refused by the engine"""
+
+
+class UnknownAccountError(ATMError):
+    """The account number does not exist"""
+
+    def __init__(self, account_number):
+        super().__init__(f"Account {account_number} not found")
+        self.account_number = account_number
+
+
+class InvalidAmountError(ATMError):
+    """The amount is not a positive value in cents precision"""
+
+
+class InsufficientFundsError(ATMError):
+    """The account balance does not cover the amount"""
+
+    def __init__(self, balance, amount):
+        super().__init__(f"Insufficient funds: balance ${balance:,.2f}, requested ${amount:,.2f}")
+        self.balance = balance
+        self.amount = amount
+
+
+class LimitExceededError(ATMError):
+    """The amount is above an operating limit"""
+
+    def __init__(self, limit, amount, remaining=None):
+        super().__init__(f"Limit exceeded: limit ${limit:,.2f}, requested ${amount:,.2f}")
+        self.limit = limit
+        self.amount = amount
+        self.remaining = limit if remaining is None else remaining
+
+
+class SameAccountError(ATMError):
+    """A transfer names the same account on both sides"""
+
+
+class InvalidPinError(ATMError):
+    """The PIN does not match the account"""
+
+
+class PinFormatError(ATMError):
+    """A new PIN does not satisfy the PIN rules"""
+
+
+class VelocityLimitError(ATMError):
+    """An operation would break a velocity rule of the account type"""
+
+    def __init__(self, rule):
+        super().__init__(rule.describe())
+        self.rule = rule.name
+
+
+class CashUnavailableError(ATMError):
+    """The terminal cannot dispense the amount from the notes it holds"""
+
+    def __init__(self, amount, step=None):
+        self.amount = amount
+        self.step = step
+        message = f"This ATM cannot dispense ${amount:,.2f} right now"
+        if step:
+            message += f"; amounts must be a multiple of ${step:g}"
+        super().__init__(message)
+
+
+class AccountLockedError(ATMError):
+    """Too many failed logins; the account is temporarily locked"""
+
+    def __init__(self, until):
+        if until.year == 9999:
+            message = "Account locked; please contact customer service"
+        else:
+            message = f"Account locked until {until:%Y-%m-%d %H:%M}"
+        super().__init__(message)
+        self.until = until
+
+
+class Result:
+    """
+    Outcome of a successful engine operation
+
+    Attributes:
+        account_number (str): Account the operation ran against
+        amount (float): Amount moved (0 for non-financial operations)
+        balance (float): Account balance after the operation
+        transactions (list): Transaction records written
+        recipient (str): Counterparty account for transfers
+        notes (dict): Notes dispensed for withdrawals (denomination -> count)
+    """
+
+    def __init__(self, account_number, amount=0, balance=None, transactions=(), recipient=None,
+                 notes=None):
+        self.account_number = account_number
+        self.amount = amount
+        self.balance = balance
+        self.transactions = list(transactions)
+        self.recipient = recipient
+        self.notes = notes
+
+    def __repr__(self):
+        return (f"Result(account_number={self.account_number!r}, amount={self.amount!r}, "
+                f"balance={self.balance!r}, recipient={self.recipient!r})")
+
+
+class AccountLocks:
+    """
+    Per-account re-entrant locks
+
+    Locks for several accounts are always taken in sorted account-number
+    order, so two transfers in opposite directions can never deadlock.
+    """
+
+    def __init__(self):
+        self._locks = {}
+        self._guard = threading.Lock()
+
+    def get(self, account_number):
+        """Return the lock for one account, creating it on first use"""
+        lock = self._locks.get(account_number)
+        if lock is None:
+            with self._guard:
+                lock = self._locks.setdefault(account_number, threading.RLock())
+        return lock
+
+    @contextmanager
+    def hold(self, *account_numbers):
+        """
+        Hold the locks of all given accounts for the enclosed block
+
+        Args:
+            *account_numbers (str): Accounts to lock, in any order
+        """
+        locks = [self.get(acct) for acct in sorted(set(account_numbers))]
+        for lock in locks:
+            acquire(lock, "account")
+        try:
+            yield
+        finally:
+            for lock in reversed(locks):
+                lock.release()
+
+
+class ATMEngine:
+    """
+    Pure transaction engine over a storage backend
+
+    Features:
+    - Authentication and PIN changes
+    - Withdrawals with per-account-type daily limits
+    - Deposits and transfers
+    - Transaction recording through the storage backend
+    - Per-account locking so concurrent sessions cannot double-spend
+    """
+
+    def __init__(self, storage, daily_withdrawal_limit=500.00, large_deposit_threshold=10000,
+                 withdrawal_limits=None, rolling_limit=False, ids=None, audit=None, auth=None,
+                 fraud=None, cash=None):
+        """
+        Create an engine on top of an opened storage backend
+
+        Args:
+            storage: Storage backend with accounts already loaded
+            daily_withdrawal_limit (float): Daily limit for account types
+                without an entry in ``withdrawal_limits``
+            large_deposit_threshold (float): Deposits above this need verification
+            withdrawal_limits (dict): account_type -> daily withdrawal limit
+            rolling_limit (bool): Also enforce the limit over a rolling 24 hours
+            ids (IDAllocator): Transaction ID source; defaults to a
+                transaction_ids.seq file next to the storage files
+            audit (AuditLog): Sink for non-financial events; defaults to an
+                audit/ directory next to the storage files
+            auth (PinAuthenticator): PIN hashing and lockout policy
+            fraud (FraudMonitor): Velocity rules; defaults to the rules in
+                atm_fraud
+            cash (CashInventory): Note cassettes of the terminal this engine
+                dispenses from; None when there is no physical dispenser
+                (e.g. a server for remote terminals)
+        """
+        self.storage = storage
+        self.limiter = WithdrawalLimiter(withdrawal_limits, default_limit=daily_withdrawal_limit,
+                                         rolling=rolling_limit)
+        self.large_deposit_threshold = large_deposit_threshold
+        self.locks = AccountLocks()
+        self.history = TransactionHistory(storage)
+        directory = os.path.dirname(os.path.abspath(storage.location))
+        if ids is None:
+            ids = IDAllocator(os.path.join(directory, "transaction_ids.seq"))
+        self.ids = ids
+        if audit is None:
+            audit = AuditLog(os.path.join(directory, "audit"))
+        self.audit = audit
+        self.auth = auth or PinAuthenticator()
+        self.fraud = fraud or FraudMonitor()
+        self.cash = cash
+
+    @property
+    def accounts(self):
+        """Account mapping of the storage backend"""
+        return self.storage.accounts
+
+    def get_account(self, account_number):
+        """
+        Look up an account record
+
+        Args:
+            account_number (str): Account identifier
+
+        Returns:
+            dict: Account record
+
+        Raises:
+            UnknownAccountError: If the account does not exist
+        """
+        try:
+            return self.storage.accounts[account_number]
+        except KeyError:
+            raise UnknownAccountError(account_number) from None
+
+    def build_transaction(self, account_number, transaction_type, amount, description=""):
+        """
+        Create a transaction record for an account
+
+        Args:
+            account_number (str): Account identifier
+            transaction_type (str): Type of transaction
+            amount (float): Transaction amount
+            description (str): Optional description
+
+        Returns:
+            dict: Transaction record ready to be stored
+        """
+        return {
+            "transaction_id": self.ids.next_transaction_id(),
+            "date": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            "type": transaction_type,
+            "amount": amount,
+            "description": description,
+            "balance_after": self.storage.accounts[account_number]["balance"]
+        }
+
+    def record(self, account_number, transaction_type, amount=0, description=""):
+        """
+        Build and store one transaction record
+
+        Returns:
+            dict: The stored transaction record
+        """
+        with self.locks.hold(account_number):
+            transaction = self.build_transaction(account_number, transaction_type, amount, description)
+            with METRICS.timer("atm_storage_seconds", call="append_transaction"):
+                self.storage.append_transaction(account_number, transaction)
+        return transaction
+
+    @staticmethod
+    def available_cents(account):
+        """
+        Balance in cents that is not held by a pending transfer
+
+        Args:
+            account (dict): Account record
+
+        Returns:
+            int: Spendable balance in cents
+        """
+        return to_cents(account["balance"]) - sum(account.get("holds", {}).values())
+
+    @staticmethod
+    def validate_amount(amount):
+        """
+        Check that an amount is positive, in cents precision and not above
+        MAX_AMOUNT_CENTS
+
+        Args:
+            amount (float or str): Amount to check
+
+        Returns:
+            float: The amount as a float
+
+        Raises:
+            InvalidAmountError: If the amount is not acceptable
+        """
+        try:
+            if isinstance(amount, bool):
+                raise TypeError(amount)
+            value = amount if isinstance(amount, str) else float(amount)
+            cents = to_cents(value)
+        except (TypeError, ValueError):
+            raise InvalidAmountError("Amount must be a number") from None
+        if cents <= 0:
+            raise InvalidAmountError("Amount must be a positive number")
+        if cents > MAX_AMOUNT_CENTS:
+            raise InvalidAmountError(f"Amount must not exceed ${from_cents(MAX_AMOUNT_CENTS):,.2f}")
+        try:
+            to_cents(value, strict=True)
+        except ValueError:
+            raise InvalidAmountError("Amount must be in cents precision") from None
+        return from_cents(cents)
+
+    @timed("authenticate")
+    def authenticate(self, account_number, pin):
+        """
+        Verify an account number and PIN and audit the attempt
+
+        Returns:
+            Result: Login outcome with the current balance
+
+        A plaintext or outdated PIN hash is replaced on success. Failures
+        are counted on the account record, which locks after
+        ``auth.max_attempts`` in a row.
+
+        Raises:
+            UnknownAccountError: If the account does not exist
+            AccountLockedError: If the account is locked
+            InvalidPinError: If the PIN is wrong
+        """
+        account = self.get_account(account_number)
+        until = self.auth.locked_until(account)
+        if until is not None:
+            self.audit.record(account_number, "Failed Login", "Account locked")
+            raise AccountLockedError(until)
+
+        # The key derivation runs without holding the account lock
+        stored = account["pin"]
+        if not self.auth.verify(pin, stored):
+            with self.locks.hold(account_number):
+                locked = self.auth.register_failure(account)
+                self._save_account(account_number)
+            self.audit.record(account_number, "Failed Login",
+                              "Incorrect PIN; account locked" if locked else "Incorrect PIN")
+            raise InvalidPinError("Incorrect PIN")
+
+        rehashed = self.auth.hash(pin) if self.auth.needs_rehash(stored) else None
+        with self.locks.hold(account_number):
+            changed = self.auth.clear_failures(account)
+            if rehashed and account["pin"] == stored:
+                account["pin"] = rehashed
+                changed = True
+            if changed:
+                self._save_account(account_number)
+        self.audit.record(account_number, "Login", "Successful authentication")
+        return Result(account_number, balance=account["balance"])
+
+    @timed("balance_inquiry")
+    def balance_inquiry(self, account_number):
+        """
+        Return the balance of an account and audit the inquiry
+
+        Returns:
+            Result: Inquiry outcome with the current balance
+        """
+        account = self.get_account(account_number)
+        self.audit.record(account_number, "Balance Inquiry", "Balance checked via ATM")
+        return Result(account_number, balance=account["balance"])
+
+    @timed("logout")
+    def logout(self, account_number):
+        """Audit the end of a session"""
+        account = self.get_account(account_number)
+        self.audit.record(account_number, "Logout", "Session ended")
+        return Result(account_number, balance=account["balance"])
+
+    def check_withdrawal(self, account_number, amount, record_failure=True):
+        """
+        Validate a withdrawal without changing any balance
+
+        Args:
+            account_number (str): Account to withdraw from
+            amount (float): Requested amount
+            record_failure (bool): Audit a "Failed Withdrawal" on insufficient funds
+
+        Returns:
+            float: The validated amount
+
+        Raises:
+            UnknownAccountError, InvalidAmountError, CashUnavailableError,
+            InsufficientFundsError, LimitExceededError, VelocityLimitError
+        """
+        account = self.get_account(account_number)
+        amount = self.validate_amount(amount)
+        if self.cash is not None and self.cash.plan(amount) is None:
+            raise self._cash_unavailable(amount)
+
+        if to_cents(amount) > self.available_cents(account):
+            if record_failure:
+                self.audit.record(account_number, "Failed Withdrawal", "Insufficient funds", amount)
+            raise InsufficientFundsError(account["balance"], amount)
+
+        remaining = self.limiter.remaining(account)
+        if to_cents(amount) > to_cents(remaining):
+            raise LimitExceededError(self.limiter.limit_for(account), amount, remaining)
+
+        self.check_velocity(account_number, "withdraw", amount)
+        return amount
+
+    def withdrawal_allowance(self, account_number):
+        """
+        Daily limit and the part of it still available
+
+        Returns:
+            tuple: (daily limit, remaining amount)
+        """
+        account = self.get_account(account_number)
+        return self.limiter.limit_for(account), self.limiter.remaining(account)
+
+    @timed("withdraw")
+    def withdraw(self, account_number, amount):
+        """
+        Withdraw cash from an account
+
+        Returns:
+            Result: Withdrawal outcome with the new balance
+        """
+        with self.locks.hold(account_number):
+            with METRICS.timer("atm_validation_seconds", operation="withdraw"):
+                amount = self.check_withdrawal(account_number, amount)
+            account = self.accounts[account_number]
+            # Take the notes before the debit so a dispense can never fail after it
+            notes = None
+            if self.cash is not None:
+                notes = self.cash.reserve(amount)
+                if notes is None:
+                    raise self._cash_unavailable(amount)
+            try:
+                transactions = self._apply(
+                    {account_number: -to_cents(amount)},
+                    [(account_number, "Withdrawal", amount, "ATM cash withdrawal")],
+                    update=lambda: self.limiter.record(account, amount)
+                )
+            except Exception:
+                if notes is not None:
+                    self.cash.release(notes)
+                raise
+            if notes is not None:
+                self._cash_changed(account_number)
+            return Result(account_number, amount, self.accounts[account_number]["balance"],
+                          transactions, notes=notes)
+
+    def check_deposit(self, account_number, amount):
+        """
+        Validate a deposit without changing any balance
+
+        Returns:
+            float: The validated amount
+        """
+        account = self.get_account(account_number)
+        amount = self.validate_amount(amount)
+        self._check_headroom(account, amount)
+        self.check_velocity(account_number, "deposit", amount)
+        return amount
+
+    def requires_verification(self, amount):
+        """True if a deposit is large enough to need extra verification"""
+        return amount > self.large_deposit_threshold
+
+    @timed("deposit")
+    def deposit(self, account_number, amount):
+        """
+        Deposit cash into an account
+
+        Returns:
+            Result: Deposit outcome with the new balance
+        """
+        with self.locks.hold(account_number):
+            with METRICS.timer("atm_validation_seconds", operation="deposit"):
+                amount = self.check_deposit(account_number, amount)
+            transactions = self._apply(
+                {account_number: to_cents(amount)},
+                [(account_number, "Deposit", amount, "ATM cash deposit")]
+            )
+            if self.cash is not None:
+                # The note breakdown is not counted here, so the cash goes to
+                # the deposit bin and is never promised to a withdrawal
+                self.cash.accept(amount)
+                self._cash_changed(account_number)
+            return Result(account_number, amount, self.accounts[account_number]["balance"], transactions)
+
+    def check_recipient(self, account_number, recipient_account):
+        """
+        Validate the recipient of a transfer
+
+        Raises:
+            SameAccountError: If both sides are the same account
+            UnknownAccountError: If the recipient does not exist
+        """
+        if recipient_account == account_number:
+            raise SameAccountError("Cannot transfer to the same account")
+        self.get_account(recipient_account)
+
+    def check_transfer(self, account_number, recipient_account, amount):
+        """
+        Validate a transfer without changing any balance
+
+        Returns:
+            float: The validated amount
+        """
+        self.check_recipient(account_number, recipient_account)
+        account = self.get_account(account_number)
+        amount = self.validate_amount(amount)
+        if to_cents(amount) > self.available_cents(account):
+            raise InsufficientFundsError(account["balance"], amount)
+        self._check_headroom(self.get_account(recipient_account), amount)
+        self.check_velocity(account_number, "transfer_out", amount)
+        self.check_velocity(recipient_account, "transfer_in", amount)
+        return amount
+
+    def check_velocity(self, account_number, operation, amount):
+        """
+        Refuse an operation that would break a blocking velocity rule
+
+        Flag-only rules are not checked here; they raise an alert when the
+        operation is applied.
+
+        Args:
+            account_number (str): Account the operation counts against
+            operation (str): "withdraw", "deposit", "transfer_out" or "transfer_in"
+            amount (float): Validated amount
+
+        Raises:
+            VelocityLimitError: If a blocking rule would be broken
+        """
+        for rule in self.fraud.check(self.get_account(account_number), operation, amount):
+            if rule.action == "block":
+                self.audit.record(account_number, "Velocity Block", rule.name, amount)
+                raise VelocityLimitError(rule)
+
+    @timed("transfer")
+    def transfer(self, account_number, recipient_account, amount):
+        """
+        Move money between two accounts
+
+        Returns:
+            Result: Transfer outcome with the sender's new balance
+        """
+        # Both accounts are locked in sorted order (see AccountLocks)
+        with self.locks.hold(account_number, recipient_account):
+            with METRICS.timer("atm_validation_seconds", operation="transfer"):
+                amount = self.check_transfer(account_number, recipient_account, amount)
+            sender_name = self.accounts[account_number]["name"]
+            recipient_name = self.accounts[recipient_account]["name"]
+            transactions = self._apply(
+                {account_number: -to_cents(amount), recipient_account: to_cents(amount)},
+                [(account_number, "Transfer Out", amount, f"Transfer to {recipient_name}"),
+                 (recipient_account, "Transfer In", amount, f"Transfer from {sender_name}")]
+            )
+            return Result(account_number, amount, self.accounts[account_number]["balance"],
+                          transactions, recipient=recipient_account)
+
+    def check_new_pin(self, current_pin, new_pin):
+        """
+        Validate a new PIN against the PIN rules
+
+        Raises:
+            PinFormatError: If the PIN is not 4 digits or is unchanged
+        """
+        if len(new_pin) != 4:
+            raise PinFormatError("PIN must be exactly 4 digits")
+        if not new_pin.isdigit():
+            raise PinFormatError("PIN must contain only numbers")
+        if new_pin == current_pin:
+            raise PinFormatError("New PIN must be different from current PIN")
+
+    def verify_pin(self, account_number, pin):
+        """
+        Check a PIN without recording a login
+
+        Raises:
+            InvalidPinError: If the PIN is wrong
+        """
+        if not self.auth.verify(pin, self.get_account(account_number)["pin"]):
+            raise InvalidPinError("Incorrect PIN")
+
+    @timed("change_pin")
+    def change_pin(self, account_number, current_pin, new_pin):
+        """
+        Replace an account's PIN
+
+        Returns:
+            Result: PIN change outcome
+        """
+        with self.locks.hold(account_number):
+            self.verify_pin(account_number, current_pin)
+            self.check_new_pin(current_pin, new_pin)
+
+            account = self.accounts[account_number]
+            old_pin = account["pin"]
+            new_hash = self.auth.hash(new_pin)
+            with self.storage.atomic():
+                account["pin"] = new_hash
+                try:
+                    with METRICS.timer("atm_storage_seconds", call="save_accounts"):
+                        self.storage.save_accounts(account_number)
+                except Exception:
+                    account["pin"] = old_pin
+                    raise
+            self.audit.record(account_number, "PIN Change", "PIN updated via ATM")
+        return Result(account_number, balance=account["balance"])
+
+    def hold_funds(self, account_number, hold_id, amount):
+        """
+        Reserve funds for a transfer that is not committed yet
+
+        The hold is stored on the account record, so it survives a restart
+        and counts against the balance for withdrawals and transfers until
+        it is settled or released. Holding the same ``hold_id`` twice is a
+        no-op.
+
+        Args:
+            account_number (str): Account to reserve funds on
+            hold_id (str): Identifier of the pending transfer
+            amount (float): Amount to reserve
+
+        Returns:
+            Result: Held amount and the (unchanged) balance
+
+        Raises:
+            UnknownAccountError, InvalidAmountError, InsufficientFundsError,
+            VelocityLimitError
+        """
+        with self.locks.hold(account_number):
+            account = self.get_account(account_number)
+            amount = self.validate_amount(amount)
+            holds = dict(account.get("holds", {}))
+            if hold_id not in holds:
+                if to_cents(amount) > self.available_cents(account):
+                    raise InsufficientFundsError(account["balance"], amount)
+                self.check_velocity(account_number, "transfer_out", amount)
+                holds[hold_id] = to_cents(amount)
+                self._store_holds(account_number, holds)
+            return Result(account_number, from_cents(holds[hold_id]), account["balance"])
+
+    def release_hold(self, account_number, hold_id):
+        """
+        Drop a hold without moving any money
+
+        Returns:
+            bool: True if the hold existed
+        """
+        with self.locks.hold(account_number):
+            holds = dict(self.get_account(account_number).get("holds", {}))
+            if holds.pop(hold_id, None) is None:
+                return False
+            self._store_holds(account_number, holds)
+            return True
+
+    def settle_hold(self, account_number, hold_id, transaction_type, description=""):
+        """
+        Debit the funds of a hold and record the transaction
+
+        Settling a hold that no longer exists is a no-op, so a commit can
+        safely be retried after a crash.
+
+        Returns:
+            Result: Debit outcome, or None if the hold was already settled
+        """
+        with self.locks.hold(account_number):
+            account = self.get_account(account_number)
+            holds = dict(account.get("holds", {}))
+            cents = holds.pop(hold_id, None)
+            if cents is None:
+                return None
+            transactions = self._apply(
+                {account_number: -cents},
+                [(account_number, transaction_type, from_cents(cents), description)],
+                update=lambda: _put_holds(account, holds)
+            )
+            return Result(account_number, from_cents(cents), account["balance"], transactions)
+
+    def credit_once(self, account_number, credit_id, amount, transaction_type, description=""):
+        """
+        Credit an account at most once per ``credit_id``
+
+        The last ``SETTLED_MEMORY`` credit IDs are kept on the account
+        record and written together with the balance.
+
+        Returns:
+            Result: Credit outcome, or None if it was already applied
+        """
+        with self.locks.hold(account_number):
+            account = self.get_account(account_number)
+            settled = list(account.get("settled", []))
+            if credit_id in settled:
+                return None
+            settled = (settled + [credit_id])[-SETTLED_MEMORY:]
+            amount = self.validate_amount(amount)
+            self._check_headroom(account, amount)
+            transactions = self._apply(
+                {account_number: to_cents(amount)},
+                [(account_number, transaction_type, amount, description)],
+                update=lambda: account.__setitem__("settled", settled)
+            )
+            return Result(account_number, amount, account["balance"], transactions)
+
+    def _store_holds(self, account_number, holds):
+        """Replace and persist the holds of an account"""
+        account = self.accounts[account_number]
+        previous = dict(account.get("holds", {}))
+        with self.storage.atomic():
+            _put_holds(account, holds)
+            try:
+                with METRICS.timer("atm_storage_seconds", call="save_accounts"):
+                    self.storage.save_accounts(account_number)
+            except Exception:
+                _put_holds(account, previous)
+                raise
+
+    def close(self):
+        """Flush buffered audit events and stop the PIN hashing pool"""
+        self.audit.close()
+        self.auth.close()
+
+    @staticmethod
+    def _check_headroom(account, amount):
+        """Refuse a credit that would take a balance past the ledger's range"""
+        if to_cents(account["balance"]) + to_cents(amount) > MAX_CENTS:
+            raise InvalidAmountError("Amount would exceed the largest balance an account can hold")
+
+    def _cash_unavailable(self, amount):
+        """CashUnavailableError, naming the note step if the amount is off it"""
+        step = self.cash.step()
+        if step and to_cents(amount) % to_cents(step) == 0:
+            step = None
+        return CashUnavailableError(amount, step)
+
+    def _cash_changed(self, account_number):
+        """Persist the cash inventory and raise a low-cash alert if needed"""
+        alert = self.cash.check_low_cash()
+        try:
+            self.cash.save()
+        except OSError as e:
+            self.audit.record(account_number, "Cash Inventory Error", str(e))
+        if alert:
+            self.audit.record(account_number, "Low Cash Alert", alert, self.cash.total())
+
+    def _save_account(self, account_number):
+        """Persist one account record after a non-balance change"""
+        with self.storage.atomic(), METRICS.timer("atm_storage_seconds", call="save_accounts"):
+            self.storage.save_accounts(account_number)
+
+    def _apply(self, deltas, entries, update=None):
+        """
+        Apply balance changes and record transactions as one storage transaction
+
+        In-memory records are restored if persisting fails, so a failed
+        operation never leaves a half-applied change behind. Each entry is
+        counted in the account's velocity wheels, and flag-only rules it
+        breaks are audited as "Velocity Alert" once it is stored.
+
+        Args:
+            deltas (dict): account_number -> signed amount in cents
+            entries (list): (account_number, type, amount, description) tuples
+            update (callable): Extra in-memory record changes to persist with
+                the balances (e.g. withdrawal accumulators)
+
+        Returns:
+            list: Stored transaction records
+        """
+        accounts = self.accounts
+        previous = {acct: copy.deepcopy(accounts[acct]) for acct in deltas}
+        alerts = []
+
+        with self.storage.atomic():
+            try:
+                for account_number, cents in deltas.items():
+                    add_cents(accounts[account_number], cents)
+                for account_number, transaction_type, amount, _ in entries:
+                    alerts.extend(self._count_velocity(account_number, transaction_type, amount))
+                if update:
+                    update()
+                with METRICS.timer("atm_storage_seconds", call="save_accounts"):
+                    self.storage.save_accounts(*deltas)
+                transactions = [self.record(*entry) for entry in entries]
+            except Exception:
+                for account_number, record in previous.items():
+                    accounts[account_number].clear()
+                    accounts[account_number].update(record)
+                raise
+
+        for account_number, rule, amount in alerts:
+            self.audit.record(account_number, "Velocity Alert", rule.describe(), amount)
+        return transactions
+
+    def _count_velocity(self, account_number, transaction_type, amount):
+        """
+        Count one entry in the account's velocity wheels
+
+        Returns:
+            list: (account_number, rule, amount) for each flag-only rule broken
+        """
+        operation = OPERATIONS.get(transaction_type)
+        if operation is None:
+            return []
+        account = self.accounts[account_number]
+        flagged = [rule for rule in self.fraud.check(account, operation, amount)
+                   if rule.action == "flag"]
+        self.fraud.record(account, operation, amount)
+        return [(account_number, rule, amount) for rule in flagged]
+
+
+def _put_holds(account, holds):
+    """Set the holds of an account record, removing the field when empty"""
+    if holds:
+        account["holds"] = holds
+    else:
+        account.pop("holds", None)
@@ -0,0 +1,265 @@
+"""
+Velocity Rules
+==============
+
+Streaming fraud checks on withdrawals, deposits and transfers.
+
+A velocity rule limits how many operations of some kinds an account may
+make, or how much money they may move, within a sliding time window, e.g.
+"more than 10 transfers out in 10 minutes" or "over $2,000 withdrawn in an
+hour". Rules are evaluated inline on every operation without reading the
+transaction history:
+
+- every account carries one time wheel per rule in its record
+  (``velocity``), persisted with the balance like the withdrawal
+  accumulators in atm_limits
+- a wheel splits the window into ``buckets`` slots, each holding the count
+  and cents of the operations in that slot, plus running totals
+- moving the wheel forward clears at most ``buckets`` expired slots, so a
+  check or an update costs O(rules x buckets) whatever the history length
+
+The window slides in steps of ``window / buckets`` seconds, so the oldest
+slot may count up to one step of operations that are just past the
+window.
+
+Memory per account is bounded: a rule's wheel is 3 + 2 x buckets
+integers, i.e. 23 integers (about 100 bytes of JSON) with the default 10
+buckets, and an account holds one wheel per rule of its type that it has
+used.
+
+Rules are configured per ``account_type``. A "block" rule refuses the
+operation with VelocityLimitError; a "flag" rule lets it through and
+reports it so the engine can raise an alert.
+"""
+
+from datetime import datetime
+
+from atm_ledger import to_cents
+
+
+# Operation names counted by the rules, by transaction type
+OPERATIONS = {
+    "Withdrawal": "withdraw",
+    "Deposit": "deposit",
+    "Transfer Out": "transfer_out",
+    "Transfer In": "transfer_in",
+}
+
+LABELS = {
+    "withdraw": "withdrawals",
+    "deposit": "deposits",
+    "transfer_out": "transfers out",
+    "transfer_in": "transfers in",
+}
+
+
+class VelocityRule:
+    """
+    Count and/or amount limit over a sliding window
+
+    Args:
+        name (str): Rule identifier, also the key of its wheel on the record
+        operations (tuple): Operations counted ("withdraw", "deposit",
+            "transfer_out", "transfer_in")
+        window (int): Window length in seconds
+        max_count (int): Most operations allowed in the window
+        max_amount (float): Most money allowed in the window
+        action (str): "block" to refuse, "flag" to allow and alert
+        buckets (int): Wheel slots; more is smoother but larger
+    """
+
+    def __init__(self, name, operations, window, max_count=None, max_amount=None,
+                 action="block", buckets=10):
+        unknown = set(operations) - set(LABELS)
+        if unknown:
+            raise ValueError(f"Unknown operations: {', '.join(sorted(unknown))}")
+        if max_count is None and max_amount is None:
+            raise ValueError(f"Rule {name} needs max_count or max_amount")
+        if action not in ("block", "flag"):
+            raise ValueError(f"Unknown rule action: {action}")
+        if window < buckets:
+            raise ValueError("The window must be at least one second per bucket")
+        self.name = name
+        self.operations = frozenset(operations)
+        self.window = window
+        self.max_count = max_count
+        self.max_cents = None if max_amount is None else to_cents(max_amount)
+        self.action = action
+        self.buckets = buckets
+        self.step = window / buckets
+
+    def describe(self):
+        """Customer-facing text for a refusal"""
+        minutes = self.window / 60
+        if minutes < 60:
+            period = f"{minutes:g} minutes"
+        else:
+            period = "1 hour" if minutes == 60 else f"{minutes / 60:g} hours"
+        kinds = " and ".join(LABELS[op] for op in sorted(self.operations))
+        if self.max_count is not None:
+            limit = f"{self.max_count} {kinds}"
+        else:
+            limit = f"${self.max_cents / 100:,.2f} of {kinds}"
+        return f"More than {limit} in {period}"
+
+    def __repr__(self):
+        return f"VelocityRule({self.name!r}, {self.action})"
+
+
+# Rules per account type; types without an entry use DEFAULT_RULES
+DEFAULT_RULES = (
+    VelocityRule("transfers_10m", ("transfer_out",), 600, max_count=10),
+    VelocityRule("withdrawals_10m", ("withdraw",), 600, max_count=5),
+    VelocityRule("outflow_1h", ("withdraw", "transfer_out"), 3600, max_amount=5000.00),
+    VelocityRule("deposits_1h", ("deposit",), 3600, max_amount=20000.00, action="flag"),
+)
+
+VELOCITY_RULES = {
+    "Premium": (
+        VelocityRule("transfers_10m", ("transfer_out",), 600, max_count=20),
+        VelocityRule("withdrawals_10m", ("withdraw",), 600, max_count=5),
+        VelocityRule("outflow_1h", ("withdraw", "transfer_out"), 3600, max_amount=20000.00),
+        VelocityRule("deposits_1h", ("deposit",), 3600, max_amount=50000.00, action="flag"),
+    ),
+}
+
+
+class FraudMonitor:
+    """
+    Per-account sliding-window counters checked on every operation
+
+    Features:
+    - Rules per account type
+    - O(rules x buckets) checks and updates from state kept on the record
+    - Blocking and flag-only rules
+    """
+
+    def __init__(self, rules=None, default_rules=DEFAULT_RULES):
+        """
+        Configure the rules
+
+        Args:
+            rules (dict): account_type -> sequence of VelocityRule
+            default_rules (sequence): Rules for account types not in ``rules``
+        """
+        self.rules = dict(VELOCITY_RULES if rules is None else rules)
+        self.default_rules = tuple(default_rules)
+        self._by_operation = {}
+
+    def rules_for(self, account, operation):
+        """Rules of the account's type that count ``operation``"""
+        account_type = account.get("account_type")
+        key = (account_type, operation)
+        rules = self._by_operation.get(key)
+        if rules is None:
+            rules = tuple(rule for rule in self.rules.get(account_type, self.default_rules)
+                          if operation in rule.operations)
+            self._by_operation[key] = rules
+        return rules
+
+    def check(self, account, operation, amount, now=None):
+        """
+        Rules that one more operation would break
+
+        Nothing is changed; call ``record`` once the operation succeeds.
+
+        Args:
+            account (dict): Account record
+            operation (str): "withdraw", "deposit", "transfer_out" or "transfer_in"
+            amount (float): Amount of the operation
+            now (datetime): Time of the operation
+
+        Returns:
+            list: Broken rules, blocking ones first (empty if none)
+        """
+        rules = self.rules_for(account, operation)
+        if not rules:
+            return []
+        seconds = (now or datetime.now()).timestamp()
+        cents = to_cents(amount)
+        state = account.get("velocity", {})
+        broken = []
+        for rule in rules:
+            wheel = state.get(rule.name)
+            if wheel is not None and len(wheel["counts"]) != rule.buckets:
+                wheel = None  # the rule was reconfigured; record() starts over
+            count, total = _totals(wheel, int(seconds // rule.step), rule.buckets)
+            if ((rule.max_count is not None and count + 1 > rule.max_count) or
+                    (rule.max_cents is not None and total + cents > rule.max_cents)):
+                broken.append(rule)
+        broken.sort(key=lambda rule: rule.action != "block")
+        return broken
+
+    def record(self, account, operation, amount, now=None):
+        """
+        Count an operation in every matching wheel of the account
+
+        Args:
+            account (dict): Account record, updated in place
+            operation (str): Operation name (see ``check``)
+            amount (float): Amount of the operation
+            now (datetime): Time of the operation
+        """
+        rules = self.rules_for(account, operation)
+        if not rules:
+            return
+        seconds = (now or datetime.now()).timestamp()
+        cents = to_cents(amount)
+        state = account.setdefault("velocity", {})
+        for rule in rules:
+            slot = int(seconds // rule.step)
+            wheel = state.get(rule.name)
+            if wheel is None or len(wheel["counts"]) != rule.buckets:
+                wheel = state[rule.name] = _new_wheel(slot, rule.buckets)
+            _advance(wheel, slot)
+            i = slot % rule.buckets
+            wheel["counts"][i] += 1
+            wheel["cents"][i] += cents
+            wheel["count"] += 1
+            wheel["total"] += cents
+
+
+def _new_wheel(slot, buckets):
+    return {"slot": slot, "count": 0, "total": 0,
+            "counts": [0] * buckets, "cents": [0] * buckets}
+
+
+def _totals(wheel, slot, buckets):
+    """
+    Count and cents in the window ending at ``slot`` without changing the wheel
+
+    Returns:
+        tuple: (count, cents)
+    """
+    if wheel is None:
+        return 0, 0
+    elapsed = slot - wheel["slot"]
+    if elapsed <= 0:
+        return wheel["count"], wheel["total"]
+    if elapsed >= buckets:
+        return 0, 0
+    count, total = wheel["count"], wheel["total"]
+    for s in range(wheel["slot"] + 1, slot + 1):
+        i = s % buckets
+        count -= wheel["counts"][i]
+        total -= wheel["cents"][i]
+    return count, total
+
+
+def _advance(wheel, slot):
+    """Expire the slots that fell out of the window ending at ``slot``"""
+    elapsed = slot - wheel["slot"]
+    if elapsed <= 0:
+        return
+    buckets = len(wheel["counts"])
+    if elapsed >= buckets:
+        wheel["counts"] = [0] * buckets
+        wheel["cents"] = [0] * buckets
+        wheel["count"] = wheel["total"] = 0
+    else:
+        for s in range(wheel["slot"] + 1, slot + 1):
+            i = s % buckets
+            wheel["count"] -= wheel["counts"][i]
+            wheel["total"] -= wheel["cents"][i]
+            wheel["counts"][i] = wheel["cents"][i] = 0
+    wheel["slot"] = slot
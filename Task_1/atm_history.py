@@ -0,0 +1,226 @@
+"""
+Transaction History Queries
+===========================
+
+Indexed, paginated access to per-account transaction history.
+
+Each account gets a compact in-memory index built from the (type, date)
+keys of its transactions only:
+
+- type -> sorted positions (``array('I')``)
+- a per-position day ordinal array; history is appended in time order, so
+  a date range maps to one contiguous position range found by bisection
+
+A page is located with a few bisections and only the records on that page
+are read from storage, so fetching a page does not depend on how long the
+history is. Indexes catch up incrementally with new transactions and are
+kept in a bounded LRU cache.
+"""
+
+import heapq
+import threading
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import OrderedDict
+from datetime import date, datetime
+
+
+class HistoryPage:
+    """
+    One page of history query results
+
+    Attributes:
+        transactions (list): Transaction records on this page, in query order
+        positions (list): History positions of those records
+        next_cursor (int): Cursor for the following page, None at the end
+        total (int): Number of records matching the query
+    """
+
+    def __init__(self, transactions, positions, next_cursor, total):
+        self.transactions = transactions
+        self.positions = positions
+        self.next_cursor = next_cursor
+        self.total = total
+
+    def __iter__(self):
+        return iter(self.transactions)
+
+    def __len__(self):
+        return len(self.transactions)
+
+
+class AccountHistoryIndex:
+    """Secondary indexes over one account's history"""
+
+    def __init__(self):
+        self.length = 0
+        self.days = array('I')
+        self.by_type = {}
+
+    def add(self, position, transaction_type, day):
+        """Index the transaction stored at ``position``"""
+        self.days.append(day)
+        positions = self.by_type.get(transaction_type)
+        if positions is None:
+            positions = self.by_type[transaction_type] = array('I')
+        positions.append(position)
+        self.length = position + 1
+
+    def day_range(self, start=None, end=None):
+        """
+        Positions covering an inclusive day-ordinal range
+
+        Returns:
+            tuple: (first position, one past the last position)
+        """
+        lo = 0 if start is None else bisect_left(self.days, start)
+        hi = self.length if end is None else bisect_right(self.days, end)
+        return lo, max(lo, hi)
+
+
+class TransactionHistory:
+    """
+    History query service over a storage backend
+
+    Storage backends provide ``transaction_count``, ``transaction_keys``
+    (type/date pairs from a position onward) and ``transactions_at``
+    (records by position), so records are only loaded for the page
+    being returned.
+    """
+
+    def __init__(self, storage, cache_size=256):
+        """
+        Args:
+            storage: Storage backend
+            cache_size (int): Account indexes kept in memory
+        """
+        self.storage = storage
+        self.cache_size = cache_size
+        self._indexes = OrderedDict()
+        self._lock = threading.Lock()
+
+    def index_for(self, account_number):
+        """
+        Return the up-to-date index for an account
+
+        Only transactions appended since the index was last used are read.
+        """
+        with self._lock:
+            index = self._indexes.get(account_number)
+            if index is None:
+                index = self._indexes[account_number] = AccountHistoryIndex()
+                while len(self._indexes) > self.cache_size:
+                    self._indexes.popitem(last=False)
+            self._indexes.move_to_end(account_number)
+
+            count = self.storage.transaction_count(account_number)
+            if count > index.length:
+                position = index.length
+                for transaction_type, when in self.storage.transaction_keys(account_number, position):
+                    index.add(position, transaction_type, _day(when))
+                    position += 1
+            return index
+
+    def transaction_types(self, account_number):
+        """Transaction types present in an account's history"""
+        return sorted(self.index_for(account_number).by_type)
+
+    def query(self, account_number, types=None, start=None, end=None,
+              cursor=None, limit=10, newest_first=True):
+        """
+        Fetch one page of an account's history
+
+        Args:
+            account_number (str): Account identifier
+            types (iterable): Only include these transaction types
+            start (date or str): First day to include (YYYY-MM-DD)
+            end (date or str): Last day to include (YYYY-MM-DD)
+            cursor (int): ``next_cursor`` of the previous page
+            limit (int): Maximum records on the page
+            newest_first (bool): Order from newest to oldest
+
+        Returns:
+            HistoryPage: The requested page
+        """
+        index = self.index_for(account_number)
+        lo, hi = index.day_range(_day(start) if start else None, _day(end) if end else None)
+
+        # Narrow the position window to what lies beyond the cursor
+        if cursor is not None:
+            if newest_first:
+                hi = min(hi, cursor)
+            else:
+                lo = max(lo, cursor + 1)
+        hi = max(lo, hi)
+
+        if types is None:
+            total = self._total(index, None, start, end)
+            if newest_first:
+                positions = list(range(hi - 1, max(lo, hi - limit) - 1, -1))
+            else:
+                positions = list(range(lo, min(hi, lo + limit)))
+        else:
+            total = self._total(index, types, start, end)
+            positions = self._typed_positions(index, types, lo, hi, limit, newest_first)
+
+        next_cursor = None
+        if positions and len(positions) == limit:
+            last = positions[-1]
+            rest = (lo, last) if newest_first else (last + 1, hi)
+            if self._count(index, types, *rest):
+                next_cursor = last
+
+        records = self.storage.transactions_at(account_number, positions) if positions else []
+        return HistoryPage(records, positions, next_cursor, total)
+
+    def _typed_positions(self, index, types, lo, hi, limit, newest_first):
+        """Merge per-type position lists within [lo, hi) and take ``limit``"""
+        runs = []
+        for transaction_type in types:
+            positions = index.by_type.get(transaction_type)
+            if not positions:
+                continue
+            first = bisect_left(positions, lo)
+            last = bisect_left(positions, hi)
+            if first >= last:
+                continue
+            if newest_first:
+                runs.append(_run(positions, last - 1, max(first, last - limit) - 1, -1))
+            else:
+                runs.append(_run(positions, first, min(last, first + limit), 1))
+
+        merged = heapq.merge(*runs, reverse=newest_first)
+        return [position for _, position in zip(range(limit), merged)]
+
+    def _total(self, index, types, start, end):
+        """Count matching records without touching storage"""
+        lo, hi = index.day_range(_day(start) if start else None, _day(end) if end else None)
+        return self._count(index, types, lo, hi)
+
+    def _count(self, index, types, lo, hi):
+        """Count positions in [lo, hi) matching the type filter"""
+        if hi <= lo:
+            return 0
+        if types is None:
+            return hi - lo
+        total = 0
+        for transaction_type in types:
+            positions = index.by_type.get(transaction_type)
+            if positions:
+                total += bisect_left(positions, hi) - bisect_left(positions, lo)
+        return total
+
+
+def _run(positions, start, stop, step):
+    """Yield positions[start:stop:step] without copying the array"""
+    for i in range(start, stop, step):
+        yield positions[i]
+
+
+def _day(value):
+    """Day ordinal for a date, datetime or 'YYYY-MM-DD[ HH:MM:SS]' string"""
+    if isinstance(value, datetime):
+        return value.toordinal()
+    if isinstance(value, date):
+        return value.toordinal()
+    return date.fromisoformat(value[:10]).toordinal()
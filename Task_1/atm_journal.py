@@ -0,0 +1,217 @@
+"""
+Transaction Journal
+===================
+
+Append-only transaction journal for the ATM Interface System.
+
+Each transaction is written as one compact JSON Lines record instead of
+re-serializing the whole history, so recording an event costs O(1) in CPU
+and bytes written no matter how long the history grows. The journal is
+replayed on startup on top of the ``transactions.json`` snapshot, which
+remains the import/export format.
+"""
+
+import json
+import os
+import time
+
+from atm_metrics import METRICS, fsync
+
+FLUSH_POLICIES = ("every", "batch", "never")
+
+# Shared compact encoder; json.dumps builds a new one per call with these options
+_ENCODER = json.JSONEncoder(separators=(',', ':'))
+
+
+class TransactionJournal:
+    """
+    Append-only JSON Lines journal of transactions
+
+    Flush policies:
+    - every: flush to the OS after every record (default)
+    - batch: flush once ``batch_size`` records are pending or
+      ``flush_interval`` seconds have passed since the last flush
+    - never: leave buffering to Python/the OS until ``flush()``/``close()``
+
+    When ``fsync`` is enabled every flush is followed by ``os.fsync`` so the
+    records survive a power loss, not just a process crash.
+    """
+
+    def __init__(self, path, flush_policy="every", fsync=False,
+                 batch_size=64, flush_interval=1.0):
+        """
+        Open (or create) a journal file for appending
+
+        Args:
+            path (str): Journal file location
+            flush_policy (str): One of FLUSH_POLICIES
+            fsync (bool): fsync the file on every flush
+            batch_size (int): Pending records that trigger a batch flush
+            flush_interval (float): Seconds between batch flushes
+        """
+        if flush_policy not in FLUSH_POLICIES:
+            raise ValueError(f"Unknown flush policy: {flush_policy}")
+
+        self.path = path
+        self.flush_policy = flush_policy
+        self.fsync = fsync
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._pending = 0
+        self._last_flush = time.monotonic()
+        self._file = open(self.path, 'a', encoding='utf-8')
+
+    def append(self, account_number, transaction):
+        """
+        Append one transaction record to the journal
+
+        Args:
+            account_number (str): Account the transaction belongs to
+            transaction (dict): Transaction record as stored in history
+        """
+        record = dict(transaction)
+        record["account"] = account_number
+        line = _ENCODER.encode(record) + "\n"
+        self._file.write(line)
+        self._pending += 1
+        if METRICS.enabled:
+            METRICS.inc("atm_bytes_written_total", len(line.encode("utf-8")), file="journal")
+
+        if self.flush_policy == "every":
+            self.flush()
+        elif self.flush_policy == "batch":
+            if (self._pending >= self.batch_size or
+                    time.monotonic() - self._last_flush >= self.flush_interval):
+                self.flush()
+
+    def extend(self, entries):
+        """
+        Append many records with one write and one flush
+
+        The flush policy is ignored: the batch is flushed (and fsynced if
+        enabled) before this returns.
+
+        Args:
+            entries (iterable): (account_number, record) pairs
+        """
+        encode = _ENCODER.encode
+        lines = []
+        for account_number, transaction in entries:
+            record = dict(transaction)
+            record["account"] = account_number
+            lines.append(encode(record))
+        if not lines:
+            return
+        data = "\n".join(lines) + "\n"
+        self._file.write(data)
+        if METRICS.enabled:
+            METRICS.inc("atm_bytes_written_total", len(data.encode("utf-8")), file="journal")
+        self.flush()
+
+    def flush(self):
+        """Flush pending records to the OS (and to disk if fsync is on)"""
+        if self._file.closed:
+            return
+        self._file.flush()
+        if self.fsync:
+            fsync(self._file.fileno(), "journal")
+        self._pending = 0
+        self._last_flush = time.monotonic()
+
+    def close(self):
+        """Flush and close the journal file"""
+        if not self._file.closed:
+            self.flush()
+            self._file.close()
+
+    def truncate(self):
+        """Discard all journal records (used after compaction)"""
+        self.flush()
+        self._file.close()
+        self._file = open(self.path, 'w', encoding='utf-8')
+        self.flush()
+        self._file.close()
+        self._file = open(self.path, 'a', encoding='utf-8')
+
+    def replay(self, transactions):
+        """
+        Apply journal records on top of a transaction history
+
+        Records whose transaction ID is already present for the account
+        (e.g. the snapshot was written but the journal was not yet
+        truncated) are skipped. A torn final line left by a crash
+        mid-write is ignored.
+
+        Args:
+            transactions (dict): account_number -> list of transactions,
+                updated in place
+
+        Returns:
+            int: Number of records applied
+        """
+        applied = 0
+        known_ids = {}
+
+        for record in read_journal(self.path):
+            account_number = record.pop("account", None)
+            if account_number is None:
+                # Header line, e.g. the generation marker of lazy storage
+                continue
+            history = transactions.setdefault(account_number, [])
+
+            if account_number not in known_ids:
+                known_ids[account_number] = {
+                    tx.get("transaction_id") for tx in history
+                }
+            ids = known_ids[account_number]
+
+            if record.get("transaction_id") in ids:
+                continue
+
+            history.append(record)
+            ids.add(record.get("transaction_id"))
+            applied += 1
+
+        return applied
+
+
+def read_journal(path):
+    """
+    Yield records from a journal file in the order they were written
+
+    Args:
+        path (str): Journal file location
+
+    Yields:
+        dict: Journal record including its "account" key
+    """
+    try:
+        f = open(path, 'r', encoding='utf-8')
+    except FileNotFoundError:
+        return
+
+    with f:
+        for line in f:
+            if not line.endswith("\n"):
+                # Torn write from a crash; everything before it is intact
+                break
+            line = line.strip()
+            if line:
+                yield json.loads(line)
+
+
+def write_snapshot(path, transactions):
+    """
+    Write the full history in the transactions.json layout atomically
+
+    Args:
+        path (str): Destination file
+        transactions (dict): account_number -> list of transactions
+    """
+    temp_path = f"{path}.tmp"
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        json.dump(transactions, f, indent=2)
+        f.flush()
+        fsync(f.fileno(), "snapshot")
+        METRICS.inc("atm_bytes_written_total", f.tell(), file="snapshot")
+    os.replace(temp_path, path)
@@ -0,0 +1,827 @@
+"""
+Lazy JSON Storage
+=================
+
+Cold-start friendly variant of the JSON storage backend.
+
+Nothing is parsed up front. Accounts and history are located through small
+sorted binary offset indexes and read on demand from memory-mapped files,
+so startup cost and memory stay flat whether the bank has a thousand or a
+million accounts. Only the authenticated account (and a transfer
+recipient) are ever loaded.
+
+Files (next to accounts.json):
+
+- accounts.json        one account per line (valid JSON, readable by
+                       JSONStorage after compaction)
+- accounts.json.idx    account -> (offset, length), sorted, fixed width
+- accounts.json.delta  JSON Lines overlay of account updates since the
+                       last compaction
+- history.<gen>.jsonl  all transactions grouped by account
+- history.idx          account -> (offset, length, count) into the
+                       current history generation
+- transactions.jsonl   journal of transactions since the last compaction
+
+``compact()`` folds the overlay and journal back into the indexed files.
+On first use existing JSON data (pretty-printed accounts.json,
+transactions.json and a plain journal) is converted automatically.
+"""
+
+import json
+import mmap
+import os
+import struct
+import threading
+from collections import OrderedDict
+from collections.abc import Mapping, MutableMapping
+from contextlib import contextmanager
+from heapq import merge
+
+from atm_journal import TransactionJournal, read_journal, write_snapshot
+
+
+KEY_SIZE = 16
+
+
+class OffsetIndex:
+    """
+    Sorted fixed-width binary index over a data file, read through mmap
+
+    Layout: a header (magic, entry count, data file size, data file mtime,
+    generation) followed by ``count`` entries of ``entry_format`` whose
+    first field is the 16-byte key. Lookups bisect directly over the
+    mapped bytes, so opening an index costs the same for any size.
+    """
+
+    MAGIC = b"ATMIDX01"
+    HEADER = struct.Struct("<8sIQQI")
+
+    def __init__(self, path, entry_format):
+        """
+        Map an existing index file
+
+        Args:
+            path (str): Index file
+            entry_format (str): struct format of one entry, key first
+        """
+        self.path = path
+        self.entry = struct.Struct(entry_format)
+        self._file = open(path, 'rb')
+        size = os.fstat(self._file.fileno()).st_size
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if size else b""
+        if size < self.HEADER.size:
+            raise ValueError(f"Index {path} is truncated")
+        magic, self.count, self.source_size, self.source_mtime, self.generation = \
+            self.HEADER.unpack_from(self._map, 0)
+        if magic != self.MAGIC:
+            raise ValueError(f"{path} is not an ATM offset index")
+        if size != self.HEADER.size + self.count * self.entry.size:
+            raise ValueError(f"Index {path} is truncated")
+
+    def __len__(self):
+        return self.count
+
+    def _key_at(self, i):
+        start = self.HEADER.size + i * self.entry.size
+        return self._map[start:start + KEY_SIZE]
+
+    def find(self, key):
+        """
+        Look up a key
+
+        Args:
+            key (str): Account number
+
+        Returns:
+            tuple: Entry values after the key, or None if absent
+        """
+        packed = _pack_key(key)
+        lo, hi = 0, self.count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._key_at(mid) < packed:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo < self.count and self._key_at(lo) == packed:
+            return self.entry.unpack_from(self._map, self.HEADER.size + lo * self.entry.size)[1:]
+        return None
+
+    def __iter__(self):
+        """Yield (key, *values) for every entry in key order"""
+        for i in range(self.count):
+            values = self.entry.unpack_from(self._map, self.HEADER.size + i * self.entry.size)
+            yield (_unpack_key(values[0]),) + values[1:]
+
+    def matches(self, data_path):
+        """True if the index was built for the current data file"""
+        try:
+            st = os.stat(data_path)
+        except FileNotFoundError:
+            return False
+        return st.st_size == self.source_size and st.st_mtime_ns == self.source_mtime
+
+    def close(self):
+        if isinstance(self._map, mmap.mmap):
+            self._map.close()
+        self._file.close()
+
+    @classmethod
+    def write(cls, path, entries, entry_format, data_path, generation=0):
+        """
+        Write an index atomically
+
+        Args:
+            path (str): Index file
+            entries (iterable): (key, *values) tuples in ascending key order
+            entry_format (str): struct format of one entry
+            data_path (str): Data file the offsets point into
+            generation (int): Data generation recorded in the header
+        """
+        entry = struct.Struct(entry_format)
+        temp_path = f"{path}.tmp"
+        count = 0
+        with open(temp_path, 'wb') as f:
+            f.write(b"\0" * cls.HEADER.size)
+            for key, *values in entries:
+                f.write(entry.pack(_pack_key(key), *values))
+                count += 1
+            st = os.stat(data_path)
+            f.seek(0)
+            f.write(cls.HEADER.pack(cls.MAGIC, count, st.st_size, st.st_mtime_ns, generation))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, path)
+
+
+ACCOUNT_ENTRY = "<16sQI"
+HISTORY_ENTRY = "<16sQII"
+
+
+class LazyJSONStorage:
+    """
+    JSON storage that loads accounts and history per account on demand
+
+    Exposes the same methods as JSONStorage/SQLiteStorage.
+    """
+
+    def __init__(self, accounts_file="accounts.json", transactions_file="transactions.json",
+                 journal_file="transactions.jsonl", history_prefix="history",
+                 flush_policy="every", fsync=False, cache_size=1024):
+        """
+        Configure lazy storage
+
+        Args:
+            accounts_file (str): Account data file
+            transactions_file (str): Legacy transaction history to import
+            journal_file (str): Journal of transactions since the last compaction
+            history_prefix (str): Prefix of the grouped history files
+            flush_policy (str): Journal flush policy (every, batch, never)
+            fsync (bool): fsync the journal and account overlay on every flush
+            cache_size (int): Account histories kept in memory
+        """
+        self.accounts_file = accounts_file
+        self.transactions_file = transactions_file
+        self.journal_file = journal_file
+        self.history_prefix = history_prefix
+        self.location = accounts_file
+        self.flush_policy = flush_policy
+        self.fsync = fsync
+        self.cache_size = cache_size
+
+        self.accounts = None
+        self.transactions = None
+        self.journal = None
+        self._lock = threading.RLock()
+        self._account_index = None
+        self._accounts_map = None
+        self._accounts_data = None
+        self._delta = None
+        self._history_index = None
+        self._history_map = None
+        self._history_data = None
+        self._tail = {}
+        self._histories = OrderedDict()
+
+    # ------------------------------------------------------------------
+    # Accounts
+
+    def load_accounts(self):
+        """
+        Open the account index, building it if missing or stale
+
+        Returns:
+            LazyAccountMap: Lazy account mapping, or None if no accounts exist
+        """
+        if not os.path.exists(self.accounts_file):
+            return None
+        self._open_accounts()
+        self.accounts = LazyAccountMap(self)
+        for record in read_journal(self._delta_path):
+            self.accounts._remember(record.pop("account"), record, override=True)
+        self._delta = TransactionJournal(self._delta_path, flush_policy=self.flush_policy,
+                                         fsync=self.fsync)
+        return self.accounts
+
+    def create_accounts(self, accounts):
+        """
+        Initialize storage with a set of accounts and persist them
+
+        Returns:
+            LazyAccountMap: The stored accounts mapping
+        """
+        _write_account_lines(self.accounts_file, sorted(accounts.items()))
+        return self.load_accounts()
+
+    def save_accounts(self, *account_numbers):
+        """
+        Append changed accounts to the overlay
+
+        Args:
+            *account_numbers (str): Accounts that changed; all loaded if empty
+        """
+        with self._lock:
+            records = [(account_number, self.accounts[account_number])
+                       for account_number in account_numbers or list(self.accounts.cached())]
+            if len(records) == 1:
+                self._delta.append(*records[0])
+            else:
+                self._delta.extend(records)
+            for account_number, record in records:
+                self.accounts._remember(account_number, record, override=True)
+
+    @property
+    def _delta_path(self):
+        return f"{self.accounts_file}.delta"
+
+    @property
+    def _account_index_path(self):
+        return f"{self.accounts_file}.idx"
+
+    def _open_accounts(self):
+        """Map accounts.json and its index, (re)building the index if needed"""
+        index = _open_index(self._account_index_path, ACCOUNT_ENTRY)
+        if index is None or not index.matches(self.accounts_file):
+            if index is not None:
+                index.close()
+            _build_account_index(self.accounts_file, self._account_index_path)
+            index = OffsetIndex(self._account_index_path, ACCOUNT_ENTRY)
+        self._account_index = index
+        self._accounts_data, self._accounts_map = _map_file(self.accounts_file)
+
+    def _read_account(self, account_number):
+        """Parse one account record from the mapped base file"""
+        entry = self._account_index.find(account_number)
+        if entry is None:
+            return None
+        offset, length = entry
+        return json.loads(self._accounts_map[offset:offset + length])
+
+    # ------------------------------------------------------------------
+    # Transactions
+
+    def load_transactions(self):
+        """
+        Open the history index and replay the journal tail
+
+        Returns:
+            LazyTransactionMap: Lazy account -> history mapping
+        """
+        index = _open_index(f"{self.history_prefix}.idx", HISTORY_ENTRY)
+        if index is None:
+            self._convert_history()
+            index = OffsetIndex(f"{self.history_prefix}.idx", HISTORY_ENTRY)
+        self._history_index = index
+        self._history_data, self._history_map = _map_file(self._history_path(index.generation))
+
+        generation = None
+        for record in read_journal(self.journal_file):
+            if "account" not in record:
+                generation = record.get("generation")
+                continue
+            if generation != index.generation:
+                # Journal was already folded into this history generation
+                break
+            self._tail.setdefault(record.pop("account"), []).append(record)
+
+        if generation != index.generation:
+            self._tail = {}
+            _start_journal(self.journal_file, index.generation)
+        self.journal = TransactionJournal(self.journal_file, flush_policy=self.flush_policy,
+                                          fsync=self.fsync)
+        self.transactions = LazyTransactionMap(self)
+        return self.transactions
+
+    def _history_path(self, generation):
+        return f"{self.history_prefix}.{generation}.jsonl"
+
+    def _convert_history(self):
+        """One-time import of transactions.json and a legacy journal"""
+        history = {}
+        try:
+            with open(self.transactions_file, 'r') as f:
+                history = json.load(f)
+        except FileNotFoundError:
+            pass
+
+        seen = {acct: {tx.get("transaction_id") for tx in txs} for acct, txs in history.items()}
+        for record in read_journal(self.journal_file):
+            account_number = record.pop("account", None)
+            if account_number is None:
+                continue
+            ids = seen.setdefault(account_number, set())
+            if record.get("transaction_id") not in ids:
+                history.setdefault(account_number, []).append(record)
+                ids.add(record.get("transaction_id"))
+
+        groups = ((acct, [_encode_record(acct, tx) for tx in history[acct]])
+                  for acct in sorted(history))
+        _write_history(self._history_path(1), f"{self.history_prefix}.idx", groups, 1)
+        _start_journal(self.journal_file, 1)
+
+    def _history(self, account_number):
+        """Full history of one account, loaded on first use"""
+        history = self._histories.get(account_number)
+        if history is not None:
+            self._histories.move_to_end(account_number)
+            return history
+
+        history = self._read_history(account_number)
+        self._histories[account_number] = history
+        while len(self._histories) > self.cache_size:
+            self._histories.popitem(last=False)
+        return history
+
+    def _read_history(self, account_number):
+        """Parse one account's history from the mapped file plus the journal tail"""
+        history = []
+        entry = self._history_index.find(account_number)
+        if entry is not None:
+            offset, length, _ = entry
+            for line in self._history_map[offset:offset + length].splitlines():
+                record = json.loads(line)
+                del record["account"]
+                history.append(record)
+        history.extend(self._tail.get(account_number, ()))
+        return history
+
+    def append_transaction(self, account_number, transaction):
+        """Record one transaction in the journal"""
+        with self._lock:
+            self.journal.append(account_number, transaction)
+            self._tail.setdefault(account_number, []).append(transaction)
+            history = self._histories.get(account_number)
+            if history is not None:
+                history.append(transaction)
+
+    def append_transactions(self, entries):
+        """
+        Record many transactions with one journal write
+
+        Args:
+            entries (list): (account_number, transaction) pairs in order
+        """
+        with self._lock:
+            self.journal.extend(entries)
+            for account_number, transaction in entries:
+                self._tail.setdefault(account_number, []).append(transaction)
+                history = self._histories.get(account_number)
+                if history is not None:
+                    history.append(transaction)
+
+    def transaction_count(self, account_number):
+        """Number of transactions recorded for an account"""
+        entry = self._history_index.find(account_number)
+        base = entry[2] if entry else 0
+        return base + len(self._tail.get(account_number, ()))
+
+    def get_transactions(self, account_number):
+        """All transactions for an account, oldest first"""
+        return list(self._history(account_number))
+
+    def recent_transactions(self, account_number, limit):
+        """The last ``limit`` transactions for an account, oldest first"""
+        return self._history(account_number)[-limit:]
+
+    def transaction_keys(self, account_number, start=0):
+        """(type, date) pairs of an account's transactions from position ``start``"""
+        return [(tx['type'], tx['date']) for tx in self._history(account_number)[start:]]
+
+    def transactions_at(self, account_number, positions):
+        """Transactions at the given 0-based history positions, in that order"""
+        history = self._history(account_number)
+        return [history[position] for position in positions]
+
+    def transaction_types(self, account_number):
+        """Distinct transaction types recorded for an account"""
+        return sorted({tx['type'] for tx in self._history(account_number)})
+
+    def transactions_by_type(self, account_number, transaction_type):
+        """All transactions of one type for an account, oldest first"""
+        return [tx for tx in self._history(account_number) if tx['type'] == transaction_type]
+
+    def scan_transactions(self):
+        """
+        Stream every transaction, grouped by account in history order
+
+        Bypasses the per-account history cache.
+
+        Yields:
+            tuple: (account_number, type, amount, balance_after, date)
+        """
+        for account_number in list(self.transactions):
+            for tx in self._read_history(account_number):
+                yield account_number, tx['type'], tx['amount'], tx['balance_after'], tx['date']
+
+    def scan_balances(self):
+        """
+        Stream the current balance of every account
+
+        Yields:
+            tuple: (account_number, balance)
+        """
+        for account_number in list(self.accounts):
+            record = self.accounts._cache.get(account_number) or self._read_account(account_number)
+            yield account_number, record['balance']
+
+    @contextmanager
+    def atomic(self):
+        """Group the saves of one operation (each append is already atomic)"""
+        yield
+
+    def export_transactions(self, path=None):
+        """Export the full history in the transactions.json layout"""
+        history = {acct: self.get_transactions(acct) for acct in self.transactions}
+        write_snapshot(path or self.transactions_file, history)
+
+    # ------------------------------------------------------------------
+    # Maintenance
+
+    def compact(self):
+        """
+        Fold the account overlay and transaction journal into new indexed files
+
+        Both base files are rewritten by streaming them in key order, so
+        compaction never needs the whole ledger in memory as objects.
+        """
+        with self._lock:
+            if not self.accounts.overrides() and not self._tail:
+                return
+            self._delta.flush()
+            self.journal.flush()
+            self._compact_accounts()
+            self._compact_history()
+
+    def _compact_accounts(self):
+        overrides = self.accounts.overrides()
+        base_keys = (key for key, _, _ in self._account_index)
+        new_keys = sorted(k for k in overrides if self._account_index.find(k) is None)
+
+        def lines():
+            for key in merge(base_keys, new_keys):
+                if key in overrides:
+                    yield key, json.dumps(overrides[key], separators=(',', ':')).encode()
+                else:
+                    offset, length = self._account_index.find(key)
+                    yield key, bytes(self._accounts_map[offset:offset + length])
+
+        _write_account_lines(self.accounts_file, lines(), encoded=True)
+        self._account_index.close()
+        _close_map(self._accounts_data, self._accounts_map)
+        self._open_accounts()
+
+        self._delta.truncate()
+        self.accounts.clear_overrides()
+
+    def _compact_history(self, drops=None):
+        old_generation = self._history_index.generation
+        generation = old_generation + 1
+        tail = self._tail
+        base_keys = (key for key, _, _, _ in self._history_index)
+
+        def groups():
+            for key in merge(base_keys, sorted(k for k in tail if self._history_index.find(k) is None)):
+                lines = []
+                entry = self._history_index.find(key)
+                if entry is not None:
+                    offset, length, _ = entry
+                    lines.extend(self._history_map[offset:offset + length].splitlines())
+                lines.extend(_encode_record(key, tx) for tx in tail.get(key, ()))
+                if drops and key in drops:
+                    del lines[:drops[key]]
+                yield key, lines
+
+        _write_history(self._history_path(generation), f"{self.history_prefix}.idx",
+                       groups(), generation)
+        self.journal.close()
+        _start_journal(self.journal_file, generation)
+
+        self._history_index.close()
+        _close_map(self._history_data, self._history_map)
+        try:
+            os.remove(self._history_path(old_generation))
+        except OSError:
+            pass
+
+        self._history_index = OffsetIndex(f"{self.history_prefix}.idx", HISTORY_ENTRY)
+        self._history_data, self._history_map = _map_file(self._history_path(generation))
+        self._tail = {}
+        self.journal = TransactionJournal(self.journal_file, flush_policy=self.flush_policy,
+                                          fsync=self.fsync)
+
+    def drop_transactions(self, counts):
+        """
+        Remove the oldest transactions of accounts (e.g. once archived)
+
+        Applied by rewriting the history files, as in ``compact()``.
+
+        Args:
+            counts (dict): account_number -> number of leading records to drop
+        """
+        with self._lock:
+            self._delta.flush()
+            self.journal.flush()
+            if self.accounts.overrides():
+                self._compact_accounts()
+            self._compact_history(counts)
+            self._histories.clear()
+
+    def close(self):
+        """Flush the overlay and journal and unmap all files"""
+        if self._delta:
+            self._delta.close()
+        if self.journal:
+            self.journal.close()
+        for index in (self._account_index, self._history_index):
+            if index:
+                index.close()
+        _close_map(self._accounts_data, self._accounts_map)
+        _close_map(self._history_data, self._history_map)
+
+
+class LazyAccountMap(MutableMapping):
+    """Dict-like view of accounts backed by the offset index"""
+
+    def __init__(self, storage):
+        self._storage = storage
+        self._cache = {}
+        self._overrides = set()
+
+    def __getitem__(self, account_number):
+        record = self._cache.get(account_number)
+        if record is None:
+            record = self._storage._read_account(account_number)
+            if record is None:
+                raise KeyError(account_number)
+            self._cache[account_number] = record
+        return record
+
+    def __setitem__(self, account_number, record):
+        self._cache[account_number] = record
+        self._storage.save_accounts(account_number)
+
+    def __delitem__(self, account_number):
+        raise TypeError("Accounts cannot be deleted from lazy storage")
+
+    def __contains__(self, account_number):
+        return (account_number in self._cache or
+                self._storage._account_index.find(account_number) is not None)
+
+    def __iter__(self):
+        base = (key for key, _, _ in self._storage._account_index)
+        extra = sorted(k for k in self._overrides if self._storage._account_index.find(k) is None)
+        return merge(base, extra)
+
+    def __len__(self):
+        extra = sum(1 for k in self._overrides if self._storage._account_index.find(k) is None)
+        return len(self._storage._account_index) + extra
+
+    def cached(self):
+        """Account numbers currently loaded"""
+        return self._cache.keys()
+
+    def overrides(self):
+        """account_number -> record for accounts changed since the last compaction"""
+        return {acct: self._cache[acct] for acct in self._overrides}
+
+    def clear_overrides(self):
+        self._overrides.clear()
+
+    def _remember(self, account_number, record, override=False):
+        self._cache[account_number] = record
+        if override:
+            self._overrides.add(account_number)
+
+
+class LazyTransactionMap(Mapping):
+    """Read-only dict-like view of per-account history"""
+
+    def __init__(self, storage):
+        self._storage = storage
+
+    def __getitem__(self, account_number):
+        if account_number not in self:
+            raise KeyError(account_number)
+        return self._storage.get_transactions(account_number)
+
+    def __contains__(self, account_number):
+        return self._storage.transaction_count(account_number) > 0
+
+    def __iter__(self):
+        storage = self._storage
+        base = (key for key, _, _, _ in storage._history_index)
+        extra = sorted(k for k in storage._tail if storage._history_index.find(k) is None)
+        return merge(base, extra)
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+
+def _pack_key(key):
+    packed = key.encode("ascii")
+    if len(packed) > KEY_SIZE:
+        raise ValueError(f"Account number too long for index: {key}")
+    return packed.ljust(KEY_SIZE, b"\0")
+
+
+def _unpack_key(packed):
+    return packed.rstrip(b"\0").decode("ascii")
+
+
+def _open_index(path, entry_format):
+    """Open an index, or return None if it is missing or unreadable"""
+    try:
+        return OffsetIndex(path, entry_format)
+    except (FileNotFoundError, ValueError, struct.error):
+        return None
+
+
+def _map_file(path):
+    """Open and memory-map a file read-only; empty files map to b''"""
+    f = open(path, 'rb')
+    if os.fstat(f.fileno()).st_size == 0:
+        return f, b""
+    return f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+def _close_map(f, mapped):
+    if isinstance(mapped, mmap.mmap):
+        mapped.close()
+    if f is not None:
+        f.close()
+
+
+def _encode_record(account_number, transaction):
+    record = dict(transaction)
+    record["account"] = account_number
+    return json.dumps(record, separators=(',', ':')).encode()
+
+
+def _write_account_lines(path, items, encoded=False):
+    """
+    Write accounts one per line in the AccountStore layout, atomically
+
+    Args:
+        path (str): accounts.json location
+        items (iterable): (account_number, record) in key order; records are
+            bytes when ``encoded`` is True
+    """
+    temp_path = f"{path}.tmp"
+    with open(temp_path, 'wb') as f:
+        f.write(b"{\n")
+        first = True
+        for account_number, record in items:
+            if not encoded:
+                record = json.dumps(record, separators=(',', ':')).encode()
+            if not first:
+                f.write(b",\n")
+            f.write(json.dumps(account_number).encode() + b": " + record)
+            first = False
+        f.write(b"\n}\n")
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temp_path, path)
+
+
+def _build_account_index(accounts_file, index_path):
+    """
+    Scan accounts.json and write its offset index
+
+    Files that are not in the one-account-per-line layout (e.g. the
+    original pretty-printed format) are rewritten in that layout first.
+    """
+    entries = _scan_account_lines(accounts_file)
+    if entries is None:
+        with open(accounts_file, 'r') as f:
+            accounts = json.load(f)
+        _write_account_lines(accounts_file, sorted(accounts.items()))
+        entries = _scan_account_lines(accounts_file)
+    entries.sort()
+    OffsetIndex.write(index_path, entries, ACCOUNT_ENTRY, accounts_file)
+
+
+def _scan_account_lines(accounts_file):
+    """
+    Locate every record in a one-account-per-line file
+
+    Returns:
+        list: (account_number, offset, length) tuples, or None if the file
+        is not in that layout
+    """
+    entries = []
+    offset = 0
+    with open(accounts_file, 'rb') as f:
+        for line in f:
+            stripped = line.rstrip(b"\r\n")
+            if stripped in (b"{", b"}", b""):
+                offset += len(line)
+                continue
+            if stripped.endswith(b","):
+                stripped = stripped[:-1]
+            split = stripped.find(b'": {')
+            if not stripped.startswith(b'"') or split < 0 or not stripped.endswith(b"}"):
+                return None
+            key = json.loads(stripped[:split + 1])
+            start = split + 3
+            entries.append((key, offset + start, len(stripped) - start))
+            offset += len(line)
+    return entries
+
+
+def _write_history(data_path, index_path, groups, generation):
+    """
+    Write grouped history lines and their index
+
+    Args:
+        data_path (str): history.<gen>.jsonl to create
+        index_path (str): history.idx to replace (the commit point)
+        groups (iterable): (account_number, [encoded lines]) in key order
+        generation (int): Generation number of the new data file
+    """
+    entries = []
+    with open(data_path, 'wb') as f:
+        offset = 0
+        for account_number, lines in groups:
+            if not lines:
+                continue
+            chunk = b"\n".join(lines) + b"\n"
+            f.write(chunk)
+            entries.append((account_number, offset, len(chunk), len(lines)))
+            offset += len(chunk)
+        f.flush()
+        os.fsync(f.fileno())
+    OffsetIndex.write(index_path, entries, HISTORY_ENTRY, data_path, generation)
+
+
+def _start_journal(path, generation):
+    """Replace the journal with an empty one for a history generation"""
+    temp_path = f"{path}.tmp"
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        f.write(json.dumps({"generation": generation}) + "\n")
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temp_path, path)
+
+
+def prepare(accounts_file="accounts.json", transactions_file="transactions.json",
+            journal_file="transactions.jsonl", history_prefix="history"):
+    """
+    Build (or refresh) the on-disk indexes for lazy loading
+
+    Returns:
+        tuple: (number of accounts, number of accounts with history)
+    """
+    storage = LazyJSONStorage(accounts_file, transactions_file, journal_file, history_prefix)
+    try:
+        if storage.load_accounts() is None:
+            raise FileNotFoundError(accounts_file)
+        storage.load_transactions()
+        storage.compact()
+        return len(storage._account_index), len(storage._history_index)
+    finally:
+        storage.close()
+
+
+def main(argv=None):
+    """Build lazy-loading indexes from the command line"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Prepare ATM data files for lazy loading")
+    parser.add_argument("--accounts", default="accounts.json")
+    parser.add_argument("--transactions", default="transactions.json")
+    parser.add_argument("--journal", default="transactions.jsonl")
+    parser.add_argument("--history-prefix", default="history")
+    args = parser.parse_args(argv)
+
+    try:
+        accounts, histories = prepare(args.accounts, args.transactions, args.journal,
+                                      args.history_prefix)
+        print(f"✓ Indexed {accounts} accounts and {histories} account histories")
+    except Exception as e:
+        print(f"✗ Preparing indexes failed: {e}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,481 @@
+"""
+Account Ledger
+==============
+
+Compact, columnar in-memory account store with integer-cent balances.
+
+Instead of one dict per account with repeated string keys, every field is
+a column indexed by a per-account slot:
+
+- balances in integer cents (``array('q')``), so arithmetic is exact and
+  bulk operations run over one flat buffer
+- PIN, name and creation date packed into byte heaps with offset/length
+  arrays
+- account type as a one-byte code into a small table of type names
+- account numbers in a sorted ``array('q')`` searched with bisect
+
+Anything else stored on an account (e.g. withdrawal accumulators) lives in
+a sparse per-slot dict. ``Ledger[account]`` returns an ``AccountRecord``
+view that behaves like the original account dict, so callers do not change.
+Floats only appear at the I/O boundary: ``record["balance"]`` converts from
+cents on read and to cents on write.
+"""
+
+import copy
+import threading
+from array import array
+from bisect import bisect_left
+from collections.abc import MutableMapping
+from decimal import Decimal, InvalidOperation, ROUND_HALF_EVEN
+
+
+STRING_COLUMNS = ("pin", "name", "created_date")
+MAX_NUMERIC_DIGITS = 18
+
+# Largest balance a ledger slot holds (int64 cents)
+MAX_CENTS = 2**63 - 1
+
+
+def to_cents(value, strict=False):
+    """
+    Convert a money amount to integer cents
+
+    Args:
+        value (int, float, str or Decimal): Amount in dollars
+        strict (bool): Reject amounts with more than two decimal places
+            instead of rounding them to the nearest cent
+
+    Returns:
+        int: Amount in cents
+
+    Raises:
+        ValueError: If the value is not a finite number (or not in cents
+            precision when ``strict``)
+    """
+    if isinstance(value, bool):
+        raise ValueError(f"Not an amount: {value!r}")
+    if isinstance(value, int):
+        return value * 100
+    if isinstance(value, float) and not strict:
+        if value != value or value in (float("inf"), float("-inf")):
+            raise ValueError(f"Not an amount: {value!r}")
+        return round(value * 100)
+    try:
+        # str() of a float is its shortest repr, so 0.1 becomes exactly 0.10
+        cents = Decimal(str(value)) * 100
+    except InvalidOperation:
+        raise ValueError(f"Not an amount: {value!r}") from None
+    if not cents.is_finite():
+        raise ValueError(f"Not an amount: {value!r}")
+    whole = cents.to_integral_value(rounding=ROUND_HALF_EVEN)
+    if strict and whole != cents:
+        raise ValueError(f"Amount has more than two decimal places: {value!r}")
+    return int(whole)
+
+
+def from_cents(cents):
+    """
+    Convert integer cents to a float amount for display and JSON
+
+    The result is the float closest to the exact decimal value, so it
+    prints and round-trips with at most two decimal places.
+    """
+    return cents / 100
+
+
+def add_cents(record, cents):
+    """
+    Add ``cents`` to an account record's balance without float error
+
+    Works for ledger views and plain account dicts alike.
+    """
+    if isinstance(record, AccountRecord):
+        record.balance_cents += cents
+    else:
+        record["balance"] = from_cents(to_cents(record["balance"]) + cents)
+
+
+class _StringColumn:
+    """
+    Column of optional strings packed into one bytearray
+
+    Each slot owns ``capacity`` bytes at its offset. A new value that fits
+    is written there, so clearing and refilling a record or rewriting a PIN
+    does not grow the heap; only a longer value moves to the end and leaves
+    dead bytes behind. ``packed`` leaves dead bytes out.
+    """
+
+    __slots__ = ("data", "offsets", "lengths", "capacity")
+
+    NONE = 0xFFFF
+
+    def __init__(self):
+        self.data = bytearray()
+        self.offsets = array('I')
+        self.lengths = array('H')
+        self.capacity = array('H')
+
+    @classmethod
+    def from_buffers(cls, offsets, lengths, data):
+        """Column over existing offset/length arrays and heap (e.g. a snapshot)"""
+        column = cls()
+        column.offsets = offsets
+        column.lengths = lengths
+        column.data = data
+        column.capacity = array('H', (0 if n == cls.NONE else n for n in lengths))
+        return column
+
+    def append(self, value):
+        self.offsets.append(len(self.data))
+        self.lengths.append(self.NONE)
+        self.capacity.append(0)
+        self.set(len(self.offsets) - 1, value)
+
+    def get(self, slot):
+        length = self.lengths[slot]
+        if length == self.NONE:
+            return None
+        offset = self.offsets[slot]
+        return self.data[offset:offset + length].decode("utf-8")
+
+    def set(self, slot, value):
+        if value is None:
+            self.lengths[slot] = self.NONE
+            return
+        encoded = str(value).encode("utf-8")
+        if len(encoded) >= self.NONE:
+            raise ValueError("String too long for the ledger")
+        if len(encoded) <= self.capacity[slot]:
+            # Overwrite in place when the new value fits the slot's space
+            offset = self.offsets[slot]
+            self.data[offset:offset + len(encoded)] = encoded
+        else:
+            self.offsets[slot] = len(self.data)
+            self.capacity[slot] = len(encoded)
+            self.data += encoded
+        self.lengths[slot] = len(encoded)
+
+    def packed(self):
+        """
+        Offsets, lengths and heap holding only the live values
+
+        Returns:
+            tuple: (offsets, lengths, data); the column's own buffers if
+                the heap has no dead or spare bytes
+        """
+        lengths = self.lengths
+        live = sum(lengths) - lengths.count(self.NONE) * self.NONE
+        if live == len(self.data):
+            return self.offsets, lengths, self.data
+        data = bytearray()
+        offsets = array('I')
+        for offset, length in zip(self.offsets, lengths):
+            offsets.append(len(data))
+            if length != self.NONE:
+                data += self.data[offset:offset + length]
+        return offsets, lengths, data
+
+
+class Ledger(MutableMapping):
+    """
+    Columnar account store: account_number -> AccountRecord
+
+    Features:
+    - Exact integer-cent balances in a flat ``array('q')``
+    - Tens of bytes per account instead of a dict of Python objects
+    - Bulk balance updates over the ``balances`` array
+    """
+
+    def __init__(self, records=None):
+        """
+        Create a ledger, optionally filled from account dicts
+
+        Args:
+            records (Mapping): account_number -> account dict
+        """
+        self.balances = array('q')
+        self._strings = {column: _StringColumn() for column in STRING_COLUMNS}
+        self._types = array('B')
+        self._type_names = [None]
+        self._extras = {}
+
+        # Canonical numeric account numbers are kept as int64 in a sorted
+        # array; anything else (leading zeros, letters) in a plain dict
+        self._keys = array('q')
+        self._key_slots = array('I')
+        self._other_keys = {}
+
+        self._lock = threading.Lock()
+        if records:
+            self._bulk_load(records)
+
+    @classmethod
+    def from_records(cls, records):
+        """Build a ledger from an account_number -> dict mapping"""
+        return cls(records)
+
+    # ------------------------------------------------------------------
+    # Mapping protocol
+
+    def __getitem__(self, account_number):
+        slot = self.slot(account_number)
+        if slot is None:
+            raise KeyError(account_number)
+        return AccountRecord(self, slot)
+
+    def __setitem__(self, account_number, record):
+        record = dict(record)
+        with self._lock:
+            slot = self.slot(account_number)
+            if slot is None:
+                slot = self._allocate()
+                self._index(account_number, slot)
+        AccountRecord(self, slot).replace(record)
+
+    def __delitem__(self, account_number):
+        raise TypeError("Accounts cannot be deleted from the ledger")
+
+    def __contains__(self, account_number):
+        return self.slot(account_number) is not None
+
+    def __iter__(self):
+        return iter(self._slot_order())
+
+    def __len__(self):
+        return len(self.balances)
+
+    # ------------------------------------------------------------------
+    # Slots and balances
+
+    def slot(self, account_number):
+        """
+        Column position of an account
+
+        Returns:
+            int: Slot number, or None if the account does not exist
+        """
+        if _numeric(account_number):
+            key = int(account_number)
+            i = bisect_left(self._keys, key)
+            if i < len(self._keys) and self._keys[i] == key:
+                return self._key_slots[i]
+            return None
+        return self._other_keys.get(account_number)
+
+    def balance_cents(self, account_number):
+        """Balance of an account in cents"""
+        return self[account_number].balance_cents
+
+    def total_cents(self):
+        """Sum of all balances in cents"""
+        return sum(self.balances)
+
+    def apply_deltas(self, deltas):
+        """
+        Add cent amounts to many balances in one pass
+
+        Args:
+            deltas (dict): account_number -> cents to add
+
+        Every new balance is computed and checked before any is stored, so
+        either all deltas are applied or none.
+
+        Raises:
+            KeyError: If an account does not exist (no balance is changed)
+            ValueError: If a balance would leave the int64-cent range (no
+                balance is changed)
+        """
+        balances = self.balances
+        updates = []
+        for acct, cents in deltas.items():
+            slot = self.slot(acct)
+            if slot is None:
+                raise KeyError(acct)
+            updates.append((slot, _balance(balances[slot] + cents)))
+        for slot, value in updates:
+            balances[slot] = value
+
+    def to_dict(self):
+        """Plain account_number -> dict copy for JSON output"""
+        return {account_number: AccountRecord(self, slot).to_dict()
+                for slot, account_number in enumerate(self._slot_order())}
+
+    # ------------------------------------------------------------------
+    # Internals
+
+    def _slot_order(self):
+        """
+        Account numbers in slot (insertion) order
+
+        Slots do not store their account number, so the reverse mapping is
+        rebuilt from the index; this only happens when iterating, which is
+        O(n) anyway.
+        """
+        numbers = [None] * len(self.balances)
+        for key, slot in zip(self._keys, self._key_slots):
+            numbers[slot] = str(key)
+        for account_number, slot in self._other_keys.items():
+            numbers[slot] = account_number
+        return numbers
+
+    def _allocate(self):
+        self.balances.append(0)
+        for column in self._strings.values():
+            column.append(None)
+        self._types.append(0)
+        return len(self.balances) - 1
+
+    def _index(self, account_number, slot):
+        if _numeric(account_number):
+            key = int(account_number)
+            i = bisect_left(self._keys, key)
+            self._keys.insert(i, key)
+            self._key_slots.insert(i, slot)
+        else:
+            self._other_keys[account_number] = slot
+
+    def _bulk_load(self, records):
+        """Fill an empty ledger, sorting the number index once at the end"""
+        numeric = []
+        for account_number, record in records.items():
+            slot = self._allocate()
+            if _numeric(account_number):
+                numeric.append((int(account_number), slot))
+            else:
+                self._other_keys[account_number] = slot
+            AccountRecord(self, slot).replace(record)
+        numeric.sort()
+        self._keys = array('q', (key for key, _ in numeric))
+        self._key_slots = array('I', (slot for _, slot in numeric))
+
+    def _type_code(self, account_type):
+        if account_type is None:
+            return 0
+        try:
+            return self._type_names.index(account_type)
+        except ValueError:
+            if len(self._type_names) > 255:
+                raise ValueError("Too many distinct account types") from None
+            self._type_names.append(account_type)
+            return len(self._type_names) - 1
+
+
+class AccountRecord(MutableMapping):
+    """
+    Dict-like view of one ledger slot
+
+    ``balance`` is always present and reads/writes dollars; use
+    ``balance_cents`` for exact arithmetic.
+    """
+
+    __slots__ = ("_ledger", "_slot")
+
+    def __init__(self, ledger, slot):
+        self._ledger = ledger
+        self._slot = slot
+
+    @property
+    def balance_cents(self):
+        return self._ledger.balances[self._slot]
+
+    @balance_cents.setter
+    def balance_cents(self, cents):
+        self._ledger.balances[self._slot] = _balance(cents)
+
+    def __getitem__(self, key):
+        ledger, slot = self._ledger, self._slot
+        if key == "balance":
+            return from_cents(ledger.balances[slot])
+        if key in ledger._strings:
+            value = ledger._strings[key].get(slot)
+        elif key == "account_type":
+            value = ledger._type_names[ledger._types[slot]]
+        else:
+            return ledger._extras.get(slot, {})[key]
+        if value is None:
+            raise KeyError(key)
+        return value
+
+    def __setitem__(self, key, value):
+        ledger, slot = self._ledger, self._slot
+        if key == "balance":
+            ledger.balances[slot] = _balance(to_cents(value))
+        elif key in ledger._strings:
+            ledger._strings[key].set(slot, value)
+        elif key == "account_type":
+            ledger._types[slot] = ledger._type_code(value)
+        else:
+            ledger._extras.setdefault(slot, {})[key] = value
+
+    def __delitem__(self, key):
+        ledger, slot = self._ledger, self._slot
+        if key == "balance":
+            raise TypeError("An account always has a balance")
+        if key not in self:
+            raise KeyError(key)
+        if key in ledger._strings:
+            ledger._strings[key].set(slot, None)
+        elif key == "account_type":
+            ledger._types[slot] = 0
+        else:
+            extras = ledger._extras[slot]
+            del extras[key]
+            if not extras:
+                del ledger._extras[slot]
+
+    def __iter__(self):
+        ledger, slot = self._ledger, self._slot
+        for column in STRING_COLUMNS[:2]:
+            if ledger._strings[column].lengths[slot] != _StringColumn.NONE:
+                yield column
+        yield "balance"
+        if ledger._types[slot]:
+            yield "account_type"
+        if ledger._strings["created_date"].lengths[slot] != _StringColumn.NONE:
+            yield "created_date"
+        yield from list(ledger._extras.get(slot, ()))
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+    def __repr__(self):
+        return f"AccountRecord({self.to_dict()!r})"
+
+    def __deepcopy__(self, memo):
+        return copy.deepcopy(self.to_dict(), memo)
+
+    def clear(self):
+        """Reset every column (balance to zero) and drop extra fields"""
+        ledger, slot = self._ledger, self._slot
+        ledger.balances[slot] = 0
+        for column in ledger._strings.values():
+            column.set(slot, None)
+        ledger._types[slot] = 0
+        ledger._extras.pop(slot, None)
+
+    def replace(self, record):
+        """Overwrite this slot with the fields of an account dict"""
+        self.clear()
+        self.update(record)
+
+    def copy(self):
+        """Shallow plain-dict copy"""
+        return self.to_dict()
+
+    def to_dict(self):
+        """Plain dict of this account, e.g. for JSON output"""
+        return dict(self.items())
+
+
+def _balance(cents):
+    """Check that a balance fits a ledger slot"""
+    if not -MAX_CENTS - 1 <= cents <= MAX_CENTS:
+        raise ValueError(f"Balance out of range: {cents} cents")
+    return cents
+
+
+def _numeric(account_number):
+    """True if an account number survives int() -> str() unchanged"""
+    return (isinstance(account_number, str) and account_number.isascii() and
+            account_number.isdigit() and len(account_number) <= MAX_NUMERIC_DIGITS and
+            (account_number[0] != "0" or account_number == "0"))
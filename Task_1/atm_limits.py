@@ -0,0 +1,155 @@
+"""
+Withdrawal Limits
+=================
+
+Constant-time daily and rolling 24-hour withdrawal accumulators.
+
+Instead of summing today's withdrawals from the transaction history, each
+account carries small running totals that are updated on every withdrawal
+and persisted with the account record:
+
+- ``withdrawal_day``: {"date": "YYYY-MM-DD", "total": amount} reset at
+  the calendar day boundary
+- ``withdrawal_window``: 24 hourly buckets plus their running total for the
+  optional rolling 24-hour limit
+
+Both are O(1) to check and update however long the history grows.
+"""
+
+from datetime import datetime
+
+from atm_ledger import from_cents, to_cents
+
+
+# Daily withdrawal limit per account type
+DAILY_WITHDRAWAL_LIMITS = {
+    "Checking": 500.00,
+    "Savings": 500.00,
+    "Premium": 1000.00,
+}
+
+WINDOW_HOURS = 24
+
+
+class WithdrawalLimiter:
+    """
+    Per-account daily (and optionally rolling 24h) withdrawal limits
+
+    Limits are looked up by ``account_type``; account types without an
+    entry use ``default_limit``.
+    """
+
+    def __init__(self, limits=None, default_limit=500.00, rolling=False):
+        """
+        Configure the limiter
+
+        Args:
+            limits (dict): account_type -> daily limit
+            default_limit (float): Limit for account types not in ``limits``
+            rolling (bool): Also enforce the limit over a rolling 24-hour window
+        """
+        self.limits = dict(DAILY_WITHDRAWAL_LIMITS if limits is None else limits)
+        self.default_limit = default_limit
+        self.rolling = rolling
+
+    def limit_for(self, account):
+        """Daily withdrawal limit for an account record"""
+        return self.limits.get(account.get("account_type"), self.default_limit)
+
+    def withdrawn(self, account, now=None):
+        """
+        Amount already counted against the limit
+
+        Args:
+            account (dict): Account record
+            now (datetime): Current time, defaults to datetime.now()
+
+        Returns:
+            float: Withdrawn today, or in the last 24 hours if that is larger
+        """
+        now = now or datetime.now()
+        day = account.get("withdrawal_day")
+        total = day["total"] if day and day["date"] == now.strftime("%Y-%m-%d") else 0.0
+
+        if self.rolling:
+            window = account.get("withdrawal_window")
+            if window:
+                total = max(total, _advance(window, _hour(now), mutate=False))
+        return total
+
+    def remaining(self, account, now=None):
+        """Amount that can still be withdrawn without exceeding the limit"""
+        remaining = to_cents(self.limit_for(account)) - to_cents(self.withdrawn(account, now))
+        return from_cents(max(0, remaining))
+
+    def record(self, account, amount, now=None):
+        """
+        Count a withdrawal against the account's accumulators
+
+        Args:
+            account (dict): Account record, updated in place
+            amount (float): Amount withdrawn
+            now (datetime): Time of the withdrawal
+        """
+        now = now or datetime.now()
+        today = now.strftime("%Y-%m-%d")
+
+        day = account.get("withdrawal_day")
+        if not day or day["date"] != today:
+            day = {"date": today, "total": 0.0}
+        day["total"] = from_cents(to_cents(day["total"]) + to_cents(amount))
+        account["withdrawal_day"] = day
+
+        if self.rolling:
+            hour = _hour(now)
+            window = account.get("withdrawal_window")
+            if not window:
+                window = {"hour": hour, "total": 0.0, "buckets": [0.0] * WINDOW_HOURS}
+            _advance(window, hour, mutate=True)
+            slot = hour % WINDOW_HOURS
+            window["buckets"][slot] = from_cents(to_cents(window["buckets"][slot]) + to_cents(amount))
+            window["total"] = from_cents(to_cents(window["total"]) + to_cents(amount))
+            account["withdrawal_window"] = window
+
+
+def _hour(now):
+    """Whole hours since the epoch for a local datetime"""
+    return int(now.timestamp()) // 3600
+
+
+def _advance(window, hour, mutate):
+    """
+    Expire buckets older than 24 hours
+
+    At most WINDOW_HOURS buckets are touched, so this is constant time.
+
+    Args:
+        window (dict): Rolling window state
+        hour (int): Current hour since the epoch
+        mutate (bool): Update the window in place or only compute the total
+
+    Returns:
+        float: Total withdrawn within the window ending at ``hour``
+    """
+    elapsed = hour - window["hour"]
+    if elapsed <= 0:
+        return window["total"]
+
+    buckets = window["buckets"]
+    if elapsed >= WINDOW_HOURS:
+        total = 0
+        if mutate:
+            window["buckets"] = [0.0] * WINDOW_HOURS
+    else:
+        total = to_cents(window["total"])
+        for h in range(window["hour"] + 1, hour + 1):
+            slot = h % WINDOW_HOURS
+            total -= to_cents(buckets[slot])
+            if mutate:
+                buckets[slot] = 0.0
+    total = from_cents(max(total, 0))
+
+    if mutate:
+        window["hour"] = hour
+        window["total"] = total
+    return total
@@ -0,0 +1,460 @@
+"""
+ATM Load Generator
+==================
+
+Headless driver that replays customer sessions against the ATM, for load
+tests and repeatable regression benchmarks.
+
+A session is a list of commands in the session server's line protocol
+(see ``atm_server``), for example::
+
+    LOGIN 1234567890 1234
+    BALANCE
+    WITHDRAW 40
+    TRANSFER 9876543210 25.50
+    HISTORY 10
+    LOGOUT
+
+Sessions come from a script file or from ``generate_sessions``. They can
+be replayed in-process against an ``ATMEngine`` (``EngineDriver``), which
+needs no ``input()`` or ``getpass``. They can also be replayed over TCP
+against a running server (``run_remote``). Either way every command is
+timed into ``LatencyStats``, which reports ops/sec and p50/p95/p99 latency
+per command.
+"""
+
+import asyncio
+import json
+import os
+import queue
+import random
+import threading
+import time
+from array import array
+from concurrent.futures import ThreadPoolExecutor
+
+from atm_client import ATMClient
+from atm_engine import ATMEngine, ATMError
+from atm_ids import IDAllocator, format_id
+from atm_journal import write_snapshot
+from atm_migrate import migrate_to_sqlite
+from atm_storage import open_storage
+from atm_server import MENU_COMMANDS
+
+
+COMMANDS = ("LOGIN", "BALANCE", "WITHDRAW", "DEPOSIT", "TRANSFER", "PIN",
+            "HISTORY", "INFO", "LOGOUT")
+DEFAULT_MIX = {"BALANCE": 30, "WITHDRAW": 20, "DEPOSIT": 20, "TRANSFER": 15,
+               "HISTORY": 10, "INFO": 5}
+BACKENDS = ("json", "journal", "lazy", "sqlite")
+PERCENTILES = (50, 95, 99)
+
+
+class LatencyStats:
+    """
+    Thread-safe latency samples per command
+
+    Samples are kept in ``array('d')`` columns (8 bytes each), so millions
+    of operations can be recorded without per-sample objects.
+    """
+
+    def __init__(self):
+        self._samples = {}
+        self._errors = {}
+        self._lock = threading.Lock()
+        self.started = None
+        self.finished = None
+
+    def start(self):
+        self.started = time.perf_counter()
+
+    def stop(self):
+        self.finished = time.perf_counter()
+
+    def record(self, command, seconds, ok=True):
+        """
+        Add one timed command
+
+        Args:
+            command (str): Protocol command, e.g. "WITHDRAW"
+            seconds (float): Latency
+            ok (bool): False if the command was refused or failed
+        """
+        with self._lock:
+            samples = self._samples.get(command)
+            if samples is None:
+                samples = self._samples[command] = array('d')
+                self._errors[command] = 0
+            samples.append(seconds)
+            if not ok:
+                self._errors[command] += 1
+
+    @property
+    def elapsed(self):
+        return (self.finished or time.perf_counter()) - self.started
+
+    @property
+    def operations(self):
+        return sum(len(samples) for samples in self._samples.values())
+
+    def summary(self):
+        """
+        Per-command and overall results
+
+        Returns:
+            dict: "elapsed", "ops_per_sec", "operations", "errors" and
+                "commands": {command: {"count", "errors", "ops_per_sec",
+                "mean_ms", "p50_ms", "p95_ms", "p99_ms", "max_ms"}}
+        """
+        elapsed = self.elapsed
+        commands = {}
+        for command in sorted(self._samples, key=_command_order):
+            samples = sorted(self._samples[command])
+            row = {
+                "count": len(samples),
+                "errors": self._errors[command],
+                "ops_per_sec": len(samples) / elapsed if elapsed else 0.0,
+                "mean_ms": sum(samples) / len(samples) * 1000,
+            }
+            for p in PERCENTILES:
+                row[f"p{p}_ms"] = percentile(samples, p) * 1000
+            row["max_ms"] = samples[-1] * 1000
+            commands[command] = row
+        return {
+            "elapsed": elapsed,
+            "operations": self.operations,
+            "errors": sum(self._errors.values()),
+            "ops_per_sec": self.operations / elapsed if elapsed else 0.0,
+            "commands": commands,
+        }
+
+
+def percentile(sorted_samples, p):
+    """
+    Nearest-rank percentile of already sorted samples
+
+    Args:
+        sorted_samples (sequence): Samples in ascending order
+        p (float): Percentile in (0, 100]
+
+    Returns:
+        float: The sample at that rank (0.0 if there are none)
+    """
+    if not sorted_samples:
+        return 0.0
+    rank = max(1, -(-len(sorted_samples) * p // 100))
+    return sorted_samples[int(rank) - 1]
+
+
+def _command_order(command):
+    return COMMANDS.index(command) if command in COMMANDS else len(COMMANDS)
+
+
+def read_script(path):
+    """
+    Read sessions from a script file
+
+    One command per line; a blank line ends a session and ``#`` starts a
+    comment. Menu numbers ("1"-"8") are accepted like in the server.
+
+    Returns:
+        list: Sessions, each a list of command lines
+    """
+    sessions, current = [], []
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.split("#", 1)[0].strip()
+            if line:
+                current.append(line)
+            elif current:
+                sessions.append(current)
+                current = []
+    if current:
+        sessions.append(current)
+    return sessions
+
+
+def generate_sessions(credentials, count, seed=0, mix=None, steps=(2, 8)):
+    """
+    Generate random customer sessions
+
+    Every session logs in, runs a random number of commands drawn from
+    ``mix`` and logs out. The same seed always gives the same sessions.
+
+    Args:
+        credentials (list): (account_number, pin) pairs to log in with
+        count (int): Number of sessions
+        seed (int): Random seed
+        mix (dict): command -> relative weight (defaults to DEFAULT_MIX)
+        steps (tuple): Inclusive (min, max) commands between login and logout
+
+    Returns:
+        list: Sessions, each a list of command lines
+    """
+    rng = random.Random(seed)
+    mix = mix or DEFAULT_MIX
+    commands, weights = list(mix), list(mix.values())
+    sessions = []
+    for _ in range(count):
+        account_number, pin = rng.choice(credentials)
+        session = [f"LOGIN {account_number} {pin}"]
+        for command in rng.choices(commands, weights, k=rng.randint(*steps)):
+            if command in ("WITHDRAW", "DEPOSIT"):
+                command = f"{command} {rng.randrange(1, 20) * 5}"
+            elif command == "TRANSFER":
+                recipient = rng.choice(credentials)[0]
+                if recipient == account_number:
+                    continue
+                command = f"TRANSFER {recipient} {rng.randrange(100, 5000) / 100:.2f}"
+            elif command == "HISTORY":
+                command = f"HISTORY {rng.choice((5, 10, 20))}"
+            elif command == "PIN":
+                # Change and immediately restore, so later sessions still log in
+                new_pin = f"{(int(pin) + 1) % 10000:04d}"
+                session.append(f"PIN {pin} {new_pin}")
+                command = f"PIN {new_pin} {pin}"
+            session.append(command)
+        session.append("LOGOUT")
+        sessions.append(session)
+    return sessions
+
+
+class EngineDriver:
+    """
+    Replays sessions directly against an ``ATMEngine``
+
+    Each command maps to the engine call the server would make, so results
+    are comparable with ``run_remote`` minus the network and protocol cost.
+    """
+
+    def __init__(self, engine):
+        self.engine = engine
+
+    def run_session(self, session, stats):
+        """
+        Run one session, recording every command
+
+        A session whose login fails is abandoned.
+
+        Args:
+            session (list): Command lines
+            stats (LatencyStats): Collector for the timings
+        """
+        account_number = None
+        for line in session:
+            parts = line.split()
+            command = MENU_COMMANDS.get(parts[0], parts[0].upper())
+            handler = getattr(self, f"_do_{command.lower()}", None)
+            if handler is None:
+                raise ValueError(f"Unknown command in session: {line}")
+
+            start = time.perf_counter()
+            try:
+                result = handler(account_number, *parts[1:])
+                ok = True
+            except ATMError:
+                ok = False
+            stats.record(command, time.perf_counter() - start, ok)
+
+            if command == "LOGIN":
+                if not ok:
+                    return
+                account_number = result
+
+    def run(self, sessions, clients=1, stats=None):
+        """
+        Run sessions on ``clients`` threads
+
+        Returns:
+            LatencyStats: The recorded timings
+        """
+        stats = stats or LatencyStats()
+        work = queue.SimpleQueue()
+        for session in sessions:
+            work.put(session)
+
+        def client():
+            while True:
+                try:
+                    session = work.get_nowait()
+                except queue.Empty:
+                    return
+                self.run_session(session, stats)
+
+        stats.start()
+        with ThreadPoolExecutor(clients) as pool:
+            for future in [pool.submit(client) for _ in range(clients)]:
+                future.result()
+        stats.stop()
+        return stats
+
+    def _do_login(self, account_number, login_account, pin):
+        self.engine.authenticate(login_account, pin)
+        return login_account
+
+    def _do_balance(self, account_number):
+        self.engine.balance_inquiry(account_number)
+
+    def _do_withdraw(self, account_number, amount):
+        self.engine.withdraw(account_number, amount)
+
+    def _do_deposit(self, account_number, amount):
+        self.engine.deposit(account_number, amount)
+
+    def _do_transfer(self, account_number, recipient_account, amount):
+        self.engine.transfer(account_number, recipient_account, amount)
+
+    def _do_pin(self, account_number, current_pin, new_pin):
+        self.engine.change_pin(account_number, current_pin, new_pin)
+
+    def _do_history(self, account_number, limit="10"):
+        self.engine.history.query(account_number, limit=int(limit))
+
+    def _do_info(self, account_number):
+        self.engine.get_account(account_number)
+        self.engine.storage.transaction_count(account_number)
+
+    def _do_logout(self, account_number):
+        self.engine.logout(account_number)
+
+
+def run_remote(host, port, sessions, clients=8, stats=None):
+    """
+    Replay sessions against a running session server
+
+    Args:
+        host (str): Server address
+        port (int): Server port
+        sessions (list): Sessions to replay
+        clients (int): Concurrent connections
+        stats (LatencyStats): Collector for the timings
+
+    Returns:
+        LatencyStats: The recorded timings
+    """
+    stats = stats or LatencyStats()
+
+    async def client(work):
+        while work:
+            session = work.pop()
+            async with ATMClient(host, port) as connection:
+                for line in session:
+                    command = MENU_COMMANDS.get(line.split()[0], line.split()[0].upper())
+                    start = time.perf_counter()
+                    response = await connection.request(line)
+                    stats.record(command, time.perf_counter() - start, response.get("ok", False))
+                    if command == "LOGIN" and not response.get("ok"):
+                        break
+
+    async def replay():
+        work = list(reversed(sessions))
+        await asyncio.gather(*(client(work) for _ in range(clients)))
+
+    stats.start()
+    asyncio.run(replay())
+    stats.stop()
+    return stats
+
+
+def build_fixture(directory, accounts, depth, seed=0):
+    """
+    Write a bank of ``accounts`` accounts with ``depth`` transactions each
+
+    Balances and ``balance_after`` values form consistent chains, and the
+    transaction ID sequence continues after the generated history.
+
+    Args:
+        directory (str): Destination for accounts.json and transactions.json
+        accounts (int): Number of accounts
+        depth (int): History length per account
+        seed (int): Random seed
+
+    Returns:
+        list: (account_number, pin) pairs
+    """
+    rng = random.Random(seed)
+    types = ("Checking", "Savings", "Premium")
+    records, transactions, credentials = {}, {}, []
+    next_id = 1
+    for i in range(accounts):
+        account_number, pin = str(1000000000 + i), f"{rng.randrange(10000):04d}"
+        balance_cents = 100000
+        history = []
+        for n in range(depth):
+            cents = rng.randrange(1, 200) * 500
+            kind = "Deposit" if n % 3 != 2 or balance_cents < cents else "Withdrawal"
+            balance_cents += cents if kind == "Deposit" else -cents
+            day = 1 + n * 28 // max(depth, 1)
+            history.append({
+                "transaction_id": format_id(next_id),
+                "date": f"2025-06-{day:02d} 09:{n % 60:02d}:00",
+                "type": kind,
+                "amount": cents / 100,
+                "description": f"ATM cash {kind.lower()}",
+                "balance_after": balance_cents / 100,
+            })
+            next_id += 1
+        records[account_number] = {
+            "pin": pin, "name": f"Customer {i}", "balance": balance_cents / 100,
+            "account_type": types[i % len(types)], "created_date": "2025-06-01",
+        }
+        if history:
+            transactions[account_number] = history
+        credentials.append((account_number, pin))
+
+    os.makedirs(directory, exist_ok=True)
+    write_snapshot(os.path.join(directory, "accounts.json"), records)
+    write_snapshot(os.path.join(directory, "transactions.json"), transactions)
+    if next_id > 1:
+        IDAllocator(os.path.join(directory, "transaction_ids.seq")).reserve(next_id - 1)
+    return credentials
+
+
+def open_fixture(directory, backend="json", durability="fsync", auth=None):
+    """
+    Open a fixture written by ``build_fixture`` with a storage backend
+
+    Args:
+        directory (str): Fixture directory
+        backend (str): One of BACKENDS ("journal" is JSON in journal mode)
+        durability (str): Account persistence level for the JSON backends
+        auth (PinAuthenticator): PIN settings (engine default if omitted)
+
+    Returns:
+        ATMEngine: Engine over the loaded storage
+    """
+    def path(name):
+        return os.path.join(directory, name)
+
+    if backend == "sqlite":
+        if not os.path.exists(path("atm.db")):
+            migrate_to_sqlite(path("accounts.json"), path("transactions.json"), path("atm.db"))
+        storage = open_storage("sqlite", path=path("atm.db"))
+    elif backend == "lazy":
+        storage = open_storage("lazy", accounts_file=path("accounts.json"),
+                               transactions_file=path("transactions.json"),
+                               journal_file=path("transactions.jsonl"),
+                               history_prefix=path("history"))
+    elif backend in ("json", "journal"):
+        storage = open_storage("json", accounts_file=path("accounts.json"),
+                               transactions_file=path("transactions.json"),
+                               journal_mode=backend == "journal",
+                               journal_file=path("transactions.jsonl"),
+                               durability=durability)
+    else:
+        raise ValueError(f"Unknown backend: {backend}")
+    storage.load_accounts()
+    storage.load_transactions()
+    return ATMEngine(storage, auth=auth)
+
+
+def save_results(path, results):
+    """Write benchmark results (backend -> summary) as JSON"""
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(results, f, indent=2)
+
+
+def load_results(path):
+    """Read results written by ``save_results``"""
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
@@ -0,0 +1,366 @@
+"""
+ATM Metrics
+===========
+
+In-process instrumentation for the ATM: latency histograms, counters and
+Prometheus text export.
+
+Everything goes through the module-level ``METRICS`` registry, which is
+disabled by default. Instrumented code checks ``METRICS.enabled`` (or
+goes through ``timed``, ``timer`` and ``fsync``, which do) before it
+reads a clock, so the disabled cost is one attribute lookup. When
+enabled, an observation is one ``bisect`` and a few integer increments
+under a per-metric lock.
+
+Metrics recorded by the ATM:
+
+- atm_operation_seconds{operation}: engine operations (withdraw, ...)
+- atm_operation_errors_total{operation,error}: refused/failed operations
+- atm_validation_seconds{operation}: the validation step of an operation
+- atm_storage_seconds{call}: persistence calls (save_accounts, ...)
+- atm_bytes_written_total{file}: bytes written per file kind
+- atm_fsync_seconds{file}: fsync durations (the count is the fsync count)
+- atm_lock_wait_seconds{lock}: time spent waiting to acquire locks
+
+Export with ``METRICS.write(path)`` (atomic), ``METRICS.render()`` or
+``METRICS.dump()``, or keep a file fresh with ``MetricsExporter``.
+"""
+
+import functools
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import nullcontext
+
+
+# Seconds, roughly x2.5 apart from 10us to 10s
+LATENCY_BUCKETS = (0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025,
+                   0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+DESCRIPTIONS = {
+    "atm_operation_seconds": "Latency of ATM engine operations",
+    "atm_operation_errors_total": "ATM engine operations that raised an error",
+    "atm_validation_seconds": "Latency of the validation step of an operation",
+    "atm_storage_seconds": "Latency of storage backend calls",
+    "atm_bytes_written_total": "Bytes written to data files",
+    "atm_fsync_seconds": "Duration of fsync calls",
+    "atm_lock_wait_seconds": "Time spent waiting to acquire a lock",
+}
+
+_NULL_TIMER = nullcontext()
+
+
+class Counter:
+    """Monotonic counter"""
+
+    kind = "counter"
+
+    def __init__(self):
+        self.value = 0
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1):
+        with self._lock:
+            self.value += amount
+
+    def samples(self, name, labels):
+        yield name, labels, self.value
+
+
+class Histogram:
+    """
+    Cumulative-bucket histogram in the Prometheus layout
+
+    Counts are kept per bucket and accumulated only when rendering.
+    """
+
+    kind = "histogram"
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        i = bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[i] += 1
+            self.count += 1
+            self.sum += value
+
+    def quantile(self, q):
+        """
+        Estimate a quantile as the upper bound of the bucket holding it
+
+        Returns:
+            float: Bucket bound in seconds (inf past the last bucket), or
+                0.0 if nothing was observed
+        """
+        with self._lock:
+            counts, count = list(self.counts), self.count
+        if not count:
+            return 0.0
+        rank = q * count
+        seen = 0
+        for bound, n in zip(self.buckets + (float("inf"),), counts):
+            seen += n
+            if seen >= rank:
+                return bound
+        return float("inf")
+
+    def samples(self, name, labels):
+        with self._lock:
+            counts, count, total = list(self.counts), self.count, self.sum
+        cumulative = 0
+        for bound, n in zip(self.buckets, counts):
+            cumulative += n
+            yield f"{name}_bucket", labels + (("le", _format_value(bound)),), cumulative
+        yield f"{name}_bucket", labels + (("le", "+Inf"),), count
+        yield f"{name}_sum", labels, total
+        yield f"{name}_count", labels, count
+
+
+class _Timer:
+    """Context manager observing elapsed seconds into a histogram"""
+
+    __slots__ = ("_histogram", "_start")
+
+    def __init__(self, histogram):
+        self._histogram = histogram
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self._histogram.observe(time.perf_counter() - self._start)
+
+
+class Metrics:
+    """
+    Registry of named, labelled metrics
+
+    Metrics are created on first use; ``(name, labels)`` identifies one
+    time series.
+    """
+
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def enable(self):
+        self.enabled = True
+
+    def disable(self):
+        self.enabled = False
+
+    def reset(self):
+        """Drop every recorded series"""
+        with self._lock:
+            self._series.clear()
+
+    def histogram(self, name, **labels):
+        """Histogram for ``name`` and ``labels``, created on first use"""
+        return self._get(name, labels, Histogram)
+
+    def counter(self, name, **labels):
+        """Counter for ``name`` and ``labels``, created on first use"""
+        return self._get(name, labels, Counter)
+
+    def observe(self, name, value, **labels):
+        """Record one histogram observation if metrics are enabled"""
+        if self.enabled:
+            self._get(name, labels, Histogram).observe(value)
+
+    def inc(self, name, amount=1, **labels):
+        """Increase a counter if metrics are enabled"""
+        if self.enabled:
+            self._get(name, labels, Counter).inc(amount)
+
+    def timer(self, name, **labels):
+        """
+        Context manager timing the enclosed block into a histogram
+
+        Returns a shared no-op context while disabled.
+        """
+        if not self.enabled:
+            return _NULL_TIMER
+        return _Timer(self._get(name, labels, Histogram))
+
+    def _get(self, name, labels, kind):
+        key = (name, tuple(sorted(labels.items())))
+        metric = self._series.get(key)
+        if metric is None:
+            with self._lock:
+                metric = self._series.setdefault(key, kind())
+        return metric
+
+    # ------------------------------------------------------------------
+    # Export
+
+    def render(self):
+        """
+        Render every series in the Prometheus text exposition format
+
+        Returns:
+            str: Exposition text
+        """
+        with self._lock:
+            series = sorted(self._series.items(), key=lambda item: item[0])
+        lines = []
+        current = None
+        for (name, labels), metric in series:
+            if name != current:
+                current = name
+                if name in DESCRIPTIONS:
+                    lines.append(f"# HELP {name} {DESCRIPTIONS[name]}")
+                lines.append(f"# TYPE {name} {metric.kind}")
+            for sample, sample_labels, value in metric.samples(name, labels):
+                lines.append(f"{sample}{_format_labels(sample_labels)} {_format_value(value)}")
+        return "\n".join(lines) + "\n" if lines else ""
+
+    def write(self, path):
+        """Write the exposition text to ``path`` atomically"""
+        temp_path = f"{path}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            f.write(self.render())
+        os.replace(temp_path, path)
+
+    def dump(self):
+        """
+        Plain snapshot of every series
+
+        Returns:
+            dict: name -> list of {"labels", "value"} for counters or
+                {"labels", "count", "sum", "p50", "p95", "p99"} for histograms
+        """
+        with self._lock:
+            series = sorted(self._series.items(), key=lambda item: item[0])
+        snapshot = {}
+        for (name, labels), metric in series:
+            entry = {"labels": dict(labels)}
+            if isinstance(metric, Histogram):
+                entry.update(count=metric.count, sum=metric.sum,
+                             p50=metric.quantile(0.5), p95=metric.quantile(0.95),
+                             p99=metric.quantile(0.99))
+            else:
+                entry["value"] = metric.value
+            snapshot.setdefault(name, []).append(entry)
+        return snapshot
+
+
+METRICS = Metrics()
+
+
+def timed(operation, name="atm_operation_seconds"):
+    """
+    Decorator timing every call of a function as ``operation``
+
+    Exceptions are counted in atm_operation_errors_total by type and
+    re-raised.
+    """
+    def decorate(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not METRICS.enabled:
+                return func(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            except Exception as e:
+                METRICS.inc("atm_operation_errors_total", operation=operation,
+                            error=type(e).__name__)
+                raise
+            finally:
+                METRICS.observe(name, time.perf_counter() - start, operation=operation)
+        return wrapper
+    return decorate
+
+
+def fsync(fd, file):
+    """``os.fsync`` that records its duration under atm_fsync_seconds{file}"""
+    if not METRICS.enabled:
+        os.fsync(fd)
+        return
+    start = time.perf_counter()
+    os.fsync(fd)
+    METRICS.observe("atm_fsync_seconds", time.perf_counter() - start, file=file)
+
+
+def acquire(lock, name):
+    """Acquire ``lock``, recording the wait under atm_lock_wait_seconds{lock}"""
+    if not METRICS.enabled:
+        lock.acquire()
+        return
+    start = time.perf_counter()
+    lock.acquire()
+    METRICS.observe("atm_lock_wait_seconds", time.perf_counter() - start, lock=name)
+
+
+class MetricsExporter:
+    """
+    Background thread rewriting a Prometheus text file periodically
+
+    Point a node_exporter textfile collector (or any scraper reading
+    files) at ``path``.
+    """
+
+    def __init__(self, path, interval=15.0, metrics=None):
+        """
+        Args:
+            path (str): Exposition file to keep up to date
+            interval (float): Seconds between writes
+            metrics (Metrics): Registry to export (defaults to METRICS)
+        """
+        self.path = path
+        self.interval = interval
+        self.metrics = metrics or METRICS
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="metrics-exporter", daemon=True)
+        self._thread.start()
+        return self
+
+    def write(self):
+        """Write the file now (e.g. from a signal handler)"""
+        self.metrics.write(self.path)
+
+    def stop(self):
+        """Stop the thread and write a final snapshot"""
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+            self._thread = None
+        self.write()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.write()
+            except OSError as e:
+                print(f"✗ Error writing metrics: {e}")
+
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    body = ",".join(f'{key}="{_escape(value)}"' for key, value in labels)
+    return "{" + body + "}"
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value):
+    if isinstance(value, float):
+        if value == float("inf"):
+            return "+Inf"
+        return repr(value)
+    return str(value)
@@ -0,0 +1,136 @@
+"""
+ATM Storage Migration Tool
+==========================
+
+Convert existing JSON data files into the SQLite backend, or export a
+SQLite database back to the JSON layout.
+
+Usage:
+    python atm_migrate.py to-sqlite --db atm.db [--journal transactions.jsonl]
+    python atm_migrate.py to-json --db atm.db
+"""
+
+import argparse
+import json
+
+from atm_journal import read_journal
+from atm_storage import ACCOUNT_COLUMNS, TRANSACTION_COLUMNS, SQLiteStorage, from_row, to_row
+
+
+def migrate_to_sqlite(accounts_file, transactions_file, db_path, journal_file=None):
+    """
+    Load JSON account/transaction files into a SQLite database
+
+    The whole import runs as one SQL transaction, so a failed migration
+    leaves the database untouched.
+
+    Args:
+        accounts_file (str): accounts.json location
+        transactions_file (str): transactions.json location
+        db_path (str): Destination SQLite database
+        journal_file (str): Optional transaction journal to apply on top
+
+    Returns:
+        tuple: (accounts migrated, transactions migrated)
+    """
+    with open(accounts_file, 'r') as f:
+        accounts = json.load(f)
+
+    try:
+        with open(transactions_file, 'r') as f:
+            transactions = json.load(f)
+    except FileNotFoundError:
+        transactions = {}
+
+    if journal_file:
+        known = {acct: {tx.get("transaction_id") for tx in history}
+                 for acct, history in transactions.items()}
+        for record in read_journal(journal_file):
+            account_number = record.pop("account")
+            ids = known.setdefault(account_number, set())
+            if record.get("transaction_id") not in ids:
+                transactions.setdefault(account_number, []).append(record)
+                ids.add(record.get("transaction_id"))
+
+    storage = SQLiteStorage(db_path)
+    try:
+        with storage.atomic():
+            for account_number, record in accounts.items():
+                storage._write_account(account_number, record)
+
+            rows = (
+                (account_number, seq) + to_row(tx, TRANSACTION_COLUMNS)
+                for account_number, history in transactions.items()
+                for seq, tx in enumerate(history, 1)
+            )
+            storage.conn.executemany(
+                "INSERT OR REPLACE INTO transactions (account_number, seq, transaction_id, date,"
+                " type, amount, description, balance_after) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                rows
+            )
+        tx_count = sum(len(history) for history in transactions.values())
+    finally:
+        storage.close()
+
+    return len(accounts), tx_count
+
+
+def export_to_json(db_path, accounts_file, transactions_file):
+    """
+    Write a SQLite database back out as accounts.json/transactions.json
+
+    Args:
+        db_path (str): Source SQLite database
+        accounts_file (str): Destination accounts file
+        transactions_file (str): Destination transactions file
+
+    Returns:
+        int: Number of accounts exported
+    """
+    storage = SQLiteStorage(db_path)
+    try:
+        accounts = {}
+        cursor = storage.conn.execute(
+            f"SELECT account_number, {', '.join(ACCOUNT_COLUMNS)}, extra FROM accounts"
+        )
+        for row in cursor:
+            record = from_row(row[1:-1], ACCOUNT_COLUMNS)
+            if row[-1]:
+                record.update(json.loads(row[-1]))
+            accounts[row[0]] = record
+
+        with open(accounts_file, 'w') as f:
+            json.dump(accounts, f, indent=2)
+        storage.export_transactions(transactions_file)
+    finally:
+        storage.close()
+
+    return len(accounts)
+
+
+def main(argv=None):
+    """Command line entry point for the migration tool"""
+    parser = argparse.ArgumentParser(description="Migrate ATM data between storage backends")
+    parser.add_argument("direction", choices=["to-sqlite", "to-json"])
+    parser.add_argument("--accounts", default="accounts.json", help="accounts JSON file")
+    parser.add_argument("--transactions", default="transactions.json", help="transactions JSON file")
+    parser.add_argument("--journal", help="transaction journal to include (to-sqlite only)")
+    parser.add_argument("--db", default="atm.db", help="SQLite database file")
+    args = parser.parse_args(argv)
+
+    try:
+        if args.direction == "to-sqlite":
+            accounts, transactions = migrate_to_sqlite(args.accounts, args.transactions,
+                                                       args.db, args.journal)
+            print(f"✓ Migrated {accounts} accounts and {transactions} transactions to {args.db}")
+        else:
+            accounts = export_to_json(args.db, args.accounts, args.transactions)
+            print(f"✓ Exported {accounts} accounts to {args.accounts} and {args.transactions}")
+    except Exception as e:
+        print(f"✗ Migration failed: {e}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,463 @@
+"""
+End-of-Day Reconciliation
+=========================
+
+Bank-wide totals and consistency checks over the full transaction ledger.
+
+The ledger is streamed once from the storage backend into typed columns
+(``array`` buffers of account codes, type codes, cents, and timestamps),
+and every report is then a grouped pass over those flat columns. When
+NumPy is installed the totals, balance chains and transfer row selection
+run as vectorized passes over the same buffers (no copy); otherwise they
+fall back to plain Python loops with identical results:
+
+- totals per transaction type, bank-wide and per account (cents, exact)
+- balance chains: each ``balance_after`` must equal the previous one plus
+  the signed amount; breaks are reported with their history position
+- closing balances: the last ``balance_after`` must match the account
+- transfers: every "Transfer Out" must be matched by a "Transfer In" of the
+  same amount at the same second (or the next one), and the two sides must
+  net to zero bank-wide
+
+Usage:
+    python atm_reconcile.py                          # JSON storage
+    python atm_reconcile.py --storage sqlite --db atm.db --date 2025-06-20
+"""
+
+import argparse
+import time
+from array import array
+from datetime import date
+
+from atm_journal import write_snapshot
+from atm_ledger import from_cents
+
+try:
+    import numpy
+except ImportError:  # optional: the pure-Python passes are used instead
+    numpy = None
+
+
+# Balance effect of each transaction type; every other type (Login,
+# Balance Inquiry, Failed Withdrawal, PIN Change, Logout, ...) is neutral
+TYPE_SIGNS = {
+    "Deposit": 1,
+    "Transfer In": 1,
+    "Payroll": 1,
+    "Interest": 1,
+    "Withdrawal": -1,
+    "Transfer Out": -1,
+    "Fee": -1,
+}
+
+TRANSFER_TYPES = ("Transfer Out", "Transfer In")
+
+MAX_REPORTED = 1000
+
+
+class TransactionColumns:
+    """
+    Columnar copy of the transaction ledger
+
+    Rows are grouped by account in history order; ``starts[i]`` is the first
+    row of ``accounts[i]`` and ``starts[-1]`` the total row count.
+    """
+
+    def __init__(self):
+        self.accounts = []
+        self.starts = array('Q', [0])
+        self.type_names = []
+        self.types = array('B')
+        self.amounts = array('q')
+        self.balances = array('q')
+        self.days = array('I')
+        self.seconds = array('I')
+
+    def __len__(self):
+        return len(self.types)
+
+    @classmethod
+    def load(cls, rows):
+        """
+        Build columns from a (account, type, amount, balance_after, date) stream
+
+        Args:
+            rows (iterable): Rows grouped by account, e.g. from
+                ``storage.scan_transactions()``
+
+        Returns:
+            TransactionColumns: The loaded columns
+        """
+        columns = cls()
+        type_codes = {}
+        day_cache = {}
+        accounts, starts = columns.accounts, columns.starts
+        types, amounts, balances = columns.types, columns.amounts, columns.balances
+        days, seconds = columns.days, columns.seconds
+        current = None
+
+        for account_number, transaction_type, amount, balance_after, when in rows:
+            if account_number != current:
+                if current is not None:
+                    starts.append(len(types))
+                accounts.append(account_number)
+                current = account_number
+
+            code = type_codes.get(transaction_type)
+            if code is None:
+                code = type_codes[transaction_type] = len(columns.type_names)
+                columns.type_names.append(transaction_type)
+            types.append(code)
+            amounts.append(round(amount * 100))
+            balances.append(round(balance_after * 100))
+
+            day = day_cache.get(when[:10])
+            if day is None:
+                day = day_cache[when[:10]] = date.fromisoformat(when[:10]).toordinal()
+            days.append(day)
+            # Time of day is only needed to pair transfers
+            if transaction_type in TRANSFER_TYPES:
+                seconds.append(int(when[11:13] or 0) * 3600 + int(when[14:16] or 0) * 60
+                               + int(when[17:19] or 0))
+            else:
+                seconds.append(0)
+
+        if current is not None:
+            starts.append(len(types))
+        return columns
+
+
+class Reconciliation:
+    """Reports computed over TransactionColumns"""
+
+    def __init__(self, columns, balances=None, day=None):
+        """
+        Args:
+            columns (TransactionColumns): Loaded ledger
+            balances (dict): account_number -> current balance for the
+                closing-balance check (skipped when None)
+            day (str): Restrict totals and transfer matching to one day
+                (YYYY-MM-DD); balance chains always cover the full history
+        """
+        self.columns = columns
+        self.balances = balances
+        self.day = date.fromisoformat(day).toordinal() if day else None
+
+    def type_totals(self):
+        """
+        Totals per transaction type, bank-wide and per account
+
+        Returns:
+            tuple: (type -> [count, cents], account -> type -> [count, cents])
+        """
+        c = self.columns
+        width = len(c.type_names)
+        if numpy is not None and len(c):
+            counts, sums = self._type_totals_numpy(width)
+            return self._group_totals(counts, sums, width)
+
+        counts = [0] * (len(c.accounts) * width)
+        sums = [0] * (len(c.accounts) * width)
+        day = self.day
+
+        for index in range(len(c.accounts)):
+            base = index * width
+            lo, hi = c.starts[index], c.starts[index + 1]
+            if day is None:
+                for code, cents in zip(c.types[lo:hi], c.amounts[lo:hi]):
+                    counts[base + code] += 1
+                    sums[base + code] += cents
+            else:
+                for code, cents, row_day in zip(c.types[lo:hi], c.amounts[lo:hi], c.days[lo:hi]):
+                    if row_day == day:
+                        counts[base + code] += 1
+                        sums[base + code] += cents
+        return self._group_totals(counts, sums, width)
+
+    def _type_totals_numpy(self, width):
+        """Flat (account, type) counts and cents sums, vectorized"""
+        c = self.columns
+        starts = numpy.frombuffer(c.starts, numpy.uint64).astype(numpy.int64)
+        keys = numpy.repeat(numpy.arange(len(c.accounts), dtype=numpy.int64) * width,
+                            numpy.diff(starts))
+        keys += numpy.frombuffer(c.types, numpy.uint8)
+        amounts = numpy.frombuffer(c.amounts, numpy.int64)
+        if self.day is not None:
+            on_day = numpy.frombuffer(c.days, numpy.uint32) == self.day
+            keys, amounts = keys[on_day], amounts[on_day]
+
+        size = len(c.accounts) * width
+        counts = numpy.bincount(keys, minlength=size)
+        # bincount weights are float64; add.at keeps the cents exact
+        sums = numpy.zeros(size, numpy.int64)
+        numpy.add.at(sums, keys, amounts)
+        return counts, sums
+
+    def _group_totals(self, counts, sums, width):
+        """Bank-wide and per-account dicts from flat (account, type) counts/sums"""
+        c = self.columns
+        bank = {name: [0, 0] for name in c.type_names}
+        per_account = {}
+        if isinstance(counts, list):
+            keys = [key for key, n in enumerate(counts) if n]
+            counts, sums = [counts[key] for key in keys], [sums[key] for key in keys]
+        else:
+            nonzero = numpy.flatnonzero(counts)
+            keys, counts, sums = nonzero.tolist(), counts[nonzero].tolist(), sums[nonzero].tolist()
+
+        for key, n, cents in zip(keys, counts, sums):
+            index, code = divmod(key, width)
+            name = c.type_names[code]
+            per_account.setdefault(c.accounts[index], {})[name] = [n, cents]
+            bank[name][0] += n
+            bank[name][1] += cents
+        return {name: total for name, total in bank.items() if total[0]}, per_account
+
+    def chain_breaks(self):
+        """
+        Rows whose balance_after does not follow from the previous row
+
+        Returns:
+            list: (account_number, position, expected cents, actual cents)
+        """
+        c = self.columns
+        signs = array('b', (TYPE_SIGNS.get(name, 0) for name in c.type_names))
+        if numpy is not None and len(c):
+            return self._chain_breaks_numpy(signs)
+
+        breaks = []
+        for index, account_number in enumerate(c.accounts):
+            lo, hi = c.starts[index], c.starts[index + 1]
+            if hi - lo < 2:
+                continue
+            previous = c.balances[lo]
+            position = 1
+            for code, cents, balance in zip(c.types[lo + 1:hi], c.amounts[lo + 1:hi],
+                                            c.balances[lo + 1:hi]):
+                expected = previous + signs[code] * cents
+                if balance != expected:
+                    breaks.append((account_number, position, expected, balance))
+                previous = balance
+                position += 1
+        return breaks
+
+    def _chain_breaks_numpy(self, signs):
+        """chain_breaks as one vectorized comparison of every row with its predecessor"""
+        c = self.columns
+        types = numpy.frombuffer(c.types, numpy.uint8)
+        amounts = numpy.frombuffer(c.amounts, numpy.int64)
+        balances = numpy.frombuffer(c.balances, numpy.int64)
+        starts = numpy.frombuffer(c.starts, numpy.uint64).astype(numpy.int64)
+
+        expected = balances[:-1] + numpy.frombuffer(signs, numpy.int8)[types[1:]] * amounts[1:]
+        rows = numpy.flatnonzero(expected != balances[1:]) + 1
+        # An account's first row has no predecessor to follow from
+        index = numpy.searchsorted(starts, rows, side="right") - 1
+        later = rows != starts[index]
+        rows, index = rows[later], index[later]
+        return [(c.accounts[i], row - start, expected_cents, actual)
+                for i, row, start, expected_cents, actual
+                in zip(index.tolist(), rows.tolist(), starts[index].tolist(),
+                       expected[rows - 1].tolist(), balances[rows].tolist())]
+
+    def closing_mismatches(self):
+        """
+        Accounts whose last balance_after differs from the stored balance
+
+        Returns:
+            list: (account_number, last balance_after cents, balance cents)
+        """
+        if self.balances is None:
+            return []
+        c = self.columns
+        mismatches = []
+        for index, account_number in enumerate(c.accounts):
+            balance = self.balances.get(account_number)
+            if balance is None:
+                continue
+            last = c.balances[c.starts[index + 1] - 1]
+            if last != round(balance * 100):
+                mismatches.append((account_number, last, round(balance * 100)))
+        return mismatches
+
+    def transfer_check(self):
+        """
+        Match Transfer Out rows against Transfer In rows
+
+        Returns:
+            dict: out/in cents, net, and unmatched (second, cents, count)
+                groups where count > 0 means unmatched outgoing transfers
+        """
+        c = self.columns
+        try:
+            out_code = c.type_names.index("Transfer Out")
+        except ValueError:
+            out_code = -1
+        try:
+            in_code = c.type_names.index("Transfer In")
+        except ValueError:
+            in_code = -1
+
+        pending = {}
+        out_total = in_total = 0
+        day = self.day
+        rows = zip(c.types, c.amounts, c.days, c.seconds)
+        if numpy is not None and len(c):
+            # Only transfer rows reach the Python loop below
+            types = numpy.frombuffer(c.types, numpy.uint8)
+            selected = numpy.flatnonzero((types == out_code) | (types == in_code))
+            rows = zip(types[selected].tolist(),
+                       numpy.frombuffer(c.amounts, numpy.int64)[selected].tolist(),
+                       numpy.frombuffer(c.days, numpy.uint32)[selected].tolist(),
+                       numpy.frombuffer(c.seconds, numpy.uint32)[selected].tolist())
+        for code, cents, row_day, second in rows:
+            if code == out_code:
+                direction = 1
+            elif code == in_code:
+                direction = -1
+            else:
+                continue
+            if day is not None and row_day != day:
+                continue
+            if direction > 0:
+                out_total += cents
+            else:
+                in_total += cents
+            key = (row_day * 86400 + second, cents)
+            pending[key] = pending.get(key, 0) + direction
+
+        # Both sides share one timestamp unless the clock ticked in between
+        unmatched = {key: n for key, n in pending.items() if n}
+        for (stamp, cents), n in sorted(unmatched.items()):
+            if not unmatched.get((stamp, cents)):
+                continue
+            neighbour = (stamp + 1, cents)
+            other = unmatched.get(neighbour, 0)
+            if other and (other > 0) != (n > 0):
+                matched = min(abs(n), abs(other))
+                unmatched[(stamp, cents)] = n - matched if n > 0 else n + matched
+                unmatched[neighbour] = other - matched if other > 0 else other + matched
+
+        return {
+            "out_cents": out_total,
+            "in_cents": in_total,
+            "net_cents": in_total - out_total,
+            "unmatched": [(stamp, cents, n) for (stamp, cents), n in sorted(unmatched.items()) if n],
+        }
+
+    def summary(self):
+        """Full report as a JSON-ready dict"""
+        bank, per_account = self.type_totals()
+        breaks = self.chain_breaks()
+        closing = self.closing_mismatches()
+        transfers = self.transfer_check()
+        return {
+            "generated": time.strftime("%Y-%m-%d %H:%M:%S"),
+            "day": date.fromordinal(self.day).isoformat() if self.day else None,
+            "rows": len(self.columns),
+            "accounts": len(self.columns.accounts),
+            "totals": {name: {"count": n, "amount": from_cents(cents)}
+                       for name, (n, cents) in bank.items()},
+            "account_totals": {
+                account_number: {name: {"count": n, "amount": from_cents(cents)}
+                                 for name, (n, cents) in totals.items()}
+                for account_number, totals in per_account.items()
+            },
+            "balance_chain_breaks": {
+                "count": len(breaks),
+                "rows": [{"account": acct, "position": position,
+                          "expected": from_cents(expected), "actual": from_cents(actual)}
+                         for acct, position, expected, actual in breaks[:MAX_REPORTED]],
+            },
+            "closing_balance_mismatches": {
+                "count": len(closing),
+                "accounts": [{"account": acct, "last_balance_after": from_cents(last),
+                              "balance": from_cents(balance)}
+                             for acct, last, balance in closing[:MAX_REPORTED]],
+            },
+            "transfers": {
+                "out": from_cents(transfers["out_cents"]),
+                "in": from_cents(transfers["in_cents"]),
+                "net": from_cents(transfers["net_cents"]),
+                "unmatched_count": sum(abs(n) for _, _, n in transfers["unmatched"]),
+                "unmatched": [{"date": _stamp_text(stamp), "amount": from_cents(cents),
+                               "side": "out" if n > 0 else "in", "count": abs(n)}
+                              for stamp, cents, n in transfers["unmatched"][:MAX_REPORTED]],
+            },
+        }
+
+
+def reconcile(storage, output="reconciliation.json", day=None):
+    """
+    Reconcile a storage backend and write the summary file
+
+    Args:
+        storage: Opened storage backend with transactions loaded
+        output (str): Summary file location (None to skip writing)
+        day (str): Restrict totals to one day (YYYY-MM-DD)
+
+    Returns:
+        dict: The summary
+    """
+    columns = TransactionColumns.load(storage.scan_transactions())
+    balances = dict(storage.scan_balances())
+    summary = Reconciliation(columns, balances, day).summary()
+    if output:
+        write_snapshot(output, summary)
+    return summary
+
+
+def _stamp_text(stamp):
+    day, second = divmod(stamp, 86400)
+    return (f"{date.fromordinal(day).isoformat()} "
+            f"{second // 3600:02d}:{second // 60 % 60:02d}:{second % 60:02d}")
+
+
+def main(argv=None):
+    """Run reconciliation from the command line"""
+    from atm_storage import open_storage
+
+    parser = argparse.ArgumentParser(description="ATM end-of-day reconciliation")
+    parser.add_argument("--storage", choices=["json", "lazy", "sqlite"], default="json")
+    parser.add_argument("--db", default="atm.db", help="SQLite database file")
+    parser.add_argument("--journal", action="store_true",
+                        help="replay transactions.jsonl on top of transactions.json")
+    parser.add_argument("--date", help="only total this day (YYYY-MM-DD)")
+    parser.add_argument("--output", default="reconciliation.json", help="summary file")
+    args = parser.parse_args(argv)
+
+    if args.storage == "sqlite":
+        storage = open_storage("sqlite", path=args.db)
+    elif args.storage == "lazy":
+        storage = open_storage("lazy")
+    else:
+        storage = open_storage("json", journal_mode=args.journal)
+
+    try:
+        if storage.load_accounts() is None:
+            print("❌ No accounts found")
+            return 1
+        storage.load_transactions()
+
+        start = time.perf_counter()
+        summary = reconcile(storage, args.output, args.date)
+        elapsed = time.perf_counter() - start
+    finally:
+        storage.close()
+
+    print(f"📊 Reconciled {summary['rows']:,} transactions across "
+          f"{summary['accounts']:,} accounts in {elapsed:.2f}s")
+    for name, total in summary["totals"].items():
+        print(f"   {name:<18} {total['count']:>10,}  ${total['amount']:>16,.2f}")
+    breaks = summary["balance_chain_breaks"]["count"]
+    closing = summary["closing_balance_mismatches"]["count"]
+    unmatched = summary["transfers"]["unmatched_count"]
+    status = "✓" if not (breaks or closing or unmatched) else "✗"
+    print(f"{status} Balance chain breaks: {breaks}, closing mismatches: {closing}, "
+          f"unmatched transfers: {unmatched}, transfer net: ${summary['transfers']['net']:,.2f}")
+    print(f"✓ Summary written to {args.output}")
+    return 0 if status == "✓" else 2
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,418 @@
+"""
+ATM Read Replica
+================
+
+Read-only follower of a primary that uses JSON storage in journal mode.
+
+Balance inquiries, account information and history views far outnumber
+money movements. A follower lets other processes (or machines sharing
+the files) answer them without loading the primary:
+
+- on start it loads accounts.json, transactions.json and the journal,
+  like the primary does
+- then it tails the journal: every poll reads only the bytes appended
+  since the last one (a torn final line is left for the next poll) and
+  appends the records to its in-memory history
+- balances follow the ``balance_after`` of the newest replicated
+  transaction, so a balance always agrees with the history shown next to
+  it. accounts.json is re-read when it changes, at most every
+  ``reload_interval`` seconds, for new accounts and other fields (name,
+  PIN, lockout)
+- a compaction (new transactions.json snapshot, truncated journal) is
+  detected from the snapshot's file identity and triggers a full reload
+- the offset is only trusted for the same journal file, still at least
+  that long and still ending in the line last read there; otherwise (a
+  poll that reloaded the new snapshot before the primary truncated the
+  journal, for one) the journal is re-read from the start, skipping
+  transactions already applied
+
+Staleness bound: ``synced_at`` is the start time of the last poll that
+read the journal to its end. Everything the primary had flushed to the
+journal before that moment is visible, so answers are at most
+``staleness()`` seconds behind the primary's persisted state. Account
+fields other than the balance can lag up to ``reload_interval`` more.
+
+``ReplicaEngine`` exposes the engine's read operations on top of a
+follower, so ``ATMServer`` can serve read-only sessions from it; money
+movements and PIN changes are refused with ReadOnlyError. A replica
+cannot persist failed-login counters, so it honours the primary's
+lockouts but limits wrong PINs per session only.
+
+Usage:
+    python atm_replica.py --serve --port 8766 --max-staleness 5
+    python atm_replica.py --account 1234567890
+"""
+
+import argparse
+import json
+import os
+import threading
+import time
+
+from atm_auth import PinAuthenticator
+from atm_engine import (AccountLockedError, ATMError, InvalidPinError, Result,
+                        UnknownAccountError)
+from atm_history import TransactionHistory
+from atm_ledger import Ledger
+from atm_storage import JSONStorage
+
+
+class ReadOnlyError(ATMError):
+    """A write operation was sent to a read replica"""
+
+
+class ReplicaStaleError(ATMError):
+    """The replica is further behind the primary than allowed"""
+
+
+class Follower:
+    """
+    In-memory copy of a JSON-journal primary kept current by tailing
+
+    Features:
+    - Incremental journal tailing from a byte offset
+    - Balances consistent with replicated history
+    - Full reload on compaction
+    - Reported staleness bound
+    """
+
+    def __init__(self, accounts_file="accounts.json", transactions_file="transactions.json",
+                 journal_file="transactions.jsonl", poll_interval=0.2, reload_interval=5.0):
+        """
+        Configure the follower (call ``start`` or ``sync`` to load data)
+
+        Args:
+            accounts_file (str): Primary's account file
+            transactions_file (str): Primary's history snapshot
+            journal_file (str): Primary's transaction journal
+            poll_interval (float): Seconds between background polls
+            reload_interval (float): Minimum seconds between account file reloads
+        """
+        self.journal_file = journal_file
+        self.poll_interval = poll_interval
+        self.reload_interval = reload_interval
+        # Only the read methods of this storage are used; it opens no files
+        self.storage = JSONStorage(accounts_file, transactions_file)
+        self.history = None
+        self.synced_at = None
+        self.applied = 0
+        self.reloads = 0
+
+        self._lock = threading.Lock()
+        self._offset = 0
+        # (device, inode) of the journal the offset refers to, and the last
+        # line read before it, so a truncated or rewritten journal is noticed
+        self._journal_id = None
+        self._last_line = b""
+        self._snapshot_id = None
+        self._accounts_id = None
+        self._accounts_loaded = 0.0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        """Load the primary's state and keep following it in the background"""
+        self.sync()
+        self._thread = threading.Thread(target=self._follow, name="replica-follower", daemon=True)
+        self._thread.start()
+        return self
+
+    def close(self):
+        """Stop the background poller"""
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+            self._thread = None
+
+    def staleness(self, now=None):
+        """
+        Upper bound on how far behind the primary's journal answers are
+
+        Returns:
+            float: Seconds, or infinity before the first sync
+        """
+        if self.synced_at is None:
+            return float("inf")
+        return max(0.0, (now or time.time()) - self.synced_at)
+
+    def sync(self):
+        """
+        Catch up with the primary once
+
+        Returns:
+            int: Transactions applied
+        """
+        started = time.time()
+        with self._lock:
+            if self.synced_at is None or _file_id(self.storage.transactions_file) != self._snapshot_id:
+                applied = self._reload()
+            else:
+                applied = self._tail()
+                self._reload_accounts()
+            self.synced_at = started
+        return applied
+
+    # ------------------------------------------------------------------
+    # Internals
+
+    def _follow(self):
+        while not self._stop.wait(self.poll_interval):
+            try:
+                self.sync()
+            except (OSError, ValueError) as e:
+                print(f"✗ Error following primary: {e}")
+
+    def _reload(self):
+        """Load snapshot, journal and accounts from scratch"""
+        storage = self.storage
+        self._snapshot_id = _file_id(storage.transactions_file)
+        try:
+            with open(storage.transactions_file, 'r') as f:
+                transactions = json.load(f)
+        except FileNotFoundError:
+            transactions = {}
+        storage.transactions = transactions
+        self._offset = 0
+        self._journal_id = None
+        self._last_line = b""
+        self._accounts_id = None
+        self._reload_accounts(force=True)
+        # The snapshot may already hold records that are still in the journal
+        applied = self._tail(self._known_ids())
+        self.history = TransactionHistory(storage)
+        self.reloads += 1
+        return applied
+
+    def _reload_accounts(self, force=False):
+        """Re-read accounts.json if it changed and the reload interval has passed"""
+        storage = self.storage
+        file_id = _file_id(storage.accounts_file)
+        if file_id is None or file_id == self._accounts_id:
+            return
+        if not force and time.monotonic() - self._accounts_loaded < self.reload_interval:
+            return
+        with open(storage.accounts_file, 'r') as f:
+            accounts = Ledger.from_records(json.load(f))
+        for account_number, history in storage.transactions.items():
+            if history and account_number in accounts:
+                accounts[account_number]["balance"] = history[-1]["balance_after"]
+        storage.accounts = accounts
+        self._accounts_id = file_id
+        self._accounts_loaded = time.monotonic()
+
+    def _tail(self, known_ids=None):
+        """
+        Apply journal records appended since the last poll
+
+        Args:
+            known_ids (dict): account_number -> transaction IDs to skip
+                (only needed right after loading a snapshot)
+
+        Returns:
+            int: Transactions applied
+        """
+        try:
+            with open(self.journal_file, 'rb') as f:
+                st = os.fstat(f.fileno())
+                if self._offset and not self._same_journal(f, st):
+                    # Truncated or rewritten since the last poll: start over
+                    self._offset = 0
+                    if known_ids is None:
+                        known_ids = self._known_ids()
+                f.seek(self._offset)
+                data = f.read()
+        except FileNotFoundError:
+            return 0
+
+        end = data.rfind(b"\n") + 1
+        if end:
+            self._last_line = data[data.rfind(b"\n", 0, end - 1) + 1:end]
+        self._journal_id = (st.st_dev, st.st_ino)
+        self._offset += end
+        transactions = self.storage.transactions
+        accounts = self.storage.accounts
+        applied = 0
+        for line in data[:end].splitlines():
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            account_number = record.pop("account", None)
+            if account_number is None:
+                continue
+            if known_ids is not None:
+                ids = known_ids.setdefault(account_number, set())
+                if record.get("transaction_id") in ids:
+                    continue
+                ids.add(record.get("transaction_id"))
+            transactions.setdefault(account_number, []).append(record)
+            if accounts is not None and account_number in accounts:
+                accounts[account_number]["balance"] = record["balance_after"]
+            applied += 1
+        self.applied += applied
+        return applied
+
+    def _same_journal(self, f, st):
+        """True if the open journal still continues from the last offset read"""
+        if (st.st_dev, st.st_ino) != self._journal_id or st.st_size < self._offset:
+            return False
+        f.seek(self._offset - len(self._last_line))
+        return f.read(len(self._last_line)) == self._last_line
+
+    def _known_ids(self):
+        """account_number -> transaction IDs already in the replicated history"""
+        return {account_number: {tx.get("transaction_id") for tx in history}
+                for account_number, history in self.storage.transactions.items()}
+
+
+def _file_id(path):
+    """(inode, size, mtime) of a file, or None if it does not exist"""
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return st.st_ino, st.st_size, st.st_mtime_ns
+
+
+class ReplicaEngine:
+    """
+    Read-only ATMEngine stand-in over a Follower
+
+    Implements the calls ATMServer makes for login, balance, history and
+    account information; every write operation raises ReadOnlyError.
+    """
+
+    WRITE_OPERATIONS = ("withdraw", "deposit", "transfer", "change_pin", "check_withdrawal",
+                        "check_deposit", "check_transfer", "hold_funds", "release_hold",
+                        "settle_hold", "credit_once")
+
+    def __init__(self, follower, max_staleness=None, auth=None):
+        """
+        Args:
+            follower (Follower): Started follower
+            max_staleness (float): Refuse reads further behind than this
+                many seconds (None never refuses)
+            auth (PinAuthenticator): PIN verification; only its verify and
+                lockout checks are used
+        """
+        self.follower = follower
+        self.max_staleness = max_staleness
+        self.auth = auth or PinAuthenticator(pool="inline")
+
+    @property
+    def storage(self):
+        return self.follower.storage
+
+    @property
+    def accounts(self):
+        return self.follower.storage.accounts
+
+    @property
+    def history(self):
+        return self.follower.history
+
+    def staleness(self):
+        """Seconds the answers may be behind the primary"""
+        return self.follower.staleness()
+
+    def get_account(self, account_number):
+        """
+        Look up a replicated account record
+
+        Raises:
+            ReplicaStaleError: If the replica is too far behind
+            UnknownAccountError: If the account does not exist
+        """
+        if self.max_staleness is not None:
+            staleness = self.staleness()
+            if staleness > self.max_staleness:
+                raise ReplicaStaleError(f"Replica is {staleness:.1f}s behind the primary")
+        try:
+            return self.accounts[account_number]
+        except KeyError:
+            raise UnknownAccountError(account_number) from None
+
+    def authenticate(self, account_number, pin):
+        """
+        Verify a PIN against the replicated record
+
+        Raises:
+            UnknownAccountError, AccountLockedError, InvalidPinError
+        """
+        account = self.get_account(account_number)
+        until = self.auth.locked_until(account)
+        if until is not None:
+            raise AccountLockedError(until)
+        if not self.auth.verify(pin, account["pin"]):
+            raise InvalidPinError("Incorrect PIN")
+        return Result(account_number, balance=account["balance"])
+
+    def balance_inquiry(self, account_number):
+        return Result(account_number, balance=self.get_account(account_number)["balance"])
+
+    def logout(self, account_number):
+        return Result(account_number)
+
+    def requires_verification(self, amount):
+        return False
+
+    def close(self):
+        self.follower.close()
+        self.auth.close()
+
+    def _read_only(self, *args, **kwargs):
+        raise ReadOnlyError("This terminal is read-only; use a full-service terminal")
+
+
+for _name in ReplicaEngine.WRITE_OPERATIONS:
+    setattr(ReplicaEngine, _name, ReplicaEngine._read_only)
+del _name
+
+
+def main(argv=None):
+    from atm_server import run_server
+
+    parser = argparse.ArgumentParser(description="ATM read replica")
+    parser.add_argument("--accounts-file", default="accounts.json")
+    parser.add_argument("--transactions-file", default="transactions.json")
+    parser.add_argument("--journal-file", default="transactions.jsonl")
+    parser.add_argument("--poll-interval", type=float, default=0.2,
+                        help="seconds between journal polls (default: 0.2)")
+    parser.add_argument("--reload-interval", type=float, default=5.0,
+                        help="minimum seconds between account file reloads (default: 5)")
+    parser.add_argument("--max-staleness", type=float, default=None,
+                        help="refuse reads further behind the primary than this")
+    parser.add_argument("--serve", action="store_true", help="serve read-only sessions")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8766)
+    parser.add_argument("--account", help="print one account's balance and recent history")
+    args = parser.parse_args(argv)
+
+    follower = Follower(args.accounts_file, args.transactions_file, args.journal_file,
+                        poll_interval=args.poll_interval, reload_interval=args.reload_interval)
+    start = time.perf_counter()
+    follower.start()
+    print(f"✓ Replica loaded {len(follower.storage.accounts or ()):,} accounts in "
+          f"{time.perf_counter() - start:.2f}s")
+    engine = ReplicaEngine(follower, max_staleness=args.max_staleness)
+    try:
+        if args.serve:
+            run_server(engine, host=args.host, port=args.port)
+        elif args.account:
+            account = engine.get_account(args.account)
+            print(f"📊 {account['name']}: ${account['balance']:,.2f} "
+                  f"(at most {engine.staleness():.2f}s behind the primary)")
+            for tx in engine.storage.recent_transactions(args.account, 5):
+                print(f"   {tx['date']}  {tx['type']:<13} ${tx['amount']:>10,.2f}")
+        else:
+            print(f"✓ {follower.applied:,} journal records replicated")
+    except ATMError as e:
+        print(f"❌ {e}")
+        return 1
+    finally:
+        engine.close()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,269 @@
+"""
+ATM Session Server
+==================
+
+Asyncio TCP server that lets one process serve many ATM terminal sessions.
+
+Each connection is an independent session speaking a simple line protocol.
+Requests are one command per line; responses are one JSON object per line:
+
+    LOGIN <account> <pin>          -> {"ok": true, "name": ..., "balance": ...}
+    BALANCE                        (menu 1)
+    WITHDRAW <amount>              (menu 2)
+    DEPOSIT <amount>               (menu 3)
+    TRANSFER <recipient> <amount>  (menu 4)
+    PIN <current> <new>            (menu 5)
+    HISTORY [limit] [cursor] [type] (menu 6, newest first; "-" for no cursor,
+                                   "_" for spaces in the type, e.g. Transfer_Out)
+    INFO                           (menu 7)
+    LOGOUT                         (menu 8, closes the session)
+
+Failures answer {"ok": false, "error": "<ErrorType>", "message": "..."}.
+Served from a read replica (atm_replica), every response also carries
+"staleness": the seconds its data may lag the primary.
+
+Engine calls run in a thread pool so blocking storage I/O never stalls the
+event loop; the engine's per-account locks keep concurrent sessions from
+double-spending, and transfers lock both accounts in sorted order.
+"""
+
+import asyncio
+import inspect
+import json
+from concurrent.futures import ThreadPoolExecutor
+
+from atm_engine import ATMError, InvalidPinError
+
+
+MENU_COMMANDS = {
+    "1": "BALANCE",
+    "2": "WITHDRAW",
+    "3": "DEPOSIT",
+    "4": "TRANSFER",
+    "5": "PIN",
+    "6": "HISTORY",
+    "7": "INFO",
+    "8": "LOGOUT",
+}
+
+
+class ProtocolError(ATMError):
+    """A request line could not be understood"""
+
+
+class Session:
+    """State of one connected terminal"""
+
+    def __init__(self, peer):
+        self.peer = peer
+        self.account_number = None
+        self.failed_logins = 0
+        self.closed = False
+
+
+class ATMServer:
+    """
+    Multi-session ATM server on top of ATMEngine
+
+    Features:
+    - Hundreds of concurrent sessions in one process
+    - Same operations as the interactive ATMSystem menu
+    - Per-account locking through the engine
+    - Login attempt limit per session
+    """
+
+    def __init__(self, engine, host="127.0.0.1", port=8765, workers=32, max_login_attempts=3):
+        """
+        Configure the server
+
+        Args:
+            engine (ATMEngine): Engine shared by all sessions
+            host (str): Interface to listen on
+            port (int): TCP port to listen on (0 picks a free port)
+            workers (int): Threads available for engine calls
+            max_login_attempts (int): Failed logins before a session is closed
+        """
+        self.engine = engine
+        self.host = host
+        self.port = port
+        self.max_login_attempts = max_login_attempts
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="atm-worker")
+        self.sessions = set()
+        self.server = None
+
+    async def start(self):
+        """
+        Start listening for connections
+
+        Returns:
+            asyncio.base_events.Server: The listening server
+        """
+        self.server = await asyncio.start_server(self.handle_client, self.host, self.port)
+        self.port = self.server.sockets[0].getsockname()[1]
+        return self.server
+
+    async def serve_forever(self):
+        """Start the server and serve until cancelled"""
+        if self.server is None:
+            await self.start()
+        async with self.server:
+            await self.server.serve_forever()
+
+    async def close(self):
+        """Stop accepting connections and release the worker threads"""
+        if self.server is not None:
+            self.server.close()
+            await self.server.wait_closed()
+        self.executor.shutdown(wait=True)
+
+    async def handle_client(self, reader, writer):
+        """Serve one terminal connection until it logs out or disconnects"""
+        session = Session(writer.get_extra_info("peername"))
+        self.sessions.add(session)
+        try:
+            while not session.closed:
+                line = await reader.readline()
+                if not line:
+                    break
+                response = await self.dispatch(session, line.decode("utf-8", "replace"))
+                writer.write(json.dumps(response).encode("utf-8") + b"\n")
+                await writer.drain()
+        except (ConnectionResetError, BrokenPipeError):
+            pass
+        finally:
+            self.sessions.discard(session)
+            if session.account_number and not session.closed:
+                try:
+                    await self._call(self.engine.logout, session.account_number)
+                except Exception:
+                    pass
+            writer.close()
+
+    async def dispatch(self, session, line):
+        """
+        Execute one request line for a session
+
+        Returns:
+            dict: Response object
+        """
+        parts = line.split()
+        if not parts:
+            return {"ok": False, "error": "ProtocolError", "message": "Empty request"}
+
+        command = MENU_COMMANDS.get(parts[0], parts[0].upper())
+        args = parts[1:]
+        handler = getattr(self, f"_do_{command.lower()}", None)
+
+        try:
+            if handler is None:
+                raise ProtocolError(f"Unknown command: {parts[0]}")
+            if command != "LOGIN" and session.account_number is None:
+                raise ProtocolError("Not logged in")
+            try:
+                inspect.signature(handler).bind(session, *args)
+            except TypeError:
+                raise ProtocolError(f"Wrong number of arguments for {command}") from None
+            response = await handler(session, *args)
+        except ATMError as e:
+            return {"ok": False, "error": type(e).__name__, "message": str(e)}
+        except Exception as e:
+            return {"ok": False, "error": "ServerError", "message": str(e)}
+        # Read replicas report how far behind the primary the answer may be
+        staleness = getattr(self.engine, "staleness", None)
+        if staleness is not None:
+            response["staleness"] = round(staleness(), 3)
+        return response
+
+    async def _call(self, func, *args):
+        """Run a blocking engine call on the worker pool"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, func, *args)
+
+    async def _do_login(self, session, account_number, pin):
+        if session.account_number is not None:
+            raise ProtocolError("Already logged in")
+        try:
+            result = await self._call(self.engine.authenticate, account_number, pin)
+        except ATMError:
+            session.failed_logins += 1
+            if session.failed_logins >= self.max_login_attempts:
+                session.closed = True
+                return {"ok": False, "error": "SessionLocked",
+                        "message": f"Session closed after {self.max_login_attempts} failed attempts"}
+            raise InvalidPinError("Invalid account number or PIN") from None
+        session.account_number = account_number
+        account = self.engine.accounts[account_number]
+        return {"ok": True, "name": account["name"], "balance": result.balance}
+
+    async def _do_balance(self, session):
+        result = await self._call(self.engine.balance_inquiry, session.account_number)
+        return {"ok": True, "balance": result.balance}
+
+    async def _do_withdraw(self, session, amount):
+        result = await self._call(self.engine.withdraw, session.account_number, amount)
+        return {"ok": True, "amount": result.amount, "balance": result.balance}
+
+    async def _do_deposit(self, session, amount):
+        result = await self._call(self.engine.deposit, session.account_number, amount)
+        return {"ok": True, "amount": result.amount, "balance": result.balance,
+                "verification_required": self.engine.requires_verification(result.amount)}
+
+    async def _do_transfer(self, session, recipient_account, amount):
+        result = await self._call(self.engine.transfer, session.account_number,
+                                  recipient_account, amount)
+        return {"ok": True, "amount": result.amount, "balance": result.balance,
+                "recipient": result.recipient}
+
+    async def _do_pin(self, session, current_pin, new_pin):
+        await self._call(self.engine.change_pin, session.account_number, current_pin, new_pin)
+        return {"ok": True}
+
+    async def _do_history(self, session, limit="10", cursor=None, transaction_type=None):
+        try:
+            limit = int(limit)
+            cursor = None if cursor in (None, "-") else int(cursor)
+        except ValueError:
+            raise ProtocolError("History limit and cursor must be numbers") from None
+        types = [transaction_type.replace("_", " ")] if transaction_type else None
+        page = await self._call(lambda: self.engine.history.query(
+            session.account_number, types=types, cursor=cursor, limit=limit))
+        return {"ok": True, "transactions": page.transactions,
+                "next_cursor": page.next_cursor, "total": page.total}
+
+    async def _do_info(self, session):
+        account = self.engine.accounts[session.account_number]
+        total = await self._call(self.engine.storage.transaction_count, session.account_number)
+        return {"ok": True, "account_number": session.account_number, "name": account["name"],
+                "account_type": account["account_type"], "balance": account["balance"],
+                "created_date": account.get("created_date"), "total_transactions": total}
+
+    async def _do_logout(self, session):
+        await self._call(self.engine.logout, session.account_number)
+        session.closed = True
+        return {"ok": True}
+
+
+def run_server(engine, host="127.0.0.1", port=8765, workers=32):
+    """
+    Serve ATM sessions until interrupted
+
+    Args:
+        engine (ATMEngine): Engine shared by all sessions
+        host (str): Interface to listen on
+        port (int): TCP port to listen on
+        workers (int): Threads available for engine calls
+    """
+    server = ATMServer(engine, host=host, port=port, workers=workers)
+
+    async def serve():
+        await server.start()
+        print(f"🌐 ATM server listening on {server.host}:{server.port}")
+        try:
+            await server.serve_forever()
+        finally:
+            await server.close()
+
+    try:
+        asyncio.run(serve())
+    except KeyboardInterrupt:
+        print("\n🛑 ATM server stopped")
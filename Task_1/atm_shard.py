@@ -0,0 +1,722 @@
+"""
+ATM Account Sharding
+====================
+
+Spreads accounts over several worker processes so the ledger scales past
+one core.
+
+Accounts are assigned to a shard by a stable hash of the account number.
+Every shard is a worker process with its own ``ATMEngine`` and its own
+storage files under ``<directory>/shard-NN/``. All shards share one
+transaction ID sequence file, so IDs stay globally unique. A
+``ShardRouter`` in the serving process forwards each operation to the
+shard that owns the account. It has the same interface as ``ATMEngine``,
+so ``atm_server`` runs on top of it unchanged.
+
+Transfers between two shards use two-phase commit, with the router as
+coordinator:
+
+1. ``begin`` is written to the coordinator log (fsynced).
+2. Prepare: the sender's shard places a hold on the funds. The hold is
+   stored on the account record and counts against the balance. The
+   recipient's shard confirms the account exists.
+3. ``commit`` (or ``abort``) is written to the coordinator log. This is
+   the decision point.
+4. The sender's shard settles the hold and the recipient's shard credits
+   the account. Both steps are idempotent.
+5. ``done`` is written once both shards have acknowledged.
+
+A worker that dies is restarted from its files. On start-up the router
+replays its log: a transfer without a decision is aborted (presumed
+abort), and a decided transfer that is not done is re-sent to both shards.
+
+Usage:
+    python atm_shard.py --shards 4
+    python atm_shard.py --shards 4 --dir shards --accounts accounts.json
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import threading
+import uuid
+import zlib
+from collections.abc import Mapping
+
+from atm_engine import (ATMEngine, ATMError, InsufficientFundsError, SameAccountError,
+                        UnknownAccountError)
+from atm_ids import ID_DIGITS, ID_PREFIX, IDAllocator
+from atm_journal import TransactionJournal, read_journal, write_snapshot
+from atm_ledger import from_cents, to_cents
+from atm_storage import JSONStorage
+
+
+CONFIG_FILE = "shards.json"
+COORDINATOR_LOG = "coordinator.jsonl"
+IDS_FILE = "transaction_ids.seq"
+# Coordinator log records kept before it is truncated (when idle)
+LOG_TRUNCATE_RECORDS = 10000
+COMMIT_RETRIES = 3
+
+
+class ShardUnavailableError(ATMError):
+    """A shard worker died while handling a request"""
+
+
+ERROR_TYPES = {cls.__name__: cls for cls in ATMError.__subclasses__()}
+ERROR_TYPES[ATMError.__name__] = ATMError
+
+
+def shard_for(account_number, shards):
+    """
+    Shard that owns an account
+
+    crc32 is stable across processes and Python versions, unlike hash().
+
+    Args:
+        account_number (str): Account identifier
+        shards (int): Number of shards
+
+    Returns:
+        int: Shard index in range(shards)
+    """
+    return zlib.crc32(account_number.encode("utf-8")) % shards
+
+
+def shard_path(directory, index):
+    """Directory holding one shard's storage files"""
+    return os.path.join(directory, f"shard-{index:02d}")
+
+
+def read_config(directory):
+    """
+    Read the shard layout of a directory
+
+    Returns:
+        dict: Layout with a "shards" count, or None if not initialized
+    """
+    try:
+        with open(os.path.join(directory, CONFIG_FILE), 'r') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def create_shards(directory, shards, accounts, transactions=None):
+    """
+    Partition accounts and their history into shard directories
+
+    Args:
+        directory (str): Root directory for the shards
+        shards (int): Number of shards
+        accounts (dict): account_number -> record
+        transactions (dict): account_number -> list of transactions
+
+    Returns:
+        list: Number of accounts per shard
+    """
+    if shards < 1:
+        raise ValueError("shards must be at least 1")
+    if read_config(directory) is not None:
+        raise ValueError(f"{directory} already holds shards")
+    transactions = transactions or {}
+
+    # Continue the transaction ID sequence after the IDs already in history
+    last_id = max((_id_number(tx) for history in transactions.values() for tx in history),
+                  default=0)
+    os.makedirs(directory, exist_ok=True)
+    if last_id:
+        IDAllocator(os.path.join(directory, IDS_FILE)).reserve(last_id)
+
+    parts = [{} for _ in range(shards)]
+    for account_number, record in accounts.items():
+        parts[shard_for(account_number, shards)][account_number] = dict(record)
+
+    for index, part in enumerate(parts):
+        path = shard_path(directory, index)
+        os.makedirs(path, exist_ok=True)
+        storage = JSONStorage(accounts_file=os.path.join(path, "accounts.json"))
+        storage.create_accounts(part)
+        storage.close()
+        write_snapshot(os.path.join(path, "transactions.json"),
+                       {acct: transactions[acct] for acct in part if acct in transactions})
+
+    # Written last: a directory is only a shard set once every shard exists
+    write_snapshot(os.path.join(directory, CONFIG_FILE), {"shards": shards})
+    return [len(part) for part in parts]
+
+
+def _id_number(transaction):
+    """Numeric part of a sequence-allocated transaction ID, else 0"""
+    transaction_id = transaction.get("transaction_id") or ""
+    digits = transaction_id[len(ID_PREFIX):]
+    if (transaction_id.startswith(ID_PREFIX) and len(digits) == ID_DIGITS and
+            digits.isdigit()):
+        return int(digits)
+    return 0
+
+
+def split_storage(storage, directory, shards):
+    """
+    Partition an opened, loaded storage backend into shards
+
+    Returns:
+        list: Number of accounts per shard
+    """
+    accounts = {acct: dict(record) for acct, record in storage.accounts.items()}
+    transactions = {acct: list(storage.get_transactions(acct)) for acct in accounts}
+    return create_shards(directory, shards, accounts, transactions)
+
+
+class ShardWorker:
+    """
+    Engine of one shard, driven by requests from the router
+
+    Only the operations listed in ``OPERATIONS`` can be called remotely.
+    """
+
+    OPERATIONS = frozenset((
+        "authenticate", "balance_inquiry", "logout", "check_withdrawal",
+        "withdrawal_allowance", "withdraw", "check_deposit", "deposit",
+        "check_transfer", "check_velocity", "transfer", "verify_pin", "change_pin",
+        "hold_funds", "release_hold", "settle_hold", "credit_once",
+        "account", "account_numbers", "transaction_count", "get_transactions",
+        "recent_transactions", "history_query", "ping",
+    ))
+
+    def __init__(self, directory, index, durability="fsync", fsync=True, engine_options=None):
+        """
+        Open the storage of one shard
+
+        Args:
+            directory (str): Root directory of the shard set
+            index (int): Shard number
+            durability (str): Account persistence level (fsync, batched, async)
+            fsync (bool): fsync the transaction journal on every record
+            engine_options (dict): Extra ATMEngine keyword arguments
+        """
+        path = shard_path(directory, index)
+        self.index = index
+        self.storage = JSONStorage(accounts_file=os.path.join(path, "accounts.json"),
+                                   transactions_file=os.path.join(path, "transactions.json"),
+                                   journal_mode=True,
+                                   journal_file=os.path.join(path, "transactions.jsonl"),
+                                   fsync=fsync, durability=durability)
+        if self.storage.load_accounts() is None:
+            raise FileNotFoundError(f"No accounts in {path}")
+        self.storage.load_transactions()
+        self.engine = ATMEngine(self.storage, ids=IDAllocator(os.path.join(directory, IDS_FILE)),
+                                **(engine_options or {}))
+
+    def handle(self, method, args):
+        """
+        Run one operation
+
+        Returns:
+            object: The operation's return value (must be picklable)
+        """
+        if method not in self.OPERATIONS:
+            raise ValueError(f"Unknown shard operation: {method}")
+        local = getattr(self, f"_op_{method}", None)
+        if local is not None:
+            return local(*args)
+        return getattr(self.engine, method)(*args)
+
+    def close(self):
+        self.engine.close()
+        self.storage.close()
+
+    def _op_account(self, account_number):
+        return dict(self.engine.get_account(account_number))
+
+    def _op_account_numbers(self):
+        return list(self.engine.accounts)
+
+    def _op_transaction_count(self, account_number):
+        return self.storage.transaction_count(account_number)
+
+    def _op_get_transactions(self, account_number):
+        return list(self.storage.get_transactions(account_number))
+
+    def _op_recent_transactions(self, account_number, limit):
+        return list(self.storage.recent_transactions(account_number, limit))
+
+    def _op_history_query(self, account_number, options):
+        return self.engine.history.query(account_number, **options)
+
+    def _op_ping(self):
+        return self.index
+
+
+def serve_shard(directory, index, options, conn):
+    """
+    Worker process entry point: answer requests until told to stop
+
+    Requests are ``(method, args)`` tuples; ``None`` shuts the worker
+    down. Replies are ``("ok", value)`` or ``("error", type, message,
+    attributes)``.
+    """
+    try:
+        worker = ShardWorker(directory, index, **options)
+    except Exception as e:
+        conn.send(("error", type(e).__name__, str(e), {}))
+        return
+    conn.send(("ok", index))
+
+    try:
+        while True:
+            try:
+                request = conn.recv()
+            except EOFError:
+                break
+            if request is None:
+                break
+            method, args = request
+            try:
+                reply = ("ok", worker.handle(method, args))
+            except ATMError as e:
+                reply = ("error", type(e).__name__, str(e), dict(vars(e)))
+            except Exception as e:
+                reply = ("error", "ServerError", f"{type(e).__name__}: {e}", {})
+            conn.send(reply)
+    finally:
+        worker.close()
+
+
+class Shard:
+    """Router-side handle of one worker process"""
+
+    def __init__(self, index):
+        self.index = index
+        self.process = None
+        self.conn = None
+        self.lock = threading.Lock()
+
+
+class ShardRouter:
+    """
+    Engine-compatible front end over a set of shard workers
+
+    Features:
+    - Routes every operation to the shard owning the account
+    - Two-phase commit for transfers between shards
+    - Restarts crashed workers and resolves in-doubt transfers
+    """
+
+    def __init__(self, directory="shards", durability="fsync", fsync=True,
+                 large_deposit_threshold=10000, **engine_options):
+        """
+        Configure a router over an initialized shard directory
+
+        Args:
+            directory (str): Root directory created by ``create_shards``
+            durability (str): Account persistence level of the workers
+            fsync (bool): fsync worker journals and the coordinator log
+            large_deposit_threshold (float): Deposits above this need verification
+            **engine_options: Extra ATMEngine keyword arguments for the workers
+                (daily_withdrawal_limit, withdrawal_limits, rolling_limit)
+        """
+        config = read_config(directory)
+        if config is None:
+            raise FileNotFoundError(f"{directory} holds no shards; run atm_shard.py first")
+        self.directory = directory
+        self.location = directory
+        self.large_deposit_threshold = large_deposit_threshold
+        self.worker_options = {
+            "durability": durability,
+            "fsync": fsync,
+            "engine_options": dict(engine_options,
+                                   large_deposit_threshold=large_deposit_threshold),
+        }
+        self.shards = [Shard(index) for index in range(config["shards"])]
+        self.accounts = ShardAccounts(self)
+        self.history = ShardHistory(self)
+        self.storage = ShardStorage(self)
+        self.restarts = 0
+        self._fsync = fsync
+        self._log = None
+        self._log_lock = threading.Lock()
+        self._log_records = 0
+        self._in_flight = 0
+
+    # ------------------------------------------------------------------
+    # Lifecycle
+
+    def start(self):
+        """
+        Start every worker and finish transfers left in doubt
+
+        Returns:
+            ShardRouter: self, for chaining
+        """
+        for shard in self.shards:
+            self._spawn(shard)
+        self.recover()
+        return self
+
+    def close(self):
+        """Stop the workers and close the coordinator log"""
+        for shard in self.shards:
+            with shard.lock:
+                if shard.process is None:
+                    continue
+                try:
+                    shard.conn.send(None)
+                except OSError:
+                    pass
+                shard.process.join(timeout=10)
+                if shard.process.is_alive():
+                    shard.process.terminate()
+                shard.conn.close()
+                shard.process = None
+        if self._log:
+            self._log.close()
+            self._log = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def shard_of(self, account_number):
+        """Shard index owning an account"""
+        return shard_for(account_number, len(self.shards))
+
+    # ------------------------------------------------------------------
+    # Engine interface
+
+    def call(self, account_number, method, *args):
+        """Run an engine operation on the shard owning ``account_number``"""
+        return self._call(self.shards[self.shard_of(account_number)], method,
+                          account_number, *args)
+
+    def get_account(self, account_number):
+        return self.call(account_number, "account")
+
+    def authenticate(self, account_number, pin):
+        return self.call(account_number, "authenticate", pin)
+
+    def balance_inquiry(self, account_number):
+        return self.call(account_number, "balance_inquiry")
+
+    def logout(self, account_number):
+        return self.call(account_number, "logout")
+
+    def check_withdrawal(self, account_number, amount, record_failure=True):
+        return self.call(account_number, "check_withdrawal", amount, record_failure)
+
+    def withdrawal_allowance(self, account_number):
+        return self.call(account_number, "withdrawal_allowance")
+
+    def withdraw(self, account_number, amount):
+        return self.call(account_number, "withdraw", amount)
+
+    def check_deposit(self, account_number, amount):
+        return self.call(account_number, "check_deposit", amount)
+
+    def requires_verification(self, amount):
+        """True if a deposit is large enough to need extra verification"""
+        return amount > self.large_deposit_threshold
+
+    def deposit(self, account_number, amount):
+        return self.call(account_number, "deposit", amount)
+
+    def verify_pin(self, account_number, pin):
+        return self.call(account_number, "verify_pin", pin)
+
+    def change_pin(self, account_number, current_pin, new_pin):
+        return self.call(account_number, "change_pin", current_pin, new_pin)
+
+    check_new_pin = ATMEngine.check_new_pin
+    validate_amount = staticmethod(ATMEngine.validate_amount)
+
+    def check_transfer(self, account_number, recipient_account, amount):
+        """
+        Validate a transfer without changing any balance
+
+        Returns:
+            float: The validated amount
+        """
+        if recipient_account == account_number:
+            raise SameAccountError("Cannot transfer to the same account")
+        source, target = self.shard_of(account_number), self.shard_of(recipient_account)
+        if source == target:
+            return self.call(account_number, "check_transfer", recipient_account, amount)
+        self.get_account(recipient_account)
+        amount = self.validate_amount(amount)
+        account = self.get_account(account_number)
+        if to_cents(amount) > ATMEngine.available_cents(account):
+            raise InsufficientFundsError(account["balance"], amount)
+        self.call(account_number, "check_velocity", "transfer_out", amount)
+        self.call(recipient_account, "check_velocity", "transfer_in", amount)
+        return amount
+
+    def transfer(self, account_number, recipient_account, amount):
+        """
+        Move money between two accounts, on the same shard or not
+
+        Returns:
+            Result: Transfer outcome with the sender's new balance
+        """
+        if recipient_account == account_number:
+            raise SameAccountError("Cannot transfer to the same account")
+        source, target = self.shard_of(account_number), self.shard_of(recipient_account)
+        if source == target:
+            return self.call(account_number, "transfer", recipient_account, amount)
+        return self._transfer_across(account_number, recipient_account,
+                                     self.validate_amount(amount))
+
+    # ------------------------------------------------------------------
+    # Two-phase commit
+
+    def _transfer_across(self, account_number, recipient_account, amount):
+        txid = uuid.uuid4().hex
+        record = {"txid": txid, "to": recipient_account, "cents": to_cents(amount)}
+        self._write_log(account_number, record, "begin")
+
+        try:
+            held = self.call(account_number, "hold_funds", txid, amount)
+            # The recipient's shard votes too: it must exist and accept the credit
+            self.get_account(recipient_account)
+            self.call(recipient_account, "check_velocity", "transfer_in", amount)
+        except Exception:
+            self._write_log(account_number, record, "abort")
+            self._finish(account_number, record, commit=False)
+            raise
+
+        self._write_log(account_number, record, "commit")
+        result = self._finish(account_number, record, commit=True)
+        if result is None:
+            # Settled by an earlier attempt; report the current balance
+            result = held
+            result.balance = self.get_account(account_number)["balance"]
+        result.recipient = recipient_account
+        return result
+
+    def _finish(self, account_number, record, commit):
+        """
+        Carry out a logged decision on both shards and mark it done
+
+        Returns:
+            Result: The sender's settlement on commit (None if it had
+                already been applied, or on abort)
+        """
+        txid, recipient_account = record["txid"], record["to"]
+        if commit:
+            sender = self._retry(account_number, "account")
+            recipient = self._retry(recipient_account, "account")
+            result = self._retry(account_number, "settle_hold", txid, "Transfer Out",
+                                 f"Transfer to {recipient['name']}")
+            self._retry(recipient_account, "credit_once", txid, from_cents(record["cents"]),
+                        "Transfer In", f"Transfer from {sender['name']}")
+        else:
+            self._retry(account_number, "release_hold", txid)
+            result = None
+        self._write_log(account_number, record, "done")
+        return result
+
+    def recover(self):
+        """
+        Resolve transfers the coordinator log left unfinished
+
+        Returns:
+            dict: Number of transfers committed and aborted
+        """
+        path = os.path.join(self.directory, COORDINATOR_LOG)
+        pending = {}
+        for entry in read_journal(path):
+            account_number = entry.pop("account")
+            state = entry.pop("state")
+            if state == "done":
+                pending.pop(entry["txid"], None)
+            else:
+                pending[entry["txid"]] = (account_number, entry, state)
+
+        resolved = {"committed": 0, "aborted": 0}
+        for account_number, record, state in pending.values():
+            if state == "begin":
+                self._write_log(account_number, record, "abort")
+            commit = state == "commit"
+            self._finish(account_number, record, commit=commit)
+            resolved["committed" if commit else "aborted"] += 1
+
+        with self._log_lock:
+            self._open_log().truncate()
+            self._log_records = 0
+            self._in_flight = 0
+        return resolved
+
+    def _write_log(self, account_number, record, state):
+        with self._log_lock:
+            log = self._open_log()
+            log.append(account_number, dict(record, state=state))
+            self._log_records += 1
+            if state == "begin":
+                self._in_flight += 1
+            elif state == "done":
+                self._in_flight -= 1
+                if self._in_flight == 0 and self._log_records >= LOG_TRUNCATE_RECORDS:
+                    log.truncate()
+                    self._log_records = 0
+
+    def _open_log(self):
+        if self._log is None:
+            self._log = TransactionJournal(os.path.join(self.directory, COORDINATOR_LOG),
+                                           fsync=self._fsync)
+        return self._log
+
+    # ------------------------------------------------------------------
+    # Transport
+
+    def _retry(self, account_number, method, *args):
+        """Call an idempotent operation, retrying across worker restarts"""
+        for attempt in range(COMMIT_RETRIES):
+            try:
+                return self.call(account_number, method, *args)
+            except ShardUnavailableError:
+                if attempt == COMMIT_RETRIES - 1:
+                    raise
+
+    def _call(self, shard, method, *args):
+        """
+        Send one request to a worker and wait for its reply
+
+        Raises:
+            ATMError: Re-raised from the worker with its original type
+            ShardUnavailableError: If the worker died (it is restarted)
+        """
+        with shard.lock:
+            try:
+                shard.conn.send((method, args))
+                reply = shard.conn.recv()
+            except (EOFError, OSError):
+                self._respawn(shard)
+                raise ShardUnavailableError(
+                    f"Shard {shard.index} restarted; the outcome of {method} is unknown") from None
+        if reply[0] == "ok":
+            return reply[1]
+        raise _rebuild_error(*reply[1:])
+
+    def _spawn(self, shard):
+        # Spawned rather than forked: the router is multi-threaded
+        context = multiprocessing.get_context("spawn")
+        conn, child = context.Pipe()
+        process = context.Process(target=serve_shard, daemon=True,
+                          args=(self.directory, shard.index, self.worker_options, child))
+        process.start()
+        child.close()
+        try:
+            reply = conn.recv()
+        except EOFError:
+            reply = ("error", "ServerError", f"Shard {shard.index} exited during start-up", {})
+        if reply[0] != "ok":
+            process.join()
+            raise RuntimeError(f"Shard {shard.index} failed to start: {reply[2]}")
+        shard.process, shard.conn = process, conn
+
+    def _respawn(self, shard):
+        """Replace a dead worker (caller holds ``shard.lock``)"""
+        try:
+            shard.conn.close()
+        except OSError:
+            pass
+        shard.process.join(timeout=1)
+        if shard.process.is_alive():
+            shard.process.kill()
+            shard.process.join()
+        self.restarts += 1
+        self._spawn(shard)
+
+
+def _rebuild_error(name, message, attributes):
+    """Recreate an exception raised in a worker, keeping its type"""
+    cls = ERROR_TYPES.get(name)
+    if cls is None:
+        return RuntimeError(message)
+    error = cls.__new__(cls)
+    Exception.__init__(error, message)
+    error.__dict__.update(attributes)
+    return error
+
+
+class ShardAccounts(Mapping):
+    """Read-only account_number -> record view across all shards"""
+
+    def __init__(self, router):
+        self._router = router
+
+    def __getitem__(self, account_number):
+        try:
+            return self._router.get_account(account_number)
+        except UnknownAccountError:
+            raise KeyError(account_number) from None
+
+    def __iter__(self):
+        for shard in self._router.shards:
+            yield from self._router._call(shard, "account_numbers")
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+
+class ShardHistory:
+    """``TransactionHistory.query`` routed to the owning shard"""
+
+    def __init__(self, router):
+        self._router = router
+
+    def query(self, account_number, **options):
+        return self._router.call(account_number, "history_query", options)
+
+
+class ShardStorage:
+    """Read-only storage calls routed to the owning shard"""
+
+    def __init__(self, router):
+        self._router = router
+        self.location = router.directory
+
+    def transaction_count(self, account_number):
+        return self._router.call(account_number, "transaction_count")
+
+    def get_transactions(self, account_number):
+        return self._router.call(account_number, "get_transactions")
+
+    def recent_transactions(self, account_number, limit):
+        return self._router.call(account_number, "recent_transactions", limit)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Split ATM accounts into shards")
+    parser.add_argument("--shards", type=int, required=True, help="number of shards")
+    parser.add_argument("--dir", default="shards", help="shard directory (default: shards)")
+    parser.add_argument("--accounts", default="accounts.json", help="accounts file to split")
+    parser.add_argument("--transactions", default="transactions.json",
+                        help="transaction history to split")
+    parser.add_argument("--journal-file", default=None,
+                        help="transaction journal to replay before splitting")
+    args = parser.parse_args(argv)
+
+    storage = JSONStorage(accounts_file=args.accounts, transactions_file=args.transactions,
+                          journal_mode=args.journal_file is not None,
+                          journal_file=args.journal_file or "transactions.jsonl")
+    if storage.load_accounts() is None:
+        print(f"❌ No accounts found in {args.accounts}")
+        return 1
+    storage.load_transactions()
+    try:
+        counts = split_storage(storage, args.dir, args.shards)
+    except ValueError as e:
+        print(f"❌ {e}")
+        return 1
+    finally:
+        storage.close()
+    for index, count in enumerate(counts):
+        print(f"✓ {shard_path(args.dir, index)}: {count:,} accounts")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,278 @@
+"""
+Binary Account Snapshots
+========================
+
+Compact binary file format for the account ledger.
+
+accounts.json has to be parsed record by record on startup and
+re-encoded on every commit. A snapshot instead stores the Ledger's own
+fixed-width columns, so loading is a single read plus one
+``array.frombytes`` per column and saving is one write of the same
+buffers:
+
+    header     magic, format version, byte order, account count,
+               section count, CRC-32 of everything after the header
+    sections   table of (name, length), then the sections themselves:
+
+    balances   int64 cents per slot
+    types      uint8 type code per slot; ``typenames`` is the type table
+    <col>.off  uint32 offset per slot into ``<col>.dat``, the string table
+    <col>.len  uint16 length per slot (0xFFFF for a missing value)
+               for col = pin, name, date (created_date)
+    keys       sorted int64 account numbers, ``keyslots`` their slots;
+               non-numeric account numbers are in ``otherkey`` (JSON)
+    extras     JSON object slot -> fields outside the columns (holds,
+               withdrawal accumulators, velocity wheels, lockouts)
+
+Readers reject unknown major versions and a bad checksum, and ignore
+sections they do not know, so new sections can be added without breaking
+older files. JSON stays the interchange format: ``import`` and ``export``
+convert between accounts.json and a snapshot.
+
+Usage:
+    python atm_snapshot.py import accounts.json accounts.snap
+    python atm_snapshot.py export accounts.snap accounts.json
+    python atm_snapshot.py verify accounts.snap
+"""
+
+import argparse
+import json
+import os
+import struct
+import sys
+import time
+import zlib
+from array import array
+
+from atm_account_store import AccountStore, _fsync_directory
+from atm_journal import write_snapshot
+from atm_ledger import Ledger, STRING_COLUMNS, _StringColumn
+from atm_metrics import METRICS, acquire, fsync
+
+
+MAGIC = b"ATMSNAP\0"
+FORMAT_VERSION = 1
+
+HEADER = struct.Struct("<8sHBxIII")
+SECTION = struct.Struct("<16sQ")
+
+# Section name prefix of each string column
+COLUMN_PREFIXES = {"pin": "pin", "name": "name", "created_date": "date"}
+
+
+class SnapshotError(ValueError):
+    """A snapshot file is damaged or has an unsupported format"""
+
+
+def encode_ledger(ledger):
+    """
+    Serialize a ledger to snapshot bytes
+
+    Args:
+        ledger (Ledger): Accounts to write (a plain mapping is converted)
+
+    Returns:
+        bytes: Complete snapshot file contents
+    """
+    if not isinstance(ledger, Ledger):
+        ledger = Ledger.from_records(ledger)
+    sections = [
+        ("balances", ledger.balances.tobytes()),
+        ("types", ledger._types.tobytes()),
+        ("typenames", json.dumps(ledger._type_names).encode("utf-8")),
+    ]
+    for column in STRING_COLUMNS:
+        offsets, lengths, data = ledger._strings[column].packed()
+        prefix = COLUMN_PREFIXES[column]
+        sections += [(f"{prefix}.off", offsets.tobytes()),
+                     (f"{prefix}.len", lengths.tobytes()),
+                     (f"{prefix}.dat", bytes(data))]
+    sections += [
+        ("keys", ledger._keys.tobytes()),
+        ("keyslots", ledger._key_slots.tobytes()),
+        ("otherkey", json.dumps(ledger._other_keys).encode("utf-8")),
+        ("extras", json.dumps(ledger._extras, separators=(",", ":")).encode("utf-8")),
+    ]
+
+    table = b"".join(SECTION.pack(name.encode("ascii"), len(data)) for name, data in sections)
+    body = [table] + [data for _, data in sections]
+    crc = 0
+    for part in body:
+        crc = zlib.crc32(part, crc)
+    header = HEADER.pack(MAGIC, FORMAT_VERSION, sys.byteorder == "little",
+                         len(ledger.balances), len(sections), crc)
+    return b"".join([header] + body)
+
+
+def decode_ledger(data):
+    """
+    Rebuild a ledger from snapshot bytes
+
+    Args:
+        data (bytes): Complete snapshot file contents
+
+    Returns:
+        Ledger: The stored accounts
+
+    Raises:
+        SnapshotError: If the data is not a valid snapshot
+    """
+    if len(data) < HEADER.size:
+        raise SnapshotError("Snapshot is truncated")
+    magic, version, little, count, section_count, crc = HEADER.unpack_from(data)
+    if magic != MAGIC:
+        raise SnapshotError("Not an account snapshot")
+    if version != FORMAT_VERSION:
+        raise SnapshotError(f"Unsupported snapshot version {version}")
+    view = memoryview(data)
+    if zlib.crc32(view[HEADER.size:]) != crc:
+        raise SnapshotError("Snapshot checksum mismatch")
+
+    sections = {}
+    position = HEADER.size + section_count * SECTION.size
+    for i in range(section_count):
+        name, length = SECTION.unpack_from(data, HEADER.size + i * SECTION.size)
+        sections[name.rstrip(b"\0").decode("ascii")] = view[position:position + length]
+        position += length
+    if position != len(data):
+        raise SnapshotError("Snapshot is truncated")
+    swap = bool(little) != (sys.byteorder == "little")
+
+    def column(name, typecode):
+        values = array(typecode)
+        try:
+            values.frombytes(sections[name])
+        except KeyError:
+            raise SnapshotError(f"Snapshot has no {name} section") from None
+        if swap:
+            values.byteswap()
+        return values
+
+    def document(name):
+        try:
+            return json.loads(bytes(sections[name]))
+        except KeyError:
+            raise SnapshotError(f"Snapshot has no {name} section") from None
+
+    ledger = Ledger()
+    ledger.balances = column("balances", 'q')
+    ledger._types = column("types", 'B')
+    ledger._type_names = document("typenames")
+    for name in STRING_COLUMNS:
+        prefix = COLUMN_PREFIXES[name]
+        ledger._strings[name] = _StringColumn.from_buffers(
+            column(f"{prefix}.off", 'I'), column(f"{prefix}.len", 'H'),
+            bytearray(sections[f"{prefix}.dat"]))
+    ledger._keys = column("keys", 'q')
+    ledger._key_slots = column("keyslots", 'I')
+    ledger._other_keys = document("otherkey")
+    ledger._extras = {int(slot): fields for slot, fields in document("extras").items()}
+
+    if any(len(values) != count for values in
+           [ledger.balances, ledger._types] +
+           [c.offsets for c in ledger._strings.values()] +
+           [c.lengths for c in ledger._strings.values()]):
+        raise SnapshotError("Snapshot columns do not match the account count")
+    if len(ledger._keys) + len(ledger._other_keys) != count:
+        raise SnapshotError("Snapshot index does not match the account count")
+    return ledger
+
+
+def read_snapshot(path):
+    """Load a ledger from a snapshot file with a single read"""
+    with open(path, 'rb') as f:
+        return decode_ledger(f.read())
+
+
+def write_ledger(path, ledger):
+    """
+    Write a snapshot atomically (temp file, fsync, rename)
+
+    Args:
+        path (str): Snapshot file
+        ledger (Ledger): Accounts to write
+    """
+    _write_atomic(path, encode_ledger(ledger))
+
+
+def _write_atomic(path, data):
+    temp_path = f"{path}.tmp"
+    with open(temp_path, 'wb') as f:
+        f.write(data)
+        f.flush()
+        fsync(f.fileno(), "accounts")
+    METRICS.inc("atm_bytes_written_total", len(data), file="accounts")
+    os.replace(temp_path, path)
+    _fsync_directory(path)
+
+
+class SnapshotStore(AccountStore):
+    """
+    AccountStore that commits the whole ledger as a binary snapshot
+
+    Durability levels, batching and the write-behind thread are those of
+    AccountStore; only the file format differs. A commit costs one copy
+    of the ledger's columns instead of encoding the dirty records.
+    """
+
+    def commit(self):
+        """
+        Write the snapshot if any account changed
+
+        Returns:
+            bool: True if a file was written, False if nothing was dirty
+        """
+        acquire(self._commit_lock, "account_store")
+        try:
+            with self._lock:
+                if not self._dirty and os.path.exists(self.path):
+                    return False
+                self._dirty.clear()
+                self._pending = 0
+                self._first_pending = None
+                data = encode_ledger(self.accounts)
+            _write_atomic(self.path, data)
+            self.commits += 1
+        finally:
+            self._commit_lock.release()
+        return True
+
+
+def main(argv=None):
+    """Convert and check snapshots from the command line"""
+    parser = argparse.ArgumentParser(description="ATM binary account snapshots")
+    commands = parser.add_subparsers(dest="command", required=True)
+    convert = commands.add_parser("import", help="convert accounts.json to a snapshot")
+    convert.add_argument("source", nargs="?", default="accounts.json")
+    convert.add_argument("target", nargs="?", default="accounts.snap")
+    export = commands.add_parser("export", help="convert a snapshot to accounts.json")
+    export.add_argument("source", nargs="?", default="accounts.snap")
+    export.add_argument("target", nargs="?", default="accounts.json")
+    verify = commands.add_parser("verify", help="check a snapshot's checksum and structure")
+    verify.add_argument("source", nargs="?", default="accounts.snap")
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    try:
+        if args.command == "import":
+            with open(args.source, 'r', encoding='utf-8') as f:
+                ledger = Ledger.from_records(json.load(f))
+            write_ledger(args.target, ledger)
+        else:
+            ledger = read_snapshot(args.source)
+            if args.command == "export":
+                write_snapshot(args.target, ledger.to_dict())
+    except (OSError, ValueError) as e:
+        print(f"❌ {e}")
+        return 1
+    elapsed = time.perf_counter() - start
+    if args.command == "verify":
+        print(f"✓ {args.source}: {len(ledger):,} accounts, "
+              f"${ledger.total_cents() / 100:,.2f} total, checksum OK")
+    else:
+        print(f"✓ {len(ledger):,} accounts written to {args.target} in {elapsed:.2f}s")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,324 @@
+"""
+Statement Export
+================
+
+Streams account statements for a date range to CSV or JSON Lines.
+
+A statement is a generator pipeline over the storage backend:
+
+- the first position in the range is found by bisecting the history on
+  its dates (history is appended in time order), reading one record per
+  step, so earlier history is never read
+- records are then fetched ``chunk`` positions at a time with
+  ``transactions_at`` and written as they arrive; reading stops at the
+  first record past the end of the range
+- per-type subtotals are kept in cents while streaming
+
+Memory per statement is one chunk of records plus one subtotal per
+transaction type, however long the history is.
+
+Every statement has the same row kinds, in this order:
+
+    opening      balance before the first record in the range
+    transaction  one per record in the range
+    subtotal     count and amount per transaction type
+    closing      balance after the last record, with credit/debit totals
+
+All accounts can be exported at once, one file per account, by a pool of
+threads sharing the storage or by processes that each open their own.
+
+Usage:
+    python atm_statement.py 1234567890 --from 2025-06-01 --to 2025-06-30
+    python atm_statement.py 1234567890 --format jsonl --output statement.jsonl
+    python atm_statement.py --all --output-dir statements --processes 4
+"""
+
+import argparse
+import csv
+import json
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import datetime
+
+from atm_ledger import from_cents, to_cents
+from atm_reconcile import TYPE_SIGNS
+
+
+FORMATS = ("csv", "jsonl")
+
+FIELDS = ("record", "account", "transaction_id", "date", "type", "amount",
+          "description", "balance_after", "count", "balance", "credits", "debits")
+
+DEFAULT_CHUNK = 500
+
+
+def statement_rows(storage, account_number, start=None, end=None, chunk=DEFAULT_CHUNK):
+    """
+    Stream one account's statement rows
+
+    Args:
+        storage: Storage backend
+        account_number (str): Account to export
+        start (str): First day (YYYY-MM-DD), None for the whole history
+        end (str): Last day (YYYY-MM-DD), inclusive, None for up to now
+        chunk (int): Records read from storage per call
+
+    Yields:
+        dict: Rows with the keys in FIELDS that apply to their kind
+    """
+    count = storage.transaction_count(account_number)
+    position = _first_position(storage, account_number, count, start) if start else 0
+
+    if position > 0:
+        opening = _at(storage, account_number, position)["balance_after"]
+    elif count:
+        first = _at(storage, account_number, 1)
+        opening = from_cents(to_cents(first["balance_after"]) -
+                             TYPE_SIGNS.get(first["type"], 0) * to_cents(first["amount"]))
+    else:
+        opening = storage.accounts[account_number]["balance"]
+    yield {"record": "opening", "account": account_number, "date": start, "balance": opening}
+
+    balance = opening
+    subtotals = {}
+    credits = debits = 0
+    while position < count:
+        records = storage.transactions_at(account_number,
+                                          range(position, min(position + chunk, count)))
+        position += len(records)
+        for tx in records:
+            if end and tx["date"][:10] > end:
+                position = count
+                break
+            cents = to_cents(tx["amount"])
+            sign = TYPE_SIGNS.get(tx["type"], 0)
+            if sign > 0:
+                credits += cents
+            elif sign < 0:
+                debits += cents
+            subtotal = subtotals.setdefault(tx["type"], [0, 0])
+            subtotal[0] += 1
+            subtotal[1] += cents
+            balance = tx["balance_after"]
+            yield {"record": "transaction", "account": account_number,
+                   "transaction_id": tx.get("transaction_id"), "date": tx["date"],
+                   "type": tx["type"], "amount": tx["amount"],
+                   "description": tx.get("description", ""), "balance_after": balance}
+
+    for transaction_type in sorted(subtotals):
+        number, cents = subtotals[transaction_type]
+        yield {"record": "subtotal", "account": account_number, "type": transaction_type,
+               "count": number, "amount": from_cents(cents)}
+    yield {"record": "closing", "account": account_number, "date": end, "balance": balance,
+           "credits": from_cents(credits), "debits": from_cents(debits)}
+
+
+def _at(storage, account_number, number):
+    """The ``number``-th record (1-based) of an account's history"""
+    return storage.transactions_at(account_number, [number - 1])[0]
+
+
+def _first_position(storage, account_number, count, start):
+    """Position of the first record dated on or after ``start``"""
+    lo, hi = 0, count
+    while lo < hi:
+        mid = (lo + hi) // 2
+        if _at(storage, account_number, mid + 1)["date"][:10] < start:
+            lo = mid + 1
+        else:
+            hi = mid
+    return lo
+
+
+def write_statement(rows, f, fmt="csv"):
+    """
+    Write statement rows to an open text file
+
+    Args:
+        rows (iterable): Rows from ``statement_rows``
+        f: Text file opened with newline=""
+        fmt (str): "csv" or "jsonl"
+
+    Returns:
+        dict: The closing row
+    """
+    last = None
+    if fmt == "csv":
+        writer = csv.DictWriter(f, FIELDS)
+        writer.writeheader()
+        for last in rows:
+            writer.writerow(last)
+    elif fmt == "jsonl":
+        encode = json.JSONEncoder(separators=(",", ":")).encode
+        for last in rows:
+            f.write(encode({key: value for key, value in last.items() if value is not None}))
+            f.write("\n")
+    else:
+        raise ValueError(f"Unknown statement format: {fmt}")
+    return last
+
+
+def export_statement(storage, account_number, path, fmt="csv", start=None, end=None,
+                     chunk=DEFAULT_CHUNK):
+    """
+    Export one account's statement to a file
+
+    Returns:
+        dict: The closing row
+    """
+    with open(path, 'w', encoding='utf-8', newline='') as f:
+        return write_statement(statement_rows(storage, account_number, start, end, chunk), f, fmt)
+
+
+def export_all(storage, directory, fmt="csv", start=None, end=None, workers=4,
+               chunk=DEFAULT_CHUNK, part=0, parts=1):
+    """
+    Export every account's statement to ``directory/<account>.<fmt>``
+
+    Accounts are streamed from ``scan_balances`` and at most ``2 x workers``
+    exports are in flight, so the account list is never materialized.
+
+    Args:
+        storage: Storage backend
+        directory (str): Output directory
+        fmt (str): "csv" or "jsonl"
+        start, end (str): Date range, as for ``statement_rows``
+        workers (int): Export threads
+        chunk (int): Records read from storage per call
+        part, parts (int): Only export accounts whose position modulo
+            ``parts`` is ``part`` (used to split work between processes)
+
+    Returns:
+        int: Statements written
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown statement format: {fmt}")
+    os.makedirs(directory, exist_ok=True)
+    written = 0
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        pending = deque()
+        for i, (account_number, _) in enumerate(storage.scan_balances()):
+            if i % parts != part:
+                continue
+            path = os.path.join(directory, f"{account_number}.{fmt}")
+            pending.append(executor.submit(export_statement, storage, account_number, path,
+                                           fmt, start, end, chunk))
+            if len(pending) >= 2 * workers:
+                pending.popleft().result()
+                written += 1
+        for future in pending:
+            future.result()
+            written += 1
+    return written
+
+
+def export_all_processes(backend, options, directory, fmt="csv", start=None, end=None,
+                         processes=4, workers=1, chunk=DEFAULT_CHUNK):
+    """
+    Export every account's statement from several processes
+
+    Each process opens its own storage with ``open_storage(backend,
+    **options)`` and exports one slice of the accounts, so JSON backends
+    are not limited to one core.
+
+    Returns:
+        int: Statements written
+    """
+    if backend == "lazy":
+        # Build the shared indexes once instead of racing to build them in every part
+        from atm_lazy import prepare
+        prepare(**options)
+    with ProcessPoolExecutor(max_workers=processes) as executor:
+        futures = [executor.submit(_export_part, backend, options, directory, fmt, start, end,
+                                   workers, chunk, part, processes)
+                   for part in range(processes)]
+        return sum(future.result() for future in futures)
+
+
+def _export_part(backend, options, directory, fmt, start, end, workers, chunk, part, parts):
+    from atm_storage import open_storage
+
+    storage = open_storage(backend, **options)
+    try:
+        storage.load_accounts()
+        storage.load_transactions()
+        # Nothing is written back: concurrent parts would race on accounts.json
+        if getattr(storage, "account_store", None) is not None:
+            storage.account_store = None
+        return export_all(storage, directory, fmt, start, end, workers, chunk, part, parts)
+    finally:
+        storage.close()
+
+
+def _day(value):
+    """Validate a YYYY-MM-DD argument"""
+    datetime.strptime(value, "%Y-%m-%d")
+    return value
+
+
+def main(argv=None):
+    """Export statements from the command line"""
+    from atm_storage import open_storage
+
+    parser = argparse.ArgumentParser(description="ATM statement export")
+    parser.add_argument("account", nargs="?", help="account to export")
+    parser.add_argument("--all", action="store_true", help="export every account")
+    parser.add_argument("--from", dest="start", type=_day, help="first day (YYYY-MM-DD)")
+    parser.add_argument("--to", dest="end", type=_day, help="last day (YYYY-MM-DD)")
+    parser.add_argument("--format", choices=FORMATS, default="csv")
+    parser.add_argument("--output", help="statement file (default: <account>.<format>)")
+    parser.add_argument("--output-dir", default="statements", help="directory for --all")
+    parser.add_argument("--workers", type=int, default=4, help="export threads per process")
+    parser.add_argument("--processes", type=int, default=1, help="export processes for --all")
+    parser.add_argument("--storage", choices=["json", "lazy", "sqlite"], default="json")
+    parser.add_argument("--db", default="atm.db", help="SQLite database file")
+    parser.add_argument("--journal", action="store_true",
+                        help="replay transactions.jsonl on top of transactions.json")
+    args = parser.parse_args(argv)
+    if not args.all and not args.account:
+        parser.error("give an account number or --all")
+
+    if args.storage == "sqlite":
+        options = {"path": args.db}
+    elif args.storage == "lazy":
+        options = {}
+    else:
+        options = {"journal_mode": args.journal}
+
+    start = time.perf_counter()
+    if args.all and args.processes > 1:
+        written = export_all_processes(args.storage, options, args.output_dir, args.format,
+                                       args.start, args.end, args.processes, args.workers)
+        print(f"✓ {written:,} statements written to {args.output_dir} "
+              f"in {time.perf_counter() - start:.2f}s")
+        return 0
+
+    storage = open_storage(args.storage, **options)
+    try:
+        if storage.load_accounts() is None:
+            print("❌ No accounts found")
+            return 1
+        storage.load_transactions()
+        if args.all:
+            written = export_all(storage, args.output_dir, args.format, args.start, args.end,
+                                 args.workers)
+            print(f"✓ {written:,} statements written to {args.output_dir} "
+                  f"in {time.perf_counter() - start:.2f}s")
+            return 0
+        if args.account not in storage.accounts:
+            print(f"❌ Account {args.account} not found")
+            return 1
+        path = args.output or f"{args.account}.{args.format}"
+        closing = export_statement(storage, args.account, path, args.format,
+                                   args.start, args.end)
+    finally:
+        storage.close()
+    print(f"✓ Statement written to {path}: closing balance ${closing['balance']:,.2f}, "
+          f"credits ${closing['credits']:,.2f}, debits ${closing['debits']:,.2f}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
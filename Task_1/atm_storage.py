@@ -0,0 +1,828 @@
+"""
+ATM Storage Backends
+====================
+
+Pluggable persistence layer behind ``ATMSystem``.
+
+- JSONStorage: the original accounts.json/transactions.json files, with the
+  optional transaction journal and group-committed account store (or a
+  binary account snapshot, atm_snapshot)
+- SQLiteStorage: a single SQLite database in WAL mode with indexed
+  transaction queries; accounts and history are read on demand so memory
+  stays flat and startup does not depend on ledger size
+- LazyJSONStorage (atm_lazy): the JSON files behind memory-mapped offset
+  indexes, loading single accounts on demand
+
+All backends expose the same methods so the ATM never needs to know which
+one it is talking to.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+from collections import OrderedDict
+from collections.abc import Mapping, MutableMapping
+from contextlib import contextmanager
+
+from atm_account_store import AccountStore
+from atm_journal import TransactionJournal, write_snapshot
+from atm_lazy import LazyJSONStorage
+from atm_ledger import Ledger, from_cents, to_cents
+from atm_metrics import METRICS, acquire
+from atm_snapshot import SnapshotStore, read_snapshot
+
+
+ACCOUNT_COLUMNS = ("pin", "name", "balance", "account_type", "created_date")
+TRANSACTION_COLUMNS = ("transaction_id", "date", "type", "amount", "description", "balance_after")
+# Stored as INTEGER cents in SQLite; records carry them as float amounts
+MONEY_COLUMNS = frozenset(("balance", "amount", "balance_after"))
+# PRAGMA user_version of the current SQLite schema (0: money stored as REAL)
+SCHEMA_VERSION = 1
+
+
+class JSONStorage:
+    """
+    Storage backed by accounts.json and transactions.json
+
+    The whole ledger is held in memory as plain dicts. Transactions are
+    either rewritten to transactions.json on every event (legacy behaviour)
+    or appended to a JSON Lines journal when journal mode is on. Writes are
+    serialized by an internal lock so several sessions can share it.
+    """
+
+    def __init__(self, accounts_file="accounts.json", transactions_file="transactions.json",
+                 journal_mode=False, journal_file="transactions.jsonl",
+                 flush_policy="every", fsync=False, durability="fsync",
+                 batch_size=32, batch_interval=1.0, snapshot_file=None):
+        """
+        Configure JSON file storage
+
+        Args:
+            accounts_file (str): Account data file
+            transactions_file (str): Transaction history file
+            journal_mode (bool): Append transactions to a JSON Lines journal
+            journal_file (str): Journal file location
+            flush_policy (str): Journal flush policy (every, batch, never)
+            fsync (bool): fsync the journal on every flush
+            durability (str): Account persistence level (fsync, batched, async)
+            batch_size (int): Pending account saves per batched commit
+            batch_interval (float): Seconds between batched/async commits
+            snapshot_file (str): Keep accounts in this binary snapshot
+                (atm_snapshot) instead of accounts_file; accounts_file is
+                imported once if the snapshot does not exist yet
+        """
+        self.accounts_file = accounts_file
+        self.transactions_file = transactions_file
+        self.snapshot_file = snapshot_file
+        self.location = snapshot_file or accounts_file
+        self.durability = durability
+        self.batch_size = batch_size
+        self.batch_interval = batch_interval
+        self.accounts = None
+        self.transactions = None
+        self.account_store = None
+        self.journal = None
+        self._lock = threading.RLock()
+        if journal_mode:
+            self.journal = TransactionJournal(journal_file, flush_policy=flush_policy, fsync=fsync)
+
+    def load_accounts(self):
+        """
+        Load all accounts from accounts.json into a columnar ledger
+
+        Returns:
+            Ledger: account_number -> record, or None if no file exists yet
+        """
+        if self.snapshot_file and os.path.exists(self.snapshot_file):
+            self.accounts = read_snapshot(self.snapshot_file)
+        else:
+            try:
+                with open(self.accounts_file, 'r') as f:
+                    self.accounts = Ledger.from_records(json.load(f))
+            except FileNotFoundError:
+                return None
+        self.account_store = self._open_account_store()
+        return self.accounts
+
+    def create_accounts(self, accounts):
+        """
+        Initialize storage with a set of accounts and persist them
+
+        Args:
+            accounts (dict): account_number -> record
+
+        Returns:
+            Ledger: The stored accounts mapping
+        """
+        self.accounts = Ledger.from_records(accounts)
+        self.account_store = self._open_account_store()
+        self.account_store.save()
+        return self.accounts
+
+    def _open_account_store(self):
+        """Create the dirty-tracking store for the loaded accounts"""
+        if self.snapshot_file:
+            return SnapshotStore(self.snapshot_file, self.accounts,
+                                 durability=self.durability,
+                                 batch_size=self.batch_size,
+                                 batch_interval=self.batch_interval)
+        return AccountStore(self.accounts_file, self.accounts,
+                            durability=self.durability,
+                            batch_size=self.batch_size,
+                            batch_interval=self.batch_interval)
+
+    def save_accounts(self, *account_numbers):
+        """
+        Persist changed accounts
+
+        Args:
+            *account_numbers (str): Accounts that changed; all accounts if empty
+        """
+        self.account_store.save(*account_numbers)
+
+    def load_transactions(self):
+        """
+        Load transaction history and replay the journal on top of it
+
+        Returns:
+            dict: account_number -> list of transactions
+        """
+        try:
+            with open(self.transactions_file, 'r') as f:
+                self.transactions = json.load(f)
+        except FileNotFoundError:
+            self.transactions = {}
+
+        if self.journal:
+            self.journal.replay(self.transactions)
+        return self.transactions
+
+    def save_transactions(self):
+        """Rewrite transactions.json with the full history"""
+        with self._lock, METRICS.timer("atm_storage_seconds", call="save_transactions"), \
+                open(self.transactions_file, 'w') as f:
+            json.dump(self.transactions, f, indent=2)
+            METRICS.inc("atm_bytes_written_total", f.tell(), file="transactions")
+
+    def append_transaction(self, account_number, transaction):
+        """
+        Record one transaction
+
+        Args:
+            account_number (str): Account the transaction belongs to
+            transaction (dict): Transaction record
+        """
+        acquire(self._lock, "transactions")
+        try:
+            self.transactions.setdefault(account_number, []).append(transaction)
+
+            if self.journal:
+                self.journal.append(account_number, transaction)
+            else:
+                self.save_transactions()
+        finally:
+            self._lock.release()
+
+    def append_transactions(self, entries):
+        """
+        Record many transactions with one journal write or one file rewrite
+
+        Args:
+            entries (list): (account_number, transaction) pairs in order
+        """
+        acquire(self._lock, "transactions")
+        try:
+            transactions = self.transactions
+            for account_number, transaction in entries:
+                history = transactions.get(account_number)
+                if history is None:
+                    history = transactions[account_number] = []
+                history.append(transaction)
+
+            if self.journal:
+                self.journal.extend(entries)
+            else:
+                self.save_transactions()
+        finally:
+            self._lock.release()
+
+    def transaction_count(self, account_number):
+        """Number of transactions recorded for an account"""
+        return len(self.transactions.get(account_number, ()))
+
+    def get_transactions(self, account_number):
+        """All transactions for an account, oldest first"""
+        return list(self.transactions.get(account_number, ()))
+
+    def recent_transactions(self, account_number, limit):
+        """The last ``limit`` transactions for an account, oldest first"""
+        return self.transactions.get(account_number, [])[-limit:]
+
+    def transaction_keys(self, account_number, start=0):
+        """(type, date) pairs of an account's transactions from position ``start``"""
+        history = self.transactions.get(account_number, [])
+        return [(tx['type'], tx['date']) for tx in history[start:]]
+
+    def transactions_at(self, account_number, positions):
+        """Transactions at the given 0-based history positions, in that order"""
+        history = self.transactions.get(account_number, [])
+        return [history[position] for position in positions]
+
+    def transaction_types(self, account_number):
+        """Distinct transaction types recorded for an account"""
+        return sorted({tx['type'] for tx in self.transactions.get(account_number, ())})
+
+    def transactions_by_type(self, account_number, transaction_type):
+        """All transactions of one type for an account, oldest first"""
+        return [tx for tx in self.transactions.get(account_number, ())
+                if tx['type'] == transaction_type]
+
+    def scan_transactions(self):
+        """
+        Stream every transaction, grouped by account in history order
+
+        Yields:
+            tuple: (account_number, type, amount, balance_after, date)
+        """
+        for account_number, history in list(self.transactions.items()):
+            for tx in history:
+                yield account_number, tx['type'], tx['amount'], tx['balance_after'], tx['date']
+
+    def scan_balances(self):
+        """
+        Stream the current balance of every account
+
+        Yields:
+            tuple: (account_number, balance)
+        """
+        for account_number in list(self.accounts):
+            yield account_number, self.accounts[account_number]['balance']
+
+    def drop_transactions(self, counts):
+        """
+        Remove the oldest transactions of accounts (e.g. once archived)
+
+        Args:
+            counts (dict): account_number -> number of leading records to drop
+        """
+        with self._lock:
+            for account_number, count in counts.items():
+                history = self.transactions.get(account_number)
+                if history is not None:
+                    del history[:count]
+            if self.journal:
+                self.compact()
+            else:
+                self.save_transactions()
+
+    @contextmanager
+    def atomic(self):
+        """
+        Group the saves of one operation
+
+        JSON files have no multi-file transactions; each save is already
+        atomic on its own, so this only exists to match SQLiteStorage.
+        """
+        yield
+
+    def export_transactions(self, path=None):
+        """
+        Export the full history in the transactions.json layout
+
+        Args:
+            path (str): Destination file, defaults to the transactions file
+        """
+        write_snapshot(path or self.transactions_file, self.transactions)
+
+    def compact(self):
+        """Fold the journal into transactions.json and start a fresh journal"""
+        if not self.journal:
+            return
+        with self._lock:
+            self.journal.flush()
+            self.export_transactions()
+            self.journal.truncate()
+
+    def close(self):
+        """Flush and close any open persistence resources"""
+        try:
+            if self.account_store:
+                self.account_store.close()
+        finally:
+            if self.journal:
+                self.journal.close()
+
+
+class SQLiteStorage:
+    """
+    Storage backed by a single SQLite database in WAL mode
+
+    Accounts are fetched by primary key when first touched and kept in a
+    small LRU cache; transaction history is queried through the
+    (account_number, date) and (account_number, type) indexes. Nothing is
+    loaded up front, so startup cost and memory do not grow with the ledger.
+    """
+
+    def __init__(self, path="atm.db", synchronous="NORMAL", cache_size=1024):
+        """
+        Open (or create) the SQLite database
+
+        Args:
+            path (str): Database file location
+            synchronous (str): SQLite synchronous pragma (OFF, NORMAL, FULL)
+            cache_size (int): Account records kept in the in-memory LRU cache
+        """
+        self.path = path
+        self.location = path
+        self._lock = threading.RLock()
+        self._depth = 0
+        self._touched = set()
+        self.conn = sqlite3.connect(path, isolation_level=None, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute(f"PRAGMA synchronous={synchronous}")
+        create_schema(self.conn)
+        self.accounts = SQLiteAccountMap(self, cache_size)
+        self.transactions = SQLiteTransactionMap(self)
+
+    def load_accounts(self):
+        """
+        Open the accounts table
+
+        Returns:
+            SQLiteAccountMap: Lazy account mapping, or None if the table is empty
+        """
+        row = self._fetchone("SELECT 1 FROM accounts LIMIT 1")
+        return self.accounts if row else None
+
+    def create_accounts(self, accounts):
+        """
+        Initialize storage with a set of accounts and persist them
+
+        Args:
+            accounts (dict): account_number -> record
+
+        Returns:
+            SQLiteAccountMap: The stored accounts mapping
+        """
+        with self.atomic():
+            for account_number, record in accounts.items():
+                self.accounts[account_number] = record
+        return self.accounts
+
+    def save_accounts(self, *account_numbers):
+        """
+        Persist changed accounts from the record cache
+
+        Args:
+            *account_numbers (str): Accounts that changed; all cached if empty
+        """
+        with self.atomic():
+            for account_number in account_numbers or list(self.accounts.cached()):
+                self._write_account(account_number, self.accounts[account_number])
+
+    def load_transactions(self):
+        """
+        Open the transactions table
+
+        Returns:
+            SQLiteTransactionMap: Lazy account -> history mapping
+        """
+        return self.transactions
+
+    def append_transaction(self, account_number, transaction):
+        """
+        Record one transaction
+
+        Args:
+            account_number (str): Account the transaction belongs to
+            transaction (dict): Transaction record
+        """
+        with self.atomic():
+            seq = self.transaction_count(account_number) + 1
+            self.conn.execute(
+                "INSERT INTO transactions (account_number, seq, transaction_id, date, type,"
+                " amount, description, balance_after) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (account_number, seq) + to_row(transaction, TRANSACTION_COLUMNS)
+            )
+
+    def append_transactions(self, entries):
+        """
+        Record many transactions in one SQL transaction
+
+        Args:
+            entries (list): (account_number, transaction) pairs in order
+        """
+        rows = []
+        with self.atomic():
+            seqs = self._last_seqs({account_number for account_number, _ in entries})
+            for account_number, transaction in entries:
+                seq = seqs[account_number] + 1
+                seqs[account_number] = seq
+                rows.append((account_number, seq) + to_row(transaction, TRANSACTION_COLUMNS))
+            self.conn.executemany(
+                "INSERT INTO transactions (account_number, seq, transaction_id, date, type,"
+                " amount, description, balance_after) VALUES (?, ?, ?, ?, ?, ?, ?, ?)", rows
+            )
+
+    def _last_seqs(self, account_numbers, chunk=500):
+        """account_number -> highest history position (0 if none), queried in chunks"""
+        seqs = dict.fromkeys(account_numbers, 0)
+        keys = list(seqs)
+        for i in range(0, len(keys), chunk):
+            part = keys[i:i + chunk]
+            cursor = self.conn.execute(
+                "SELECT account_number, MAX(seq) FROM transactions WHERE account_number IN"
+                f" ({', '.join('?' * len(part))}) GROUP BY account_number", part
+            )
+            seqs.update(cursor.fetchall())
+        return seqs
+
+    def transaction_count(self, account_number):
+        """Number of transactions recorded for an account"""
+        row = self._fetchone(
+            "SELECT MAX(seq) FROM transactions WHERE account_number = ?", (account_number,)
+        )
+        return row[0] or 0
+
+    def get_transactions(self, account_number):
+        """All transactions for an account, oldest first"""
+        return self._query("WHERE account_number = ? ORDER BY seq", (account_number,))
+
+    def recent_transactions(self, account_number, limit):
+        """The last ``limit`` transactions for an account, oldest first"""
+        rows = self._query("WHERE account_number = ? ORDER BY seq DESC LIMIT ?",
+                           (account_number, limit))
+        rows.reverse()
+        return rows
+
+    def transaction_keys(self, account_number, start=0):
+        """(type, date) pairs of an account's transactions from position ``start``"""
+        with self._lock:
+            return self.conn.execute(
+                "SELECT type, date FROM transactions WHERE account_number = ? AND seq > ?"
+                " ORDER BY seq", (account_number, start)
+            ).fetchall()
+
+    def transactions_at(self, account_number, positions):
+        """Transactions at the given 0-based history positions, in that order"""
+        positions = list(positions)
+        placeholders = ", ".join("?" * len(positions))
+        with self._lock:
+            rows = self.conn.execute(
+                f"SELECT seq, {', '.join(TRANSACTION_COLUMNS)} FROM transactions"
+                f" WHERE account_number = ? AND seq IN ({placeholders})",
+                [account_number] + [position + 1 for position in positions]
+            ).fetchall()
+        by_seq = {row[0]: from_row(row[1:], TRANSACTION_COLUMNS) for row in rows}
+        return [by_seq[position + 1] for position in positions]
+
+    def transaction_types(self, account_number):
+        """Distinct transaction types recorded for an account"""
+        with self._lock:
+            rows = self.conn.execute(
+                "SELECT DISTINCT type FROM transactions WHERE account_number = ? ORDER BY type",
+                (account_number,)
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def transactions_by_type(self, account_number, transaction_type):
+        """All transactions of one type for an account, oldest first"""
+        return self._query("WHERE account_number = ? AND type = ? ORDER BY seq",
+                           (account_number, transaction_type))
+
+    def scan_transactions(self):
+        """
+        Stream every transaction, grouped by account in history order
+
+        Reads through a separate connection so the scan sees one consistent
+        WAL snapshot without holding the writer's lock.
+
+        Yields:
+            tuple: (account_number, type, amount, balance_after, date)
+        """
+        reader = sqlite3.connect(self.path)
+        try:
+            for account_number, transaction_type, amount, balance_after, when in reader.execute(
+                "SELECT account_number, type, amount, balance_after, date FROM transactions"
+                " ORDER BY account_number, seq"
+            ):
+                yield (account_number, transaction_type, from_cents(amount),
+                       None if balance_after is None else from_cents(balance_after), when)
+        finally:
+            reader.close()
+
+    def scan_balances(self):
+        """
+        Stream the current balance of every account
+
+        Yields:
+            tuple: (account_number, balance)
+        """
+        reader = sqlite3.connect(self.path)
+        try:
+            for account_number, balance in reader.execute(
+                    "SELECT account_number, balance FROM accounts ORDER BY account_number"):
+                yield account_number, from_cents(balance)
+        finally:
+            reader.close()
+
+    def drop_transactions(self, counts):
+        """
+        Remove the oldest transactions of accounts (e.g. once archived)
+
+        Remaining records are renumbered so history positions stay 0-based.
+
+        Args:
+            counts (dict): account_number -> number of leading records to drop
+        """
+        with self.atomic():
+            for account_number, count in counts.items():
+                self.conn.execute("DELETE FROM transactions WHERE account_number = ? AND seq <= ?",
+                                  (account_number, count))
+                self.conn.execute("UPDATE transactions SET seq = seq - ? WHERE account_number = ?",
+                                  (count, account_number))
+
+    def _query(self, clause, params):
+        """Select transaction records with a WHERE/ORDER clause"""
+        with self._lock:
+            rows = self.conn.execute(
+                f"SELECT {', '.join(TRANSACTION_COLUMNS)} FROM transactions {clause}", params
+            ).fetchall()
+        return [from_row(row, TRANSACTION_COLUMNS) for row in rows]
+
+    def _fetchone(self, sql, params=()):
+        """Run a single-row query under the connection lock"""
+        with self._lock:
+            return self.conn.execute(sql, params).fetchone()
+
+    @contextmanager
+    def atomic(self):
+        """
+        Run the enclosed saves as one SQL transaction
+
+        Nested blocks join the outermost transaction. On error the
+        transaction is rolled back and cached records touched inside it are
+        dropped so they are re-read from the database.
+        """
+        with self._lock:
+            outermost = self._depth == 0
+            if outermost:
+                self.conn.execute("BEGIN IMMEDIATE")
+            self._depth += 1
+            try:
+                yield
+            except BaseException:
+                self._depth -= 1
+                if outermost:
+                    self.conn.execute("ROLLBACK")
+                    self.accounts.invalidate(self._touched)
+                    self._touched.clear()
+                raise
+            self._depth -= 1
+            if outermost:
+                self.conn.execute("COMMIT")
+                self._touched.clear()
+
+    def _write_account(self, account_number, record):
+        """Upsert one account row"""
+        extra = {k: v for k, v in record.items() if k not in ACCOUNT_COLUMNS}
+        self.conn.execute(
+            "INSERT OR REPLACE INTO accounts (account_number, pin, name, balance,"
+            " account_type, created_date, extra) VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (account_number,) + to_row(record, ACCOUNT_COLUMNS)
+            + (json.dumps(extra) if extra else None,)
+        )
+
+    def export_transactions(self, path):
+        """
+        Export the full history in the transactions.json layout
+
+        Args:
+            path (str): Destination file
+        """
+        history = {}
+        cursor = self.conn.execute(
+            f"SELECT account_number, {', '.join(TRANSACTION_COLUMNS)} FROM transactions"
+            " ORDER BY account_number, seq"
+        )
+        for row in cursor:
+            history.setdefault(row[0], []).append(from_row(row[1:], TRANSACTION_COLUMNS))
+        write_snapshot(path, history)
+
+    def compact(self):
+        """Checkpoint the WAL back into the main database file"""
+        self.conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+
+    def close(self):
+        """Checkpoint and close the database connection"""
+        self.compact()
+        self.conn.close()
+
+
+class SQLiteAccountMap(MutableMapping):
+    """Dict-like view of the accounts table with a bounded record cache"""
+
+    def __init__(self, storage, cache_size):
+        self._storage = storage
+        self._cache = OrderedDict()
+        self._cache_size = cache_size
+
+    def __getitem__(self, account_number):
+        record = self._cache.get(account_number)
+        if record is not None:
+            self._cache.move_to_end(account_number)
+            return record
+
+        row = self._storage._fetchone(
+            f"SELECT {', '.join(ACCOUNT_COLUMNS)}, extra FROM accounts WHERE account_number = ?",
+            (account_number,)
+        )
+        if row is None:
+            raise KeyError(account_number)
+
+        record = from_row(row[:-1], ACCOUNT_COLUMNS)
+        if row[-1]:
+            record.update(json.loads(row[-1]))
+        self._remember(account_number, record)
+        return record
+
+    def __setitem__(self, account_number, record):
+        with self._storage.atomic():
+            self._storage._touched.add(account_number)
+            self._storage._write_account(account_number, record)
+        self._remember(account_number, record)
+
+    def __delitem__(self, account_number):
+        with self._storage.atomic():
+            cursor = self._storage.conn.execute(
+                "DELETE FROM accounts WHERE account_number = ?", (account_number,)
+            )
+        self._cache.pop(account_number, None)
+        if cursor.rowcount == 0:
+            raise KeyError(account_number)
+
+    def __contains__(self, account_number):
+        if account_number in self._cache:
+            return True
+        row = self._storage._fetchone(
+            "SELECT 1 FROM accounts WHERE account_number = ?", (account_number,)
+        )
+        return row is not None
+
+    def __iter__(self):
+        cursor = self._storage.conn.execute("SELECT account_number FROM accounts")
+        for row in cursor:
+            yield row[0]
+
+    def __len__(self):
+        return self._storage._fetchone("SELECT COUNT(*) FROM accounts")[0]
+
+    def cached(self):
+        """Account numbers currently held in the record cache"""
+        return self._cache.keys()
+
+    def invalidate(self, account_numbers):
+        """Drop cached records so they are re-read from the database"""
+        for account_number in account_numbers:
+            self._cache.pop(account_number, None)
+
+    def _remember(self, account_number, record):
+        self._cache[account_number] = record
+        self._cache.move_to_end(account_number)
+        while len(self._cache) > self._cache_size:
+            self._cache.popitem(last=False)
+
+
+class SQLiteTransactionMap(Mapping):
+    """Read-only dict-like view of per-account transaction history"""
+
+    def __init__(self, storage):
+        self._storage = storage
+
+    def __getitem__(self, account_number):
+        if account_number not in self:
+            raise KeyError(account_number)
+        return self._storage.get_transactions(account_number)
+
+    def __contains__(self, account_number):
+        row = self._storage._fetchone(
+            "SELECT 1 FROM transactions WHERE account_number = ? LIMIT 1", (account_number,)
+        )
+        return row is not None
+
+    def __iter__(self):
+        cursor = self._storage.conn.execute("SELECT DISTINCT account_number FROM transactions")
+        for row in cursor:
+            yield row[0]
+
+    def __len__(self):
+        return self._storage._fetchone(
+            "SELECT COUNT(DISTINCT account_number) FROM transactions"
+        )[0]
+
+
+def create_schema(conn):
+    """Create the accounts/transactions tables and their indexes, migrating old schemas"""
+    version = conn.execute("PRAGMA user_version").fetchone()[0]
+    exists = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'accounts'").fetchone()
+    if exists and version < SCHEMA_VERSION:
+        _migrate_to_cents(conn)
+        return
+    conn.executescript(SCHEMA)
+    conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+
+
+def _migrate_to_cents(conn):
+    """
+    Rewrite a version 0 database (money as REAL dollars) with INTEGER cents
+
+    SQLite cannot change a column's type in place, so both tables are
+    copied into the current schema in one transaction.
+    """
+    conn.create_function("to_cents", 1,
+                         lambda value: None if value is None else to_cents(value),
+                         deterministic=True)
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        conn.execute("DROP INDEX IF EXISTS idx_transactions_account_date")
+        conn.execute("DROP INDEX IF EXISTS idx_transactions_account_type")
+        conn.execute("ALTER TABLE accounts RENAME TO accounts_v0")
+        conn.execute("ALTER TABLE transactions RENAME TO transactions_v0")
+        for statement in SCHEMA.split(";"):
+            if statement.strip():
+                conn.execute(statement)
+        conn.execute(
+            "INSERT INTO accounts SELECT account_number, pin, name, to_cents(balance),"
+            " account_type, created_date, extra FROM accounts_v0")
+        conn.execute(
+            "INSERT INTO transactions SELECT account_number, seq, transaction_id, date, type,"
+            " to_cents(amount), description, to_cents(balance_after) FROM transactions_v0")
+        conn.execute("DROP TABLE accounts_v0")
+        conn.execute("DROP TABLE transactions_v0")
+        conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+    except BaseException:
+        conn.execute("ROLLBACK")
+        raise
+    conn.execute("COMMIT")
+
+
+def to_row(record, columns):
+    """Column values of a record for an INSERT, with money as integer cents"""
+    return tuple(to_cents(record[c]) if c in MONEY_COLUMNS and record.get(c) is not None
+                 else record.get(c) for c in columns)
+
+
+def from_row(values, columns):
+    """Record dict from selected column values, with money back as float amounts"""
+    return {c: from_cents(v) if c in MONEY_COLUMNS and v is not None else v
+            for c, v in zip(columns, values)}
+
+
+SCHEMA = """
+    CREATE TABLE IF NOT EXISTS accounts (
+        account_number TEXT PRIMARY KEY,
+        pin TEXT NOT NULL,
+        name TEXT NOT NULL,
+        balance INTEGER NOT NULL,
+        account_type TEXT NOT NULL,
+        created_date TEXT,
+        extra TEXT
+    );
+    CREATE TABLE IF NOT EXISTS transactions (
+        account_number TEXT NOT NULL,
+        seq INTEGER NOT NULL,
+        transaction_id TEXT NOT NULL,
+        date TEXT NOT NULL,
+        type TEXT NOT NULL,
+        amount INTEGER NOT NULL,
+        description TEXT,
+        balance_after INTEGER,
+        PRIMARY KEY (account_number, seq)
+    ) WITHOUT ROWID;
+    CREATE INDEX IF NOT EXISTS idx_transactions_account_date
+        ON transactions (account_number, date);
+    CREATE INDEX IF NOT EXISTS idx_transactions_account_type
+        ON transactions (account_number, type);
+"""
+
+
+def open_storage(backend="json", **options):
+    """
+    Create a storage backend by name
+
+    Args:
+        backend (str): "json", "lazy" or "sqlite"
+        **options: Backend specific constructor arguments
+
+    Returns:
+        JSONStorage, LazyJSONStorage or SQLiteStorage
+    """
+    if backend == "json":
+        return JSONStorage(**options)
+    if backend == "lazy":
+        return LazyJSONStorage(**options)
+    if backend == "sqlite":
+        return SQLiteStorage(**options)
+    raise ValueError(f"Unknown storage backend: {backend}")
@@ -12,15 +12,32 @@ A comprehensive ATM interface system demonstrating core banking operations
 with security features, data persistence, and professional user experience.
 """
 
-import json
-import os
+import argparse
 from datetime import datetime
 import getpass
+import os
+import signal
+
+from atm_archive import TieredStorage, TransactionArchive
+from atm_auth import PinAuthenticator, PinHasher
+from atm_directory import AccountDirectory
+from atm_cash import CashInventory, describe as describe_notes
+from atm_engine import (AccountLockedError, ATMEngine, CashUnavailableError,
+                        InsufficientFundsError, InvalidAmountError, InvalidPinError,
+                        LimitExceededError, PinFormatError, SameAccountError,
+                        UnknownAccountError, VelocityLimitError)
+from atm_metrics import METRICS, MetricsExporter
+from atm_server import run_server
+from atm_shard import ShardRouter, read_config, split_storage
+from atm_statement import FORMATS as STATEMENT_FORMATS, export_statement
+from atm_storage import JSONStorage, open_storage
 
 class ATMSystem:
     """
     Comprehensive ATM Interface System
     
+    Interactive terminal client on top of ATMEngine.
+    
     Features:
     - User authentication with PIN security
     - Balance inquiry and account management
@@ -28,83 +45,128 @@ class ATMSystem:
     - Cash deposits and transfers
     - Transaction history tracking
     - PIN change functionality
-    - Persistent data storage using JSON
+    - Pluggable persistence (JSON files or SQLite)
+    - Optional append-only transaction journal
+    - Atomic, group-committed account persistence
     """
     
-    def __init__(self):
-        """Initialize ATM system with default configuration"""
-        self.accounts_file = "accounts.json"
-        self.transactions_file = "transactions.json"
+    def __init__(self, storage=None, auth=None, terminal_id="ATM-001", **storage_options):
+        """
+        Initialize ATM system with default configuration
+        
+        Args:
+            storage: Storage backend (JSONStorage or SQLiteStorage); a
+                JSONStorage in the working directory is used if omitted
+            auth (PinAuthenticator): PIN hashing settings (engine default
+                if omitted)
+            terminal_id (str): Terminal whose cash inventory (cash/<id>.json
+                next to the data files) withdrawals dispense from; None for
+                no dispenser (server mode)
+            **storage_options: JSONStorage options when no storage is given
+                (journal_mode, journal_file, flush_policy, fsync,
+                durability, batch_size, batch_interval)
+        """
+        self.storage = storage or JSONStorage(**storage_options)
         self.current_account = None
-        self.daily_withdrawal_limit = 500.00
         self.max_login_attempts = 3
         
         # Load existing data or create default accounts
         self.load_accounts()
         self.load_transactions()
+        # Opened on the first recipient search so startup stays independent of it
+        self._directory = None
+        cash = None
+        if terminal_id:
+            cash_dir = os.path.join(os.path.dirname(os.path.abspath(self.storage.location)), "cash")
+            cash = CashInventory.open(cash_dir, terminal_id)
+        self.engine = ATMEngine(self.storage, auth=auth, cash=cash)
         
         print("🏦 ATM System Initialized Successfully")
     
+    @property
+    def directory(self):
+        """Recipient search directory, loaded (or rebuilt) on first use"""
+        if self._directory is None:
+            self._directory = AccountDirectory.open(self.storage)
+        return self._directory
+    
     def load_accounts(self):
-        """Load account data from JSON file or create default test accounts"""
-        try:
-            with open(self.accounts_file, 'r') as f:
-                self.accounts = json.load(f)
-                print(f"✓ Loaded {len(self.accounts)} accounts from {self.accounts_file}")
-        except FileNotFoundError:
-            # Create default test accounts for demonstration
-            self.accounts = {
-                "1234567890": {
-                    "pin": "1234",
-                    "name": "John Doe",
-                    "balance": 1000.00,
-                    "account_type": "Checking",
-                    "created_date": datetime.now().strftime("%Y-%m-%d")
-                },
-                "9876543210": {
-                    "pin": "5678",
-                    "name": "Jane Smith", 
-                    "balance": 2500.00,
-                    "account_type": "Savings",
-                    "created_date": datetime.now().strftime("%Y-%m-%d")
-                },
-                "5555444433": {
-                    "pin": "9999",
-                    "name": "Sylvester Kpei",
-                    "balance": 5000.00,
-                    "account_type": "Premium",
-                    "created_date": datetime.now().strftime("%Y-%m-%d")
-                }
+        """Load account data from storage or create default test accounts"""
+        self.accounts = self.storage.load_accounts()
+        if self.accounts is not None:
+            print(f"✓ Loaded accounts from {self.storage.location}")
+            return
+        
+        # Create default test accounts for demonstration
+        self.accounts = self.storage.create_accounts({
+            "1234567890": {
+                "pin": "1234",
+                "name": "John Doe",
+                "balance": 1000.00,
+                "account_type": "Checking",
+                "created_date": datetime.now().strftime("%Y-%m-%d")
+            },
+            "9876543210": {
+                "pin": "5678",
+                "name": "Jane Smith", 
+                "balance": 2500.00,
+                "account_type": "Savings",
+                "created_date": datetime.now().strftime("%Y-%m-%d")
+            },
+            "5555444433": {
+                "pin": "9999",
+                "name": "Sylvester Kpei",
+                "balance": 5000.00,
+                "account_type": "Premium",
+                "created_date": datetime.now().strftime("%Y-%m-%d")
             }
-            self.save_accounts()
-            print("✓ Created default test accounts")
+        })
+        print("✓ Created default test accounts")
     
-    def save_accounts(self):
-        """Persist account data to JSON file"""
+    def save_accounts(self, *account_numbers):
+        """
+        Persist changed account data
+        
+        Args:
+            *account_numbers (str): Accounts that changed; all accounts if empty
+        """
         try:
-            with open(self.accounts_file, 'w') as f:
-                json.dump(self.accounts, f, indent=2)
+            self.storage.save_accounts(*account_numbers)
             print("✓ Account data saved successfully")
         except Exception as e:
             print(f"✗ Error saving accounts: {e}")
     
     def load_transactions(self):
-        """Load transaction history from JSON file"""
+        """Load transaction history from storage"""
+        self.transactions = self.storage.load_transactions()
+        print(f"✓ Loaded transaction history")
+    
+    def export_transactions(self, path="transactions.json"):
+        """
+        Export the full history in the transactions.json layout
+        
+        Args:
+            path (str): Destination file
+        """
+        self.storage.export_transactions(path)
+    
+    def compact_journal(self):
+        """Compact the storage log (journal or SQLite WAL)"""
         try:
-            with open(self.transactions_file, 'r') as f:
-                self.transactions = json.load(f)
-                print(f"✓ Loaded transaction history")
-        except FileNotFoundError:
-            self.transactions = {}
-            print("✓ Initialized new transaction history")
+            self.storage.compact()
+            print("✓ Transaction log compacted")
+        except Exception as e:
+            print(f"✗ Error compacting transaction log: {e}")
     
-    def save_transactions(self):
-        """Persist transaction history to JSON file"""
+    def shutdown(self):
+        """Flush and close any open persistence resources"""
         try:
-            with open(self.transactions_file, 'w') as f:
-                json.dump(self.transactions, f, indent=2)
+            if self._directory is not None:
+                self._directory.save()
+            self.engine.close()
+            self.storage.close()
         except Exception as e:
-            print(f"✗ Error saving transactions: {e}")
+            print(f"✗ Error closing storage: {e}")
     
     def add_transaction(self, account_number, transaction_type, amount, description=""):
         """
@@ -116,20 +178,10 @@ class ATMSystem:
             amount (float): Transaction amount
             description (str): Optional description
         """
-        if account_number not in self.transactions:
-            self.transactions[account_number] = []
-        
-        transaction = {
-            "transaction_id": f"TXN{len(self.transactions[account_number]) + 1:04d}",
-            "date": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-            "type": transaction_type,
-            "amount": amount,
-            "description": description,
-            "balance_after": self.accounts[account_number]["balance"]
-        }
-        
-        self.transactions[account_number].append(transaction)
-        self.save_transactions()
+        try:
+            self.engine.record(account_number, transaction_type, amount, description)
+        except Exception as e:
+            print(f"✗ Error saving transactions: {e}")
     
     def authenticate_user(self):
         """
@@ -164,19 +216,19 @@ class ATMSystem:
                 # Secure PIN entry
                 pin = getpass.getpass("🔐 Enter your PIN: ")
                 
-                if self.accounts[account_number]["pin"] == pin:
-                    self.current_account = account_number
-                    account_name = self.accounts[account_number]['name']
-                    print(f"\n✅ Authentication Successful!")
-                    print(f"🎉 Welcome back, {account_name}!")
-                    
-                    # Log successful login
-                    self.add_transaction(account_number, "Login", 0, "Successful authentication")
-                    return True
-                else:
-                    print("❌ Incorrect PIN!")
-                    attempts += 1
+                self.engine.authenticate(account_number, pin)
+                self.current_account = account_number
+                account_name = self.accounts[account_number]['name']
+                print(f"\n✅ Authentication Successful!")
+                print(f"🎉 Welcome back, {account_name}!")
+                return True
                     
+            except AccountLockedError as e:
+                print(f"\n🔒 {e}")
+                return False
+            except InvalidPinError:
+                print("❌ Incorrect PIN!")
+                attempts += 1
             except KeyboardInterrupt:
                 print("\n\n🚫 Session cancelled by user.")
                 return False
@@ -223,7 +275,10 @@ class ATMSystem:
         print(f"  Account Status: Active")
         print(f"{'='*40}")
         
-        self.add_transaction(self.current_account, "Balance Inquiry", 0, "Balance checked via ATM")
+        try:
+            self.engine.balance_inquiry(self.current_account)
+        except Exception as e:
+            print(f"✗ Error saving transactions: {e}")
     
     def withdraw_money(self):
         """Handle money withdrawal with security checks and limits"""
@@ -234,33 +289,15 @@ class ATMSystem:
         print("            💸 CASH WITHDRAWAL 💸")
         print(f"{'='*40}")
         print(f"  Available Balance: ${current_balance:,.2f}")
-        print(f"  Daily Limit: ${self.daily_withdrawal_limit:,.2f}")
+        daily_limit, remaining = self.engine.withdrawal_allowance(self.current_account)
+        print(f"  Daily Limit: ${daily_limit:,.2f} (${remaining:,.2f} remaining today)")
         print(f"{'='*40}")
         
         try:
             amount = float(input("💵 Enter withdrawal amount: $"))
             
-            # Input validation
-            if amount <= 0:
-                print("❌ Invalid amount! Please enter a positive number.")
-                return
-            
-            if amount != round(amount, 2):
-                print("❌ Invalid amount! Please enter amount in cents precision.")
-                return
-            
-            # Balance check
-            if amount > current_balance:
-                print("❌ Insufficient funds!")
-                print(f"   Available balance: ${current_balance:,.2f}")
-                self.add_transaction(self.current_account, "Failed Withdrawal", amount, "Insufficient funds")
-                return
-            
-            # Daily limit check
-            if amount > self.daily_withdrawal_limit:
-                print(f"❌ Daily withdrawal limit exceeded!")
-                print(f"   Daily limit: ${self.daily_withdrawal_limit:,.2f}")
-                return
+            # Validation, balance and limit checks
+            self.engine.check_withdrawal(self.current_account, amount)
             
             # Transaction confirmation
             print(f"\n📋 Transaction Summary:")
@@ -273,16 +310,29 @@ class ATMSystem:
                 return
             
             # Process withdrawal
-            account['balance'] -= amount
-            self.save_accounts()
+            result = self.engine.withdraw(self.current_account, amount)
             
             print(f"\n🎉 TRANSACTION SUCCESSFUL! 🎉")
-            print(f"   Amount Withdrawn: ${amount:,.2f}")
-            print(f"   New Balance: ${account['balance']:,.2f}")
+            print(f"   Amount Withdrawn: ${result.amount:,.2f}")
+            if result.notes:
+                print(f"   Notes: {describe_notes(result.notes)}")
+            print(f"   New Balance: ${result.balance:,.2f}")
             print(f"   📄 Please take your cash and receipt.")
             
-            self.add_transaction(self.current_account, "Withdrawal", amount, f"ATM cash withdrawal")
-            
+        except InvalidAmountError as e:
+            print(f"❌ Invalid amount! {e}.")
+        except InsufficientFundsError as e:
+            print("❌ Insufficient funds!")
+            print(f"   Available balance: ${e.balance:,.2f}")
+        except LimitExceededError as e:
+            print(f"❌ Daily withdrawal limit exceeded!")
+            print(f"   Daily limit: ${e.limit:,.2f}")
+            print(f"   Remaining today: ${e.remaining:,.2f}")
+        except VelocityLimitError as e:
+            print(f"❌ Withdrawal refused for your security: {e}.")
+        except CashUnavailableError as e:
+            print(f"❌ {e}.")
+            print("   Please try a different amount.")
         except ValueError:
             print("❌ Invalid input! Please enter a valid number.")
         except Exception as e:
@@ -302,16 +352,10 @@ class ATMSystem:
             amount = float(input("💰 Enter deposit amount: $"))
             
             # Input validation
-            if amount <= 0:
-                print("❌ Invalid amount! Please enter a positive number.")
-                return
-            
-            if amount != round(amount, 2):
-                print("❌ Invalid amount! Please enter amount in cents precision.")
-                return
+            self.engine.check_deposit(self.current_account, amount)
             
             # Large deposit check (for demonstration)
-            if amount > 10000:
+            if self.engine.requires_verification(amount):
                 print("⚠️  Large deposit detected. Additional verification may be required.")
                 confirm_large = input("Continue with deposit? (y/n): ").lower()
                 if confirm_large != 'y':
@@ -329,16 +373,17 @@ class ATMSystem:
                 return
             
             # Process deposit
-            account['balance'] += amount
-            self.save_accounts()
+            result = self.engine.deposit(self.current_account, amount)
             
             print(f"\n🎉 DEPOSIT SUCCESSFUL! 🎉")
-            print(f"   Amount Deposited: ${amount:,.2f}")
-            print(f"   New Balance: ${account['balance']:,.2f}")
+            print(f"   Amount Deposited: ${result.amount:,.2f}")
+            print(f"   New Balance: ${result.balance:,.2f}")
             print(f"   📄 Please take your receipt.")
             
-            self.add_transaction(self.current_account, "Deposit", amount, "ATM cash deposit")
-            
+        except InvalidAmountError as e:
+            print(f"❌ Invalid amount! {e}.")
+        except VelocityLimitError as e:
+            print(f"❌ Deposit refused for your security: {e}.")
         except ValueError:
             print("❌ Invalid input! Please enter a valid number.")
         except Exception as e:
@@ -355,29 +400,17 @@ class ATMSystem:
         print(f"{'='*45}")
         
         try:
-            recipient_account = input("👤 Enter recipient account number: ").strip()
-            
-            # Validation checks
-            if recipient_account == self.current_account:
-                print("❌ Cannot transfer to the same account!")
+            recipient_account = self._choose_recipient()
+            if recipient_account is None:
                 return
             
-            if recipient_account not in self.accounts:
-                print("❌ Recipient account not found!")
-                print("Please verify the account number and try again.")
-                return
+            # Validation checks
+            self.engine.check_recipient(self.current_account, recipient_account)
             
             amount = float(input("💰 Enter transfer amount: $"))
             
             # Input validation
-            if amount <= 0:
-                print("❌ Invalid amount! Please enter a positive number.")
-                return
-            
-            if amount > account['balance']:
-                print("❌ Insufficient funds!")
-                print(f"   Available balance: ${account['balance']:,.2f}")
-                return
+            self.engine.check_transfer(self.current_account, recipient_account, amount)
             
             recipient_name = self.accounts[recipient_account]['name']
             
@@ -394,25 +427,58 @@ class ATMSystem:
                 return
             
             # Process transfer
-            account['balance'] -= amount
-            self.accounts[recipient_account]['balance'] += amount
-            self.save_accounts()
+            result = self.engine.transfer(self.current_account, recipient_account, amount)
             
             print(f"\n🎉 TRANSFER SUCCESSFUL! 🎉")
-            print(f"   Amount Transferred: ${amount:,.2f}")
+            print(f"   Amount Transferred: ${result.amount:,.2f}")
             print(f"   To: {recipient_name}")
-            print(f"   Your New Balance: ${account['balance']:,.2f}")
+            print(f"   Your New Balance: ${result.balance:,.2f}")
             print(f"   📄 Please take your receipt.")
             
-            # Record transactions for both accounts
-            self.add_transaction(self.current_account, "Transfer Out", amount, f"Transfer to {recipient_name}")
-            self.add_transaction(recipient_account, "Transfer In", amount, f"Transfer from {account['name']}")
-            
+        except SameAccountError:
+            print("❌ Cannot transfer to the same account!")
+        except UnknownAccountError:
+            print("❌ Recipient account not found!")
+            print("Please verify the account number and try again.")
+        except InvalidAmountError as e:
+            print(f"❌ Invalid amount! {e}.")
+        except InsufficientFundsError as e:
+            print("❌ Insufficient funds!")
+            print(f"   Available balance: ${e.balance:,.2f}")
+        except VelocityLimitError as e:
+            print(f"❌ Transfer refused for your security: {e}.")
         except ValueError:
             print("❌ Invalid input! Please enter a valid number.")
         except Exception as e:
             print(f"❌ Transaction failed: {e}")
     
+    def _choose_recipient(self, limit=5):
+        """
+        Ask for a recipient by account number, number prefix or name
+        
+        Returns:
+            str: Chosen account number, or None if cancelled
+        """
+        query = input("👤 Enter recipient account number or name: ").strip()
+        if query in self.directory:
+            return query
+        matches = [match for match in self.directory.search(query, limit + 1)
+                   if match[0] != self.current_account][:limit]
+        if not matches:
+            # Let the engine report the unknown account
+            return query
+        print("\n🔎 Matching accounts:")
+        for i, (account_number, name) in enumerate(matches, 1):
+            print(f"  {i}. {name} ({account_number})")
+        choice = input(f"Select recipient (1-{len(matches)}, blank to cancel): ").strip()
+        if not choice:
+            print("🚫 Transaction cancelled.")
+            return None
+        index = int(choice) - 1
+        if not 0 <= index < len(matches):
+            raise ValueError(choice)
+        return matches[index][0]
+    
     def change_pin(self):
         """Allow user to change their PIN with security validation"""
         print(f"\n{'='*40}")
@@ -425,7 +491,9 @@ class ATMSystem:
             # Verify current PIN
             current_pin = getpass.getpass("🔐 Enter current PIN: ")
             
-            if current_pin != self.accounts[self.current_account]['pin']:
+            try:
+                self.engine.verify_pin(self.current_account, current_pin)
+            except InvalidPinError:
                 print("❌ Incorrect current PIN!")
                 print("PIN change cancelled for security reasons.")
                 return
@@ -434,17 +502,7 @@ class ATMSystem:
             new_pin = getpass.getpass("🆕 Enter new PIN (4 digits): ")
             
             # PIN validation
-            if len(new_pin) != 4:
-                print("❌ PIN must be exactly 4 digits!")
-                return
-                
-            if not new_pin.isdigit():
-                print("❌ PIN must contain only numbers!")
-                return
-            
-            if new_pin == current_pin:
-                print("❌ New PIN must be different from current PIN!")
-                return
+            self.engine.check_new_pin(current_pin, new_pin)
             
             # Confirm new PIN
             confirm_pin = getpass.getpass("🔁 Confirm new PIN: ")
@@ -454,15 +512,14 @@ class ATMSystem:
                 return
             
             # Update PIN
-            self.accounts[self.current_account]['pin'] = new_pin
-            self.save_accounts()
+            self.engine.change_pin(self.current_account, current_pin, new_pin)
             
             print(f"\n🎉 PIN CHANGED SUCCESSFULLY! 🎉")
             print("   Your PIN has been updated securely.")
             print("   Please remember your new PIN.")
             
-            self.add_transaction(self.current_account, "PIN Change", 0, "PIN updated via ATM")
-            
+        except PinFormatError as e:
+            print(f"❌ {e}!")
         except KeyboardInterrupt:
             print("\n🚫 PIN change cancelled.")
         except Exception as e:
@@ -474,13 +531,10 @@ class ATMSystem:
         print("              📋 TRANSACTION HISTORY 📋")
         print(f"{'='*60}")
         
-        if self.current_account not in self.transactions:
-            print("   No transactions found for this account.")
-            return
-        
-        transactions = self.transactions[self.current_account]
+        history = self.engine.history
+        total = self.storage.transaction_count(self.current_account)
         
-        if not transactions:
+        if not total:
             print("   No transactions found for this account.")
             return
         
@@ -488,38 +542,104 @@ class ATMSystem:
         print("  1. Show last 10 transactions")
         print("  2. Show all transactions")
         print("  3. Show transactions by type")
+        print("  4. Show transactions by date range")
+        print("  5. Export statement to a file")
         
-        choice = input("\nSelect option (1-3): ").strip()
+        choice = input("\nSelect option (1-5): ").strip()
+        query = {}
         
         if choice == "1":
-            display_transactions = transactions[-10:]
+            page = history.query(self.current_account, limit=10)
             print(f"\n📊 Last 10 Transactions:")
+            self._print_transactions(reversed(page.transactions))
+            return
         elif choice == "2":
-            display_transactions = transactions
-            print(f"\n📊 All Transactions ({len(transactions)} total):")
+            print(f"\n📊 All Transactions ({total} total, newest first):")
         elif choice == "3":
             print("\nAvailable transaction types:")
-            types = set(tx['type'] for tx in transactions)
+            types = history.transaction_types(self.current_account)
             for i, tx_type in enumerate(types, 1):
                 print(f"  {i}. {tx_type}")
             
             try:
                 type_choice = int(input("Select type number: ")) - 1
-                selected_type = list(types)[type_choice]
-                display_transactions = [tx for tx in transactions if tx['type'] == selected_type]
+                if type_choice < 0:
+                    raise IndexError(type_choice)
+                selected_type = types[type_choice]
+                query["types"] = [selected_type]
                 print(f"\n📊 {selected_type} Transactions:")
             except (ValueError, IndexError):
                 print("❌ Invalid selection!")
                 return
+        elif choice == "4":
+            try:
+                start = input("From date (YYYY-MM-DD, blank for any): ").strip() or None
+                end = input("To date (YYYY-MM-DD, blank for any): ").strip() or None
+                for value in (start, end):
+                    if value:
+                        datetime.strptime(value, "%Y-%m-%d")
+                query.update(start=start, end=end)
+                print(f"\n📊 Transactions from {start or 'the beginning'} to {end or 'today'}:")
+            except ValueError:
+                print("❌ Invalid date! Please use YYYY-MM-DD.")
+                return
+        elif choice == "5":
+            self._export_statement()
+            return
         else:
             print("❌ Invalid option!")
             return
         
-        print("-" * 80)
-        print(f"{'ID':<8} {'Date':<20} {'Type':<15} {'Amount':<12} {'Balance':<12} {'Description'}")
-        print("-" * 80)
+        self._page_history(query)
+    
+    def _export_statement(self):
+        """Write the current account's statement for a date range to CSV or JSON Lines"""
+        try:
+            start = input("From date (YYYY-MM-DD, blank for any): ").strip() or None
+            end = input("To date (YYYY-MM-DD, blank for any): ").strip() or None
+            for value in (start, end):
+                if value:
+                    datetime.strptime(value, "%Y-%m-%d")
+        except ValueError:
+            print("❌ Invalid date! Please use YYYY-MM-DD.")
+            return
+        fmt = input("Format (csv/jsonl, default csv): ").strip().lower() or "csv"
+        if fmt not in STATEMENT_FORMATS:
+            print("❌ Invalid format!")
+            return
+        path = f"statement_{self.current_account}.{fmt}"
+        try:
+            closing = export_statement(self.storage, self.current_account, path, fmt, start, end)
+        except OSError as e:
+            print(f"❌ Error writing statement: {e}")
+            return
+        print(f"✓ Statement written to {path}")
+        print(f"   Closing balance: ${closing['balance']:,.2f}  "
+              f"(credits ${closing['credits']:,.2f}, debits ${closing['debits']:,.2f})")
+    
+    def _page_history(self, query, page_size=20):
+        """Print a history query one page at a time, newest first"""
+        cursor = None
+        while True:
+            page = self.engine.history.query(self.current_account, cursor=cursor,
+                                             limit=page_size, **query)
+            if cursor is None:
+                print(f"   {page.total} matching transactions")
+            self._print_transactions(page.transactions)
+            
+            cursor = page.next_cursor
+            if cursor is None:
+                return
+            if input("\n⏭️  Press Enter for more, or q to stop: ").strip().lower() == 'q':
+                return
+    
+    def _print_transactions(self, transactions):
+        """Print transaction records as a formatted table"""
+        print("-" * 90)
+        print(f"{'ID':<15} {'Date':<20} {'Type':<15} {'Amount':<12} {'Balance':<12} {'Description'}")
+        print("-" * 90)
         
-        for tx in display_transactions:
+        for tx in transactions:
             tx_id = tx.get('transaction_id', 'N/A')
             date = tx['date']
             tx_type = tx['type']
@@ -527,7 +647,7 @@ class ATMSystem:
             balance = f"${tx['balance_after']:,.2f}"
             description = tx.get('description', '')[:25]
             
-            print(f"{tx_id:<8} {date:<20} {tx_type:<15} {amount:<12} {balance:<12} {description}")
+            print(f"{tx_id:<15} {date:<20} {tx_type:<15} {amount:<12} {balance:<12} {description}")
     
     def show_account_info(self):
         """Display comprehensive account information"""
@@ -544,8 +664,8 @@ class ATMSystem:
         print(f"  Account Status: Active")
         
         # Transaction statistics
-        if self.current_account in self.transactions:
-            total_transactions = len(self.transactions[self.current_account])
+        total_transactions = self.storage.transaction_count(self.current_account)
+        if total_transactions:
             print(f"  Total Transactions: {total_transactions}")
         
         print(f"{'='*45}")
@@ -586,7 +706,10 @@ class ATMSystem:
                     print(f"{'='*50}")
                     
                     # Log logout
-                    self.add_transaction(self.current_account, "Logout", 0, "Session ended")
+                    try:
+                        self.engine.logout(self.current_account)
+                    except Exception as e:
+                        print(f"✗ Error saving transactions: {e}")
                     break
                 else:
                     print("❌ Invalid option! Please select 1-8.")
@@ -605,20 +728,150 @@ class ATMSystem:
                 print("Please try again or contact customer service.")
                 input("Press Enter to continue...")
 
-def main():
+def parse_args(argv=None):
+    """Parse command line options for the ATM system"""
+    parser = argparse.ArgumentParser(description="Brainwave ATM Interface System")
+    parser.add_argument("--storage", choices=["json", "lazy", "sqlite"], default="json",
+                        help="persistence backend (default: json)")
+    parser.add_argument("--db", default="atm.db",
+                        help="SQLite database file (default: atm.db)")
+    parser.add_argument("--journal", action="store_true",
+                        help="append transactions to a JSON Lines journal")
+    parser.add_argument("--journal-file", default="transactions.jsonl",
+                        help="journal file location (default: transactions.jsonl)")
+    parser.add_argument("--flush-policy", choices=["every", "batch", "never"], default="every",
+                        help="when journal records are flushed to the OS")
+    parser.add_argument("--fsync", action="store_true",
+                        help="fsync the journal on every flush")
+    parser.add_argument("--durability", choices=["fsync", "batched", "async"], default="fsync",
+                        help="account persistence level (default: fsync)")
+    parser.add_argument("--snapshot-file", default=None,
+                        help="keep accounts in this binary snapshot instead of accounts.json "
+                             "(json storage; imported from accounts.json on first use)")
+    parser.add_argument("--serve", action="store_true",
+                        help="serve concurrent sessions over TCP instead of the terminal")
+    parser.add_argument("--host", default="127.0.0.1", help="server interface (default: 127.0.0.1)")
+    parser.add_argument("--port", type=int, default=8765, help="server port (default: 8765)")
+    parser.add_argument("--terminal-id", default="ATM-001",
+                        help="terminal whose cash cassettes withdrawals dispense from "
+                             "(default: ATM-001)")
+    parser.add_argument("--shards", type=int, default=0,
+                        help="with --serve, spread accounts over this many worker processes")
+    parser.add_argument("--shard-dir", default="shards",
+                        help="shard storage directory (default: shards)")
+    parser.add_argument("--archive-dir", default="archive",
+                        help="archived history merged into queries when present (default: archive)")
+    parser.add_argument("--metrics-file", default=None,
+                        help="enable instrumentation and export Prometheus text to this file")
+    parser.add_argument("--metrics-interval", type=float, default=15.0,
+                        help="seconds between metrics file updates (default: 15)")
+    parser.add_argument("--pin-scheme", choices=["pbkdf2_sha256", "scrypt"],
+                        default="pbkdf2_sha256", help="PIN hash for new and migrated PINs")
+    parser.add_argument("--pin-iterations", type=int, default=100_000,
+                        help="PBKDF2 iterations (default: 100000)")
+    parser.add_argument("--pin-pool", choices=["thread", "process", "inline"], default="thread",
+                        help="where PIN hashing runs (default: thread)")
+    parser.add_argument("--compact", action="store_true",
+                        help="compact the journal/WAL on exit")
+    return parser.parse_args(argv)
+
+def build_storage(args):
+    """Create the storage backend selected on the command line"""
+    if args.storage == "sqlite":
+        storage = open_storage("sqlite", path=args.db)
+    elif args.storage == "lazy":
+        storage = open_storage("lazy", journal_file=args.journal_file,
+                               flush_policy=args.flush_policy, fsync=args.fsync)
+    else:
+        storage = open_storage("json", journal_mode=args.journal, journal_file=args.journal_file,
+                               flush_policy=args.flush_policy, fsync=args.fsync,
+                               durability=args.durability, snapshot_file=args.snapshot_file)
+    if os.path.isdir(args.archive_dir):
+        storage = TieredStorage(storage, TransactionArchive(args.archive_dir))
+    return storage
+
+def build_auth(args):
+    """Create the PIN authenticator selected on the command line"""
+    hasher = PinHasher(args.pin_scheme, iterations=args.pin_iterations)
+    return PinAuthenticator(hasher, pool=args.pin_pool)
+
+def start_metrics(args):
+    """
+    Enable instrumentation when a metrics file is requested
+    
+    The file is rewritten every ``--metrics-interval`` seconds, on SIGUSR1
+    and at exit.
+    
+    Returns:
+        MetricsExporter: Running exporter, or None if metrics are off
+    """
+    if not args.metrics_file:
+        return None
+    METRICS.enable()
+    exporter = MetricsExporter(args.metrics_file, args.metrics_interval).start()
+    if hasattr(signal, "SIGUSR1"):
+        signal.signal(signal.SIGUSR1, lambda signum, frame: exporter.write())
+    return exporter
+
+def open_shards(args):
+    """
+    Start a shard router, splitting the current accounts on first use
+    
+    Returns:
+        ShardRouter: Started router
+    """
+    config = read_config(args.shard_dir)
+    if config is None:
+        atm = ATMSystem(storage=build_storage(args), terminal_id=None)
+        try:
+            counts = split_storage(atm.storage, args.shard_dir, args.shards)
+        finally:
+            atm.shutdown()
+        print(f"✓ Split {sum(counts):,} accounts into {len(counts)} shards")
+    elif config["shards"] != args.shards:
+        raise ValueError(f"{args.shard_dir} holds {config['shards']} shards, not {args.shards}")
+    return ShardRouter(args.shard_dir, durability=args.durability).start()
+
+def main(argv=None):
     """Main function to run the ATM system"""
+    args = parse_args(argv)
+    
     print("🏦 Brainwave Matrix Solutions - ATM Interface System")
     print("📚 Python Programming Internship - Task 1")
     print("👨‍💻 Developed by: Sylvester Elorm Kpei")
     print("📅 Date: June 2025")
     print("-" * 60)
     
+    atm = None
+    router = None
+    exporter = start_metrics(args)
     try:
-        atm = ATMSystem()
-        atm.run()
+        if args.shards:
+            if not args.serve:
+                raise ValueError("--shards requires --serve")
+            router = open_shards(args)
+            run_server(router, host=args.host, port=args.port)
+            return
+        # Served sessions are remote terminals with their own dispensers
+        terminal_id = None if args.serve else args.terminal_id
+        atm = ATMSystem(storage=build_storage(args), auth=build_auth(args),
+                        terminal_id=terminal_id)
+        if args.serve:
+            run_server(atm.engine, host=args.host, port=args.port)
+        else:
+            atm.run()
+        if args.compact:
+            atm.compact_journal()
     except Exception as e:
         print(f"❌ Critical system error: {e}")
         print("Please restart the application.")
+    finally:
+        if atm:
+            atm.shutdown()
+        if router:
+            router.close()
+        if exporter:
+            exporter.stop()
 
 if __name__ == "__main__":
     main()
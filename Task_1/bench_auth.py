@@ -0,0 +1,137 @@
+"""
+PIN Login Throughput Benchmark
+==============================
+
+Measures logins/sec and login latency for a range of PIN hash costs and
+for each way of running the key derivation (inline on the caller, on a
+thread pool, on a process pool), with concurrent client threads.
+
+A higher cost makes stolen account files slower to brute-force, but every
+login pays it too. Pick the highest cost whose logins/sec still covers
+peak demand with headroom; the table shows where that is on this machine.
+
+A second run measures the one-time migration: the first login of each
+account with a plaintext PIN verifies it, hashes it and saves the record,
+while later logins only verify.
+
+Usage:
+    python bench_auth.py
+    python bench_auth.py --cost pbkdf2:50000 pbkdf2:200000 scrypt:16384 --pool thread process
+    python bench_auth.py --clients 16 --logins 400 --accounts 500
+"""
+
+import argparse
+import os
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from atm_auth import PinAuthenticator, PinHasher
+from atm_loadgen import LatencyStats, build_fixture, open_fixture
+
+
+DEFAULT_COSTS = ["pbkdf2:10000", "pbkdf2:50000", "pbkdf2:100000", "pbkdf2:300000",
+                 "scrypt:16384"]
+
+
+def parse_cost(value):
+    """
+    Turn "pbkdf2:100000" or "scrypt:16384" into a PinHasher
+
+    The number is the PBKDF2 iteration count or the scrypt n.
+    """
+    scheme, _, number = value.partition(":")
+    if scheme == "pbkdf2":
+        return PinHasher("pbkdf2_sha256", iterations=int(number or 100_000))
+    if scheme == "scrypt":
+        return PinHasher("scrypt", n=int(number or 2 ** 14))
+    raise argparse.ArgumentTypeError(f"Unknown cost {value!r}; use pbkdf2:N or scrypt:N")
+
+
+def run_logins(login, credentials, count, clients):
+    """
+    Call ``login(account, pin)`` ``count`` times from client threads
+
+    Returns:
+        LatencyStats: Timings under "LOGIN"
+    """
+    stats = LatencyStats()
+
+    def one(i):
+        account_number, pin = credentials[i % len(credentials)]
+        start = time.perf_counter()
+        ok = login(account_number, pin)
+        stats.record("LOGIN", time.perf_counter() - start, ok is not False)
+
+    stats.start()
+    with ThreadPoolExecutor(clients) as pool:
+        list(pool.map(one, range(count)))
+    stats.stop()
+    return stats
+
+
+def bench_costs(costs, pools, logins, clients):
+    """Print logins/sec for every cost and pool combination"""
+    print(f"\n📊 Verification only: {logins:,} logins, {clients} clients, "
+          f"{os.cpu_count()} CPUs")
+    print(f"{'cost':<34} {'pool':<8} {'logins/s':>9} {'p50 ms':>8} {'p99 ms':>8}")
+    for hasher in costs:
+        # A few distinct PINs, hashed once up front like stored accounts
+        stored = {f"{i:010d}": hasher.hash(f"{i:04d}") for i in range(16)}
+        credentials = [(account, f"{i:04d}") for i, account in enumerate(stored)]
+        for pool in pools:
+            auth = PinAuthenticator(hasher, pool=pool, workers=clients)
+            try:
+                stats = run_logins(lambda account, pin: auth.verify(pin, stored[account]),
+                                   credentials, logins, clients)
+            finally:
+                auth.close()
+            row = stats.summary()["commands"]["LOGIN"]
+            print(f"{hasher.describe():<34} {pool:<8} {row['ops_per_sec']:>9,.1f} "
+                  f"{row['p50_ms']:>8.2f} {row['p99_ms']:>8.2f}")
+
+
+def bench_migration(hasher, pool, accounts, clients):
+    """Print first-login (migrating) against later-login throughput"""
+    print(f"\n📊 Plaintext migration: {accounts:,} accounts, {hasher.describe()}, {pool} pool")
+    with tempfile.TemporaryDirectory() as directory:
+        credentials = build_fixture(directory, accounts, 1, seed=1)
+        engine = open_fixture(directory, "json", durability="batched",
+                              auth=PinAuthenticator(hasher, pool=pool, workers=clients))
+
+        def login(account_number, pin):
+            engine.authenticate(account_number, pin)
+
+        try:
+            for label in ("first login", "later login"):
+                row = run_logins(login, credentials, accounts, clients).summary()["commands"]["LOGIN"]
+                print(f"{label:<12} {row['ops_per_sec']:>9,.1f} logins/s  "
+                      f"p50 {row['p50_ms']:.2f} ms  p99 {row['p99_ms']:.2f} ms")
+            migrated = sum("$" in engine.accounts[account]["pin"] for account, _ in credentials)
+            print(f"✓ {migrated:,}/{accounts:,} PINs stored hashed")
+        finally:
+            engine.close()
+            engine.storage.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="PIN login throughput benchmark")
+    parser.add_argument("--cost", nargs="+", type=parse_cost, default=None, metavar="SCHEME:N",
+                        help="hash costs to compare (default: " + " ".join(DEFAULT_COSTS) + ")")
+    parser.add_argument("--pool", nargs="+", choices=["inline", "thread", "process"],
+                        default=["inline", "thread", "process"], help="where hashing runs")
+    parser.add_argument("--logins", type=int, default=200, help="logins per measurement")
+    parser.add_argument("--clients", type=int, default=8, help="concurrent login threads")
+    parser.add_argument("--accounts", type=int, default=200,
+                        help="accounts for the migration run (0 skips it)")
+    args = parser.parse_args(argv)
+
+    costs = args.cost or [parse_cost(value) for value in DEFAULT_COSTS]
+    bench_costs(costs, args.pool, args.logins, args.clients)
+    if args.accounts:
+        bench_migration(PinHasher(), "thread", args.accounts, args.clients)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,74 @@
+"""
+Batch Posting Benchmark
+=======================
+
+Writes a posting file of ``--rows`` lines spread over ``--accounts``
+accounts, then times ``BatchPoster`` on each storage backend: parsing,
+validation, the balance pass and the single commit, end to end. About 1%
+of lines are invalid so the reject path is exercised too.
+
+Usage:
+    python bench_batch.py
+    python bench_batch.py --rows 1000000 --accounts 100000 --backend journal sqlite
+"""
+
+import argparse
+import os
+import random
+import tempfile
+import time
+
+from atm_auth import PinAuthenticator
+from atm_batch import BatchPoster, read_postings
+from atm_loadgen import BACKENDS, build_fixture, open_fixture
+
+
+def write_postings(path, credentials, rows, seed):
+    """Write a payroll-style CSV with a few bad lines mixed in"""
+    rng = random.Random(seed)
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write("account,amount,type,description\n")
+        for i in range(rows):
+            account_number = credentials[rng.randrange(len(credentials))][0]
+            roll = rng.random()
+            if roll < 0.005:
+                f.write(f"{account_number},-5.00,Payroll,bad amount\n")
+            elif roll < 0.01:
+                f.write(f"0000000000,10.00,Payroll,unknown account\n")
+            elif roll < 0.1:
+                f.write(f"{account_number},{rng.randrange(100, 2000)}.00,Fee,Service fee\n")
+            else:
+                f.write(f"{account_number},{rng.randrange(100, 500000) / 100:.2f},Payroll,"
+                        f"Salary {i}\n")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Batch posting benchmark")
+    parser.add_argument("--backend", nargs="+", choices=BACKENDS, default=["journal", "sqlite"],
+                        help="storage backends (default: journal sqlite)")
+    parser.add_argument("--rows", type=int, default=1_000_000, help="posting lines")
+    parser.add_argument("--accounts", type=int, default=100_000, help="accounts in the bank")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args(argv)
+
+    print(f"{args.rows:,} postings over {args.accounts:,} accounts")
+    for backend in args.backend:
+        with tempfile.TemporaryDirectory() as directory:
+            credentials = build_fixture(directory, args.accounts, 0, args.seed)
+            path = os.path.join(directory, "postings.csv")
+            write_postings(path, credentials, args.rows, args.seed)
+            engine = open_fixture(directory, backend, auth=PinAuthenticator(pool="inline"))
+            try:
+                start = time.perf_counter()
+                report = BatchPoster(engine).post(read_postings(path))
+                elapsed = time.perf_counter() - start
+            finally:
+                engine.close()
+                engine.storage.close()
+        print(f"📊 {backend:<8} {report['posted']:>10,} posted {len(report['rejected']):>8,} "
+              f"rejected in {elapsed:6.2f}s = {args.rows / elapsed:>10,.0f} rows/sec")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
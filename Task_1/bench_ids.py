@@ -0,0 +1,70 @@
+"""
+Transaction ID Benchmark
+========================
+
+Measures IDs/sec when several processes allocate from one shared sequence
+file, for a range of block sizes, and checks that no ID is handed out
+twice.
+
+Usage:
+    python bench_ids.py
+    python bench_ids.py --processes 8 --ids 50000 --blocks 1 100 10000
+"""
+
+import argparse
+import os
+import tempfile
+import time
+from array import array
+from multiprocessing import Pool
+
+from atm_ids import IDAllocator
+
+
+def _allocate(job):
+    """Worker: allocate ``count`` IDs and return them as packed int64 bytes"""
+    path, block_size, count, fsync = job
+    allocator = IDAllocator(path, block_size=block_size, fsync=fsync)
+    ids = array('q', (allocator.next_id() for _ in range(count)))
+    return ids.tobytes()
+
+
+def run(processes, count, block_sizes, fsync=True):
+    """Print IDs/sec per block size and verify uniqueness"""
+    print(f"{processes} processes x {count:,} IDs, fsync={'on' if fsync else 'off'}")
+    print(f"{'block':>8} {'IDs/sec':>12} {'elapsed':>9} {'unique':>7}")
+    with Pool(processes) as pool:
+        for block_size in block_sizes:
+            with tempfile.TemporaryDirectory() as directory:
+                path = os.path.join(directory, "transaction_ids.seq")
+                jobs = [(path, block_size, count, fsync)] * processes
+
+                start = time.perf_counter()
+                results = pool.map(_allocate, jobs)
+                elapsed = time.perf_counter() - start
+
+                seen = set()
+                for packed in results:
+                    ids = array('q')
+                    ids.frombytes(packed)
+                    if list(ids) != sorted(ids):
+                        raise AssertionError("IDs not increasing within a process")
+                    seen.update(ids)
+                total = processes * count
+                unique = "yes" if len(seen) == total else f"NO ({total - len(seen)} dup)"
+                print(f"{block_size:>8} {total / elapsed:>12,.0f} {elapsed:>8.2f}s {unique:>7}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="ATM transaction ID allocator benchmark")
+    parser.add_argument("--processes", type=int, default=os.cpu_count() or 4)
+    parser.add_argument("--ids", type=int, default=20000, help="IDs per process")
+    parser.add_argument("--blocks", type=int, nargs="+", default=[1, 10, 100, 1000, 10000],
+                        help="block sizes to compare")
+    parser.add_argument("--no-fsync", action="store_true", help="skip fsync of the sequence file")
+    args = parser.parse_args(argv)
+    run(args.processes, args.ids, args.blocks, fsync=not args.no_fsync)
+
+
+if __name__ == "__main__":
+    main()
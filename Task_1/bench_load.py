@@ -0,0 +1,151 @@
+"""
+Session Load Benchmark
+======================
+
+Replays generated (or scripted) customer sessions against the ATM and
+reports ops/sec plus p50/p95/p99 latency per command, for one or more
+storage backends.
+
+Every run builds a fresh bank from the same seed, so results are
+repeatable. Save a run with ``--save`` and compare a later run against it
+with ``--baseline``. The exit status is 1 if overall ops/sec dropped by
+more than ``--tolerance`` percent, which makes it usable as a regression
+gate for storage and engine changes.
+
+Usage:
+    python bench_load.py
+    python bench_load.py --backend json journal lazy sqlite --accounts 10000 --depth 50
+    python bench_load.py --sessions 2000 --clients 16 --save baseline.json
+    python bench_load.py --baseline baseline.json --tolerance 10
+    python bench_load.py --script sessions.txt --backend sqlite
+    python bench_load.py --server 127.0.0.1:8765 --sessions 500
+"""
+
+import argparse
+import tempfile
+
+from atm_loadgen import (BACKENDS, DEFAULT_MIX, EngineDriver, build_fixture, generate_sessions,
+                         load_results, open_fixture, read_script, run_remote, save_results)
+from atm_metrics import METRICS
+
+
+def print_summary(label, summary):
+    """Print one backend's results as a table"""
+    print(f"\n📊 {label}: {summary['operations']:,} ops in {summary['elapsed']:.2f}s "
+          f"= {summary['ops_per_sec']:,.0f} ops/sec ({summary['errors']:,} refused)")
+    print(f"{'command':<10} {'count':>8} {'errors':>7} {'ops/sec':>9} "
+          f"{'mean ms':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'max ms':>8}")
+    for command, row in summary["commands"].items():
+        print(f"{command:<10} {row['count']:>8,} {row['errors']:>7,} {row['ops_per_sec']:>9,.0f} "
+              f"{row['mean_ms']:>8.3f} {row['p50_ms']:>8.3f} {row['p95_ms']:>8.3f} "
+              f"{row['p99_ms']:>8.3f} {row['max_ms']:>8.3f}")
+
+
+def compare(results, baseline, tolerance):
+    """
+    Print changes against a baseline run
+
+    Returns:
+        bool: True if no backend regressed by more than ``tolerance`` percent
+    """
+    passed = True
+    print(f"\n{'backend':<10} {'baseline':>10} {'now':>10} {'change':>8}   p99 by command")
+    for label, summary in results.items():
+        before = baseline.get(label)
+        if before is None:
+            print(f"{label:<10} {'-':>10} {summary['ops_per_sec']:>10,.0f} {'new':>8}")
+            continue
+        change = (summary["ops_per_sec"] / before["ops_per_sec"] - 1) * 100
+        p99 = ", ".join(
+            f"{command} {before['commands'][command]['p99_ms']:.2f}->{row['p99_ms']:.2f}ms"
+            for command, row in summary["commands"].items() if command in before["commands"])
+        status = "✓" if change >= -tolerance else "✗"
+        passed = passed and change >= -tolerance
+        print(f"{label:<10} {before['ops_per_sec']:>10,.0f} {summary['ops_per_sec']:>10,.0f} "
+              f"{change:>+7.1f}% {status} {p99}")
+    return passed
+
+
+def parse_mix(values):
+    """Turn ["BALANCE=30", ...] into a weight mapping"""
+    mix = {}
+    for value in values:
+        command, _, weight = value.partition("=")
+        mix[command.upper()] = int(weight)
+    return mix
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="ATM session load benchmark")
+    parser.add_argument("--backend", nargs="+", choices=BACKENDS, default=["json"],
+                        help="storage backends to benchmark (default: json)")
+    parser.add_argument("--accounts", type=int, default=1000, help="accounts in the bank")
+    parser.add_argument("--depth", type=int, default=20, help="history length per account")
+    parser.add_argument("--sessions", type=int, default=1000, help="generated sessions")
+    parser.add_argument("--steps", type=int, nargs=2, default=[2, 8], metavar=("MIN", "MAX"),
+                        help="commands per session between login and logout")
+    parser.add_argument("--mix", nargs="+", metavar="COMMAND=WEIGHT",
+                        help="command weights (default: " +
+                             " ".join(f"{c}={w}" for c, w in DEFAULT_MIX.items()) + ")")
+    parser.add_argument("--script", help="replay sessions from this file instead of generating")
+    parser.add_argument("--clients", type=int, default=8, help="concurrent sessions")
+    parser.add_argument("--seed", type=int, default=1, help="random seed (default: 1)")
+    parser.add_argument("--durability", choices=["fsync", "batched", "async"], default="fsync",
+                        help="account persistence level for the JSON backends")
+    parser.add_argument("--server", metavar="HOST:PORT",
+                        help="replay against a running session server instead")
+    parser.add_argument("--metrics", metavar="FILE",
+                        help="enable instrumentation and write Prometheus text here "
+                             "(one file per backend: FILE.<backend>)")
+    parser.add_argument("--save", help="write results to this JSON file")
+    parser.add_argument("--baseline", help="compare with results saved earlier")
+    parser.add_argument("--tolerance", type=float, default=10.0,
+                        help="allowed ops/sec drop against the baseline in percent")
+    args = parser.parse_args(argv)
+
+    mix = parse_mix(args.mix) if args.mix else None
+    script = read_script(args.script) if args.script else None
+    results = {}
+
+    if args.server:
+        host, _, port = args.server.rpartition(":")
+        credentials = [("1234567890", "1234"), ("9876543210", "5678"), ("5555444433", "9999")]
+        sessions = script or generate_sessions(credentials, args.sessions, args.seed, mix,
+                                               tuple(args.steps))
+        stats = run_remote(host or "127.0.0.1", int(port), sessions, clients=args.clients)
+        results["server"] = stats.summary()
+        print_summary(f"server {args.server}", results["server"])
+    else:
+        print(f"{args.accounts:,} accounts x {args.depth} transactions, "
+              f"{len(script) if script else args.sessions:,} sessions, {args.clients} clients, "
+              f"seed {args.seed}")
+        for backend in args.backend:
+            with tempfile.TemporaryDirectory() as directory:
+                credentials = build_fixture(directory, args.accounts, args.depth, args.seed)
+                sessions = script or generate_sessions(credentials, args.sessions, args.seed,
+                                                       mix, tuple(args.steps))
+                engine = open_fixture(directory, backend, durability=args.durability)
+                if args.metrics:
+                    METRICS.reset()
+                    METRICS.enable()
+                try:
+                    stats = EngineDriver(engine).run(sessions, clients=args.clients)
+                finally:
+                    engine.close()
+                    engine.storage.close()
+                    METRICS.disable()
+            if args.metrics:
+                METRICS.write(f"{args.metrics}.{backend}")
+            results[backend] = stats.summary()
+            print_summary(backend, results[backend])
+
+    if args.save:
+        save_results(args.save, results)
+        print(f"\n✓ Results saved to {args.save}")
+    if args.baseline:
+        return 0 if compare(results, load_results(args.baseline), args.tolerance) else 1
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,118 @@
+"""
+Reconciliation Benchmark
+========================
+
+Times the end-of-day reconciliation passes over a synthetic ledger of
+``--rows`` transactions spread over ``--accounts`` accounts:
+
+- load: stream the rows into TransactionColumns
+- totals: per-type totals, bank-wide and per account (and for one day)
+- chains: balance chain check
+- transfers: Transfer Out/In matching (every transfer has its pair)
+
+Each pass is timed with the vectorized NumPy path (when NumPy is
+installed) and with the pure-Python fallback, on the same columns.
+
+Usage:
+    python bench_reconcile.py
+    python bench_reconcile.py --rows 10000000 --accounts 100000
+"""
+
+import argparse
+import random
+import time
+from datetime import date, timedelta
+
+import atm_reconcile
+from atm_reconcile import TYPE_SIGNS, Reconciliation, TransactionColumns
+
+
+TYPES = ("Deposit", "Withdrawal", "Fee", "Payroll", "Interest")
+FIRST_DAY = date(2025, 1, 1)
+TRANSFER_EVERY = 10
+
+
+def transfer(index, k, per_account):
+    """Amount (cents), day and time of the k-th transfer from account index to index + 1"""
+    amount = (index * 7919 + k * 104729) % 50_000 + 1
+    day = k * TRANSFER_EVERY * 365 // per_account
+    second = (index * 31 + k * 17) % 86400
+    return amount, day, f"{second // 3600:02d}:{second // 60 % 60:02d}:{second % 60:02d}"
+
+
+def ledger_rows(rows, accounts, seed):
+    """
+    Yield (account, type, amount, balance_after, date) rows, grouped by account
+
+    Every tenth row is a Transfer Out to the next account, which records the
+    matching Transfer In a few rows later, so transfer matching sees pairs.
+    """
+    rng = random.Random(seed)
+    days = [(FIRST_DAY + timedelta(days=n)).isoformat() for n in range(365)]
+    per_account = max(TRANSFER_EVERY, rows // accounts)
+    for index in range(accounts):
+        account_number = str(1000000000 + index)
+        cents = 10_000_000
+        for i in range(per_account):
+            k, slot = divmod(i, TRANSFER_EVERY)
+            if slot == 3 and index + 1 < accounts:
+                transaction_type = "Transfer Out"
+                amount, day, clock = transfer(index, k, per_account)
+            elif slot == 7 and index > 0:
+                transaction_type = "Transfer In"
+                amount, day, clock = transfer(index - 1, k, per_account)
+            else:
+                transaction_type = TYPES[rng.randrange(len(TYPES))]
+                amount = rng.randrange(1, 50_000)
+                day = i * 365 // per_account
+                clock = f"{rng.randrange(24):02d}:{rng.randrange(60):02d}:00"
+            cents += TYPE_SIGNS[transaction_type] * amount
+            if rng.random() < 1e-5:
+                cents += 1  # an occasional broken chain
+            yield account_number, transaction_type, amount / 100, cents / 100, f"{days[day]} {clock}"
+
+
+def time_passes(columns, day):
+    """Seconds per reconciliation pass on the current code path"""
+    full, one_day = Reconciliation(columns), Reconciliation(columns, day=day)
+    timings = {}
+    for name, run in (("totals", full.type_totals), ("day totals", one_day.type_totals),
+                      ("chains", full.chain_breaks), ("transfers", full.transfer_check)):
+        start = time.perf_counter()
+        run()
+        timings[name] = time.perf_counter() - start
+    return timings
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Reconciliation benchmark")
+    parser.add_argument("--rows", type=int, default=1_000_000, help="ledger rows")
+    parser.add_argument("--accounts", type=int, default=10_000, help="accounts in the bank")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    columns = TransactionColumns.load(ledger_rows(args.rows, args.accounts, args.seed))
+    loaded = time.perf_counter() - start
+    print(f"{len(columns):,} rows over {len(columns.accounts):,} accounts, "
+          f"loaded in {loaded:.2f}s")
+
+    numpy = atm_reconcile.numpy
+    paths = [("numpy", numpy)] if numpy is not None else []
+    paths.append(("python", None))
+    day = FIRST_DAY.replace(month=6, day=20).isoformat()
+    try:
+        for label, module in paths:
+            atm_reconcile.numpy = module
+            timings = time_passes(columns, day)
+            print(f"📊 {label:<7} " + "  ".join(f"{name} {seconds:6.2f}s"
+                                                for name, seconds in timings.items()))
+    finally:
+        atm_reconcile.numpy = numpy
+    if numpy is None:
+        print("NumPy is not installed; only the pure-Python path was timed")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
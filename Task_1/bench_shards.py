@@ -0,0 +1,130 @@
+"""
+Shard Scaling Benchmark
+=======================
+
+Measures ops/sec through a ShardRouter for a range of shard counts, using
+client threads that issue a mix of deposits, balance inquiries and
+transfers. Cross-shard transfers go through two-phase commit. After each
+run it checks that the money is conserved: the total balance must equal
+the opening total plus the deposits.
+
+Scaling is bounded by the number of cores (and by the disk when every
+operation fsyncs), so compare shard counts up to ``os.cpu_count()``.
+
+Usage:
+    python bench_shards.py
+    python bench_shards.py --shards 1 2 4 8 --clients 32 --seconds 10 --durability batched
+"""
+
+import argparse
+import os
+import random
+import tempfile
+import threading
+import time
+
+from atm_ledger import to_cents
+from atm_shard import ShardRouter, create_shards
+
+
+OPERATIONS = ("deposit", "balance", "transfer")
+
+
+def make_accounts(count):
+    """account_number -> record for ``count`` benchmark accounts"""
+    return {
+        str(1000000000 + i): {
+            "pin": "1234",
+            "name": f"Customer {i}",
+            "balance": 1000000.00,
+            "account_type": "Checking",
+            "created_date": "2025-01-01",
+        }
+        for i in range(count)
+    }
+
+
+def _client(router, numbers, weights, deadline, stats, seed):
+    rng = random.Random(seed)
+    ops = deposited = cross = 0
+    while time.perf_counter() < deadline:
+        op = rng.choices(OPERATIONS, weights)[0]
+        account_number = rng.choice(numbers)
+        if op == "deposit":
+            router.deposit(account_number, 1.25)
+            deposited += to_cents(1.25)
+        elif op == "balance":
+            router.balance_inquiry(account_number)
+        else:
+            recipient = rng.choice(numbers)
+            if recipient == account_number:
+                continue
+            router.transfer(account_number, recipient, 0.50)
+            cross += router.shard_of(account_number) != router.shard_of(recipient)
+        ops += 1
+    stats.append((ops, deposited, cross))
+
+
+def run_once(shards, accounts, clients, seconds, weights, durability):
+    """
+    Benchmark one shard count
+
+    Returns:
+        tuple: (ops/sec, cross-shard transfers, conserved)
+    """
+    records = make_accounts(accounts)
+    numbers = list(records)
+    opening = sum(to_cents(record["balance"]) for record in records.values())
+
+    with tempfile.TemporaryDirectory() as directory:
+        create_shards(directory, shards, records)
+        with ShardRouter(directory, durability=durability,
+                         fsync=durability == "fsync") as router:
+            stats = []
+            deadline = time.perf_counter() + seconds
+            threads = [threading.Thread(target=_client,
+                                        args=(router, numbers, weights, deadline, stats, i))
+                       for i in range(clients)]
+            start = time.perf_counter()
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            elapsed = time.perf_counter() - start
+
+            ops = sum(s[0] for s in stats)
+            deposited = sum(s[1] for s in stats)
+            cross = sum(s[2] for s in stats)
+            closing = sum(to_cents(router.accounts[n]["balance"]) for n in numbers)
+    return ops / elapsed, cross, closing == opening + deposited
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="ATM shard scaling benchmark")
+    cores = os.cpu_count() or 1
+    parser.add_argument("--shards", type=int, nargs="+",
+                        default=sorted({1, 2, 4, cores}), help="shard counts to compare")
+    parser.add_argument("--accounts", type=int, default=10000)
+    parser.add_argument("--clients", type=int, default=16, help="client threads")
+    parser.add_argument("--seconds", type=float, default=5.0, help="duration per shard count")
+    parser.add_argument("--mix", type=int, nargs=3, default=[40, 40, 20],
+                        metavar=("DEPOSIT", "BALANCE", "TRANSFER"),
+                        help="operation weights (default: 40 40 20)")
+    parser.add_argument("--durability", choices=["fsync", "batched", "async"], default="fsync",
+                        help="worker persistence level (default: fsync)")
+    args = parser.parse_args(argv)
+
+    print(f"{args.accounts:,} accounts, {args.clients} clients, {args.seconds:g}s per run, "
+          f"durability={args.durability}, {cores} cores")
+    print(f"{'shards':>6} {'ops/sec':>10} {'speedup':>8} {'cross-shard':>12} {'conserved':>10}")
+    baseline = None
+    for shards in args.shards:
+        rate, cross, conserved = run_once(shards, args.accounts, args.clients, args.seconds,
+                                          args.mix, args.durability)
+        baseline = baseline or rate
+        print(f"{shards:>6} {rate:>10,.0f} {rate / baseline:>7.2f}x {cross:>12,} "
+              f"{'yes' if conserved else 'NO':>10}")
+
+
+if __name__ == "__main__":
+    main()
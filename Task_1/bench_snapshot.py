@@ -0,0 +1,105 @@
+"""
+Account Snapshot Benchmark
+==========================
+
+Compares loading and saving the account ledger as accounts.json (the
+AccountStore layout parsed into a Ledger) and as a binary snapshot
+(atm_snapshot), for banks of increasing size.
+
+- load: read the file and build the Ledger
+- save: full commit of every account (first commit after load)
+- commit: commit after changing one balance (the steady-state write)
+
+Every save is fsynced, as with the default "fsync" durability. One in ten
+accounts carries extra fields (a withdrawal accumulator) so the snapshot's
+JSON extras section is exercised.
+
+Usage:
+    python bench_snapshot.py                      # 10k, 100k, 1M accounts
+    python bench_snapshot.py --sizes 10000 100000
+"""
+
+import argparse
+import json
+import os
+import tempfile
+import time
+
+from atm_account_store import AccountStore
+from atm_ledger import Ledger
+from atm_snapshot import SnapshotStore, read_snapshot
+
+
+def make_records(size):
+    """account_number -> record dict like the ones ATMSystem creates"""
+    types = ("Checking", "Savings", "Premium")
+    records = {}
+    for i in range(size):
+        record = {"pin": f"{i % 10000:04d}", "name": f"Customer {i}",
+                  "balance": 1000.0 + i % 997, "account_type": types[i % 3],
+                  "created_date": "2025-06-01"}
+        if i % 10 == 0:
+            record["daily_withdrawals"] = {"date": "2025-06-20", "total": 120.0}
+        records[str(1000000000 + i)] = record
+    return records
+
+
+def load_json(path):
+    with open(path, 'r') as f:
+        return Ledger.from_records(json.load(f))
+
+
+def measure(store_class, load, path, ledger):
+    """
+    Time a full save, a load and a one-account commit
+
+    Returns:
+        tuple: (save, load, commit) seconds, file size in bytes
+    """
+    store = store_class(path, ledger)
+    start = time.perf_counter()
+    store.commit()
+    save = time.perf_counter() - start
+    size = os.path.getsize(path)
+
+    start = time.perf_counter()
+    loaded = load(path)
+    load_time = time.perf_counter() - start
+
+    account_number = next(iter(loaded))
+    store = store_class(path, loaded)
+    store.commit()
+    loaded[account_number]["balance"] += 1
+    store.mark_dirty(account_number)
+    start = time.perf_counter()
+    store.commit()
+    commit = time.perf_counter() - start
+    return save, load_time, commit, size
+
+
+def run(sizes):
+    """Print a load/save table for each bank size"""
+    print(f"{'accounts':>10} {'format':>8} {'load':>9} {'save':>9} {'commit':>9} {'size':>9}")
+    for size in sizes:
+        ledger = Ledger.from_records(make_records(size))
+        with tempfile.TemporaryDirectory() as directory:
+            for name, store_class, load, filename in (
+                    ("json", AccountStore, load_json, "accounts.json"),
+                    ("snapshot", SnapshotStore, read_snapshot, "accounts.snap")):
+                save, load_time, commit, file_size = measure(
+                    store_class, load, os.path.join(directory, filename), ledger)
+                print(f"{size:>10,} {name:>8} {load_time * 1000:>7.1f}ms {save * 1000:>7.1f}ms "
+                      f"{commit * 1000:>7.1f}ms {file_size / 2**20:>7.1f}MB")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Account snapshot benchmark")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000, 1000000],
+                        help="bank sizes in accounts (default: 10000 100000 1000000)")
+    args = parser.parse_args(argv)
+    run(args.sizes)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,124 @@
+"""
+Startup Benchmark
+=================
+
+Measures cold-start time and peak memory of the eager JSON backend against
+lazy, index-backed loading for banks of increasing size.
+
+Each measurement runs in a fresh interpreter: open the storage, load
+accounts and transactions, then read one account and its history (what a
+single login needs).
+
+Usage:
+    python bench_startup.py                      # 1k, 10k, 100k accounts
+    python bench_startup.py --sizes 1000 1000000
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from atm_lazy import prepare
+
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+COLD_START = """
+import sys, time
+sys.path.insert(0, {here!r})
+start = time.perf_counter()
+from atm_storage import open_storage
+storage = open_storage({backend!r}, **{options!r})
+accounts = storage.load_accounts()
+storage.load_transactions()
+account = accounts[{account!r}]
+history = storage.recent_transactions({account!r}, 10)
+elapsed = time.perf_counter() - start
+with open("/proc/self/status") as status:
+    rss = next((line.split()[1] for line in status if line.startswith("VmHWM")), 0)
+print(elapsed, rss)
+"""
+
+
+def generate(directory, size, transactions_per_account=3):
+    """
+    Write ``size`` accounts and a journal of their transactions
+
+    Returns:
+        str: An account number to look up
+    """
+    accounts_file = os.path.join(directory, "accounts.json")
+    journal_file = os.path.join(directory, "transactions.jsonl")
+
+    with open(accounts_file, 'w') as accounts, open(journal_file, 'w') as journal:
+        accounts.write("{\n")
+        for i in range(size):
+            account_number = f"{1000000000 + i}"
+            record = {"pin": "1234", "name": f"Customer {i}", "balance": 1000.0,
+                      "account_type": "Checking", "created_date": "2025-06-20 09:00:00"}
+            separator = ",\n" if i else ""
+            accounts.write(f'{separator}"{account_number}": {json.dumps(record, separators=(",", ":"))}')
+            for n in range(transactions_per_account):
+                journal.write(json.dumps({
+                    "transaction_id": f"TXN{n + 1:04d}", "date": "2025-06-20 09:00:00",
+                    "type": "Deposit", "amount": 10.0, "description": "Cash deposit",
+                    "balance_after": 1000.0, "account": account_number}) + "\n")
+        accounts.write("\n}\n")
+    return f"{1000000000 + size // 2}"
+
+
+def cold_start(backend, options, account):
+    """Time one cold start in a new interpreter; returns (seconds, max RSS KiB)"""
+    code = COLD_START.format(here=HERE, backend=backend, options=options, account=account)
+    output = subprocess.run([sys.executable, "-c", code], capture_output=True,
+                            text=True, check=True).stdout
+    elapsed, rss = output.split()
+    return float(elapsed), int(rss)
+
+
+def run(sizes, eager=True):
+    """Print a startup table for each bank size"""
+    print(f"{'accounts':>10} {'backend':>8} {'startup':>10} {'max RSS':>10}")
+    for size in sizes:
+        with tempfile.TemporaryDirectory() as directory:
+            account = generate(directory, size)
+            files = {name: os.path.join(directory, name) for name in
+                     ("accounts.json", "transactions.json", "transactions.jsonl", "history")}
+
+            if eager:
+                options = {"accounts_file": files["accounts.json"],
+                           "transactions_file": files["transactions.json"],
+                           "journal_mode": True, "journal_file": files["transactions.jsonl"]}
+                elapsed, rss = cold_start("json", options, account)
+                print(f"{size:>10} {'json':>8} {elapsed * 1000:>8.1f}ms {rss / 1024:>8.1f}MB")
+
+            prep_start = time.perf_counter()
+            prepare(files["accounts.json"], files["transactions.json"],
+                    files["transactions.jsonl"], files["history"])
+            prep_time = time.perf_counter() - prep_start
+
+            options = {"accounts_file": files["accounts.json"],
+                       "transactions_file": files["transactions.json"],
+                       "journal_file": files["transactions.jsonl"],
+                       "history_prefix": files["history"]}
+            elapsed, rss = cold_start("lazy", options, account)
+            print(f"{size:>10} {'lazy':>8} {elapsed * 1000:>8.1f}ms {rss / 1024:>8.1f}MB"
+                  f"   (one-time index build {prep_time:.1f}s)")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="ATM cold-start benchmark")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000],
+                        help="bank sizes in accounts (default: 1000 10000 100000)")
+    parser.add_argument("--lazy-only", action="store_true",
+                        help="skip the eager JSON backend (slow at 1M accounts)")
+    args = parser.parse_args(argv)
+    run(args.sizes, eager=not args.lazy_only)
+
+
+if __name__ == "__main__":
+    main()
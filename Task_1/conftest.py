@@ -0,0 +1,33 @@
+"""
+Shared pytest fixtures
+
+Test modules declare their accounts in a module-level ``ACCOUNTS`` dict;
+``storage`` opens a journal-mode JSONStorage holding them in a temporary
+directory and ``engine`` runs an ATMEngine on top of it.
+"""
+
+import os
+
+import pytest
+
+from atm_engine import ATMEngine
+from atm_storage import JSONStorage
+
+
+@pytest.fixture
+def storage(request, tmp_path):
+    storage = JSONStorage(accounts_file=os.path.join(tmp_path, "accounts.json"),
+                          transactions_file=os.path.join(tmp_path, "transactions.json"),
+                          journal_mode=True,
+                          journal_file=os.path.join(tmp_path, "transactions.jsonl"))
+    storage.create_accounts(request.module.ACCOUNTS)
+    storage.load_transactions()
+    yield storage
+    storage.close()
+
+
+@pytest.fixture
+def engine(storage):
+    engine = ATMEngine(storage)
+    yield engine
+    engine.close()
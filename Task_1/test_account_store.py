@@ -0,0 +1,42 @@
+"""AccountStore group commits under concurrent saves"""
+
+import json
+import sys
+import threading
+
+from atm_account_store import AccountStore
+
+
+def test_batched_saves_from_many_threads(tmp_path):
+    path = str(tmp_path / "accounts.json")
+    accounts = {str(1000000001 + i): {"pin": "1234", "name": f"Thread {i}", "balance": 0.0}
+                for i in range(4)}
+    store = AccountStore(path, accounts, durability="batched",
+                         batch_size=64, batch_interval=0.002)
+    errors = []
+
+    def saver(account_number):
+        try:
+            for count in range(5000):
+                accounts[account_number]["balance"] = float(count + 1)
+                store.save(account_number)
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=saver, args=(acct,)) for acct in accounts]
+    # Switch threads often so saves interleave with commits resetting the batch
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    try:
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    finally:
+        sys.setswitchinterval(interval)
+    store.close()
+
+    assert errors == []
+    with open(path) as f:
+        assert json.load(f) == accounts
+    assert all(record["balance"] == 5000.0 for record in accounts.values())
@@ -0,0 +1,85 @@
+"""Archive tier and TieredStorage position merging"""
+
+import os
+from datetime import datetime
+
+import pytest
+
+from atm_archive import TieredStorage, TransactionArchive, archive_transactions
+
+
+TYPES = ("Deposit", "Withdrawal", "Transfer In", "Transfer Out")
+
+
+def history(account_number, dates):
+    """Transactions on the given days with a running balance"""
+    balance = 0
+    records = []
+    for i, date in enumerate(dates):
+        transaction_type = TYPES[i % len(TYPES)]
+        amount = 10 * (i + 1) + 0.25
+        balance += amount if transaction_type in ("Deposit", "Transfer In") else -amount
+        records.append({"transaction_id": f"{account_number[-2:]}{i:04d}",
+                        "date": f"{date} 10:{i % 60:02d}:00", "type": transaction_type,
+                        "amount": amount, "description": f"#{i}",
+                        "balance_after": round(balance, 2)})
+    return records
+
+
+MONTHLY = [f"2025-{month:02d}-{day:02d}" for month in range(1, 7) for day in (3, 17)]
+HISTORY = {
+    "1000000001": history("1000000001", MONTHLY),
+    "1000000002": history("1000000002", ["2025-01-05", "2025-02-05"]),
+    "1000000003": history("1000000003", ["2025-06-10", "2025-06-11"]),
+}
+ACCOUNTS = {acct: {"pin": "1234", "name": acct, "balance": 0.0} for acct in HISTORY}
+
+
+@pytest.fixture
+def tiered(tmp_path, storage):
+    storage.transactions.update({acct: list(records) for acct, records in HISTORY.items()})
+    directory = os.path.join(tmp_path, "archive")
+    # Two runs, so the oldest account spans several segments
+    assert archive_transactions(storage, directory, 90, now=datetime(2025, 5, 1)) == 3
+    assert archive_transactions(storage, directory, 90, now=datetime(2025, 7, 1)) == 5
+    return TieredStorage(storage, TransactionArchive(directory, cache_size=1))
+
+
+def test_hot_tier_only_keeps_recent_rows(tiered):
+    assert tiered.storage.transaction_count("1000000001") == 6
+    assert tiered.storage.transaction_count("1000000002") == 0
+    assert tiered.archive.count("1000000001") == 6
+    assert tiered.archive.count("1000000003") == 0
+
+
+@pytest.mark.parametrize("account_number", sorted(HISTORY))
+def test_positions_run_through_both_tiers(tiered, account_number):
+    expected = HISTORY[account_number]
+    assert tiered.transaction_count(account_number) == len(expected)
+    assert tiered.get_transactions(account_number) == expected
+    positions = list(range(len(expected)))
+    assert tiered.transactions_at(account_number, positions[::-1]) == expected[::-1]
+    assert tiered.transactions_at(account_number, [1, 1, 0]) == [expected[1], expected[1],
+                                                                expected[0]]
+    for start in range(len(expected) + 1):
+        assert tiered.transaction_keys(account_number, start) == \
+            [(tx["type"], tx["date"]) for tx in expected[start:]]
+    for limit in range(1, len(expected) + 2):
+        assert tiered.recent_transactions(account_number, limit) == expected[-limit:]
+
+
+def test_type_queries_merge_both_tiers(tiered):
+    expected = HISTORY["1000000001"]
+    assert tiered.transaction_types("1000000001") == sorted(TYPES)
+    assert tiered.transactions_by_type("1000000001", "Withdrawal") == \
+        [tx for tx in expected if tx["type"] == "Withdrawal"]
+
+
+def test_scan_yields_every_row_grouped_by_account(tiered):
+    rows = list(tiered.scan_transactions())
+    assert sorted(rows) == sorted(
+        (acct, tx["type"], tx["amount"], tx["balance_after"], tx["date"])
+        for acct, records in HISTORY.items() for tx in records)
+    for account_number, records in HISTORY.items():
+        dates = [row[4] for row in rows if row[0] == account_number]
+        assert dates == [tx["date"] for tx in records]
@@ -0,0 +1,94 @@
+"""Batch posting: per-line rejects and all-or-nothing commits"""
+
+import json
+
+import pytest
+
+from atm_batch import BatchPoster, read_postings
+
+
+ACCOUNTS = {
+    "1000000001": {"pin": "1234", "name": "Payee", "balance": 100.00,
+                   "account_type": "Checking"},
+    "1000000002": {"pin": "1234", "name": "Rich", "balance": 2**63 / 100 - 1000,
+                   "account_type": "Savings"},
+}
+
+
+@pytest.fixture
+def poster(engine):
+    return BatchPoster(engine)
+
+
+def write_jsonl(path, rows):
+    with open(path, 'w') as f:
+        for row in rows:
+            f.write(json.dumps(row) + "\n")
+    return str(path)
+
+
+def reasons(report):
+    return {line: reason for line, _, reason in report["rejected"]}
+
+
+def test_bad_lines_are_rejected_and_the_rest_posted(tmp_path, poster, storage):
+    path = write_jsonl(tmp_path / "postings.jsonl", [
+        {"account": "1000000001", "amount": "25.50"},
+        {"account": "1000000001", "amount": 1e300},
+        {"account": "1000000001", "amount": True},
+        {"account": "1000000001", "amount": "NaN"},
+        {"account": "1000000001", "amount": "-5"},
+        {"account": "1000000001", "amount": "1.005"},
+        {"account": "9999999999", "amount": "5"},
+        {"account": "1000000001", "amount": "5", "type": "Bonus"},
+        {"account": "1000000001", "amount": "130", "type": "Fee"},
+        {"account": "1000000002", "amount": "600"},
+        {"account": "1000000002", "amount": "600"},
+        {"account": "1000000001", "amount": "4.50", "type": "Fee"},
+    ])
+    report = poster.post(read_postings(path))
+    assert report["posted"] == 3
+    assert set(reasons(report)) == {2, 3, 4, 5, 6, 7, 8, 9, 11}
+    assert reasons(report)[9] == "Insufficient funds"
+    assert "largest" in reasons(report)[11]
+    assert storage.accounts["1000000001"]["balance"] == 121.00
+    assert len(storage.transactions["1000000001"]) == 2
+
+
+def test_csv_rows_may_omit_optional_columns(tmp_path, poster, storage):
+    path = tmp_path / "postings.csv"
+    path.write_text("account,amount,type,description\n"
+                    "1000000001,10\n"
+                    "1000000001,-3\n"
+                    "1000000001,2.5,Fee\n"
+                    "1000000001\n")
+    report = poster.post(read_postings(str(path)))
+    assert report["posted"] == 2
+    assert reasons(report) == {3: "Amount must be a positive number",
+                               5: "Unreadable line: missing fields"}
+    assert storage.accounts["1000000001"]["balance"] == 107.50
+
+
+def test_failed_commit_posts_nothing(tmp_path, poster, storage, monkeypatch):
+    before = storage.accounts.to_dict()
+
+    def fail(entries):
+        raise OSError("disk full")
+
+    monkeypatch.setattr(storage, "append_transactions", fail)
+    path = write_jsonl(tmp_path / "postings.jsonl", [
+        {"account": "1000000001", "amount": "10"},
+        {"account": "1000000002", "amount": "10", "type": "Fee"},
+    ])
+    with pytest.raises(OSError):
+        poster.post(read_postings(path))
+    assert storage.accounts.to_dict() == before
+    assert storage.transactions == {}
+
+
+def test_dry_run_changes_nothing(tmp_path, poster, storage):
+    before = storage.accounts.to_dict()
+    path = write_jsonl(tmp_path / "postings.jsonl", [{"account": "1000000001", "amount": "10"}])
+    report = poster.post(read_postings(path), dry_run=True)
+    assert report["posted"] == 1 and report["first_id"] is None
+    assert storage.accounts.to_dict() == before
@@ -0,0 +1,87 @@
+"""Cash inventory and the note-mix solver"""
+
+import random
+from itertools import product
+
+import pytest
+
+from atm_cash import CashInventory
+
+
+def brute_force(counts, cents):
+    """Fewest notes making ``cents`` from ``counts``, by trying every mix"""
+    denominations = sorted(counts)
+    best = None
+    for mix in product(*(range(counts[d] + 1) for d in denominations)):
+        if sum(d * n for d, n in zip(denominations, mix)) == cents:
+            if best is None or sum(mix) < best:
+                best = sum(mix)
+    return best
+
+
+@pytest.mark.parametrize("seed", range(6))
+def test_solver_matches_brute_force(seed):
+    rng = random.Random(seed)
+    denominations = rng.sample([1, 2, 5, 10, 20, 25, 50, 100], rng.randint(2, 4))
+    counts = {d: rng.randint(0, 6) for d in denominations}
+    inventory = CashInventory(cassettes=counts)
+    for amount in range(1, sum(d * n for d, n in counts.items()) + 2):
+        mix = inventory._solve(amount * 100)
+        expected = brute_force({d * 100: n for d, n in counts.items()}, amount * 100)
+        if expected is None:
+            assert mix is None, (counts, amount)
+            continue
+        assert mix is not None, (counts, amount)
+        assert sum(d * n for d, n in mix.items()) == amount * 100
+        assert all(n <= counts[d // 100] for d, n in mix.items())
+        assert sum(mix.values()) == expected, (counts, amount)
+
+
+def test_greedy_trap_is_avoided():
+    # Greedy would take 1 x $50 and then fail on $10; 3 x $20 works
+    inventory = CashInventory(cassettes={50: 10, 20: 10})
+    assert inventory.plan(60) == {20: 3}
+    assert inventory.plan(110) == {50: 1, 20: 3}
+    assert inventory.plan(30) is None
+
+
+def test_reserve_and_release():
+    inventory = CashInventory(cassettes={100: 1, 20: 5})
+    first = inventory.reserve(120)
+    assert first == {100: 1, 20: 1}
+    assert inventory.plan(100) is None
+    assert inventory.reserve(100) is None
+    inventory.release(first)
+    assert inventory.counts == {10000: 1, 2000: 5}
+
+
+def test_deposits_are_only_recycled_when_counted():
+    inventory = CashInventory(cassettes={100: 0, 20: 10, 5: 0})
+    assert inventory.accept(135) == {}
+    assert inventory.bin_cents == 13500
+    assert inventory.plan(100) == {20: 5}
+    assert inventory.accept(135, {5: 27}) == {5: 27}
+    assert inventory.counts[500] == 27
+    with pytest.raises(ValueError):
+        inventory.accept(100, {50: 1})
+
+
+@pytest.mark.parametrize("notes", [{100: -500}, {100: 0}, {7: 1}, {-5: 2}, {100: True}])
+def test_bad_refills_are_rejected(notes):
+    inventory = CashInventory()
+    before = dict(inventory.counts)
+    with pytest.raises(ValueError):
+        inventory.refill(notes)
+    assert inventory.counts == before
+
+
+def test_low_cash_alert_is_latched(tmp_path):
+    inventory = CashInventory.open(str(tmp_path), "ATM-T", cassettes={20: 30},
+                                   low_total=100, low_notes=20)
+    assert inventory.check_low_cash() is None
+    inventory.reserve(300)
+    assert "low on cash" in inventory.check_low_cash()
+    assert inventory.check_low_cash() is None
+    inventory.refill({20: 100})
+    inventory.save()
+    assert CashInventory.open(str(tmp_path), "ATM-T").counts == {2000: 115}
@@ -0,0 +1,45 @@
+"""Recipient directory: search, persistence and lazy opening"""
+
+from atm_directory import AccountDirectory
+from atm_system import ATMSystem
+
+
+ACCOUNTS = {
+    "1000000002": {"pin": "1234", "name": "Jane Smith", "balance": 10.00,
+                   "account_type": "Checking"},
+    "1000000001": {"pin": "1234", "name": "John Doe", "balance": 10.00,
+                   "account_type": "Checking"},
+    "2000000001": {"pin": "1234", "name": "Jörg Smithers", "balance": 10.00,
+                   "account_type": "Savings"},
+}
+
+
+def test_search_by_number_prefix_and_name_words(storage):
+    directory = AccountDirectory.open(storage)
+    assert directory.search("1000") == [("1000000001", "John Doe"),
+                                        ("1000000002", "Jane Smith")]
+    assert directory.search("smith") == [("1000000002", "Jane Smith"),
+                                         ("2000000001", "Jörg Smithers")]
+    assert directory.search("jorg sm") == [("2000000001", "Jörg Smithers")]
+
+
+def test_saved_directory_is_reused_until_the_accounts_change(storage):
+    directory = AccountDirectory.open(storage)
+    directory.rename("1000000001", "Johnny Doe")
+    directory.save()
+
+    reopened = AccountDirectory(directory.path)
+    assert reopened.load(list(reversed(list(storage.accounts))))
+    assert reopened.name_of("1000000001") == "Johnny Doe"
+    assert not reopened.load(["1000000001", "1000000002", "2000000002"])
+    assert not reopened.load(list(storage.accounts)[:2])
+
+
+def test_system_opens_the_directory_on_first_search(storage):
+    system = ATMSystem(storage, terminal_id=None)
+    try:
+        assert system._directory is None
+        assert "1000000001" in system.directory
+        assert system.directory.search("doe") == [("1000000001", "John Doe")]
+    finally:
+        system.shutdown()
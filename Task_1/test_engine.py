@@ -0,0 +1,71 @@
+"""ATMEngine: failed operations leave no trace"""
+
+import pytest
+
+from atm_engine import InsufficientFundsError, InvalidAmountError
+
+
+ACCOUNTS = {
+    "1000000001": {"pin": "1234", "name": "Ada Lovelace", "balance": 500.00,
+                   "account_type": "Checking", "created_date": "2025-06-01"},
+    "1000000002": {"pin": "4321", "name": "Alan Turing", "balance": 80.00,
+                   "account_type": "Savings", "created_date": "2025-06-01"},
+}
+
+
+def snapshot(storage):
+    return storage.accounts.to_dict(), {acct: list(history) for acct, history
+                                        in storage.transactions.items()}
+
+
+def fail(*args, **kwargs):
+    raise OSError("disk full")
+
+
+def test_withdraw_rolls_back_when_saving_accounts_fails(engine, storage, monkeypatch):
+    before = snapshot(storage)
+    monkeypatch.setattr(storage, "save_accounts", fail)
+    with pytest.raises(OSError):
+        engine.withdraw("1000000001", 120)
+    assert snapshot(storage) == before
+    assert "withdrawal_day" not in storage.accounts["1000000001"]
+    assert "velocity" not in storage.accounts["1000000001"]
+
+
+def test_transfer_rolls_back_both_sides_when_recording_fails(engine, storage, monkeypatch):
+    before = snapshot(storage)
+    monkeypatch.setattr(storage, "append_transaction", fail)
+    with pytest.raises(OSError):
+        engine.transfer("1000000001", "1000000002", 50)
+    assert snapshot(storage) == before
+
+
+def test_rollback_keeps_string_fields(engine, storage, monkeypatch):
+    monkeypatch.setattr(storage, "save_accounts", fail)
+    for _ in range(20):
+        with pytest.raises(OSError):
+            engine.deposit("1000000002", 10)
+    account = storage.accounts["1000000002"]
+    assert account["name"] == "Alan Turing"
+    assert account["pin"] == "4321"
+    assert account["balance"] == 80.00
+
+
+def test_successful_operations_balance(engine, storage):
+    engine.deposit("1000000002", 20.10)
+    engine.transfer("1000000001", "1000000002", 0.90)
+    result = engine.withdraw("1000000001", 99.10)
+    assert result.balance == 400.00
+    assert storage.accounts["1000000002"]["balance"] == 101.00
+    assert [tx["type"] for tx in storage.transactions["1000000001"]] == \
+        ["Transfer Out", "Withdrawal"]
+
+
+def test_refused_operations_change_nothing(engine, storage):
+    before = snapshot(storage)
+    with pytest.raises(InsufficientFundsError):
+        engine.withdraw("1000000002", 100)
+    for amount in (0, -5, 1.001, "abc", True, 1e300):
+        with pytest.raises(InvalidAmountError):
+            engine.deposit("1000000001", amount)
+    assert snapshot(storage) == before
@@ -0,0 +1,69 @@
+"""Velocity rules and their time-wheel counters"""
+
+from datetime import datetime, timedelta
+
+import pytest
+
+from atm_engine import VelocityLimitError
+from atm_fraud import FraudMonitor, VelocityRule
+
+
+NOON = datetime(2025, 6, 20, 12, 0)
+
+
+ACCOUNTS = {
+    "1000000001": {"pin": "1234", "name": "Sender", "balance": 50000.00,
+                   "account_type": "Checking"},
+    "1000000002": {"pin": "1234", "name": "Recipient", "balance": 0.00,
+                   "account_type": "Checking"},
+}
+
+
+def test_withdrawal_count_rule_blocks(engine):
+    for _ in range(5):
+        engine.withdraw("1000000001", 10)
+    with pytest.raises(VelocityLimitError) as refused:
+        engine.withdraw("1000000001", 10)
+    assert refused.value.rule == "withdrawals_10m"
+    assert engine.accounts["1000000001"]["balance"] == 49950.00
+
+
+def test_outflow_amount_rule_blocks_transfers(engine):
+    engine.transfer("1000000001", "1000000002", 4000)
+    with pytest.raises(VelocityLimitError) as refused:
+        engine.transfer("1000000001", "1000000002", 1000.01)
+    assert refused.value.rule == "outflow_1h"
+    engine.transfer("1000000001", "1000000002", 1000)
+    assert engine.accounts["1000000002"]["balance"] == 5000.00
+
+
+def test_flag_rule_allows_and_audits(engine, monkeypatch):
+    events = []
+    monkeypatch.setattr(engine.audit, "record", lambda *event: events.append(event))
+    engine.deposit("1000000002", 9999)
+    engine.deposit("1000000002", 9999)
+    engine.deposit("1000000002", 9999)
+    assert engine.accounts["1000000002"]["balance"] == 29997.00
+    assert [event[1] for event in events] == ["Velocity Alert"]
+
+
+def test_window_slides():
+    rule = VelocityRule("three_per_minute", ("withdraw",), 60, max_count=3, buckets=6)
+    monitor = FraudMonitor(rules={}, default_rules=[rule])
+    account = {"account_type": "Checking"}
+    for seconds in (0, 20, 40):
+        now = NOON + timedelta(seconds=seconds)
+        assert monitor.check(account, "withdraw", 10, now) == []
+        monitor.record(account, "withdraw", 10, now)
+    assert monitor.check(account, "withdraw", 10, NOON + timedelta(seconds=50)) == [rule]
+    # The first withdrawal has left the window
+    assert monitor.check(account, "withdraw", 10, NOON + timedelta(seconds=70)) == []
+    assert monitor.check(account, "withdraw", 10, NOON + timedelta(minutes=5)) == []
+
+
+def test_rules_only_count_their_operations():
+    monitor = FraudMonitor()
+    account = {"account_type": "Checking"}
+    for _ in range(10):
+        monitor.record(account, "deposit", 10, NOON)
+    assert monitor.check(account, "withdraw", 10, NOON) == []
@@ -0,0 +1,68 @@
+"""Columnar account ledger"""
+
+import pytest
+
+from atm_ledger import MAX_CENTS, Ledger, add_cents, to_cents
+
+
+RECORDS = {
+    "1000000001": {"pin": "1234", "name": "Ada", "balance": 10.10, "account_type": "Checking"},
+    "1000000002": {"pin": "4321", "name": "Alan", "balance": 0.20, "account_type": "Savings"},
+    "0042": {"pin": "0000", "name": "Leading zero", "balance": 1.00},
+}
+
+
+def test_records_round_trip():
+    ledger = Ledger.from_records(RECORDS)
+    assert ledger.to_dict() == RECORDS
+    assert list(ledger) == list(RECORDS)
+    assert "42" not in ledger and "0042" in ledger
+
+
+def test_cents_are_exact():
+    ledger = Ledger.from_records(RECORDS)
+    for _ in range(10):
+        add_cents(ledger["1000000002"], to_cents(0.10))
+    assert ledger["1000000002"]["balance"] == 1.20
+    assert ledger.total_cents() == 1010 + 120 + 100
+
+
+def test_apply_deltas_is_all_or_nothing():
+    ledger = Ledger.from_records(RECORDS)
+    before = ledger.to_dict()
+    with pytest.raises(KeyError):
+        ledger.apply_deltas({"1000000001": 5, "9999999999": 5})
+    with pytest.raises(ValueError):
+        ledger.apply_deltas({"1000000001": 5, "1000000002": MAX_CENTS})
+    assert ledger.to_dict() == before
+    ledger.apply_deltas({"1000000001": -10, "1000000002": 10})
+    assert ledger.balance_cents("1000000001") == 1000
+
+
+def test_out_of_range_balances_are_refused():
+    ledger = Ledger.from_records(RECORDS)
+    with pytest.raises(ValueError):
+        ledger["1000000001"]["balance"] = 1e300
+    with pytest.raises(ValueError):
+        ledger["1000000001"].balance_cents = MAX_CENTS + 1
+    assert ledger["1000000001"]["balance"] == 10.10
+
+
+def test_rewriting_strings_reuses_their_space():
+    ledger = Ledger.from_records(RECORDS)
+    names = ledger._strings["name"]
+    account = ledger["1000000001"]
+    account["name"] = "Augusta Ada King"
+    size = len(names.data)
+    for _ in range(100):
+        record = account.to_dict()
+        account.clear()
+        account.update(record)
+        account["name"] = "Ada"
+        account["name"] = "Augusta Ada King"
+        del account["pin"]
+        account["pin"] = "1234"
+    assert len(names.data) == size
+    assert account.to_dict() == dict(RECORDS["1000000001"], name="Augusta Ada King")
+    offsets, lengths, data = names.packed()
+    assert len(data) == sum(len(r["name"].encode()) for r in ledger.to_dict().values())
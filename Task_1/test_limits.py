@@ -0,0 +1,60 @@
+"""Daily and rolling 24-hour withdrawal limits"""
+
+from datetime import datetime, timedelta
+
+import pytest
+
+from atm_engine import LimitExceededError
+from atm_limits import WithdrawalLimiter
+
+
+NOON = datetime(2025, 6, 20, 12, 0)
+
+
+ACCOUNTS = {
+    "1000000001": {"pin": "1234", "name": "Checking", "balance": 5000.00,
+                   "account_type": "Checking"},
+    "1000000002": {"pin": "1234", "name": "Premium", "balance": 5000.00,
+                   "account_type": "Premium"},
+}
+
+
+def test_daily_limit_is_cumulative(engine):
+    engine.withdraw("1000000001", 300)
+    with pytest.raises(LimitExceededError) as refused:
+        engine.withdraw("1000000001", 250)
+    assert refused.value.remaining == 200.00
+    engine.withdraw("1000000001", 200)
+    with pytest.raises(LimitExceededError):
+        engine.withdraw("1000000001", 0.01)
+    assert engine.accounts["1000000001"]["balance"] == 4500.00
+
+
+def test_limit_depends_on_account_type(engine):
+    assert engine.withdrawal_allowance("1000000002") == (1000.00, 1000.00)
+    engine.withdraw("1000000002", 600)
+    assert engine.withdrawal_allowance("1000000002") == (1000.00, 400.00)
+
+
+def test_refused_withdrawal_is_not_counted(engine):
+    with pytest.raises(LimitExceededError):
+        engine.withdraw("1000000001", 500.01)
+    assert engine.withdrawal_allowance("1000000001")[1] == 500.00
+
+
+def test_day_boundary_resets_the_total():
+    limiter = WithdrawalLimiter()
+    account = {"account_type": "Checking", "balance": 1000.0}
+    limiter.record(account, 500, now=NOON)
+    assert limiter.remaining(account, now=NOON) == 0
+    assert limiter.remaining(account, now=NOON + timedelta(days=1)) == 500.00
+
+
+def test_rolling_window_spans_midnight():
+    limiter = WithdrawalLimiter(rolling=True)
+    account = {"account_type": "Checking", "balance": 1000.0}
+    late = datetime(2025, 6, 20, 23, 30)
+    limiter.record(account, 400, now=late)
+    # A new calendar day, but still inside the last 24 hours
+    assert limiter.remaining(account, now=late + timedelta(hours=1)) == 100.00
+    assert limiter.remaining(account, now=late + timedelta(hours=25)) == 500.00
@@ -0,0 +1,59 @@
+"""End-of-day reconciliation on the pure-Python and NumPy paths"""
+
+import pytest
+
+import atm_reconcile
+from atm_reconcile import Reconciliation, TransactionColumns
+
+
+ROWS = [
+    ("1000000001", "Deposit", 100.00, 100.00, "2025-06-19 09:00:00"),
+    ("1000000001", "Transfer Out", 30.00, 70.00, "2025-06-20 10:00:00"),
+    ("1000000001", "Withdrawal", 20.00, 55.00, "2025-06-20 11:00:00"),
+    ("1000000001", "Login", 0.0, 55.00, "2025-06-20 11:05:00"),
+    ("1000000002", "Deposit", 0.10, 0.10, "2025-06-20 09:00:00"),
+    ("1000000002", "Transfer In", 30.00, 30.10, "2025-06-20 10:00:01"),
+    ("1000000002", "Fee", 1.25, 28.85, "2025-06-20 12:00:00"),
+    ("1000000003", "Deposit", 5.00, 7.00, "2025-06-20 09:30:00"),
+]
+
+
+@pytest.fixture(params=["python", "numpy"])
+def path(request, monkeypatch):
+    if request.param == "numpy":
+        monkeypatch.setattr(atm_reconcile, "numpy", pytest.importorskip("numpy"))
+    else:
+        monkeypatch.setattr(atm_reconcile, "numpy", None)
+    return request.param
+
+
+def test_type_totals(path):
+    bank, per_account = Reconciliation(TransactionColumns.load(ROWS)).type_totals()
+    assert bank == {"Deposit": [3, 10510], "Transfer Out": [1, 3000], "Withdrawal": [1, 2000],
+                    "Login": [1, 0], "Transfer In": [1, 3000], "Fee": [1, 125]}
+    assert list(per_account) == ["1000000001", "1000000002", "1000000003"]
+    assert per_account["1000000002"] == {"Deposit": [1, 10], "Transfer In": [1, 3000],
+                                         "Fee": [1, 125]}
+
+
+def test_type_totals_for_one_day(path):
+    bank, per_account = Reconciliation(TransactionColumns.load(ROWS), day="2025-06-19").type_totals()
+    assert bank == {"Deposit": [1, 10000]}
+    assert per_account == {"1000000001": {"Deposit": [1, 10000]}}
+
+
+def test_chain_breaks_skip_each_accounts_first_row(path):
+    breaks = Reconciliation(TransactionColumns.load(ROWS)).chain_breaks()
+    # The withdrawal should have left 50.00; the first row of 1000000003 has no predecessor
+    assert breaks == [("1000000001", 2, 5000, 5500)]
+
+
+def test_transfers_pair_across_a_clock_tick(path):
+    transfers = Reconciliation(TransactionColumns.load(ROWS)).transfer_check()
+    assert transfers == {"out_cents": 3000, "in_cents": 3000, "net_cents": 0, "unmatched": []}
+
+
+def test_empty_ledger(path):
+    reconciliation = Reconciliation(TransactionColumns.load([]))
+    assert reconciliation.type_totals() == ({}, {})
+    assert reconciliation.chain_breaks() == []
@@ -0,0 +1,54 @@
+"""Read replica journal tailing across compactions"""
+
+import pytest
+
+from atm_replica import Follower
+
+
+ACCOUNTS = {
+    "1000000001": {"pin": "1234", "name": "Ada", "balance": 100.00, "account_type": "Checking"},
+}
+
+
+@pytest.fixture
+def follower(storage):
+    follower = Follower(storage.accounts_file, storage.transactions_file,
+                        storage.journal.path, reload_interval=0)
+    follower.sync()
+    return follower
+
+
+def history(follower):
+    return [tx["amount"] for tx in follower.storage.transactions.get("1000000001", [])]
+
+
+def test_follower_tails_new_records(engine, follower):
+    engine.deposit("1000000001", 5)
+    engine.deposit("1000000001", 6)
+    assert follower.sync() == 2
+    assert history(follower) == [5.0, 6.0]
+    assert follower.storage.accounts["1000000001"]["balance"] == 111.00
+
+
+@pytest.mark.parametrize("deposits_after_truncate", [1, 20])
+def test_poll_between_snapshot_and_truncate(engine, storage, follower, deposits_after_truncate):
+    for amount in range(1, 6):
+        engine.deposit("1000000001", amount)
+    follower.sync()
+
+    # compact(), with a poll landing between its two steps
+    storage.journal.flush()
+    storage.export_transactions()
+    follower.sync()
+    assert follower.reloads == 2
+    storage.journal.truncate()
+
+    # Fewer bytes than the old offset, or enough to grow past it
+    for _ in range(deposits_after_truncate):
+        engine.deposit("1000000001", 10)
+    follower.sync()
+
+    assert history(follower) == [1.0, 2.0, 3.0, 4.0, 5.0] + [10.0] * deposits_after_truncate
+    assert follower.storage.accounts["1000000001"]["balance"] == \
+        storage.accounts["1000000001"]["balance"]
+    assert follower.reloads == 2
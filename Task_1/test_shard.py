@@ -0,0 +1,143 @@
+"""Two-phase cross-shard transfers and coordinator recovery
+
+Each test starts real shard worker processes, so this module takes a few
+seconds.
+"""
+
+import uuid
+
+import pytest
+
+from atm_engine import VelocityLimitError
+from atm_fraud import FraudMonitor, VelocityRule
+from atm_ledger import to_cents
+from atm_shard import ShardRouter, create_shards, shard_for
+
+
+SHARDS = 2
+
+
+def accounts_on_two_shards():
+    """Sender and recipient account numbers owned by different shards"""
+    numbers = [str(1000000000 + i) for i in range(20)]
+    sender = numbers[0]
+    recipient = next(n for n in numbers if shard_for(n, SHARDS) != shard_for(sender, SHARDS))
+    return sender, recipient
+
+
+SENDER, RECIPIENT = accounts_on_two_shards()
+
+
+@pytest.fixture
+def directory(tmp_path):
+    create_shards(str(tmp_path), SHARDS, {
+        SENDER: {"pin": "1234", "name": "Sender", "balance": 300.00,
+                 "account_type": "Checking"},
+        RECIPIENT: {"pin": "1234", "name": "Recipient", "balance": 20.00,
+                    "account_type": "Checking"},
+    })
+    return str(tmp_path)
+
+
+def open_router(directory, **engine_options):
+    return ShardRouter(directory, fsync=False, **engine_options).start()
+
+
+def state(router):
+    sender, recipient = router.get_account(SENDER), router.get_account(RECIPIENT)
+    return sender["balance"], sender.get("holds", {}), recipient["balance"]
+
+
+def begin(router, amount):
+    """Log a transfer and place its hold, as the coordinator does before deciding"""
+    record = {"txid": uuid.uuid4().hex, "to": RECIPIENT, "cents": to_cents(amount)}
+    router._write_log(SENDER, record, "begin")
+    router.call(SENDER, "hold_funds", record["txid"], amount)
+    return record
+
+
+def test_transfer_across_shards(directory):
+    router = open_router(directory)
+    try:
+        result = router.transfer(SENDER, RECIPIENT, 120)
+        assert result.balance == 180.00
+        assert state(router) == (180.00, {}, 140.00)
+    finally:
+        router.close()
+
+
+def test_recipient_velocity_rule_aborts_the_transfer(directory):
+    one_credit = VelocityRule("transfers_in_10m", ("transfer_in",), 600, max_count=1)
+    router = open_router(directory, fraud=FraudMonitor(rules={}, default_rules=[one_credit]))
+    try:
+        router.transfer(SENDER, RECIPIENT, 10)
+        with pytest.raises(VelocityLimitError) as refused:
+            router.transfer(SENDER, RECIPIENT, 10)
+        assert refused.value.rule == "transfers_in_10m"
+        # The sender's hold was released and nothing reached the recipient
+        assert state(router) == (290.00, {}, 30.00)
+        assert router.recover() == {"committed": 0, "aborted": 0}
+    finally:
+        router.close()
+
+
+def test_undecided_transfer_is_aborted(directory):
+    router = open_router(directory)
+    try:
+        begin(router, 100)
+        assert state(router)[1]
+    finally:
+        router.close()
+
+    router = open_router(directory)
+    try:
+        assert state(router) == (300.00, {}, 20.00)
+        assert router.recover() == {"committed": 0, "aborted": 0}
+    finally:
+        router.close()
+
+
+def test_committed_transfer_is_finished_after_a_crash(directory, monkeypatch):
+    router = open_router(directory)
+
+    def crash(account_number, record, commit):
+        raise RuntimeError("coordinator crashed")
+
+    monkeypatch.setattr(router, "_finish", crash)
+    try:
+        with pytest.raises(RuntimeError):
+            router.transfer(SENDER, RECIPIENT, 75)
+        # Decided but not carried out: the funds are only held
+        assert state(router)[0] == 300.00 and state(router)[2] == 20.00
+    finally:
+        router.close()
+
+    router = open_router(directory)
+    try:
+        assert state(router) == (225.00, {}, 95.00)
+    finally:
+        router.close()
+
+
+def test_half_finished_commit_is_applied_once(directory):
+    router = open_router(directory)
+    try:
+        record = begin(router, 50)
+        router._write_log(SENDER, record, "commit")
+        # The sender settled; the coordinator died before crediting the recipient
+        router.call(SENDER, "settle_hold", record["txid"], "Transfer Out", "Transfer")
+    finally:
+        router.close()
+
+    router = open_router(directory)
+    try:
+        assert state(router) == (250.00, {}, 70.00)
+    finally:
+        router.close()
+
+    # A second restart finds nothing left to do
+    router = open_router(directory)
+    try:
+        assert state(router) == (250.00, {}, 70.00)
+    finally:
+        router.close()
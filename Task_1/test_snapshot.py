@@ -0,0 +1,85 @@
+"""Binary account snapshot format"""
+
+import os
+import struct
+
+import pytest
+
+from atm_ledger import Ledger
+from atm_snapshot import (HEADER, SnapshotError, SnapshotStore, decode_ledger, encode_ledger,
+                          read_snapshot, write_ledger)
+
+
+RECORDS = {
+    "1234567890": {"pin": "1234", "name": "John Doe", "balance": 1500.75,
+                   "account_type": "Checking", "created_date": "2025-06-01"},
+    "0987654321": {"pin": "5678", "name": "Zoë Ñúñez", "balance": 0.01,
+                   "account_type": "Premium", "created_date": "2025-06-02",
+                   "daily_withdrawals": {"date": "2025-06-20", "total": 120.0},
+                   "holds": {"tx1": 2500}},
+    "ACC-7": {"pin": "0000", "name": "Non-numeric", "balance": -12.34,
+              "account_type": "Savings"},
+    "5": {"name": "No PIN", "balance": 90071992547409.91},
+}
+
+
+def test_round_trip():
+    ledger = Ledger.from_records(RECORDS)
+    decoded = decode_ledger(encode_ledger(ledger))
+    assert decoded.to_dict() == ledger.to_dict()
+    assert list(decoded) == list(ledger)
+    assert decoded.total_cents() == ledger.total_cents()
+    assert decoded["0987654321"]["name"] == "Zoë Ñúñez"
+    assert "1234567891" not in decoded
+
+
+def test_decoded_ledger_accepts_updates():
+    decoded = decode_ledger(encode_ledger(Ledger.from_records(RECORDS)))
+    decoded["1234567890"]["name"] = "Johnathan Doe"
+    decoded["5"]["pin"] = "9999"
+    decoded["2000000000"] = {"pin": "1111", "name": "New", "balance": 5.0}
+    again = decode_ledger(encode_ledger(decoded))
+    assert again.to_dict() == decoded.to_dict()
+    assert again["1234567890"]["name"] == "Johnathan Doe"
+
+
+def test_rewrites_do_not_grow_the_snapshot():
+    ledger = Ledger.from_records(RECORDS)
+    size = len(encode_ledger(ledger))
+    for _ in range(50):
+        ledger["1234567890"]["name"] = "A much longer customer name"
+        record = ledger["1234567890"].to_dict()
+        ledger["1234567890"].clear()
+        ledger["1234567890"].update(record)
+        ledger["1234567890"]["name"] = "John Doe"
+    assert len(encode_ledger(ledger)) == size
+
+
+def test_damage_is_detected():
+    data = bytearray(encode_ledger(Ledger.from_records(RECORDS)))
+    with pytest.raises(SnapshotError):
+        decode_ledger(bytes(data[:-1]))
+    with pytest.raises(SnapshotError):
+        decode_ledger(bytes(data[:HEADER.size - 1]))
+    flipped = bytearray(data)
+    flipped[-3] ^= 0xFF
+    with pytest.raises(SnapshotError, match="checksum"):
+        decode_ledger(bytes(flipped))
+    wrong_version = bytearray(data)
+    struct.pack_into("<H", wrong_version, 8, 99)
+    with pytest.raises(SnapshotError, match="version"):
+        decode_ledger(bytes(wrong_version))
+    with pytest.raises(SnapshotError):
+        decode_ledger(b"{}" + bytes(data[2:]))
+
+
+def test_store_commits_changes(tmp_path):
+    path = os.path.join(tmp_path, "accounts.snap")
+    write_ledger(path, Ledger.from_records(RECORDS))
+    ledger = read_snapshot(path)
+    store = SnapshotStore(path, ledger)
+    ledger["1234567890"]["balance"] = 1.25
+    store.save("1234567890")
+    assert read_snapshot(path)["1234567890"]["balance"] == 1.25
+    assert not store.commit()
+    store.close()
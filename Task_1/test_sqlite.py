@@ -0,0 +1,76 @@
+"""SQLite backend: money stored as integer cents"""
+
+import sqlite3
+
+from atm_storage import SQLiteStorage
+
+
+ACCOUNTS = {
+    "1000000001": {"pin": "1234", "name": "Ada", "balance": 10.10, "account_type": "Checking",
+                   "created_date": "2025-06-01"},
+    "1000000002": {"pin": "4321", "name": "Alan", "balance": 0.30, "account_type": "Savings",
+                   "created_date": "2025-06-01"},
+}
+
+DEPOSIT = {"transaction_id": "t1", "date": "2025-06-20 12:00:00", "type": "Deposit",
+           "amount": 0.20, "description": "Cash", "balance_after": 0.30}
+
+
+def test_money_is_stored_as_cents(tmp_path):
+    path = str(tmp_path / "atm.db")
+    storage = SQLiteStorage(path)
+    storage.create_accounts(ACCOUNTS)
+    storage.append_transaction("1000000002", DEPOSIT)
+    storage.close()
+
+    conn = sqlite3.connect(path)
+    assert conn.execute("SELECT balance, typeof(balance) FROM accounts"
+                        " WHERE account_number = '1000000001'").fetchone() == (1010, "integer")
+    assert conn.execute("SELECT amount, balance_after FROM transactions").fetchone() == (20, 30)
+    conn.close()
+
+    storage = SQLiteStorage(path)
+    assert storage.accounts["1000000001"] == ACCOUNTS["1000000001"]
+    assert storage.get_transactions("1000000002") == [DEPOSIT]
+    assert list(storage.scan_balances()) == [("1000000001", 10.10), ("1000000002", 0.30)]
+    storage.close()
+
+
+def test_real_schema_is_migrated(tmp_path):
+    path = str(tmp_path / "atm.db")
+    conn = sqlite3.connect(path)
+    conn.executescript("""
+        CREATE TABLE accounts (account_number TEXT PRIMARY KEY, pin TEXT NOT NULL,
+            name TEXT NOT NULL, balance REAL NOT NULL, account_type TEXT NOT NULL,
+            created_date TEXT, extra TEXT);
+        CREATE TABLE transactions (account_number TEXT NOT NULL, seq INTEGER NOT NULL,
+            transaction_id TEXT NOT NULL, date TEXT NOT NULL, type TEXT NOT NULL,
+            amount REAL NOT NULL, description TEXT, balance_after REAL,
+            PRIMARY KEY (account_number, seq)) WITHOUT ROWID;
+        CREATE INDEX idx_transactions_account_date ON transactions (account_number, date);
+        INSERT INTO accounts VALUES ('1000000002', '4321', 'Alan', 0.30, 'Savings', '2025-06-01', NULL);
+        INSERT INTO transactions VALUES ('1000000002', 1, 't1', '2025-06-20 12:00:00',
+            'Deposit', 0.20, 'Cash', 0.30);
+        INSERT INTO transactions VALUES ('1000000002', 2, 't2', '2025-06-20 12:01:00',
+            'Login', 0.0, 'Login', NULL);
+    """)
+    conn.close()
+
+    storage = SQLiteStorage(path)
+    assert storage.accounts["1000000002"] == ACCOUNTS["1000000002"]
+    assert storage.get_transactions("1000000002")[0] == DEPOSIT
+    assert storage.get_transactions("1000000002")[1]["balance_after"] is None
+    assert storage.transactions_by_type("1000000002", "Deposit") == [DEPOSIT]
+    storage.close()
+
+    conn = sqlite3.connect(path)
+    assert conn.execute("PRAGMA user_version").fetchone() == (1,)
+    assert conn.execute("SELECT typeof(amount) FROM transactions WHERE seq = 1").fetchone() == ("integer",)
+    assert [row[2] for row in conn.execute("PRAGMA table_info(accounts)")
+            if row[1] == "balance"] == ["INTEGER"]
+    conn.close()
+
+    # A second open finds the current schema and leaves it alone
+    storage = SQLiteStorage(path)
+    assert storage.accounts["1000000002"]["balance"] == 0.30
+    storage.close()